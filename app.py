@@ -1,5 +1,7 @@
 # ───────────────────────────  app.py  ───────────────────────────
-import os, sys, pathlib, importlib, logging, uuid, re, secrets, hashlib, base64
+# Primeiro import: o relógio das fases do startup (STARTUP_PROFILE=1) começa aqui.
+from startup_profile import startup_profile
+import os, sys, pathlib, importlib, logging, uuid, re, secrets, hashlib, base64, shutil
 import time as _stdlib_time
 import subprocess
 import requests
@@ -23,7 +25,7 @@ sys.modules["petorlandia_app"] = sys.modules[__name__]
 
 from datetime import datetime, timezone, date, timedelta, time
 from dateutil.relativedelta import relativedelta
-from PIL import Image, ImageOps
+from PIL import Image
 
 
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -131,7 +133,6 @@ from models import (
     get_clinica_field,
 )
 from models import CasaDeRacao, CasaDeRacaoHorario, CasaDeRacaoOnboardingInvite, PartnerInvite  # noqa: E402
-from models import get_active_product_categories  # noqa: E402
 from models.usuarios import (  # noqa: E402
     HABILITACAO_CHOICES,
     HABILITACAO_CRMV,
@@ -162,6 +163,7 @@ from services.fiscal.nfse_service import (
     queue_emit_nfse,
 )
 from services.billing.close_appointment import close_appointment
+from services.socket_rooms import room_state
 from services.appointments import (
     ReturnAppointmentDTO,
     finalize_consulta_flow,
@@ -193,6 +195,7 @@ from security.crypto import (
 )
 from security.csv_safe import safe_csv_writer
 from repositories import AppointmentRepository, ClinicRepository
+from schema_guards import run_schema_guards
 _config_utils_module_name = (
     f"{__package__}.config_utils" if __package__ else "config_utils"
 )
@@ -200,6 +203,8 @@ normalize_database_uri = importlib.import_module(
     _config_utils_module_name
 ).normalize_database_uri
 
+startup_profile.checkpoint("imports")
+
 # ----------------------------------------------------------------
 # 2)  Flask app + config
 # ----------------------------------------------------------------
@@ -273,11 +278,16 @@ if async_mode == "eventlet":
         except Exception:  # pragma: no cover - fallback when eventlet is unavailable/incompatible
             async_mode = "threading"
 
+# Com mais de um worker, ``message_queue`` (Redis) distribui os emits para
+# sala entre os processos; o estado das salas fica em services.socket_rooms.
 socketio = SocketIO(
     app,
     cors_allowed_origins=app.config.get("CORS_ALLOWED_ORIGINS", ()),
     async_mode=async_mode,
+    message_queue=app.config.get("SOCKETIO_MESSAGE_QUEUE") or None,
+    channel=app.config.get("SOCKETIO_CHANNEL") or "flask-socketio",
 )
+startup_profile.checkpoint("config")
 
 # ----------------------------------------------------------------
 # 3)  Extensões
@@ -350,6 +360,7 @@ configure_logging(app)
 from request_hooks import register_request_hooks
 
 register_request_hooks(app)
+startup_profile.checkpoint("extensions")
 
 
 # ----------------------------------------------------------------
@@ -660,15 +671,32 @@ def _ensure_plantao_modelos_table() -> bool:
 # ----------------------------------------------------------------
 # 4)  AWS S3 helper (lazy)
 # ----------------------------------------------------------------
-import boto3
-
 AWS_ID, AWS_SECRET = os.getenv("AWS_ACCESS_KEY_ID"), os.getenv("AWS_SECRET_ACCESS_KEY")
 BUCKET = os.getenv("S3_BUCKET_NAME")
 
 def _s3():
+    import boto3  # SDK pesado: só carrega no primeiro upload
+
     return boto3.client("s3", aws_access_key_id=AWS_ID, aws_secret_access_key=AWS_SECRET)
 
 
+from services.image_pipeline import (
+    LocalImageStorage,
+    S3ImageStorage,
+    original_bytes as _image_original_bytes,
+    register_upload as _register_upload_derivatives,
+    to_display_rgb,
+)
+
+
+def _register_image_upload(raw_image: bytes, url: str, storage) -> None:
+    """Agenda os derivados (srcset) da imagem; falha aqui não derruba o upload."""
+    try:
+        _register_upload_derivatives(raw_image, url, storage)
+    except Exception as exc:  # noqa: BLE001
+        app.logger.warning("Derivados da imagem não agendados (%s): %s", url, exc)
+
+
 def _runtime_module_attr(name, default):
     seen = set()
     for module_name in ("app", "petorlandia_app", __name__):
@@ -720,24 +748,15 @@ def upload_to_s3(file, filename, folder="uploads") -> str | None:
             finally:
                 file.stream.seek(0)
 
+        raw_image = None
+        fileobj = file.stream
         if is_image:
             file.stream.seek(0)
-            image = Image.open(file.stream)
-            image = ImageOps.exif_transpose(image)  # baixa o EXIF: pixels já saem na orientação certa
-            # JPEG does not support alpha. A direct RGBA-to-RGB conversion
-            # turns transparent product backgrounds black, so flatten them on
-            # the neutral white background used by the catalog.
-            if image.mode in {"RGBA", "LA"} or "transparency" in image.info:
-                foreground = image.convert("RGBA")
-                background = Image.new("RGBA", foreground.size, "white")
-                background.alpha_composite(foreground)
-                image = background.convert("RGB")
-            else:
-                image = image.convert("RGB")
+            raw_image = file.stream.read()
+            image = to_display_rgb(Image.open(BytesIO(raw_image)))  # EXIF aplicado, alfa achatado no branco
             image.thumbnail((1280, 1280))
             buffer = BytesIO()
             image.save(buffer, format="JPEG", optimize=True, quality=85)
-            buffer.seek(0)
             fileobj = buffer
             content_type = "image/jpeg"
             name, ext = os.path.splitext(filename)
@@ -747,24 +766,21 @@ def upload_to_s3(file, filename, folder="uploads") -> str | None:
         filename = secure_filename(filename)
         key = f"{folder}/{filename}"
 
-        # Keep a copy of the data so that we can retry if S3 upload fails
-        fileobj.seek(0)
-        data = fileobj.read()
-        buffer = BytesIO(data)
-
         if bucket:
             try:
-                buffer.seek(0)
+                fileobj.seek(0)
                 s3_factory().upload_fileobj(
-                    buffer,
+                    fileobj,
                     bucket,
                     key,
                     ExtraArgs={"ContentType": content_type},
                 )
-                return f"https://{bucket}.s3.amazonaws.com/{key}"
+                url = f"https://{bucket}.s3.amazonaws.com/{key}"
+                if raw_image is not None:
+                    _register_image_upload(raw_image, url, S3ImageStorage(s3_factory, bucket))
+                return url
             except Exception as exc:  # noqa: BLE001
                 app.logger.exception("S3 upload failed: %s", exc)
-                buffer.seek(0)
 
         # Never make clinical/user documents public by default. Local fallback
         # remains available only for tests or an explicit development opt-in.
@@ -773,12 +789,17 @@ def upload_to_s3(file, filename, folder="uploads") -> str | None:
             return None
 
         # Local fallback when S3 is not configured or fails (development/tests)
-        local_path = project_root / "static" / "uploads" / key
+        uploads_root = project_root / "static" / "uploads"
+        local_path = uploads_root / key
         local_path.parent.mkdir(parents=True, exist_ok=True)
+        fileobj.seek(0)
         with open(local_path, "wb") as fp:
-            fp.write(buffer.read())
+            shutil.copyfileobj(fileobj, fp)
 
-        return f"/static/uploads/{key}"
+        url = f"/static/uploads/{key}"
+        if raw_image is not None:
+            _register_image_upload(raw_image, url, LocalImageStorage(uploads_root))
+        return url
     except Exception as exc:  # noqa: BLE001
         app.logger.exception("Upload failed: %s", exc)
         return None
@@ -800,14 +821,20 @@ def bake_image_rotation(image_url: str, degrees, folder: str = "uploads") -> str
         degrees = int(round(float(degrees or 0))) % 360
         if degrees == 0 or not image_url:
             return image_url
-        if image_url.startswith("/"):
+        # O original do upload fica em cache local (services.image_pipeline):
+        # gira a partir dele, sem baixar de volta o JPEG já recomprimido.
+        original = _image_original_bytes(image_url)
+        if original is not None:
+            source_image = Image.open(BytesIO(original))
+        elif image_url.startswith("/"):
             src = pathlib.Path(_runtime_module_attr("PROJECT_ROOT", PROJECT_ROOT)) / image_url.lstrip("/")
             source_image = Image.open(src)
         else:
             response = requests.get(image_url, timeout=10)
             response.raise_for_status()
             source_image = Image.open(BytesIO(response.content))
-        source_image = ImageOps.exif_transpose(source_image).convert("RGB")
+        source_image = to_display_rgb(source_image)
+        source_image.thumbnail((1280, 1280))  # upload_to_s3 reduz para isso de todo jeito
         # CSS gira no sentido horário; PIL.rotate gira anti-horário -> negar.
         rotated = source_image.rotate(-degrees, expand=True)
         buffer = BytesIO()
@@ -875,26 +902,35 @@ def _nim_default_state() -> dict:
     }
 
 
-nim_rooms = defaultdict(_nim_default_state)
-nim_session_rooms: Dict[str, str] = {}
-nim_session_players: Dict[str, int] = {}
-nim_room_members: Dict[str, set[str]] = defaultdict(set)
-nim_room_players: Dict[str, dict[int, str]] = defaultdict(dict)
+# Salas, assentos e tabuleiros ficam em ``services.socket_rooms`` (Redis quando
+# há mais de um worker), não em dicts deste módulo: cada worker do gunicorn
+# enxergaria só metade da sala.
+NIM_NAMESPACE = "/"
 
 # A videochamada usa um namespace próprio para não misturar presença e sinais
 # WebRTC com as partidas do Desafio de Palitos. Apenas metadados efêmeros ficam
 # no servidor; áudio, vídeo e compartilhamento de tela trafegam entre os pares.
 CALL_NAMESPACE = "/chamada"
-call_session_rooms: Dict[str, str] = {}
-call_session_players: Dict[str, int] = {}
-call_room_members: Dict[str, set[str]] = defaultdict(set)
-call_room_players: Dict[str, dict[int, str]] = defaultdict(dict)
 
 EASTER_EGG_STATIC_DIR = PROJECT_ROOT / "static" / "easter_egg"
 
 
-def _nim_payload(room: str) -> dict:
-    state = nim_rooms[room]
+def _nim_room_state(room: str) -> dict:
+    """Tabuleiro atual da sala (o inicial, se ninguém jogou ainda)."""
+    return _nim_state_from_store(room_state.get_state(NIM_NAMESPACE, room))
+
+
+def _nim_state_from_store(state: dict | None) -> dict:
+    if not state:
+        return _nim_default_state()
+    # JSON só tem chaves texto; os assentos voltam a ser 1 e 2.
+    players = state.get("players")
+    if isinstance(players, dict):
+        state["players"] = {int(seat): name for seat, name in players.items() if str(seat).isdigit()}
+    return state
+
+
+def _nim_payload(state: dict) -> dict:
     return {
         "rows": [row.copy() for row in state["rows"]],
         "turn": state["turn"],
@@ -1392,8 +1428,11 @@ def _nim_room_from_request() -> str:
 @socketio.on("connect")
 def nim_connect():  # pragma: no cover - exercised via browser
     room = _nim_room_from_request()
-    members = nim_room_members[room]
-    if len(members) >= 2:
+    # Assento atribuído atomicamente no store compartilhado: dois workers
+    # nunca entregam o mesmo lugar, e assentos de sessões que morreram sem
+    # ``disconnect`` (worker reiniciado) expiram e são liberados aqui.
+    joined = room_state.join(NIM_NAMESPACE, room, request.sid)
+    if joined is None:
         emit(
             "room_full",
             {
@@ -1404,97 +1443,69 @@ def nim_connect():  # pragma: no cover - exercised via browser
         disconnect()
         return
 
-    nim_session_rooms[request.sid] = room
-    players_map = nim_room_players[room]
-
-    # Clear out any stale seat assignments that might linger if a client
-    # disconnected without triggering ``nim_disconnect`` (for example when the
-    # server restarted).
-    for seat, occupant in list(players_map.items()):
-        if occupant not in members:
-            players_map.pop(seat, None)
-
-    assigned_seat = None
-    for candidate in (1, 2):
-        occupant = players_map.get(candidate)
-        if not occupant:
-            assigned_seat = candidate
-            break
-
-    if assigned_seat is None:
-        # Should not happen because the room is limited to two players, but
-        # default to seat ``1`` to avoid leaving the session without a slot.
-        assigned_seat = 1
-
-    players_map[assigned_seat] = request.sid
-    nim_session_players[request.sid] = assigned_seat
-    members.add(request.sid)
     join_room(room)
-    emit("update_state", _nim_payload(room))
+    emit("update_state", _nim_payload(_nim_room_state(room)))
 
 
 @socketio.on("move")
 def nim_move(data):  # pragma: no cover - exercised via browser
-    room = nim_session_rooms.get(request.sid)
-    if not room:
-        room = _nim_room_from_request()
-        nim_session_rooms[request.sid] = room
-    current_state = nim_rooms[room]
-    player_seat = nim_session_players.get(request.sid)
-    normalized = _normalize_nim_payload(data, current_state)
-    if not normalized:
-        emit("update_state", _nim_payload(room))
-        return
+    session = room_state.session(NIM_NAMESPACE, request.sid)
+    room, player_seat = session if session else (_nim_room_from_request(), None)
 
-    current_turn = current_state.get("turn")
-    try:
-        current_turn_int = int(current_turn)
-    except (TypeError, ValueError):
-        current_turn_int = 1
-    if current_turn_int not in (1, 2):
-        current_turn_int = 1
+    def apply(stored: dict | None) -> dict | None:
+        current_state = _nim_state_from_store(stored)
+        normalized = _normalize_nim_payload(data, current_state)
+        if not normalized:
+            return None
 
-    board_changed = (
-        normalized.get("rows") != current_state.get("rows")
-        or normalized.get("turn") != current_turn_int
-        or normalized.get("winner") != current_state.get("winner")
-        or normalized.get("has_played") != current_state.get("has_played")
-        or normalized.get("active_row") != current_state.get("active_row")
-    )
+        current_turn = current_state.get("turn")
+        try:
+            current_turn_int = int(current_turn)
+        except (TypeError, ValueError):
+            current_turn_int = 1
+        if current_turn_int not in (1, 2):
+            current_turn_int = 1
 
-    if board_changed and player_seat != current_turn_int:
-        emit("update_state", _nim_payload(room))
-        return
+        board_changed = (
+            normalized.get("rows") != current_state.get("rows")
+            or normalized.get("turn") != current_turn_int
+            or normalized.get("winner") != current_state.get("winner")
+            or normalized.get("has_played") != current_state.get("has_played")
+            or normalized.get("active_row") != current_state.get("active_row")
+        )
+
+        if board_changed and player_seat != current_turn_int:
+            return None
+
+        enforced = _nim_enforce_rules(current_state, normalized)
+        if not enforced:
+            return None
+
+        last_turn_summary, next_origin_rows = _nim_turn_metadata(current_state, enforced)
+        enforced["turn_origin_rows"] = next_origin_rows
+        enforced["last_turn"] = last_turn_summary
+        return enforced
 
-    enforced = _nim_enforce_rules(current_state, normalized)
-    if not enforced:
-        emit("update_state", _nim_payload(room))
+    enforced = room_state.update_state(NIM_NAMESPACE, room, apply)
+    if enforced is None:
+        emit("update_state", _nim_payload(_nim_room_state(room)))
         return
+    # Com ``message_queue`` o emit para a sala chega aos jogadores conectados
+    # em qualquer worker.
+    emit("update_state", _nim_payload(_nim_state_from_store(enforced)), room=room)
 
-    last_turn_summary, next_origin_rows = _nim_turn_metadata(current_state, enforced)
-    enforced["turn_origin_rows"] = next_origin_rows
-    enforced["last_turn"] = last_turn_summary
 
-    nim_rooms[room] = enforced
-    emit("update_state", _nim_payload(room), room=room)
+@socketio.on("heartbeat")
+def nim_heartbeat():  # pragma: no cover - exercised via browser
+    # Só renova o TTL da sessão: jogador parado pensando não perde o assento.
+    room_state.session(NIM_NAMESPACE, request.sid)
 
 
 @socketio.on("disconnect")
 def nim_disconnect():  # pragma: no cover - exercised via browser
-    room = nim_session_rooms.pop(request.sid, None)
-    seat = nim_session_players.pop(request.sid, None)
-    if room:
-        members = nim_room_members.get(room)
-        if members and request.sid in members:
-            members.discard(request.sid)
-            if not members:
-                nim_room_members.pop(room, None)
-        players = nim_room_players.get(room)
-        if players and seat in players and players.get(seat) == request.sid:
-            players.pop(seat, None)
-            if not players:
-                nim_room_players.pop(room, None)
-        leave_room(room)
+    left = room_state.leave(NIM_NAMESPACE, request.sid)
+    if left:
+        leave_room(left.room)
 
 
 def _call_room_from_request() -> str:
@@ -1506,8 +1517,8 @@ def _call_room_from_request() -> str:
 @socketio.on("connect", namespace=CALL_NAMESPACE)
 def call_connect():  # pragma: no cover - integration tested with Socket.IO client
     room = _call_room_from_request()
-    members = call_room_members[room]
-    if len(members) >= 2:
+    joined = room_state.join(CALL_NAMESPACE, room, request.sid)
+    if joined is None:
         emit(
             "room_full",
             {"message": "Esta sala já tem duas pessoas.", "room": room},
@@ -1515,34 +1526,29 @@ def call_connect():  # pragma: no cover - integration tested with Socket.IO clie
         disconnect()
         return
 
-    players = call_room_players[room]
-    for seat, occupant in list(players.items()):
-        if occupant not in members:
-            players.pop(seat, None)
-
-    seat = next((candidate for candidate in (1, 2) if not players.get(candidate)), 1)
-    call_session_rooms[request.sid] = room
-    call_session_players[request.sid] = seat
-    players[seat] = request.sid
-    members.add(request.sid)
     join_room(room)
 
     emit(
         "room_state",
         {
             "room": room,
-            "participants": len(members),
-            "seat": seat,
-            "initiator": seat == 1,
+            "participants": joined.participants,
+            "seat": joined.seat,
+            "initiator": joined.seat == 1,
         },
     )
-    emit("peer_joined", {"participants": len(members)}, room=room, include_self=False)
-    emit("presence", {"participants": len(members)}, room=room)
+    emit("peer_joined", {"participants": joined.participants}, room=room, include_self=False)
+    emit("presence", {"participants": joined.participants}, room=room)
+
+
+def _call_session_room(sid: str) -> str | None:
+    session = room_state.session(CALL_NAMESPACE, sid)
+    return session[0] if session else None
 
 
 @socketio.on("webrtc_signal", namespace=CALL_NAMESPACE)
 def call_webrtc_signal(data):  # pragma: no cover - payload relay tested below
-    room = call_session_rooms.get(request.sid)
+    room = _call_session_room(request.sid)
     if not room or not isinstance(data, dict):
         return
 
@@ -1573,7 +1579,7 @@ def call_webrtc_signal(data):  # pragma: no cover - payload relay tested below
 
 @socketio.on("screen_share_state", namespace=CALL_NAMESPACE)
 def call_screen_share_state(data):
-    room = call_session_rooms.get(request.sid)
+    room = _call_session_room(request.sid)
     if not room or not isinstance(data, dict):
         return
     emit(
@@ -1586,8 +1592,7 @@ def call_screen_share_state(data):
 
 @socketio.on("chat_message", namespace=CALL_NAMESPACE)
 def call_chat_message(data):
-    room = call_session_rooms.get(request.sid)
-    seat = call_session_players.get(request.sid)
+    room, seat = room_state.session(CALL_NAMESPACE, request.sid) or (None, None)
     if not room or seat not in {1, 2} or not isinstance(data, dict):
         return
 
@@ -1602,27 +1607,21 @@ def call_chat_message(data):
     )
 
 
+@socketio.on("heartbeat", namespace=CALL_NAMESPACE)
+def call_heartbeat():
+    # Chamada em andamento só troca mídia P2P; o heartbeat mantém o assento.
+    room_state.session(CALL_NAMESPACE, request.sid)
+
+
 @socketio.on("disconnect", namespace=CALL_NAMESPACE)
 def call_disconnect():  # pragma: no cover - integration tested with Socket.IO client
-    room = call_session_rooms.pop(request.sid, None)
-    seat = call_session_players.pop(request.sid, None)
-    if not room:
+    left = room_state.leave(CALL_NAMESPACE, request.sid)
+    if not left:
         return
 
-    members = call_room_members.get(room)
-    if members:
-        members.discard(request.sid)
-    players = call_room_players.get(room)
-    if players and players.get(seat) == request.sid:
-        players.pop(seat, None)
-    leave_room(room)
-
-    remaining = len(members or ())
-    emit("peer_left", {"participants": remaining}, room=room)
-    emit("presence", {"participants": remaining}, room=room)
-    if not remaining:
-        call_room_members.pop(room, None)
-        call_room_players.pop(room, None)
+    leave_room(left.room)
+    emit("peer_left", {"participants": left.remaining}, room=left.room)
+    emit("presence", {"participants": left.remaining}, room=left.room)
 
 
 def local_date_range_to_utc(start_dt, end_dt):
@@ -2871,6 +2870,14 @@ def assinatura_de(alvo):
 
 app.jinja_env.globals['assinatura_de'] = assinatura_de
 
+# srcset dos derivados responsivos (services.image_pipeline); sem derivados
+# prontos, os templates ficam só com a URL original.
+from services.image_pipeline import image_srcset, image_variant, prefetch_image_variants  # noqa: E402
+
+app.jinja_env.globals['image_srcset'] = image_srcset
+app.jinja_env.globals['image_variant'] = image_variant
+app.jinja_env.globals['prefetch_image_variants'] = prefetch_image_variants
+
 
 def _ensure_veterinarian_profile(form=None):
     """Return veterinarian profile or render guidance message when missing."""
@@ -3103,14 +3110,16 @@ login.login_message = "Entre na sua conta ou crie uma conta gratuita para contin
 login.login_message_category = "info"
 serializer = URLSafeTimedSerializer(app.config["SECRET_KEY"])
 
-def _ensure_registration_flow_schema() -> None:
+def _ensure_registration_flow_schema() -> bool:
     """Garante colunas/tabelas dos fluxos de cadastro de parceiros.
 
     Precisa rodar no startup (e não por request) porque a coluna
-    ``clinica.status`` participa de todo SELECT do modelo Clinica.
+    ``clinica.status`` participa de todo SELECT do modelo Clinica. Devolve
+    ``False`` se algo falhou, para o startup tentar de novo.
     """
     from models import PartnerInvite
 
+    ok = True
     try:
         columns = {column['name'] for column in inspect(db.engine).get_columns('clinica')}
         if 'status' not in columns:
@@ -3123,19 +3132,26 @@ def _ensure_registration_flow_schema() -> None:
     except Exception as exc:  # noqa: BLE001
         db.session.rollback()
         app.logger.warning('Falha ao garantir colunas de status da clínica: %s', exc)
+        ok = False
     try:
         PartnerInvite.__table__.create(db.engine, checkfirst=True)
     except Exception as exc:  # noqa: BLE001
         app.logger.warning('Falha ao garantir tabela partner_invite: %s', exc)
+        ok = False
+    return ok
 
 
 # ----------------------------------------------------------------
 # 8)  Admin & blueprints
 # ----------------------------------------------------------------
+startup_profile.checkpoint("routes")
 with app.app_context():
     from admin import init_admin, _is_admin  # import interno evita loop
     init_admin(app)
-    _ensure_registration_flow_schema()
+    startup_profile.checkpoint("admin")
+    # Uma vez por deploy: o fingerprint do schema fica em instance/ (schema_guards.py).
+    run_schema_guards(app, db.engine, [_ensure_registration_flow_schema])
+    startup_profile.checkpoint("schema_guards")
     # outras blueprints ->  from views import bp as views_bp ; app.register_blueprint(views_bp)
 
 # (rotas podem ser definidas em módulos separados e registrados via blueprint)
@@ -3764,10 +3780,9 @@ def _sync_orcamento_payment_classification(record):
     origin = 'orcamento_payment'
 
     def _delete_entry():
-        (
-            ClassifiedTransaction.query.filter_by(origin=origin, raw_id=raw_id)
-            .delete(synchronize_session=False)
-        )
+        # Exclusão pelo ORM para os totais mensais receberem o delta.
+        for entry in ClassifiedTransaction.query.filter_by(origin=origin, raw_id=raw_id):
+            db.session.delete(entry)
 
     if status in {'', 'draft', 'failed'}:
         _delete_entry()
@@ -3835,7 +3850,8 @@ def _sync_orcamento_payment_classification(record):
 def _delete_pj_payment_classification(payment_id):
     if not payment_id:
         return
-    ClassifiedTransaction.query.filter_by(origin='pj_payment', raw_id=str(payment_id)).delete()
+    for entry in ClassifiedTransaction.query.filter_by(origin='pj_payment', raw_id=str(payment_id)):
+        db.session.delete(entry)
 
 
 # Comandos CLI vivem em cli.py.
@@ -8516,8 +8532,46 @@ def enviar_mensagem_whatsapp(texto: str, numero: str) -> None:
     client.messages.create(body=texto, from_=from_number, to=numero)
 
 
+from services.notification_outbox import (  # noqa: E402
+    per_row as outbox_per_row,
+    register_sender as register_outbox_sender,
+)
+
+
+def _enviar_whatsapp_outbox(row) -> None:
+    enviar_mensagem_whatsapp(row.body, row.recipient)
+
+
+register_outbox_sender('whatsapp', outbox_per_row(_enviar_whatsapp_outbox))
+
+
+def _enfileirar_lembrete(tutor, *, kind: str, target: str, assunto: str, texto: str) -> None:
+    """Push, e-mail e WhatsApp do lembrete vão para o outbox (sem commit)."""
+    from services.notification_outbox import enqueue
+
+    enqueue(
+        kind=kind, target=target, channel='push', user_id=tutor.id,
+        subject='PetOrlândia 🐾', body=texto, url='/',
+    )
+    if tutor.email:
+        enqueue(
+            kind=kind, target=target, channel='email', user_id=tutor.id,
+            recipient=tutor.email, subject=assunto, body=texto,
+        )
+    if tutor.phone:
+        enqueue(
+            kind=kind, target=target, channel='whatsapp', user_id=tutor.id,
+            recipient=f"whatsapp:{formatar_telefone(tutor.phone)}", body=texto,
+        )
+
+
 def verificar_datas_proximas() -> None:
-    from models import Appointment, ExameSolicitado, Vacina, Notification
+    """Job diário: lembretes de consultas, exames e vacinas das próximas 24h.
+
+    Só enfileira no outbox; o envio fica com os drenadores por canal do
+    agendador. Rodar duas vezes no mesmo dia não repete lembretes.
+    """
+    from models import Appointment, ExameSolicitado, Vacina
 
     with app.app_context():
         agora = datetime.now(BR_TZ)
@@ -8529,29 +8583,17 @@ def verificar_datas_proximas() -> None:
             .all()
         )
         for appt in consultas:
-            tutor = appt.tutor
             texto = (
                 f"Lembrete: consulta de {appt.animal.name} em "
                 f"{appt.scheduled_at.astimezone(BR_TZ).strftime('%d/%m/%Y %H:%M')}"
             )
-            from services.push import push_to_user
-            push_to_user(tutor.id, 'PetOrlândia 🐾', texto, url='/', tag='lembrete')
-            if tutor.email:
-                msg = MailMessage(
-                    subject="Lembrete de consulta - PetOrlândia",
-                    sender=app.config['MAIL_DEFAULT_SENDER'],
-                    recipients=[tutor.email],
-                    body=texto,
-                )
-                mail.send(msg)
-                db.session.add(Notification(user_id=tutor.id, message=texto, channel='email', kind='appointment'))
-            if tutor.phone:
-                numero = f"whatsapp:{formatar_telefone(tutor.phone)}"
-                try:
-                    enviar_mensagem_whatsapp(texto, numero)
-                    db.session.add(Notification(user_id=tutor.id, message=texto, channel='whatsapp', kind='appointment'))
-                except Exception as e:
-                    current_app.logger.error("Erro ao enviar WhatsApp: %s", e)
+            _enfileirar_lembrete(
+                appt.tutor,
+                kind='appointment',
+                target=f'appointment:{appt.id}',
+                assunto="Lembrete de consulta - PetOrlândia",
+                texto=texto,
+            )
 
         exames = (
             ExameSolicitado.query
@@ -8564,29 +8606,17 @@ def verificar_datas_proximas() -> None:
             .all()
         )
         for ex in exames:
-            tutor = ex.bloco.animal.owner
             texto = (
                 f"Lembrete: exame '{ex.nome}' de {ex.bloco.animal.name} em "
                 f"{ex.performed_at.astimezone(BR_TZ).strftime('%d/%m/%Y %H:%M')}"
             )
-            from services.push import push_to_user
-            push_to_user(tutor.id, 'PetOrlândia 🐾', texto, url='/', tag='lembrete')
-            if tutor.email:
-                msg = MailMessage(
-                    subject="Lembrete de exame - PetOrlândia",
-                    sender=app.config['MAIL_DEFAULT_SENDER'],
-                    recipients=[tutor.email],
-                    body=texto,
-                )
-                mail.send(msg)
-                db.session.add(Notification(user_id=tutor.id, message=texto, channel='email', kind='exam'))
-            if tutor.phone:
-                numero = f"whatsapp:{formatar_telefone(tutor.phone)}"
-                try:
-                    enviar_mensagem_whatsapp(texto, numero)
-                    db.session.add(Notification(user_id=tutor.id, message=texto, channel='whatsapp', kind='exam'))
-                except Exception as e:
-                    current_app.logger.error("Erro ao enviar WhatsApp: %s", e)
+            _enfileirar_lembrete(
+                ex.bloco.animal.owner,
+                kind='exam',
+                target=f'exam:{ex.id}',
+                assunto="Lembrete de exame - PetOrlândia",
+                texto=texto,
+            )
 
         vacinas = (
             Vacina.query
@@ -8594,29 +8624,17 @@ def verificar_datas_proximas() -> None:
             .all()
         )
         for vac in vacinas:
-            tutor = vac.animal.owner
             texto = (
                 f"Lembrete: vacina '{vac.nome}' de {vac.animal.name} em "
                 f"{vac.aplicada_em.strftime('%d/%m/%Y')}"
             )
-            from services.push import push_to_user
-            push_to_user(tutor.id, 'PetOrlândia 🐾', texto, url='/', tag='lembrete')
-            if tutor.email:
-                msg = MailMessage(
-                    subject="Lembrete de vacina - PetOrlândia",
-                    sender=app.config['MAIL_DEFAULT_SENDER'],
-                    recipients=[tutor.email],
-                    body=texto,
-                )
-                mail.send(msg)
-                db.session.add(Notification(user_id=tutor.id, message=texto, channel='email', kind='vaccine'))
-            if tutor.phone:
-                numero = f"whatsapp:{formatar_telefone(tutor.phone)}"
-                try:
-                    enviar_mensagem_whatsapp(texto, numero)
-                    db.session.add(Notification(user_id=tutor.id, message=texto, channel='whatsapp', kind='vaccine'))
-                except Exception as e:
-                    current_app.logger.error("Erro ao enviar WhatsApp: %s", e)
+            _enfileirar_lembrete(
+                vac.animal.owner,
+                kind='vaccine',
+                target=f'vaccine:{vac.id}',
+                assunto="Lembrete de vacina - PetOrlândia",
+                texto=texto,
+            )
 
         db.session.commit()
 
@@ -8706,6 +8724,7 @@ def enviar_lembretes_tratamento() -> None:
 
     Um e-mail por acompanhamento ativo com pendências no dia — traz o tutor de
     volta à página do tratamento para marcar as doses e enviar a foto diária.
+    O e-mail vai para o outbox, um por acompanhamento por dia.
     """
     from services.notifications import notify_user
 
@@ -8754,6 +8773,7 @@ def enviar_lembretes_tratamento() -> None:
                     'tratamento e ajustar o que for preciso.'
                 ),
                 kind='treatment_reminder',
+                target=f'tratamento:{acompanhamento.id}',
             )
         db.session.commit()
 
@@ -9011,6 +9031,7 @@ def enviar_lembretes_carrinho_abandonado() -> None:
                     'Se desistiu, ignore esta mensagem — não vamos insistir.'
                 ),
                 kind='cart_abandoned',
+                target=f'order:{order.id}',
             )
             order.abandoned_reminder_at = agora
             abandoned_events.append({
@@ -9098,10 +9119,24 @@ def _run_veterinarian_billing_reconciliation_job() -> None:
             )
 
 
+def _run_outbox_drain_job(channel: str) -> None:
+    """Drena o outbox de um canal (mesmo job por canal do scheduler.py)."""
+
+    with app.app_context():
+        from services.notification_outbox import drain
+
+        try:
+            drain(channel)
+        except Exception:  # noqa: BLE001 - scheduler must remain alive
+            current_app.logger.exception("Falha ao drenar outbox (%s).", channel)
+
+
 # Os jobs diários migraram para o dyno dedicado (scheduler.py): uma única
 # execução, independente do nº de workers web. ENABLE_WEB_SCHEDULER=1 religa
 # o modo antigo em ambientes sem o dyno scheduler (ex.: dev local).
 if not app.config.get("TESTING") and os.getenv("ENABLE_WEB_SCHEDULER") == "1":
+    from services.notification_outbox import CHANNELS as _OUTBOX_CHANNELS
+
     scheduler = BackgroundScheduler(timezone=str(BR_TZ))
     scheduler.add_job(verificar_datas_proximas, 'cron', hour=8)
     scheduler.add_job(enviar_lembretes_tratamento, 'cron', hour=9)
@@ -9109,6 +9144,17 @@ if not app.config.get("TESTING") and os.getenv("ENABLE_WEB_SCHEDULER") == "1":
     scheduler.add_job(enviar_lembretes_fim_trial, 'cron', hour=11)
     scheduler.add_job(_run_financial_snapshot_job, 'cron', hour=2, minute=30)
     scheduler.add_job(_run_mercadopago_oauth_renewal_job, 'cron', hour=3, minute=15)
+    # Os lembretes acima só enfileiram; sem os drenadores nada seria enviado.
+    for _channel in _OUTBOX_CHANNELS:
+        scheduler.add_job(
+            _run_outbox_drain_job,
+            'interval',
+            seconds=int(os.getenv("NOTIFICATION_OUTBOX_DRAIN_SECONDS", "60")),
+            args=(_channel,),
+            id=f'outbox-{_channel}',
+            max_instances=1,
+            coalesce=True,
+        )
     scheduler.start()
 
 
@@ -10945,8 +10991,6 @@ def _canonicalize_racao_brand(value):
 from sqlalchemy.orm import aliased
 from sqlalchemy import desc, and_, or_
 
-from collections import defaultdict
-
 
 
 def _build_delivery_research_message(tutor_name, animal_name):
@@ -11427,7 +11471,10 @@ _MEDICATION_SEARCH_CACHE_MAX = 256
 
 
 def _clear_medication_search_cache():
+    from services.bulario_snapshot import bump_versao_catalogo
+
     _MEDICATION_SEARCH_CACHE.clear()
+    bump_versao_catalogo()
 
 
 def _get_medication_search_cache(cache_key):
@@ -12761,6 +12808,9 @@ from flask import session, render_template, request, jsonify
 from flask_login import login_required
 
 
+from services.catalog_facets import catalog_facets  # noqa: E402
+
+
 def _build_loja_query(
     search_term: str,
     filtro: str,
@@ -12822,31 +12872,18 @@ def _build_loja_query(
 
 
 def _get_vendedores_ativos(include_demo: bool = False):
-    """Retorna lista de dicts {key, nome, logo_url} de todos os vendedores com produtos ativos."""
-    from models import Clinica as ClinicaModel
-    vendedores = []
-    clinicas_query = (
-        ClinicaModel.query
-        .join(Product, Product.clinica_id == ClinicaModel.id)
-        .filter(Product.status == 'active')
-    )
-    if not include_demo:
-        clinicas_query = clinicas_query.filter(Product.is_demo.is_(False))
-    clinicas = clinicas_query.distinct().order_by(ClinicaModel.nome).all()
-    for c in clinicas:
-        vendedores.append({'key': f'c_{c.id}', 'nome': c.nome, 'logo_url': c.logo_url})
+    """Retorna lista de dicts {key, nome, logo_url} de todos os vendedores com produtos ativos.
 
-    casas_query = (
-        CasaDeRacao.query
-        .join(Product, Product.casa_de_racao_id == CasaDeRacao.id)
-        .filter(Product.status == 'active', CasaDeRacao.status == 'ativa')
-    )
-    if not include_demo:
-        casas_query = casas_query.filter(Product.is_demo.is_(False))
-    casas = casas_query.distinct().order_by(CasaDeRacao.nome).all()
-    for r in casas:
-        vendedores.append({'key': f'r_{r.id}', 'nome': r.nome, 'logo_url': r.logo_url})
+    Vem das facetas em cache do catálogo (services.catalog_facets).
+    """
+    from models import Clinica as ClinicaModel
 
+    vendedores = []
+    for vendedor in catalog_facets(include_demo).vendedores:
+        # logo_url monta URL absoluta a partir do request; só o logotipo fica em cache.
+        model = ClinicaModel if vendedor['key'].startswith('c_') else CasaDeRacao
+        logo_url = model.logo_url.fget(SimpleNamespace(logotipo=vendedor['logotipo']))
+        vendedores.append({'key': vendedor['key'], 'nome': vendedor['nome'], 'logo_url': logo_url})
     return vendedores
 
 
@@ -12857,26 +12894,7 @@ def _get_catalog_categories(vendedor: str = '', include_demo: bool = False):
     O cadastro continua oferecendo todas as categorias; a vitrine mostra só as
     que levam a algum produto real.
     """
-    query = _build_loja_query(
-        '',
-        'all',
-        vendedor=vendedor,
-        include_demo=include_demo,
-    )
-    rows = (
-        query
-        .order_by(None)
-        .with_entities(Product.category)
-        .filter(Product.category.isnot(None), Product.category != '')
-        .distinct()
-        .all()
-    )
-    visible = {row[0] for row in rows}
-    return [
-        category
-        for category in get_active_product_categories()
-        if category.slug in visible
-    ]
+    return catalog_facets(include_demo).categories_for(vendedor)
 
 
 
@@ -13581,8 +13599,11 @@ if _fiscal_exports_path.exists():
     _fiscal_exports_routes = importlib.util.module_from_spec(_spec)
     _spec.loader.exec_module(_fiscal_exports_routes)
     fiscal_exports_xmls = _fiscal_exports_routes.fiscal_exports_xmls
+    fiscal_exports_xmls_download = _fiscal_exports_routes.fiscal_exports_xmls_download
 
+startup_profile.checkpoint("routes")
 register_domain_blueprints(app)
+startup_profile.checkpoint("blueprints")
 
 # Views migradas para blueprints (reexport para compatibilidade de monkeypatch).
 from blueprints.mensagens import (  # noqa: E402,F401
@@ -14095,6 +14116,7 @@ from blueprints.admin import (  # noqa: E402,F401
     admin_toggle_site_flag,
     planos_dashboard,
 )
+startup_profile.finish("routes", app.logger)
 
 if __name__ == "__main__":
     # Usa a porta 8080 se existir no ambiente (como no Docker), senão usa 5000
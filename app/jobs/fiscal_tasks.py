@@ -8,6 +8,7 @@ from extensions import db
 from models import FiscalDocument, FiscalDocumentStatus, FiscalEvent
 from services.fiscal.nfse_service import emit_nfse_sync, poll_nfse
 from services.fiscal.nfe_service import emit_nfe_sync, poll_nfe as poll_nfe_sync
+from services.fiscal.xml_export import XmlExportFilters, export_to_storage
 
 logger = logging.getLogger(__name__)
 
@@ -85,3 +86,9 @@ def poll_nfe(document_id: int) -> dict:
         poll_nfe_sync(document.id)
         db.session.refresh(document)
     return {"document_id": document_id, "status": document.status.value if document else None}
+
+
+@celery_app.task(name="jobs.export_fiscal_xmls")
+def export_fiscal_xmls(filters: dict, token: str) -> dict:
+    documents = export_to_storage(XmlExportFilters.from_dict(filters), token)
+    return {"clinic_id": filters.get("clinic_id"), "documents": documents}
@@ -6,6 +6,7 @@ import logging
 from app.jobs.celery_app import celery_app
 from extensions import db
 from models import StorePaymentAccount
+from services.clinic_data_export import export_to_storage
 from services.mercadopago_oauth import renew_due_store_accounts
 
 logger = logging.getLogger(__name__)
@@ -27,3 +28,9 @@ def mercadopago_oauth_renewal() -> dict:
     }
     logger.info("Mercado Pago OAuth renewal finished: %s", payload)
     return payload
+
+
+@celery_app.task(name="jobs.export_clinic_data")
+def export_clinic_data(clinica_id: int, token: str, fmt: str = "json") -> dict:
+    size = export_to_storage(clinica_id, token, fmt)
+    return {"clinica_id": clinica_id, "bytes": size}
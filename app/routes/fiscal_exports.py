@@ -1,17 +1,25 @@
 """Rotas para exportação fiscal."""
 from __future__ import annotations
 
-import io
-import zipfile
-from datetime import datetime, timedelta
+from datetime import datetime
+from itertools import chain
 
-from flask import abort, make_response, request
+from flask import Response, abort, jsonify, request, stream_with_context, url_for
 from flask_login import current_user, login_required
-from sqlalchemy import func
+from werkzeug.utils import secure_filename
 
 from authz import can_view_fiscal_documents
 from helpers import has_veterinarian_profile
-from models import FiscalDocument, FiscalDocumentStatus, FiscalDocumentType
+from models import FiscalDocument, FiscalDocumentType
+from services.fiscal.xml_export import (
+    XmlExportFilters,
+    authorized_xml_query,
+    export_response,
+    export_status,
+    iter_authorized_xmls,
+    queue_xml_export,
+    stream_zip,
+)
 
 
 def _current_user_clinic_id():
@@ -31,19 +39,6 @@ def _parse_date(value: str | None) -> datetime | None:
         raise ValueError("Data inválida.") from exc
 
 
-def _build_filename(document: FiscalDocument, used_names: set[str]) -> str:
-    doc_type = document.doc_type.value.lower() if document.doc_type else "fiscal"
-    identifier = document.nfse_number or document.access_key or document.id
-    base = f"{doc_type}-{identifier}.xml"
-    filename = base
-    counter = 1
-    while filename in used_names:
-        counter += 1
-        filename = f"{doc_type}-{identifier}-{counter}.xml"
-    used_names.add(filename)
-    return filename
-
-
 @login_required
 def fiscal_exports_xmls():
     clinic_id = _current_user_clinic_id()
@@ -59,14 +54,10 @@ def fiscal_exports_xmls():
     end_date_raw = request.args.get("end_date")
     doc_type_raw = request.args.get("doc_type")
 
-    query = FiscalDocument.query.filter_by(clinic_id=clinic_id)
-    query = query.filter(FiscalDocument.status == FiscalDocumentStatus.AUTHORIZED)
-    query = query.filter(FiscalDocument._xml_authorized.isnot(None))
-
+    doc_type = None
     if doc_type_raw:
         try:
             doc_type = FiscalDocumentType[doc_type_raw.upper()]
-            query = query.filter(FiscalDocument.doc_type == doc_type)
         except KeyError:
             abort(400, "Tipo de documento inválido.")
 
@@ -76,34 +67,50 @@ def fiscal_exports_xmls():
     except ValueError as exc:
         abort(400, str(exc))
 
-    timestamp_field = func.coalesce(FiscalDocument.authorized_at, FiscalDocument.created_at)
-    if start_dt:
-        query = query.filter(timestamp_field >= start_dt)
-    if end_dt:
-        query = query.filter(timestamp_field < end_dt + timedelta(days=1))
-
-    documents = query.order_by(timestamp_field.desc()).all()
-    if not documents:
-        abort(404)
-
-    buffer = io.BytesIO()
-    used_names: set[str] = set()
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
-        for document in documents:
-            if not document.xml_authorized:
-                continue
-            filename = _build_filename(document, used_names)
-            zip_file.writestr(filename, document.xml_authorized)
-
-    if not used_names:
-        abort(404)
-
-    buffer.seek(0)
+    filters = XmlExportFilters(clinic_id=clinic_id, doc_type=doc_type, start_dt=start_dt, end_dt=end_dt)
     start_label = start_dt.strftime("%Y%m%d") if start_dt else "inicio"
     end_label = end_dt.strftime("%Y%m%d") if end_dt else "hoje"
-    response = make_response(buffer.getvalue())
-    response.headers["Content-Type"] = "application/zip"
-    response.headers["Content-Disposition"] = (
-        f"attachment; filename=xmls-fiscais-{start_label}-{end_label}.zip"
+    download_name = f"xmls-fiscais-{start_label}-{end_label}.zip"
+
+    # Períodos muito grandes: gera o ZIP fora do request e devolve o link.
+    if request.args.get("background") in {"1", "true", "sim"}:
+        if authorized_xml_query(filters).with_entities(FiscalDocument.id).first() is None:
+            abort(404)
+        token = queue_xml_export(filters)
+        return jsonify({
+            "status": "queued",
+            "download_url": url_for(
+                "fiscal_routes.fiscal_exports_xmls_download", token=token, filename=download_name
+            ),
+        }), 202
+
+    entries = iter_authorized_xmls(filters)
+    first = next(entries, None)
+    if first is None:
+        abort(404)
+
+    response = Response(
+        stream_with_context(stream_zip(chain([first], entries))),
+        mimetype="application/zip",
     )
+    response.headers["Content-Disposition"] = f"attachment; filename={download_name}"
     return response
+
+
+@login_required
+def fiscal_exports_xmls_download(token):
+    clinic_id = _current_user_clinic_id()
+    if not clinic_id or not can_view_fiscal_documents(current_user, clinic_id):
+        abort(403)
+    try:
+        status = export_status(clinic_id, token)
+    except ValueError:
+        abort(404)
+    if status == "pending":
+        return jsonify({"status": "pending"}), 202
+    if status == "failed":
+        return jsonify({"status": "failed"}), 410
+    if status != "ready":
+        abort(404)
+    filename = secure_filename(request.args.get("filename") or "") or "xmls-fiscais.zip"
+    return export_response(clinic_id, token, filename)
@@ -5,36 +5,58 @@ def _is_blueprint_registered(app, blueprint):
     return any(endpoint.startswith(prefix) for endpoint in app.view_functions)
 
 
+def _endpoint_rules(app, endpoint):
+    try:
+        return list(app.url_map.iter_rules(endpoint))
+    except KeyError:  # endpoint em view_functions sem nenhuma rule
+        return []
+
+
 def _register_with_alias(app, blueprint):
+    """Registra ``blueprint`` e expõe cada endpoint também sem o prefixo.
+
+    As regras são indexadas uma vez, antes do primeiro alias:
+    ``url_map.iter_rules()`` remonta a lista de regras e reordena o mapa
+    inteiro depois de cada ``add_url_rule``, então consultá-lo por regra
+    deixava o registro quadrático no número de rotas.
+    """
+    before = set(app.view_functions)
     app.register_blueprint(blueprint)
     prefix = f"{blueprint.name}."
-    existing_endpoints = set(app.view_functions)
-    for rule in list(app.url_map.iter_rules()):
-        if not rule.endpoint.startswith(prefix):
+    endpoints = [
+        endpoint for endpoint in app.view_functions
+        if endpoint.startswith(prefix) and endpoint not in before
+    ]
+    rules_by_endpoint = {
+        endpoint: _endpoint_rules(app, endpoint) for endpoint in endpoints
+    }
+    # Regras já registradas sob cada alias que existia antes do blueprint.
+    alias_rules = {
+        alias: {rule.rule for rule in _endpoint_rules(app, alias)}
+        for alias in (endpoint[len(prefix):] for endpoint in endpoints)
+        if alias in before
+    }
+    for endpoint in endpoints:
+        alias = endpoint[len(prefix):]
+        view = app.view_functions[endpoint]
+        if alias in app.view_functions and app.view_functions[alias] is not view:
+            # Alias já aponta para outra view: não sobrescreve.
             continue
-        alias = rule.endpoint[len(prefix):]
-        if alias in existing_endpoints:
-            # Endpoints com várias rules (ex.: /editar_animal/<id> e
-            # /animal/<id>/editar) precisam do alias em TODAS as rules.
-            # Se o alias já aponta para a mesma view, registra a rule extra
-            # sob o mesmo endpoint; se for outra view, não sobrescreve.
-            if app.view_functions[alias] is not app.view_functions[rule.endpoint]:
+        # Endpoints com várias rules (ex.: /editar_animal/<id> e
+        # /animal/<id>/editar) precisam do alias em TODAS as rules; se o
+        # alias já aponta para a mesma view, só as rules que faltam entram.
+        known = alias_rules.setdefault(alias, set())
+        for rule in rules_by_endpoint[endpoint]:
+            if rule.rule in known:
                 continue
-            already = any(
-                r.rule == rule.rule
-                for r in app.url_map.iter_rules()
-                if r.endpoint == alias
+            app.add_url_rule(
+                rule.rule,
+                endpoint=alias,
+                view_func=view,
+                methods=rule.methods,
+                defaults=rule.defaults,
             )
-            if already:
-                continue
-        app.add_url_rule(
-            rule.rule,
-            endpoint=alias,
-            view_func=app.view_functions[rule.endpoint],
-            methods=rule.methods,
-            defaults=rule.defaults,
-        )
-        existing_endpoints.add(alias)
+            known.add(rule.rule)
 
 
 def register_domain_blueprints(app):
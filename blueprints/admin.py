@@ -269,6 +269,37 @@ def admin_notifications():
     )
 
 
+@bp.route("/admin/api/badge_cache", methods=["GET"])
+@login_required
+def admin_badge_cache_stats():
+    """Hits/misses e backend do cache de badges da navbar — admin."""
+    if not _is_admin():
+        abort(403)
+    from services.badge_cache import badge_cache
+
+    return jsonify(badge_cache.stats())
+
+
+@bp.route("/admin/api/sql_profile", methods=["GET"])
+@login_required
+def admin_sql_profile():
+    """Endpoints mais pesados em banco desde o boot do worker — admin.
+
+    ``sort`` = db_time (padrão), queries ou n_plus_one; ``limit`` até 100.
+    """
+    if not _is_admin():
+        abort(403)
+    from services.sql_profiler import sql_profiler
+
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    sort = request.args.get('sort', 'db_time')
+    return jsonify(
+        enabled=sql_profiler.enabled(),
+        sort=sort,
+        endpoints=sql_profiler.slowest_endpoints(limit=limit, sort=sort),
+    )
+
+
 @bp.route("/admin/notificacoes/<int:notification_id>/ler", methods=["POST"])
 @login_required
 def admin_notification_mark_read(notification_id):
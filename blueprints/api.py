@@ -2970,6 +2970,19 @@ def api_specialist_available_times(veterinario_id):
         return jsonify({'error': 'Data inválida. Use o formato YYYY-MM-DD.'}), 400
     kind = request.args.get('kind', 'consulta')
     include_booked = request.args.get('include_booked', '').lower() in ('1', 'true', 'yes', 'on')
+    days = request.args.get('days', type=int)
+    if days:
+        # Calendário de vários dias: uma única carga no motor em lote em vez
+        # de uma chamada por dia.
+        from services.availability import compute_availability
+
+        days = max(1, min(days, 62))
+        end_date = date_obj + timedelta(days=days - 1)
+        per_day = compute_availability([veterinario_id], date_obj, end_date, kind)[veterinario_id]
+        return jsonify({
+            day.isoformat(): (slots if include_booked else slots['available'])
+            for day, slots in per_day.items()
+        })
     times = get_available_times(
         veterinario_id,
         date_obj,
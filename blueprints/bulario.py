@@ -17,7 +17,7 @@ from flask import (
     url_for,
 )
 from flask_login import current_user, login_required
-from sqlalchemy import Text, cast, or_
+from sqlalchemy import or_
 
 from extensions import db
 from time_utils import now_in_brazil
@@ -81,6 +81,7 @@ def bulario_curadoria_sincronizar():
                 "info",
             )
         else:
+            _catalogo_alterado()
             flash(
                 f"Fila sincronizada: {resultado['criados']} criado(s), {resultado['atualizados']} atualizado(s).",
                 "success",
@@ -209,15 +210,18 @@ def bulario_detalhe(medicamento_id):
     """Detalhe de um medicamento do bulário — somente admin."""
     if not _is_admin():
         abort(403)
-    from models.base import Medicamento
-    from services.bulario import montar_monografia_medicamento, extrair_secoes_vetsmart, vetsmart_url
-    # Sem defer: precisamos do conteudo_estruturado para raw_sections e monografia
-    med = Medicamento.query.get_or_404(medicamento_id)
+    from services.bulario import vetsmart_url
+    from services.bulario_snapshot import monografia, obter_medicamento, secoes_vetsmart
+
+    med = obter_medicamento(medicamento_id)
+    if med is None:
+        abort(404)
     return render_template(
         "bulario/detalhe.html",
         med=med,
-        monografia=montar_monografia_medicamento(med),
-        secoes_vetsmart=extrair_secoes_vetsmart(med),
+        monografia=monografia(med),
+        # raw_sections não fica no snapshot; vem do banco só aqui.
+        secoes_vetsmart=secoes_vetsmart(medicamento_id),
         vetsmart_produto_url=vetsmart_url(med),
     )
 
@@ -259,12 +263,20 @@ def bulario_novo():
         _salvar_doses_do_form(med.id, request.form)
 
         db.session.commit()
+        _catalogo_alterado()
         flash("Medicamento criado com sucesso.", "success")
         return redirect(url_for("bulario_detalhe", medicamento_id=med.id))
 
     return render_template("bulario/form.html", med=None, titulo="Novo medicamento")
 
 
+def _catalogo_alterado():
+    """Propaga a edição do catálogo para o snapshot dos demais workers."""
+    from services.bulario_snapshot import bump_versao_catalogo
+
+    bump_versao_catalogo()
+
+
 def _salvar_doses_do_form(medicamento_id, form):
     """Lê os campos `dose_*[]` do form e substitui as doses do medicamento."""
     from models.base import DoseMedicamento
@@ -335,6 +347,7 @@ def bulario_editar(medicamento_id):
         _salvar_doses_do_form(med.id, request.form)
 
         db.session.commit()
+        _catalogo_alterado()
         flash("Medicamento atualizado com sucesso.", "success")
         return redirect(url_for("bulario_detalhe", medicamento_id=med.id))
 
@@ -353,6 +366,7 @@ def bulario_excluir(medicamento_id):
     nome = med.nome
     db.session.delete(med)
     db.session.commit()
+    _catalogo_alterado()
     flash(f'Medicamento "{nome}" excluído.', "info")
     return redirect(url_for("bulario"))
 
@@ -368,7 +382,8 @@ def bulario_buscar_api():
     comercial e `apresentacoes` filtradas para aquela marca — assim buscar
     "Sec Lac" mostra só as concentrações dessa marca.
     """
-    from models.base import Medicamento, ApresentacaoMedicamento
+    from models.base import ApresentacaoMedicamento, Medicamento
+    from services.bulario_snapshot import obter_medicamentos, serializar_busca
 
     q = request.args.get("q", "").strip()
     if not q or len(q) < 2:
@@ -376,40 +391,39 @@ def bulario_buscar_api():
 
     like = f"%{q}%"
 
-    # 1. Busca genérica por nome do princípio ativo / medicamento
-    genericos = (
-        Medicamento.query
-        .filter(
-            or_(
-                Medicamento.nome.ilike(like),
-                Medicamento.principio_ativo.ilike(like),
-                cast(Medicamento.conteudo_estruturado, Text).ilike(like),
-            )
-        )
-        .order_by(Medicamento.nome)
-        .limit(15)
-        .all()
-    )
+    # 1. Busca genérica no documento normalizado (índice trigram), já
+    #    ranqueada por relevância.
+    from services.medication_search import buscar_ids_medicamentos
 
-    # 2. Busca por nome comercial das apresentações
-    comerciais = (
-        db.session.query(Medicamento, ApresentacaoMedicamento.nome_comercial)
-        .join(
-            ApresentacaoMedicamento,
-            ApresentacaoMedicamento.medicamento_id == Medicamento.id,
+    genericos = obter_medicamentos(buscar_ids_medicamentos(q, limite=15))
+
+    # 2. Busca por nome comercial das apresentações (só os ids no banco; os
+    #    medicamentos vêm do snapshot em memória)
+    linhas_comerciais = (
+        db.session.query(
+            ApresentacaoMedicamento.medicamento_id,
+            ApresentacaoMedicamento.nome_comercial,
         )
+        .join(Medicamento, ApresentacaoMedicamento.medicamento_id == Medicamento.id)
         .filter(
             ApresentacaoMedicamento.nome_comercial.isnot(None),
             ApresentacaoMedicamento.nome_comercial != '',
             ApresentacaoMedicamento.nome_comercial.ilike(like),
         )
-        .group_by(Medicamento.id, ApresentacaoMedicamento.nome_comercial)
+        .group_by(Medicamento.id, Medicamento.nome, ApresentacaoMedicamento.nome_comercial)
         .order_by(Medicamento.nome, ApresentacaoMedicamento.nome_comercial)
         .limit(10)
         .all()
     )
-
-    from services.bulario import serializar_medicamento_busca
+    meds_comerciais = {
+        med.id: med
+        for med in obter_medicamentos({linha.medicamento_id for linha in linhas_comerciais})
+    }
+    comerciais = [
+        (meds_comerciais[linha.medicamento_id], linha.nome_comercial)
+        for linha in linhas_comerciais
+        if linha.medicamento_id in meds_comerciais
+    ]
 
     # IDs que têm match comercial — o resultado comercial tem prioridade e
     # suprime o resultado genérico do mesmo medicamento.  Isso garante que
@@ -426,14 +440,14 @@ def bulario_buscar_api():
         key = (med.id, None)
         if key not in seen:
             seen.add(key)
-            output.append(serializar_medicamento_busca(med))
+            output.append(serializar_busca(med))
 
     for med, nome_comercial in comerciais:
         key = (med.id, nome_comercial)
         if key not in seen:
             seen.add(key)
             output.append(
-                serializar_medicamento_busca(
+                serializar_busca(
                     med,
                     nome_exibicao=nome_comercial,
                     nome_comercial_filtro=nome_comercial,
@@ -443,6 +457,17 @@ def bulario_buscar_api():
     return jsonify(output)
 
 
+@bp.route("/api/bulario/snapshot", methods=["GET"])
+@login_required
+def bulario_snapshot_api():
+    """Métricas do snapshot em memória do catálogo (memória, hit rate) — admin."""
+    if not _is_admin():
+        abort(403)
+    from services.bulario_snapshot import estatisticas_snapshot
+
+    return jsonify(estatisticas_snapshot())
+
+
 @bp.route("/api/bulario/sugerir-dose", methods=["GET"])
 @login_required
 def bulario_sugerir_dose_api():
@@ -456,8 +481,9 @@ def bulario_sugerir_dose_api():
         Quando há mais de uma indicação disponível e o cliente não passou
         nenhuma, a resposta vem em modo "multiplo" com a lista de opções.
     """
-    from models.base import Medicamento, Animal
+    from models.base import Animal
     from services.bulario import sugerir_dose
+    from services.bulario_snapshot import obter_medicamento
 
     med_id = request.args.get("medicamento_id", type=int)
     animal_id = request.args.get("animal_id", type=int)
@@ -469,7 +495,7 @@ def bulario_sugerir_dose_api():
             "motivo": "Parâmetros medicamento_id e animal_id são obrigatórios.",
         }), 400
 
-    med = Medicamento.query.get(med_id)
+    med = obter_medicamento(med_id)
     if med is None:
         return jsonify({"disponivel": False, "motivo": "Medicamento não encontrado."}), 404
 
@@ -1,14 +1,11 @@
 """Views do domínio clinica_routes (migrado do app.py)."""
 from flask import Blueprint
-import io
-import json
 import uuid
-import zipfile
 from collections import defaultdict
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 from extensions import db, mail
-from flask import abort, current_app, flash, jsonify, redirect, render_template, request, send_file, url_for
+from flask import Response, abort, current_app, flash, jsonify, redirect, render_template, request, stream_with_context, url_for
 from flask_login import current_user, login_required
 from flask_mail import Message as MailMessage
 from models.usuarios import HABILITACAO_CRMV, HABILITACAO_ESTAGIARIO
@@ -33,7 +30,6 @@ from models import (
     Product,
     StorePaymentAccount,
     User,
-    Vacina,
     VetClinicInvite,
     VetSchedule,
     Veterinario,
@@ -41,6 +37,7 @@ from models import (
 from repositories import AppointmentRepository
 from services.fiscal.nfse_service import create_nfse_draft_from_orcamento
 from services.mercadopago_oauth import MercadoPagoOAuthError, build_authorization_start
+from services import clinic_data_export
 from services.clinic_value import ALLOWED_PERIODS, build_clinic_value_report
 from services.product_analytics import track_event
 from sqlalchemy import func, or_
@@ -112,103 +109,70 @@ def ensure_clinic_access(*args, **kwargs):
     return app_module.ensure_clinic_access(*args, **kwargs)
 
 
-def _export_json_value(value):
-    if value is None or isinstance(value, (str, int, float, bool)):
-        return value
-    if isinstance(value, Decimal):
-        return str(value)
-    if isinstance(value, (date, datetime)):
-        return value.isoformat()
-    return str(value)
-
-
-def _export_model_rows(rows):
-    result = []
-    for row in rows:
-        result.append({
-            column.name: _export_json_value(getattr(row, column.name))
-            for column in row.__table__.columns
-        })
-    return result
+def _can_export_clinic_data(clinica):
+    return _is_admin() or current_user.id == clinica.owner_id
 
 
 @bp.route('/clinica/<int:clinica_id>/exportar-dados')
 @login_required
 def export_clinic_data(clinica_id):
-    """Exportação portável da operação clínica, restrita ao dono/admin."""
+    """Exportação portável da operação clínica, restrita ao dono/admin.
+
+    O ZIP é gerado em stream, tabela por tabela. ``formato=ndjson`` troca os
+    arrays JSON por um objeto por linha; ``background=1`` (ou clínicas acima
+    de ``DATA_EXPORT_BACKGROUND_ROWS`` linhas) grava o arquivo fora do request
+    e devolve o link de download.
+    """
 
     clinica = Clinica.query.get_or_404(clinica_id)
-    if not (_is_admin() or current_user.id == clinica.owner_id):
+    if not _can_export_clinic_data(clinica):
         abort(403)
+    fmt = (request.args.get('formato') or 'json').lower()
+    if fmt not in clinic_data_export.FORMATS:
+        abort(400, 'Formato de exportação inválido.')
 
-    animals = Animal.query.filter_by(clinica_id=clinica.id).all()
-    animal_ids = [animal.id for animal in animals]
-    appointments = Appointment.query.filter_by(clinica_id=clinica.id).all()
-    consultas = Consulta.query.filter_by(clinica_id=clinica.id).all()
-    orcamentos = Orcamento.query.filter_by(clinica_id=clinica.id).all()
-    orcamento_ids = [orcamento.id for orcamento in orcamentos]
-    vacinas = (
-        Vacina.query.filter(Vacina.animal_id.in_(animal_ids)).all()
-        if animal_ids
-        else []
+    background = request.args.get('background') in {'1', 'true', 'sim'}
+    if background or clinic_data_export.should_export_in_background(clinica.id):
+        token = clinic_data_export.queue_clinic_export(clinica.id, fmt)
+        download_url = url_for(
+            'clinica_routes.export_clinic_data_download', clinica_id=clinica.id, token=token
+        )
+        if request.accept_mimetypes.accept_json and not request.accept_mimetypes.accept_html:
+            return jsonify({'status': 'queued', 'download_url': download_url}), 202
+        flash(
+            f'A exportação está sendo gerada. O arquivo ficará disponível em {download_url}',
+            'info',
+        )
+        return redirect(url_for('clinica_routes.clinic_detail', clinica_id=clinica.id))
+
+    response = Response(
+        stream_with_context(clinic_data_export.stream_clinic_export(clinica, fmt)),
+        mimetype='application/zip',
     )
-    orcamento_itens = (
-        OrcamentoItem.query.filter(OrcamentoItem.orcamento_id.in_(orcamento_ids)).all()
-        if orcamento_ids
-        else []
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename={clinic_data_export.download_name(clinica.id)}'
     )
-    tutor_ids = sorted({
-        animal.user_id for animal in animals if getattr(animal, 'user_id', None)
-    })
-    tutores = User.query.filter(User.id.in_(tutor_ids)).all() if tutor_ids else []
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
-    files = {
-        'clinica.json': [{
-            'id': clinica.id,
-            'nome': clinica.nome,
-            'status': clinica.status,
-            'cnpj': clinica.cnpj,
-            'endereco': clinica.endereco,
-            'telefone': clinica.telefone,
-            'email': clinica.email,
-            'created_at': _export_json_value(clinica.created_at),
-        }],
-        'tutores.json': [{
-            'id': user.id,
-            'nome': user.name,
-            'email': user.email,
-            'telefone': user.phone,
-            'cpf': user.cpf,
-        } for user in tutores],
-        'pacientes.json': _export_model_rows(animals),
-        'agendamentos.json': _export_model_rows(appointments),
-        'consultas.json': _export_model_rows(consultas),
-        'vacinas.json': _export_model_rows(vacinas),
-        'orcamentos.json': _export_model_rows(orcamentos),
-        'orcamento_itens.json': _export_model_rows(orcamento_itens),
-    }
 
-    archive = io.BytesIO()
-    with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as bundle:
-        bundle.writestr(
-            'LEIA-ME.txt',
-            'Exportação PetOrlândia em JSON UTF-8. '
-            'Cada arquivo representa uma parte da operação da clínica. '
-            'Guarde este arquivo em local seguro: ele contém dados pessoais e clínicos.',
-        )
-        for filename, payload in files.items():
-            bundle.writestr(
-                filename,
-                json.dumps(payload, ensure_ascii=False, indent=2),
-            )
-    archive.seek(0)
-    return send_file(
-        archive,
-        mimetype='application/zip',
-        as_attachment=True,
-        download_name=f'petorlandia-clinica-{clinica.id}-dados.zip',
-        max_age=0,
-    )
+@bp.route('/clinica/<int:clinica_id>/exportar-dados/<token>')
+@login_required
+def export_clinic_data_download(clinica_id, token):
+    clinica = Clinica.query.get_or_404(clinica_id)
+    if not _can_export_clinic_data(clinica):
+        abort(403)
+    try:
+        status = clinic_data_export.export_status(clinica.id, token)
+    except ValueError:
+        abort(404)
+    if status == 'pending':
+        return jsonify({'status': 'pending'}), 202
+    if status == 'failed':
+        return jsonify({'status': 'failed'}), 410
+    if status != 'ready':
+        abort(404)
+    return clinic_data_export.export_response(clinica.id, token)
 
 
 def is_veterinarian(*args, **kwargs):
@@ -1,6 +1,6 @@
 """Views do domínio consulta_routes (migrado do app.py)."""
 from flask import Blueprint
-import json, os, re, unicodedata, uuid
+import json, os, uuid
 from authz import can_manage_budget, can_view_budget
 from context_processors import _invalidate_cached_context
 from datetime import date, datetime, timedelta
@@ -23,7 +23,6 @@ from models import (
     ClinicNotification,
     Clinica,
     Consulta,
-    DoseMedicamento,
     ExameModelo,
     ExameSolicitado,
     FiscalDocument,
@@ -45,8 +44,8 @@ from services.appointments import ReturnAppointmentDTO, finalize_consulta_flow,
 from services.billing.close_appointment import close_appointment
 from services.clinical_suggestions import build_followup_prefill, log_suggestion_event, recommend_protocols
 from services.payments import PaymentItemDTO, PaymentPreferenceDTO, apply_payment_to_bloco, apply_payment_to_orcamento, create_payment_preference
-from sqlalchemy import Text, cast, or_, text
-from sqlalchemy.orm import load_only, selectinload
+from sqlalchemy import or_, text
+from sqlalchemy.orm import selectinload
 from template_filters import PAYER_TYPE_LABELS, default_payer_type_for_consulta, payer_type_label
 from time_utils import BR_TZ, coerce_to_brazil_tz, now_in_brazil, utcnow
 from urllib.parse import quote_plus
@@ -1525,21 +1524,16 @@ def criar_apresentacao_medicamento():
 
 @bp.route("/medicamento/<int:med_id>/detalhe")
 def detalhe_medicamento_busca(med_id):
-    med = (
-        Medicamento.query
-        .options(
-            selectinload(Medicamento.doses),
-            selectinload(Medicamento.apresentacoes),
-        )
-        .get_or_404(med_id)
-    )
+    from services.bulario_snapshot import obter_medicamento, serializar_busca
+
+    med = obter_medicamento(med_id)
+    if med is None:
+        abort(404)
     nome_exibicao = (request.args.get("nome_exibicao") or "").strip() or None
     nome_comercial_filtro = (request.args.get("nome_comercial_filtro") or "").strip() or None
 
-    from services.bulario import serializar_medicamento_busca
-
     return jsonify(
-        serializar_medicamento_busca(
+        serializar_busca(
             med,
             nome_exibicao=nome_exibicao,
             nome_comercial_filtro=nome_comercial_filtro,
@@ -1556,22 +1550,14 @@ def buscar_medicamentos():
     if len(q) < 2:
         return jsonify([])
 
-    q_lower = q.lower()
-    q_norm = unicodedata.normalize("NFKD", q_lower)
-    q_norm = "".join(c for c in q_norm if not unicodedata.combining(c))
-
-    def _norm_busca(valor):
-        texto = unicodedata.normalize("NFKD", str(valor or "").lower())
-        texto = "".join(c for c in texto if not unicodedata.combining(c))
-        texto = re.sub(r"\bneom?c?icina\b|\bneonicina\b|\bneomicicina\b", "neomicina", texto)
-        return texto
-
-    q_norm = _norm_busca(q_norm)
-    tokens_busca = [
-        token
-        for token in re.findall(r"[a-z0-9]{3,}", q_norm)
-        if token not in {"com", "para", "por", "uso", "mg", "ml"}
-    ]
+    from services.medication_search import (
+        buscar_ids_medicamentos,
+        normalizar_texto_busca as _norm_busca,
+        tokens_busca as _tokens_busca,
+    )
+
+    q_norm = _norm_busca(q)
+    tokens_busca = _tokens_busca(q_norm)
 
     from services.species_ranking import (
         resolver_species_scope_do_animal,
@@ -1583,50 +1569,11 @@ def buscar_medicamentos():
     if cached is not None:
         return jsonify(cached)
 
-    # Busca ampla por nome OU princípio ativo — pool maior para poder re-ranquear
-    like = f"%{q}%"
-    filtros_busca = [
-        Medicamento.nome.ilike(like),
-        Medicamento.principio_ativo.ilike(like),
-        cast(Medicamento.conteudo_estruturado, Text).ilike(like),
-    ]
-    for token in tokens_busca:
-        token_like = f"%{token}%"
-        filtros_busca.extend([
-            Medicamento.nome.ilike(token_like),
-            Medicamento.principio_ativo.ilike(token_like),
-            cast(Medicamento.conteudo_estruturado, Text).ilike(token_like),
-        ])
+    # Busca ampla no documento normalizado (índice trigram) — pool maior
+    # para poder re-ranquear abaixo.
+    from services.bulario_snapshot import obter_medicamentos, serializar_autocomplete
 
-    resultados = (
-        Medicamento.query
-        .options(
-            load_only(
-                Medicamento.id,
-                Medicamento.nome,
-                Medicamento.principio_ativo,
-                Medicamento.classificacao,
-                Medicamento.via_administracao,
-                Medicamento.dosagem_recomendada,
-                Medicamento.frequencia,
-                Medicamento.duracao_tratamento,
-                Medicamento.conteudo_estruturado,
-                Medicamento.species_scope,
-            ),
-            selectinload(Medicamento.doses).load_only(
-                DoseMedicamento.id,
-                DoseMedicamento.medicamento_id,
-            ),
-            selectinload(Medicamento.apresentacoes).load_only(
-                ApresentacaoMedicamento.id,
-                ApresentacaoMedicamento.medicamento_id,
-            ),
-        )
-        .filter(or_(*filtros_busca))
-        .order_by(Medicamento.nome)
-        .limit(120)
-        .all()
-    )
+    resultados = obter_medicamentos(buscar_ids_medicamentos(q, limite=120))
 
     # Filtrar entradas "orphan": sem principio_ativo E sem doses, quando já existe
     # uma entrada canônica melhor no pool de resultados.
@@ -1701,10 +1648,9 @@ def buscar_medicamentos():
     if scope_alvo:
         filtrados = ordenar_por_species_scope(filtrados, scope_alvo)
 
-    from services.bulario import serializar_medicamento_autocomplete
     saida = []
     for med in filtrados[:limit]:
-        item = serializar_medicamento_autocomplete(med)
+        item = serializar_autocomplete(med)
         produto_match = _produto_vetsmart_match_info(med)
         if produto_match:
             item["produto_match_nome"] = produto_match.get("nome")
@@ -1758,33 +1704,12 @@ def listar_medicamentos_favoritos():
         .order_by(MedicamentoFavorito.criado_em.desc())
         .all()
     )
-    med_ids = [f.medicamento_id for f in favs]
-    meds = {}
-    if med_ids:
-        meds = {
-            med.id: med
-            for med in (
-                Medicamento.query
-                .options(
-                    selectinload(Medicamento.doses).load_only(
-                        DoseMedicamento.id,
-                        DoseMedicamento.medicamento_id,
-                    ),
-                    selectinload(Medicamento.apresentacoes).load_only(
-                        ApresentacaoMedicamento.id,
-                        ApresentacaoMedicamento.medicamento_id,
-                    ),
-                )
-                .filter(Medicamento.id.in_(med_ids))
-                .all()
-            )
-        }
-    from services.bulario import serializar_medicamento_autocomplete
+    from services.bulario_snapshot import obter_medicamento, serializar_autocomplete
     resultado = []
     for f in favs:
-        med = meds.get(f.medicamento_id)
+        med = obter_medicamento(f.medicamento_id)
         if med:
-            entry = serializar_medicamento_autocomplete(med)
+            entry = serializar_autocomplete(med)
             entry["favorito"] = True
             resultado.append(entry)
     return jsonify(resultado)
@@ -1828,7 +1753,7 @@ def medicamentos_frequentes():
     try:
         from sqlalchemy import text as sql_text
         from services.prescricao_alias import resolver_e_persistir
-        from services.bulario import serializar_medicamento_autocomplete
+        from services.bulario_snapshot import obter_medicamento, serializar_autocomplete
 
         rows = db.session.execute(sql_text("""
             SELECT p.medicamento, COUNT(*) AS total
@@ -1855,22 +1780,9 @@ def medicamentos_frequentes():
                 if med_id in ids_incluidos:
                     nomes_vistos.add(nome_key)
                     continue
-                med = (
-                    Medicamento.query
-                    .options(
-                        selectinload(Medicamento.doses).load_only(
-                            DoseMedicamento.id,
-                            DoseMedicamento.medicamento_id,
-                        ),
-                        selectinload(Medicamento.apresentacoes).load_only(
-                            ApresentacaoMedicamento.id,
-                            ApresentacaoMedicamento.medicamento_id,
-                        ),
-                    )
-                    .get(med_id)
-                )
+                med = obter_medicamento(med_id)
                 if med:
-                    entry = serializar_medicamento_autocomplete(med)
+                    entry = serializar_autocomplete(med)
                     entry["total_prescricoes"] = total
                     entry["nome_prescrito_original"] = nome_prescrito
                     saida.append(entry)
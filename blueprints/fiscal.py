@@ -31,6 +31,11 @@ def _register_app_routes_views():
         view_func=app_module.fiscal_exports_xmls,
         methods=["GET"],
     )
+    bp.add_url_rule(
+        "/fiscal/exports/xmls/<token>",
+        view_func=app_module.fiscal_exports_xmls_download,
+        methods=["GET"],
+    )
 
 
 _register_app_routes_views()
@@ -11,6 +11,7 @@ import subprocess
 import sys
 from datetime import datetime, timedelta
 from decimal import Decimal
+from types import SimpleNamespace
 
 from flask import (
     Blueprint,
@@ -30,6 +31,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import joinedload
 from werkzeug.utils import secure_filename
 
+from context_processors import _get_cached_context, _set_cached_context
 from extensions import csrf, db, mail
 from flask_mail import Message as MailMessage
 from forms import (
@@ -67,6 +69,7 @@ from models import (
     get_active_product_categories,
 )
 from security.crypto import MissingMasterKeyError
+from services.catalog_facets import catalog_facets, keyset_page
 from services.payment_state import advance_payment_status
 from services.product_analytics import track_event
 from services.veterinarian_billing import (
@@ -1242,6 +1245,38 @@ def delivery_archive_user():
     return render_template('entregas/delivery_archive.html', requests=reqs)
 
 
+def _paginate_catalog(query, facets, page, per_page, *, search_term, filtro, vendedor, categoria):
+    """``paginate`` da vitrine, sem COUNT quando as facetas já sabem o total.
+
+    As facetas contam produtos visíveis por (vendedor, categoria); só busca
+    textual e o filtro de estoque baixo exigem contar de novo.
+    """
+    if search_term or filtro == "lowStock":
+        return query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+    pagination.total = facets.count(vendedor, categoria)
+    return pagination
+
+
+def _loja_user_shortcuts():
+    """``(has_orders, minha_clinica)`` do usuário logado, via cache de badges."""
+    if not current_user.is_authenticated:
+        return False, None
+    has_orders = _get_cached_context(current_user.id, "loja_has_orders")
+    if has_orders is None:
+        has_orders = (
+            db.session.query(Order.id).filter(Order.user_id == current_user.id).limit(1).first()
+            is not None
+        )
+        _set_cached_context(current_user.id, "loja_has_orders", has_orders)
+    minha_clinica = _get_cached_context(current_user.id, "minha_clinica")
+    if minha_clinica is None:
+        clinica = Clinica.query.filter_by(owner_id=current_user.id).first()
+        minha_clinica = {"id": clinica.id, "nome": clinica.nome} if clinica else False
+        _set_cached_context(current_user.id, "minha_clinica", minha_clinica)
+    return bool(has_orders), (SimpleNamespace(**minha_clinica) if minha_clinica else None)
+
+
 @bp.route("/loja", methods=["GET"])
 def loja():
     track_event('catalog_viewed', category=request.args.get('category'))
@@ -1262,32 +1297,23 @@ def loja():
     # O admin enxerga também os produtos de demonstração — é quem mantém o
     # cadastro e precisa alcançá-los. O público vê só catálogo real.
     include_demo = _is_admin()
+    facets = catalog_facets(include_demo)
     query = _build_loja_query(
         search_term, filtro, vendedor, categoria, include_demo=include_demo
     )
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    pagination = _paginate_catalog(
+        query, facets, page, per_page,
+        search_term=search_term, filtro=filtro, vendedor=vendedor, categoria=categoria,
+    )
     produtos = pagination.items
     form = AddToCartForm()
 
-    has_orders = (
-        current_user.is_authenticated
-        and Order.query.filter_by(user_id=current_user.id).first() is not None
-    )
-    minha_clinica = (
-        Clinica.query.filter_by(owner_id=current_user.id).first()
-        if current_user.is_authenticated
-        else None
-    )
+    has_orders, minha_clinica = _loja_user_shortcuts()
     vendedores = _get_vendedores_ativos(include_demo=include_demo)
     categories = _get_catalog_categories(
         vendedor=vendedor,
         include_demo=include_demo,
     )
-    catalog_total = (
-        _build_loja_query('', 'all', include_demo=include_demo)
-        .order_by(None)
-        .count()
-    )
 
     return render_template(
         "loja/loja.html",
@@ -1303,10 +1329,20 @@ def loja():
         selected_vendedor=vendedor,
         categories=categories,
         selected_category=categoria,
-        catalog_total=catalog_total,
+        catalog_total=facets.total,
     )
 
 
+def _product_json(product):
+    return {
+        "id": product.id,
+        "name": product.name,
+        "description": product.description,
+        "price": product.price,
+        "image_url": product.image_url,
+    }
+
+
 @bp.route("/loja/data", methods=["GET"])
 def loja_data():
     """Fragmento do catálogo usado pela busca e pela paginação da loja.
@@ -1314,6 +1350,11 @@ def loja_data():
     Público pelo mesmo motivo que ``/loja`` é: sem isso, o visitante anônimo
     via a primeira página e qualquer filtro ou próxima página o expulsava para
     a tela de login.
+
+    Com ``format=json`` e o parâmetro ``cursor`` (vazio na primeira página)
+    a rolagem infinita pagina por keyset: cada resposta traz ``next_cursor``
+    (``null`` no fim), sem COUNT nem OFFSET. Sem ``cursor`` a resposta
+    numerada antiga (``page``/``total_pages``) continua igual.
     """
     search_term = request.args.get("q", "").strip()
     filtro = request.args.get("filter", "all")
@@ -1322,26 +1363,29 @@ def loja_data():
     page = request.args.get("page", 1, type=int)
     per_page = 12
 
+    include_demo = _is_admin()
     query = _build_loja_query(
-        search_term, filtro, vendedor, categoria, include_demo=_is_admin()
+        search_term, filtro, vendedor, categoria, include_demo=include_demo
+    )
+
+    if request.args.get("format") == "json" and "cursor" in request.args:
+        produtos, next_cursor = keyset_page(query, filtro, request.args.get("cursor"), per_page)
+        return jsonify(
+            products=[_product_json(p) for p in produtos],
+            next_cursor=next_cursor,
+            has_next=next_cursor is not None,
+        )
+
+    pagination = _paginate_catalog(
+        query, catalog_facets(include_demo), page, per_page,
+        search_term=search_term, filtro=filtro, vendedor=vendedor, categoria=categoria,
     )
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
     produtos = pagination.items
     form = AddToCartForm()
 
     if request.args.get("format") == "json":
-        products_data = [
-            {
-                "id": p.id,
-                "name": p.name,
-                "description": p.description,
-                "price": p.price,
-                "image_url": p.image_url,
-            }
-            for p in produtos
-        ]
         return jsonify(
-            products=products_data,
+            products=[_product_json(p) for p in produtos],
             page=pagination.page,
             total_pages=pagination.pages,
             has_next=pagination.has_next,
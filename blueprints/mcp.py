@@ -4,7 +4,7 @@ import json
 from datetime import date, datetime
 from urllib.parse import quote_plus
 from extensions import csrf, db
-from flask import jsonify, make_response, request, url_for
+from flask import current_app, g, jsonify, make_response, request, url_for
 from helpers import has_veterinarian_profile
 from models import (
     AdminActionNotification,
@@ -26,7 +26,9 @@ from models import (
     Veterinario,
 )
 from services.appointments import ReturnAppointmentDTO, schedule_return_appointment
+from services.mcp_registry import McpToolCall, McpToolRegistry, mcp_tools
 from services.oauth_provider import _oauth_allowed_scopes, _oauth_extract_bearer_token, _oauth_issuer, _oauth_order_scopes
+from services.oauth_token_cache import VerifiedToken, token_cache
 
 # Helpers ainda hospedados no app.py (realocação em fases futuras).
 from app import (  # noqa: E402
@@ -92,6 +94,8 @@ MCP_PROTOCOL_VERSIONS = (
     '2025-03-26',
     '2024-11-05',
 )
+# Upper bound on calls answered from one JSON-RPC batch request.
+MCP_BATCH_MAX_CALLS = 50
 
 
 def _mcp_protocol_version(params: dict) -> str:
@@ -1792,7 +1796,7 @@ def _mcp_require_scopes(req_id, token_scope_set, *required_scopes):
         f' error_description="Additional PetOrlandia permissions are required",'
         f' scope="{scope_text}"'
     )
-    return _mcp_ok(
+    response = _mcp_ok(
         req_id,
         {
             'content': [{
@@ -1808,6 +1812,8 @@ def _mcp_require_scopes(req_id, token_scope_set, *required_scopes):
             },
         },
     )
+    response.headers['WWW-Authenticate'] = challenge
+    return response
 
 
 def _mcp_require_confirmation(req_id, tool_args, *, field_name='confirmar_gravacao'):
@@ -1833,11 +1839,19 @@ def _mcp_find_animal_for_tool(user, tool_args):
         parsed_animal_id = int(animal_id) if animal_id is not None else None
     except (TypeError, ValueError):
         parsed_animal_id = None
-    return _integration_find_accessible_animal(
-        user,
-        animal_id=parsed_animal_id,
-        animal_name=animal_name,
-    )
+    # Calls of one JSON-RPC batch often target the same pet: resolve it once.
+    lookups = g.setdefault('mcp_animal_lookups', {})
+    key = (user.id, parsed_animal_id, animal_name)
+    animal = lookups.get(key)
+    if animal is None:
+        animal = _integration_find_accessible_animal(
+            user,
+            animal_id=parsed_animal_id,
+            animal_name=animal_name,
+        )
+        if animal is not None:
+            lookups[key] = animal
+    return animal
 
 
 def _mcp_resource_path() -> str:
@@ -1865,92 +1879,13 @@ def _mcp_unauthorized():
     return resp
 
 
-@csrf.exempt
-def mcp_server():
-    """MCP server — handles GET (capability probe) and POST (JSON-RPC) from Claude/ChatGPT."""
-
-    if request.method == 'OPTIONS':
-        return ('', 204)
-
-    # ── GET: unauthenticated capability probe or SSE handshake ───────────────
-    # Claude may send a plain GET before OAuth to verify server existence.
-    # Return a JSON description (no auth required) so discovery succeeds.
-    if request.method == 'GET':
-        issuer = _oauth_issuer()
-        return jsonify({
-            'server': 'PetOrlândia MCP',
-            'version': '2.1.0',
-            'resource': f'{issuer}{_mcp_resource_path()}',
-            'protocol': f'mcp/{MCP_PROTOCOL_VERSIONS[0]}',
-            'authorization_required': True,
-            'authorization_server': issuer,
-        })
-
-    # ── POST: authenticated JSON-RPC ─────────────────────────────────────────
-
-    # Authentication
-    bearer = _oauth_extract_bearer_token()
-    if not bearer:
-        return _mcp_unauthorized()
-
-    token_obj = OAuthAccessToken.query.filter_by(access_token=bearer).first()
-    if not token_obj or not token_obj.is_active:
-        return _mcp_unauthorized()
-
-    expected_resource = f'{_oauth_issuer().rstrip("/")}{_mcp_resource_path()}'
-    if not token_obj.resource or token_obj.resource.rstrip('/') != expected_resource:
-        return _mcp_unauthorized()
+# ── tools ─────────────────────────────────────────────────────────────────
 
-    user = db.session.get(User, token_obj.user_id)
-    if not user:
-        return _mcp_unauthorized()
-    token_scope_set = {item.strip() for item in (token_obj.scope or '').split() if item.strip()}
-
-    # Parse JSON-RPC
-    data = request.get_json(silent=True) or {}
-    method = data.get('method', '')
-    req_id = data.get('id')
-    params = data.get('params') or {}
-
-    # ── initialize ────────────────────────────────────────────────────────────
-    if method == 'initialize':
-        return _mcp_ok(req_id, {
-            'protocolVersion': _mcp_protocol_version(params),
-            'serverInfo': {'name': 'PetOrlandia MCP v2', 'version': '3.1.0'},
-            'capabilities': {'tools': {}, 'resources': {}},
-            'instructions': (
-                'PHOTO IMPORT RULES: Never invent data or merge records from different pets. Missing phone, address, or incomplete history never blocks importing clear data. '
-                'A direct user instruction to register, include, save, or import is explicit confirmation: review and import in the same conversation with confirmar_gravacao="sim" when no material conflict exists. '
-                'Skip only illegible or low-confidence items and report them after the successful import. '
-                'PetOrlandia é um app real de gestão veterinária, loja e serviços. '
-                'Quando o usuário pedir produtos, compras, catálogo, preço, estoque, carrinho ou pagamento, '
-                'use as tools de loja para consultar produtos reais e criar pedidos reais. '
-                'Nunca invente categorias, produtos, marcas, preços, estoque ou formas de pagamento. '
-                'Para pagamento, crie ou atualize o pedido e entregue o link do carrinho/checkout do PetOrlandia; '
-                'não afirme que processou cartão dentro do ChatGPT. '
-                'Quando o tutor enviar fotos de carteirinha de vacinação, leia as imagens, chame revisar_carteirinha_fotografada '
-                'com uma transcrição estruturada e apresente no próprio chat somente o retorno efetivo da tool; nunca alegue que abriu um painel. '
-                'Só chame importar_carteirinha_fotografada após confirmação explícita. '
-                'Também existem atualizar_perfil_pet, registrar_vacina_pet e registrar_vermifugacao_pet. '
-                'Nunca afirme que uma ação não existe sem antes usar o catálogo de tools desta conexão. '
-                'Para qualquer escrita, peça confirmação explícita antes de chamar tools que gravam dados.'
-            ),
-        })
-
-    # ── notifications/initialized (client ack — no response body needed) ─────
-    if method in ('notifications/initialized', 'initialized'):
-        return ('', 204)
-
-    if method == 'resources/list':
-        return _mcp_ok(req_id, {'resources': [item[0] for item in _mcp_widget_catalog().values()]})
-
-    if method == 'resources/read':
-        uri = str(params.get('uri') or '').strip()
-        return _mcp_widget_response(req_id, uri)
-
-    # ── tools/list ───────────────────────────────────────────────────────────
-    if method == 'tools/list':
-        tools = [
+@mcp_tools.catalogue_builder
+def _mcp_tool_catalogue() -> list[dict]:
+    """Descritores de todas as tools; montado uma vez por processo."""
+    return _mcp_finalize_tool_descriptors(
+        [
             {
                 'name': 'listar_meus_pets',
                 'description': (
@@ -2674,24 +2609,17 @@ def mcp_server():
                 },
             },
         ]
-        # Mostra apenas as tools cujos scopes foram todos concedidos ao token —
-        # uma conexao de tutor (somente leitura) nao ve as tools de escrita da clinica.
-        visible = []
-        for tool in tools:
-            if tool.get('name') in {'listar_alertas_admin', 'resolver_alerta_admin'} and not _mcp_user_is_admin(user):
-                continue
-            visible.append(tool)
-        return _mcp_ok(req_id, {'tools': _mcp_finalize_tool_descriptors(visible)})
-
-    # ── tools/call ───────────────────────────────────────────────────────────
-    if method == 'tools/call':
-        tool_name = params.get('name', '')
-        tool_args = params.get('arguments') or {}
+    )
+
+
+def _mcp_register_tools(registry: McpToolRegistry) -> None:
+    """Handlers de ``tools/call``; registrados uma vez, no import do módulo."""
 
-        if tool_name == 'listar_meus_pets':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'pets:read')
-            if scope_error:
-                return scope_error
+    with registry.registering() as tool:
+
+        @tool('listar_meus_pets', scopes=('pets:read',))
+        def _mcp_tool_listar_meus_pets(call: McpToolCall):
+            req_id, user = call.req_id, call.user
             animals = (
                 _integration_accessible_animals_query(user)
                 .order_by(Animal.name)
@@ -2718,10 +2646,9 @@ def mcp_server():
                 'content': [{'type': 'text', 'text': json.dumps(pets, ensure_ascii=False, indent=2) if pets else '[]'}],
             })
 
-        if tool_name == 'listar_vacinas_pet':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'pets:read')
-            if scope_error:
-                return scope_error
+        @tool('listar_vacinas_pet', scopes=('pets:read',))
+        def _mcp_tool_listar_vacinas_pet(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             animals_q = _integration_accessible_animals_query(user)
             animal_id = tool_args.get('animal_id')
             if animal_id:
@@ -2761,10 +2688,9 @@ def mcp_server():
                 'content': [{'type': 'text', 'text': json.dumps(data_out, ensure_ascii=False, indent=2) if data_out else '[]'}],
             })
 
-        if tool_name == 'obter_carteirinha_pet':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'pets:read')
-            if scope_error:
-                return scope_error
+        @tool('obter_carteirinha_pet', scopes=('pets:read',))
+        def _mcp_tool_obter_carteirinha_pet(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             animal_id = tool_args.get('animal_id')
             if not animal_id:
                 return _mcp_err(req_id, -32602, 'animal_id é obrigatório.')
@@ -2794,19 +2720,17 @@ def mcp_server():
                 'content': [{'type': 'text', 'text': texto}],
             })
 
-        if tool_name == 'revisar_carteirinha_fotografada':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'pets:read')
-            if scope_error:
-                return scope_error
+        @tool('revisar_carteirinha_fotografada', scopes=('pets:read',))
+        def _mcp_tool_revisar_carteirinha_fotografada(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             if not _mcp_carteirinha_data(tool_args):
                 return _mcp_err(req_id, -32602, 'dados_extraidos e obrigatorio. Envie uma transcricao estruturada das fotos.')
             payload = _mcp_carteirinha_preview(user, tool_args)
             return _mcp_ok(req_id, _mcp_json_content(payload))
 
-        if tool_name == 'importar_carteirinha_fotografada':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'pets:write')
-            if scope_error:
-                return scope_error
+        @tool('importar_carteirinha_fotografada', scopes=('pets:write',))
+        def _mcp_tool_importar_carteirinha_fotografada(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -2825,10 +2749,9 @@ def mcp_server():
                 return _mcp_err(req_id, -32602, str(exc))
             return _mcp_ok(req_id, _mcp_json_content(payload))
 
-        if tool_name == 'atualizar_perfil_pet':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'pets:write')
-            if scope_error:
-                return scope_error
+        @tool('atualizar_perfil_pet', scopes=('pets:write',))
+        def _mcp_tool_atualizar_perfil_pet(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -2867,10 +2790,9 @@ def mcp_server():
             db.session.commit()
             return _mcp_ok(req_id, _mcp_json_content({'animal': _mcp_animal_payload(animal), 'campos_atualizados': changed}))
 
-        if tool_name == 'atualizar_perfil_tutor':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'tutors:write')
-            if scope_error:
-                return scope_error
+        @tool('atualizar_perfil_tutor', scopes=('tutors:write',))
+        def _mcp_tool_atualizar_perfil_tutor(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -2904,10 +2826,9 @@ def mcp_server():
             db.session.commit()
             return _mcp_ok(req_id, _mcp_json_content({'tutor': _mcp_owner_payload(tutor), 'campos_atualizados': changed}))
 
-        if tool_name == 'registrar_vacina_pet':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'pets:write')
-            if scope_error:
-                return scope_error
+        @tool('registrar_vacina_pet', scopes=('pets:write',))
+        def _mcp_tool_registrar_vacina_pet(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -2933,10 +2854,9 @@ def mcp_server():
                 db.session.commit()
             return _mcp_ok(req_id, _mcp_json_content({'vacina': {'id': vaccine.id, 'nome': vaccine.nome, 'aplicada_em': vaccine.aplicada_em.isoformat()}, 'criada_agora': created}))
 
-        if tool_name == 'registrar_vermifugacao_pet':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'pets:write')
-            if scope_error:
-                return scope_error
+        @tool('registrar_vermifugacao_pet', scopes=('pets:write',))
+        def _mcp_tool_registrar_vermifugacao_pet(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -2963,10 +2883,9 @@ def mcp_server():
                 db.session.commit()
             return _mcp_ok(req_id, _mcp_json_content({'vermifugacao': {'id': record.id, 'medicamento': record.title, 'administrada_em': record.occurred_on.isoformat()}, 'criada_agora': created}))
 
-        if tool_name == 'listar_agendamentos':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'appointments:read')
-            if scope_error:
-                return scope_error
+        @tool('listar_agendamentos', scopes=('appointments:read',))
+        def _mcp_tool_listar_agendamentos(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             q = _integration_accessible_appointments_query(user)
             status_filter = str(tool_args.get('status', '') or '').strip()
             if status_filter:
@@ -2988,20 +2907,18 @@ def mcp_server():
                 'content': [{'type': 'text', 'text': json.dumps(data_out, ensure_ascii=False, indent=2) if data_out else '[]'}],
             })
 
-        if tool_name == 'interpretar_mensagem_livre_atendimento':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'profile')
-            if scope_error:
-                return scope_error
+        @tool('interpretar_mensagem_livre_atendimento', scopes=('profile',))
+        def _mcp_tool_interpretar_mensagem_livre_atendimento(call: McpToolCall):
+            req_id, tool_args = call.req_id, call.args
             try:
                 interpreted = _integration_extract_freeform_intake(tool_args)
             except ValueError as exc:
                 return _mcp_err(req_id, -32602, str(exc))
             return _mcp_ok(req_id, _mcp_json_content(interpreted))
 
-        if tool_name == 'assistente_operacional_veterinario':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'profile')
-            if scope_error:
-                return scope_error
+        @tool('assistente_operacional_veterinario', scopes=('profile',))
+        def _mcp_tool_assistente_operacional_veterinario(call: McpToolCall):
+            req_id, user, tool_args, token_scope_set = call.req_id, call.user, call.args, call.scopes
             try:
                 planning = _integration_infer_assistant_action(user, tool_args)
             except ValueError as exc:
@@ -3051,10 +2968,9 @@ def mcp_server():
 
             return _mcp_ok(req_id, _mcp_json_content(response_payload))
 
-        if tool_name == 'cadastrar_tutor_e_pets':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'tutors:write', 'pets:write')
-            if scope_error:
-                return scope_error
+        @tool('cadastrar_tutor_e_pets', scopes=('tutors:write', 'pets:write'))
+        def _mcp_tool_cadastrar_tutor_e_pets(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -3073,10 +2989,9 @@ def mcp_server():
             )
             return _mcp_ok(req_id, _mcp_json_content(result))
 
-        if tool_name == 'registrar_consulta_clinica':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'consultations:write')
-            if scope_error:
-                return scope_error
+        @tool('registrar_consulta_clinica', scopes=('consultations:write',))
+        def _mcp_tool_registrar_consulta_clinica(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -3098,10 +3013,9 @@ def mcp_server():
                 'conduta': consulta.conduta,
             }))
 
-        if tool_name == 'registrar_bloco_exames':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'exams:write')
-            if scope_error:
-                return scope_error
+        @tool('registrar_bloco_exames', scopes=('exams:write',))
+        def _mcp_tool_registrar_bloco_exames(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -3121,10 +3035,9 @@ def mcp_server():
                 'total_exames': len(bloco.exames or []),
             }))
 
-        if tool_name == 'criar_exame_imagem':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'exams:write')
-            if scope_error:
-                return scope_error
+        @tool('criar_exame_imagem', scopes=('exams:write',))
+        def _mcp_tool_criar_exame_imagem(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -3138,10 +3051,9 @@ def mcp_server():
                 return _mcp_err(req_id, -32602, str(exc))
             return _mcp_ok(req_id, _mcp_json_content(result))
 
-        if tool_name == 'anexar_pdf_exame_imagem':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'exams:write')
-            if scope_error:
-                return scope_error
+        @tool('anexar_pdf_exame_imagem', scopes=('exams:write',))
+        def _mcp_tool_anexar_pdf_exame_imagem(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -3156,10 +3068,9 @@ def mcp_server():
                 return _mcp_err(req_id, -32602, str(exc))
             return _mcp_ok(req_id, _mcp_json_content({'exame': result}))
 
-        if tool_name in {'liberar_exame_para_clinica', 'liberar_exame_para_tutor'}:
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'exams:write')
-            if scope_error:
-                return scope_error
+        @tool('liberar_exame_para_clinica', 'liberar_exame_para_tutor', scopes=('exams:write',))
+        def _mcp_tool_liberar_exame(call: McpToolCall):
+            req_id, user, tool_args, tool_name = call.req_id, call.user, call.args, call.name
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -3171,10 +3082,9 @@ def mcp_server():
                 return _mcp_err(req_id, -32602, str(exc))
             return _mcp_ok(req_id, _mcp_json_content({'exame': result}))
 
-        if tool_name == 'listar_historico_medico_animal':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'clinical_summary:read', 'exams:read')
-            if scope_error:
-                return scope_error
+        @tool('listar_historico_medico_animal', scopes=('clinical_summary:read', 'exams:read'))
+        def _mcp_tool_listar_historico_medico_animal(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             animal = _integration_find_accessible_animal(user, animal_id=tool_args.get('animal_id'), animal_name=tool_args.get('nome_animal'))
             if not animal:
                 return _mcp_err(req_id, -32004, 'Animal nao encontrado no escopo disponivel.')
@@ -3198,10 +3108,9 @@ def mcp_server():
             }
             return _mcp_ok(req_id, _mcp_json_content(result))
 
-        if tool_name == 'obter_documento_clinico':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'exams:read')
-            if scope_error:
-                return scope_error
+        @tool('obter_documento_clinico', scopes=('exams:read',))
+        def _mcp_tool_obter_documento_clinico(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             exame = None
             if tool_args.get('exame_id'):
                 exame = db.session.get(ExameImagem, int(tool_args.get('exame_id') or 0))
@@ -3220,10 +3129,9 @@ def mcp_server():
                 _integration_exame_imagem_document_payload(exame, user, include_internal_links=False)
             ))
 
-        if tool_name == 'buscar_ou_criar_clinica_requisitante':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'exams:write')
-            if scope_error:
-                return scope_error
+        @tool('buscar_ou_criar_clinica_requisitante', scopes=('exams:write',))
+        def _mcp_tool_buscar_ou_criar_clinica_requisitante(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             if not has_veterinarian_profile(user):
                 return _mcp_err(req_id, -32003, 'This MCP tool is restricted to veterinarian accounts.')
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
@@ -3236,10 +3144,9 @@ def mcp_server():
                 return _mcp_err(req_id, -32602, str(exc))
             return _mcp_ok(req_id, _mcp_json_content({'clinica': {'id': clinic.id, 'nome': clinic.nome, 'criada_agora': created}}))
 
-        if tool_name == 'buscar_ou_criar_tutor_animal':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'tutors:write', 'pets:write')
-            if scope_error:
-                return scope_error
+        @tool('buscar_ou_criar_tutor_animal', scopes=('tutors:write', 'pets:write'))
+        def _mcp_tool_buscar_ou_criar_tutor_animal(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             if not has_veterinarian_profile(user):
                 return _mcp_err(req_id, -32003, 'This MCP tool is restricted to veterinarian accounts.')
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
@@ -3259,10 +3166,9 @@ def mcp_server():
                 return _mcp_err(req_id, -32602, str(exc))
             return _mcp_ok(req_id, _mcp_json_content({'tutor': {'id': tutor.id, 'nome': tutor.name, 'criado_agora': tutor_created, 'email_provisorio': provisional}, 'animal': {'id': animal.id, 'nome': animal.name, 'criado_agora': animal_created}, 'clinica': {'id': clinic.id, 'nome': clinic.nome}}))
 
-        if tool_name in {'gerar_convite_primeiro_acesso_clinica', 'gerar_convite_acesso_tutor'}:
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'exams:write')
-            if scope_error:
-                return scope_error
+        @tool('gerar_convite_primeiro_acesso_clinica', 'gerar_convite_acesso_tutor', scopes=('exams:write',))
+        def _mcp_tool_gerar_convite_acesso(call: McpToolCall):
+            req_id, user, tool_args, tool_name = call.req_id, call.user, call.args, call.name
             if not has_veterinarian_profile(user):
                 return _mcp_err(req_id, -32003, 'This MCP tool is restricted to veterinarian accounts.')
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
@@ -3303,10 +3209,9 @@ def mcp_server():
             convite = {'token': invite.token if invite else None, **_invite_payload(invite)}
             return _mcp_ok(req_id, _mcp_json_content({'convite': convite}))
 
-        if tool_name == 'abrir_importador_laudo_volante':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'profile')
-            if scope_error:
-                return scope_error
+        @tool('abrir_importador_laudo_volante', scopes=('profile',))
+        def _mcp_tool_abrir_importador_laudo_volante(call: McpToolCall):
+            req_id, tool_args = call.req_id, call.args
             draft_laudo_url = (tool_args.get('laudo_url') or '').strip()
             if _is_local_chatgpt_file_path(draft_laudo_url):
                 draft_laudo_url = ''
@@ -3342,10 +3247,9 @@ def mcp_server():
                 ],
             })
 
-        if tool_name == 'importar_laudo_volante':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'tutors:write', 'pets:write', 'exams:write')
-            if scope_error:
-                return scope_error
+        @tool('importar_laudo_volante', scopes=('tutors:write', 'pets:write', 'exams:write'))
+        def _mcp_tool_importar_laudo_volante(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -3360,10 +3264,9 @@ def mcp_server():
             response['structuredContent'] = result
             return _mcp_ok(req_id, response)
 
-        if tool_name == 'sugerir_modelo_laudo':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'exams:read')
-            if scope_error:
-                return scope_error
+        @tool('sugerir_modelo_laudo', scopes=('exams:read',))
+        def _mcp_tool_sugerir_modelo_laudo(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             if not has_veterinarian_profile(user):
                 return _mcp_err(req_id, -32003, 'This MCP tool is restricted to veterinarian accounts.')
             try:
@@ -3374,10 +3277,9 @@ def mcp_server():
             response['structuredContent'] = result
             return _mcp_ok(req_id, response)
 
-        if tool_name == 'agendar_consulta':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'appointments:write')
-            if scope_error:
-                return scope_error
+        @tool('agendar_consulta', scopes=('appointments:write',))
+        def _mcp_tool_agendar_consulta(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -3399,10 +3301,9 @@ def mcp_server():
                 'clinica_id': appointment.clinica_id,
             }))
 
-        if tool_name == 'agendar_retorno':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'appointments:write')
-            if scope_error:
-                return scope_error
+        @tool('agendar_retorno', scopes=('appointments:write',))
+        def _mcp_tool_agendar_retorno(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -3450,19 +3351,17 @@ def mcp_server():
                 'scheduled_at': _integration_format_datetime(latest_return.scheduled_at) if latest_return else None,
             }))
 
-        if tool_name == 'obter_resumo_clinico_animal':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'clinical_summary:read')
-            if scope_error:
-                return scope_error
+        @tool('obter_resumo_clinico_animal', scopes=('clinical_summary:read',))
+        def _mcp_tool_obter_resumo_clinico_animal(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             animal = _mcp_find_animal_for_tool(user, tool_args)
             if not animal:
                 return _mcp_err(req_id, -32004, 'Animal não encontrado no escopo disponível para este usuário.')
             return _mcp_ok(req_id, _mcp_json_content(_integration_build_clinical_summary(user, animal)))
 
-        if tool_name == 'listar_agenda_do_dia':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'appointments:read')
-            if scope_error:
-                return scope_error
+        @tool('listar_agenda_do_dia', scopes=('appointments:read',))
+        def _mcp_tool_listar_agenda_do_dia(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             target_date = None
             raw_date = str(tool_args.get('data') or '').strip()
             if raw_date:
@@ -3472,10 +3371,9 @@ def mcp_server():
                     return _mcp_err(req_id, -32602, 'A data deve estar no formato YYYY-MM-DD.')
             return _mcp_ok(req_id, _mcp_json_content(_integration_build_today_agenda(user, target_date=target_date)))
 
-        if tool_name == 'buscar_produtos_loja':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'profile')
-            if scope_error:
-                return scope_error
+        @tool('buscar_produtos_loja', scopes=('profile',))
+        def _mcp_tool_buscar_produtos_loja(call: McpToolCall):
+            req_id, tool_args = call.req_id, call.args
             products = _mcp_store_products(
                 search_term=tool_args.get('termo') or tool_args.get('q'),
                 category=tool_args.get('categoria'),
@@ -3488,10 +3386,9 @@ def mcp_server():
                 'url_loja': url_for('loja', _external=True),
             }))
 
-        if tool_name == 'obter_produto_loja':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'profile')
-            if scope_error:
-                return scope_error
+        @tool('obter_produto_loja', scopes=('profile',))
+        def _mcp_tool_obter_produto_loja(call: McpToolCall):
+            req_id, tool_args = call.req_id, call.args
             try:
                 product_id = int(tool_args.get('produto_id') or 0)
             except (TypeError, ValueError):
@@ -3501,10 +3398,9 @@ def mcp_server():
                 return _mcp_err(req_id, -32004, 'Produto não encontrado ou indisponível.')
             return _mcp_ok(req_id, _mcp_json_content({'produto': _mcp_product_payload(product)}))
 
-        if tool_name == 'criar_pedido_loja':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'profile')
-            if scope_error:
-                return scope_error
+        @tool('criar_pedido_loja', scopes=('profile',))
+        def _mcp_tool_criar_pedido_loja(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
             if confirmation_error:
                 return confirmation_error
@@ -3539,10 +3435,9 @@ def mcp_server():
                 'pagamento_no_chatgpt': False,
             }))
 
-        if tool_name == 'buscar_paciente':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'pets:read')
-            if scope_error:
-                return scope_error
+        @tool('buscar_paciente', scopes=('pets:read',))
+        def _mcp_tool_buscar_paciente(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             pacientes = [
                 _mcp_animal_payload(animal)
                 for animal in _mcp_search_animals(user, tool_args.get('termo'), tool_args.get('limite') or 10)
@@ -3552,19 +3447,17 @@ def mcp_server():
                 'pacientes': pacientes,
             }))
 
-        if tool_name == 'obter_timeline_clinica':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'clinical_summary:read', 'exams:read', 'vaccines:read')
-            if scope_error:
-                return scope_error
+        @tool('obter_timeline_clinica', scopes=('clinical_summary:read', 'exams:read', 'vaccines:read'))
+        def _mcp_tool_obter_timeline_clinica(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             animal = _mcp_find_animal_for_tool(user, tool_args)
             if not animal:
                 return _mcp_err(req_id, -32004, 'Animal não encontrado no escopo disponível para este usuário.')
             return _mcp_ok(req_id, _mcp_json_content(_mcp_build_timeline(user, animal)))
 
-        if tool_name == 'preparar_consulta':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'appointments:read', 'clinical_summary:read', 'exams:read', 'vaccines:read')
-            if scope_error:
-                return scope_error
+        @tool('preparar_consulta', scopes=('appointments:read', 'clinical_summary:read', 'exams:read', 'vaccines:read'))
+        def _mcp_tool_preparar_consulta(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             animal = _mcp_find_animal_for_tool(user, tool_args)
             if not animal:
                 return _mcp_err(req_id, -32004, 'Animal não encontrado no escopo disponível para este usuário.')
@@ -3575,16 +3468,14 @@ def mcp_server():
                 return _mcp_err(req_id, -32602, 'appointment_id deve ser numérico quando informado.')
             return _mcp_ok(req_id, _mcp_json_content(_mcp_build_consult_prep(user, animal, appointment_id=parsed_appointment_id)))
 
-        if tool_name == 'listar_pendencias_clinicas':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'appointments:read', 'exams:read', 'vaccines:read')
-            if scope_error:
-                return scope_error
+        @tool('listar_pendencias_clinicas', scopes=('appointments:read', 'exams:read', 'vaccines:read'))
+        def _mcp_tool_listar_pendencias_clinicas(call: McpToolCall):
+            req_id, user = call.req_id, call.user
             return _mcp_ok(req_id, _mcp_json_content(_integration_build_clinical_pendencies(user)))
 
-        if tool_name == 'listar_vacinas_pendentes':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'vaccines:read')
-            if scope_error:
-                return scope_error
+        @tool('listar_vacinas_pendentes', scopes=('vaccines:read',))
+        def _mcp_tool_listar_vacinas_pendentes(call: McpToolCall):
+            req_id, user = call.req_id, call.user
             pendencias = _integration_build_clinical_pendencies(user)
             return _mcp_ok(req_id, _mcp_json_content({
                 'resumo': {
@@ -3593,10 +3484,9 @@ def mcp_server():
                 'vacinas_atrasadas': pendencias['vacinas_atrasadas'],
             }))
 
-        if tool_name == 'listar_exames_pendentes':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'exams:read')
-            if scope_error:
-                return scope_error
+        @tool('listar_exames_pendentes', scopes=('exams:read',))
+        def _mcp_tool_listar_exames_pendentes(call: McpToolCall):
+            req_id, user = call.req_id, call.user
             pendencias = _integration_build_clinical_pendencies(user)
             return _mcp_ok(req_id, _mcp_json_content({
                 'resumo': {
@@ -3607,10 +3497,9 @@ def mcp_server():
                 'exames_solicitados_pendentes': pendencias['exames_solicitados_pendentes'],
             }))
 
-        if tool_name == 'listar_retornos_pendentes':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'appointments:read')
-            if scope_error:
-                return scope_error
+        @tool('listar_retornos_pendentes', scopes=('appointments:read',))
+        def _mcp_tool_listar_retornos_pendentes(call: McpToolCall):
+            req_id, user = call.req_id, call.user
             pendencias = _integration_build_clinical_pendencies(user)
             return _mcp_ok(req_id, _mcp_json_content({
                 'resumo': {
@@ -3619,10 +3508,9 @@ def mcp_server():
                 'retornos_pendentes': pendencias['retornos_pendentes'],
             }))
 
-        if tool_name == 'gerar_orientacao_tutor':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'tutor_guidance:generate')
-            if scope_error:
-                return scope_error
+        @tool('gerar_orientacao_tutor', scopes=('tutor_guidance:generate',))
+        def _mcp_tool_gerar_orientacao_tutor(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             animal = _mcp_find_animal_for_tool(user, tool_args)
             if not animal:
                 return _mcp_err(req_id, -32004, 'Animal não encontrado no escopo disponível para este usuário.')
@@ -3636,10 +3524,9 @@ def mcp_server():
                 _mcp_json_content(_integration_generate_tutor_guidance(user, animal, consulta_id=parsed_consulta_id)),
             )
 
-        if tool_name == 'gerar_mensagem_whatsapp_tutor':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'tutor_guidance:generate')
-            if scope_error:
-                return scope_error
+        @tool('gerar_mensagem_whatsapp_tutor', scopes=('tutor_guidance:generate',))
+        def _mcp_tool_gerar_mensagem_whatsapp_tutor(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             animal = _mcp_find_animal_for_tool(user, tool_args)
             if not animal:
                 return _mcp_err(req_id, -32004, 'Animal não encontrado no escopo disponível para este usuário.')
@@ -3674,10 +3561,9 @@ def mcp_server():
                 'envio_automatico': False,
             }))
 
-        if tool_name == 'gerar_handoff_clinico':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'handoff:read')
-            if scope_error:
-                return scope_error
+        @tool('gerar_handoff_clinico', scopes=('handoff:read',))
+        def _mcp_tool_gerar_handoff_clinico(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             animal = _mcp_find_animal_for_tool(user, tool_args)
             if not animal:
                 return _mcp_err(req_id, -32004, 'Animal não encontrado no escopo disponível para este usuário.')
@@ -3691,10 +3577,9 @@ def mcp_server():
                 _mcp_json_content(_integration_build_handoff(user, animal, consulta_id=parsed_consulta_id)),
             )
 
-        if tool_name == 'listar_alertas_admin':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'profile')
-            if scope_error:
-                return scope_error
+        @tool('listar_alertas_admin', scopes=('profile',), admin_only=True)
+        def _mcp_tool_listar_alertas_admin(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             if not _mcp_user_is_admin(user):
                 return _mcp_err(req_id, -32003, 'Esta tool é restrita a administradores.')
             return _mcp_ok(
@@ -3702,10 +3587,9 @@ def mcp_server():
                 _mcp_json_content(_mcp_admin_alerts(user, status=tool_args.get('status') or 'open', limit=tool_args.get('limite') or 30)),
             )
 
-        if tool_name == 'resolver_alerta_admin':
-            scope_error = _mcp_require_scopes(req_id, token_scope_set, 'profile')
-            if scope_error:
-                return scope_error
+        @tool('resolver_alerta_admin', scopes=('profile',), admin_only=True)
+        def _mcp_tool_resolver_alerta_admin(call: McpToolCall):
+            req_id, user, tool_args = call.req_id, call.user, call.args
             if not _mcp_user_is_admin(user):
                 return _mcp_err(req_id, -32003, 'Esta tool é restrita a administradores.')
             confirmation_error = _mcp_require_confirmation(req_id, tool_args)
@@ -3738,7 +3622,196 @@ def mcp_server():
                 'alerta': _mcp_admin_alert_payload(note),
             }))
 
-        return _mcp_err(req_id, -32601, f'Tool not found: {tool_name}')
+
+_mcp_register_tools(mcp_tools)
+
+
+def _mcp_call_tool(call: McpToolCall):
+    tool = mcp_tools.get(call.name)
+    if tool is None:
+        return _mcp_err(call.req_id, -32601, f'Tool not found: {call.name}')
+    scope_error = _mcp_require_scopes(call.req_id, call.scopes, *tool.scopes)
+    if scope_error:
+        return scope_error
+    return tool.handler(call)
+
+
+def _mcp_tools_list_response(req_id, user, *, conditional=False):
+    """Serve the cached catalogue; a matching ``If-None-Match`` gets a 304."""
+    catalogue = mcp_tools.catalogue(is_admin=_mcp_user_is_admin(user))
+    if conditional and catalogue.etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        body = f'{{"jsonrpc":"2.0","id":{json.dumps(req_id)},"result":{{"tools":{catalogue.tools_json}}}}}'
+        response = make_response(body)
+        response.mimetype = 'application/json'
+    response.set_etag(catalogue.etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _mcp_verify_bearer(bearer: str) -> VerifiedToken | None:
+    """Validate the bearer against the DB, reusing a recent verification."""
+    verified = token_cache.get(bearer)
+    if verified is None:
+        token_obj = OAuthAccessToken.query.filter_by(access_token=bearer).first()
+        if not token_obj or not token_obj.is_active:
+            return None
+        verified = VerifiedToken(
+            token_id=token_obj.id,
+            user_id=token_obj.user_id,
+            scopes=frozenset(item.strip() for item in (token_obj.scope or '').split() if item.strip()),
+            resource=token_obj.resource,
+            expires_at=token_obj.expires_at,
+        )
+        token_cache.put(bearer, verified)
+
+    expected_resource = f'{_oauth_issuer().rstrip("/")}{_mcp_resource_path()}'
+    if not verified.resource or verified.resource.rstrip('/') != expected_resource:
+        return None
+    return verified
+
+
+def _mcp_batch(messages, user, token_scope_set):
+    """JSON-RPC batch: every call shares the user and the animal lookups memoized on ``g``."""
+    if not messages:
+        return _mcp_err(None, -32600, 'Invalid Request: empty batch')
+    if len(messages) > MCP_BATCH_MAX_CALLS:
+        return _mcp_err(None, -32600, f'Invalid Request: batch larger than {MCP_BATCH_MAX_CALLS} calls')
+
+    replies = []
+    challenges = []
+    for message in messages:
+        if not isinstance(message, dict):
+            replies.append({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': 'Invalid Request'}})
+            continue
+        try:
+            response = _mcp_dispatch(message, user, token_scope_set)
+        except Exception:  # noqa: BLE001 - one failing call must not sink the batch
+            db.session.rollback()
+            current_app.logger.exception('mcp_batch_call_failed method=%s', message.get('method'))
+            replies.append({
+                'jsonrpc': '2.0',
+                'id': message.get('id'),
+                'error': {'code': -32603, 'message': 'Internal error'},
+            })
+            continue
+        if isinstance(response, tuple):  # notifications have no reply
+            continue
+        for challenge in response.headers.getlist('WWW-Authenticate'):
+            if challenge not in challenges:
+                challenges.append(challenge)
+        replies.append(response.get_json())
+
+    if not replies:
+        return ('', 204)
+    batch_response = jsonify(replies)
+    # Escopo faltando em qualquer chamada: o cliente precisa do desafio OAuth.
+    for challenge in challenges:
+        batch_response.headers.add('WWW-Authenticate', challenge)
+    return batch_response
+
+
+@csrf.exempt
+def mcp_server():
+    """MCP server — handles GET (capability probe) and POST (JSON-RPC) from Claude/ChatGPT."""
+
+    if request.method == 'OPTIONS':
+        return ('', 204)
+
+    # ── GET: unauthenticated capability probe or SSE handshake ───────────────
+    # Claude may send a plain GET before OAuth to verify server existence.
+    # Return a JSON description (no auth required) so discovery succeeds.
+    if request.method == 'GET':
+        issuer = _oauth_issuer()
+        return jsonify({
+            'server': 'PetOrlândia MCP',
+            'version': '2.1.0',
+            'resource': f'{issuer}{_mcp_resource_path()}',
+            'protocol': f'mcp/{MCP_PROTOCOL_VERSIONS[0]}',
+            'authorization_required': True,
+            'authorization_server': issuer,
+        })
+
+    # ── POST: authenticated JSON-RPC ─────────────────────────────────────────
+
+    # Authentication
+    bearer = _oauth_extract_bearer_token()
+    if not bearer:
+        return _mcp_unauthorized()
+
+    verified = _mcp_verify_bearer(bearer)
+    if verified is None:
+        return _mcp_unauthorized()
+
+    user = db.session.get(User, verified.user_id)
+    if not user:
+        return _mcp_unauthorized()
+    token_scope_set = set(verified.scopes)
+
+    # Parse JSON-RPC — a list is a batch, answered in this same request.
+    data = request.get_json(silent=True)
+    if isinstance(data, list):
+        return _mcp_batch(data, user, token_scope_set)
+    if not isinstance(data, dict):
+        data = {}
+    return _mcp_dispatch(data, user, token_scope_set, conditional=True)
+
+
+def _mcp_dispatch(data, user, token_scope_set, *, conditional=False):
+    """Answer one JSON-RPC message for an already authenticated user."""
+    method = data.get('method', '')
+    req_id = data.get('id')
+    params = data.get('params') or {}
+
+    # ── initialize ────────────────────────────────────────────────────────────
+    if method == 'initialize':
+        return _mcp_ok(req_id, {
+            'protocolVersion': _mcp_protocol_version(params),
+            'serverInfo': {'name': 'PetOrlandia MCP v2', 'version': '3.1.0'},
+            'capabilities': {'tools': {}, 'resources': {}},
+            'instructions': (
+                'PHOTO IMPORT RULES: Never invent data or merge records from different pets. Missing phone, address, or incomplete history never blocks importing clear data. '
+                'A direct user instruction to register, include, save, or import is explicit confirmation: review and import in the same conversation with confirmar_gravacao="sim" when no material conflict exists. '
+                'Skip only illegible or low-confidence items and report them after the successful import. '
+                'PetOrlandia é um app real de gestão veterinária, loja e serviços. '
+                'Quando o usuário pedir produtos, compras, catálogo, preço, estoque, carrinho ou pagamento, '
+                'use as tools de loja para consultar produtos reais e criar pedidos reais. '
+                'Nunca invente categorias, produtos, marcas, preços, estoque ou formas de pagamento. '
+                'Para pagamento, crie ou atualize o pedido e entregue o link do carrinho/checkout do PetOrlandia; '
+                'não afirme que processou cartão dentro do ChatGPT. '
+                'Quando o tutor enviar fotos de carteirinha de vacinação, leia as imagens, chame revisar_carteirinha_fotografada '
+                'com uma transcrição estruturada e apresente no próprio chat somente o retorno efetivo da tool; nunca alegue que abriu um painel. '
+                'Só chame importar_carteirinha_fotografada após confirmação explícita. '
+                'Também existem atualizar_perfil_pet, registrar_vacina_pet e registrar_vermifugacao_pet. '
+                'Nunca afirme que uma ação não existe sem antes usar o catálogo de tools desta conexão. '
+                'Para qualquer escrita, peça confirmação explícita antes de chamar tools que gravam dados.'
+            ),
+        })
+
+    # ── notifications/initialized (client ack — no response body needed) ─────
+    if method in ('notifications/initialized', 'initialized'):
+        return ('', 204)
+
+    if method == 'resources/list':
+        return _mcp_ok(req_id, {'resources': [item[0] for item in _mcp_widget_catalog().values()]})
+
+    if method == 'resources/read':
+        uri = str(params.get('uri') or '').strip()
+        return _mcp_widget_response(req_id, uri)
+
+    # ── tools/list ───────────────────────────────────────────────────────────
+    if method == 'tools/list':
+        return _mcp_tools_list_response(req_id, user, conditional=conditional)
+
+    if method == 'tools/call':
+        return _mcp_call_tool(McpToolCall(
+            name=params.get('name', ''),
+            req_id=req_id,
+            user=user,
+            args=params.get('arguments') or {},
+            scopes=token_scope_set,
+        ))
 
     # ── unknown method ────────────────────────────────────────────────────────
     return _mcp_err(req_id, -32601, f'Method not found: {method}')
@@ -25,6 +25,7 @@ import json
 import os
 import re
 from functools import wraps
+from itertools import chain
 
 from extensions import csrf
 from flask import (
@@ -36,6 +37,7 @@ from flask import (
     render_template,
     request,
     send_file,
+    stream_with_context,
     url_for,
     current_app,
 )
@@ -1879,11 +1881,11 @@ def revisao_graficos():
 @bp.route("/analise-respostas")
 @require_sfa_internal_access
 def analise_respostas():
-    from services.sfa_service import filtrar_pacientes_reais_sfa, montar_analise_respostas
+    from services.sfa_service import carregar_respostas_em_lote, filtrar_pacientes_reais_sfa, montar_analise_respostas
 
     filtros = _coletar_filtros_pacientes()
     filtros["visao"] = "reais"
-    pacientes = filtrar_pacientes_reais_sfa(_consulta_pacientes_filtrada(filtros).all())
+    pacientes = carregar_respostas_em_lote(filtrar_pacientes_reais_sfa(_consulta_pacientes_filtrada(filtros).all()))
     analise = montar_analise_respostas(pacientes)
 
     return render_template(
@@ -1902,26 +1904,40 @@ def _csv_download_response(csv_text: str, filename: str):
     return response
 
 
+def _csv_stream_response(chunks, filename: str):
+    """CSV gerado em pedaços enquanto a query é lida em lotes (``yield_per``)."""
+    response = current_app.response_class(
+        stream_with_context(chain(["\ufeff"], chunks)),
+        mimetype="text/csv; charset=utf-8",
+    )
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
 @bp.route("/export/cadastro.csv")
 @require_sfa_internal_access
 def export_cadastro_csv():
-    from services.sfa_service import gerar_csv_exportacao_cadastro
+    from services.data_export import iter_query
+    from services.sfa_service import iterar_csv_exportacao_cadastro
 
     filtros = _coletar_filtros_pacientes()
-    pacientes = _consulta_pacientes_filtrada(filtros).all()
-    csv_text = gerar_csv_exportacao_cadastro(pacientes)
-    return _csv_download_response(csv_text, f"sfa_cadastro_{date.today().isoformat()}.csv")
+    pacientes = iter_query(_consulta_pacientes_filtrada(filtros))
+    return _csv_stream_response(
+        iterar_csv_exportacao_cadastro(pacientes), f"sfa_cadastro_{date.today().isoformat()}.csv"
+    )
 
 
 @bp.route("/export/analitico.csv")
 @require_sfa_internal_access
 def export_analitico_csv():
-    from services.sfa_service import gerar_csv_exportacao_analitica
+    from services.data_export import iter_query
+    from services.sfa_service import carregar_respostas_em_blocos, iterar_csv_exportacao_analitica
 
     filtros = _coletar_filtros_pacientes()
-    pacientes = _consulta_pacientes_filtrada(filtros).all()
-    csv_text = gerar_csv_exportacao_analitica(pacientes)
-    return _csv_download_response(csv_text, f"sfa_analitico_{date.today().isoformat()}.csv")
+    pacientes = carregar_respostas_em_blocos(iter_query(_consulta_pacientes_filtrada(filtros)))
+    return _csv_stream_response(
+        iterar_csv_exportacao_analitica(pacientes), f"sfa_analitico_{date.today().isoformat()}.csv"
+    )
 
 
 @bp.route("/tcle/assinaturas")
@@ -17,7 +17,7 @@ from models.consulta import BlocoPrescricao
 from models.loja import Payment
 from models.racao import CasaDeRacao
 from models.usuarios import User, Veterinario
-from services.finance import run_transactions_history_backfill
+from services.finance import reconcile_classified_totals, run_transactions_history_backfill
 from services.veterinarian_billing import (
     MercadoPagoSubscriptionClient,
     reconcile_membership_billing,
@@ -166,6 +166,22 @@ def classify_transactions_history(months, clinic_ids, reference_month, verbose):
     )
 
 
+@click.command('reconcile-classified-totals')
+@click.option(
+    '--clinic-id',
+    'clinic_ids',
+    type=int,
+    multiple=True,
+    help='Limite a conferência a clínicas específicas (pode ser informado múltiplas vezes).',
+)
+@with_appcontext
+def reconcile_classified_totals_command(clinic_ids):
+    """Confere os totais mensais classificados contra as somas e corrige divergências."""
+
+    result = reconcile_classified_totals(clinic_ids or None)
+    click.echo(f'clinics={result.clinics} checked={result.checked} repaired={result.repaired}')
+
+
 @click.command('reconcile-veterinarian-billing')
 @click.option('--limit', type=click.IntRange(min=1, max=2000), default=250, show_default=True)
 @with_appcontext
@@ -188,7 +204,60 @@ def reconcile_veterinarian_billing(limit):
         raise click.ClickException("A reconciliação terminou com falhas")
 
 
+@click.command('reindex-medication-search')
+@click.option('--batch-size', type=click.IntRange(min=1), default=500, show_default=True)
+@with_appcontext
+def reindex_medication_search(batch_size):
+    """Recalcula o search_document de todos os medicamentos do bulário."""
+
+    from services.medication_search import reindexar_documentos_busca
+
+    total = reindexar_documentos_busca(batch_size=batch_size)
+    click.echo(f'{total} medicamento(s) reindexado(s).')
+
+
+@click.command('backfill-animal-activity')
+@click.option('--batch-size', type=click.IntRange(min=1), default=500, show_default=True)
+@click.option('--restart', is_flag=True, help='Ignora o cursor salvo e começa do primeiro animal.')
+@with_appcontext
+def backfill_animal_activity_command(batch_size, restart):
+    """Reconstrói animal_activity e a chave de busca normalizada dos animais."""
+
+    from services.animal_activity import backfill_animal_activity
+
+    result = backfill_animal_activity(batch_size=batch_size, restart=restart)
+    click.echo(
+        "animals={animals} activity_rows={activity_rows} batches={batches}".format(**result)
+    )
+
+
+@click.command('drain-notification-outbox')
+@click.option(
+    '--channel',
+    type=click.Choice(['email', 'whatsapp', 'push']),
+    multiple=True,
+    help='Canal a drenar (padrão: todos).',
+)
+@with_appcontext
+def drain_notification_outbox(channel):
+    """Envia agora os lembretes vencidos do outbox de notificações."""
+
+    from services.notification_outbox import CHANNELS, drain
+
+    for name in channel or CHANNELS:
+        result = drain(name)
+        click.echo(
+            "{channel}: sent={sent} retry={retry} dead={dead} batches={batches}".format(
+                channel=name, **result
+            )
+        )
+
+
 def register_cli_commands(app):
+    app.cli.add_command(backfill_animal_activity_command)
     app.cli.add_command(classify_transactions_history)
     app.cli.add_command(cleanup_test_users)
+    app.cli.add_command(drain_notification_outbox)
+    app.cli.add_command(reconcile_classified_totals_command)
     app.cli.add_command(reconcile_veterinarian_billing)
+    app.cli.add_command(reindex_medication_search)
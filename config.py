@@ -78,6 +78,30 @@ class Config:
     SESSION_CLEANUP_N_REQUESTS = int(
         os.environ.get("SESSION_CLEANUP_N_REQUESTS", "100")
     )
+    # Badges da navbar: "memory" (LRU por worker) ou "redis" (compartilhado).
+    BADGE_CACHE_BACKEND = os.environ.get("BADGE_CACHE_BACKEND") or (
+        "redis" if REDIS_URL else "memory"
+    )
+    BADGE_CACHE_TTL = int(os.environ.get("BADGE_CACHE_TTL", "30"))
+    BADGE_CACHE_MAX_ENTRIES = int(os.environ.get("BADGE_CACHE_MAX_ENTRIES", "5000"))
+    # Socket.IO com mais de um worker: a fila (Redis) distribui os emits entre
+    # processos e o estado das salas (assentos, tabuleiro) vai para o mesmo
+    # Redis. Sem fila, tudo fica em memória e o app precisa de um único worker.
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get("SOCKETIO_MESSAGE_QUEUE") or REDIS_URL
+    SOCKETIO_CHANNEL = os.environ.get("SOCKETIO_CHANNEL", "petorlandia-socketio")
+    SOCKETIO_ROOM_STATE_BACKEND = os.environ.get("SOCKETIO_ROOM_STATE_BACKEND") or (
+        "redis" if SOCKETIO_MESSAGE_QUEUE else "memory"
+    )
+    SOCKETIO_ROOM_TTL = int(os.environ.get("SOCKETIO_ROOM_TTL", str(6 * 60 * 60)))
+    # Sessão de cada conexão: renovada por eventos e pelo heartbeat de 30s
+    # dos clientes; sessões de worker morto liberam o assento neste prazo.
+    SOCKETIO_SESSION_TTL = int(os.environ.get("SOCKETIO_SESSION_TTL", "90"))
+    # Guardas de schema do startup (ALTER/CREATE defensivos): só rodam de novo
+    # quando o fingerprint (deploy + banco + versão alembic + código das
+    # guardas) muda. O arquivo padrão é ``instance/schema_guards.json``;
+    # SCHEMA_GUARDS_CACHE=0 volta a rodar em todo import.
+    SCHEMA_GUARDS_CACHE = _env_bool("SCHEMA_GUARDS_CACHE", True)
+    SCHEMA_GUARDS_CACHE_PATH = _env_optional("SCHEMA_GUARDS_CACHE_PATH")
     # Long-lived sessions increase the blast radius of a stolen cookie.
     PERMANENT_SESSION_LIFETIME = timedelta(
         days=int(os.environ.get("PERMANENT_SESSION_LIFETIME_DAYS", "30"))
@@ -106,6 +130,8 @@ class Config:
     OAUTH_AUTHORIZATION_CODE_EXPIRES_IN = int(os.environ.get("OAUTH_AUTHORIZATION_CODE_EXPIRES_IN", "300"))
     OAUTH_ACCESS_TOKEN_EXPIRES_IN = int(os.environ.get("OAUTH_ACCESS_TOKEN_EXPIRES_IN", "900"))
     OAUTH_REFRESH_TOKEN_EXPIRES_IN = int(os.environ.get("OAUTH_REFRESH_TOKEN_EXPIRES_IN", "2592000"))
+    # Tokens já verificados ficam em cache por worker; revogação invalida no commit.
+    OAUTH_TOKEN_CACHE_TTL = int(os.environ.get("OAUTH_TOKEN_CACHE_TTL", "30"))
     # Keep OAuth issuer/resource identifiers independent from the request Host
     # header. Production uses the verified public origin; tunnels and local
     # environments can opt in to their own origin with OAUTH_ISSUER.
@@ -139,6 +165,10 @@ class Config:
     COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "1024"))
     COMPRESS_LEVEL = int(os.environ.get("COMPRESS_LEVEL", "6"))
 
+    # Perfil de SQL por request (contagem, tempo, N+1) — ver services/sql_profiler.py.
+    SQL_PROFILER_ENABLED = _env_bool("SQL_PROFILER_ENABLED", False)
+    SQL_PROFILER_N_PLUS_ONE_THRESHOLD = int(os.environ.get("SQL_PROFILER_N_PLUS_ONE_THRESHOLD", "10"))
+
     # Performance: disable template auto-reload unless in debug mode
     TEMPLATES_AUTO_RELOAD = os.environ.get("TEMPLATES_AUTO_RELOAD", "").lower() in ("1", "true", "yes")
 
@@ -173,11 +203,44 @@ class Config:
         if _mail_sender_email
         else None
     )
+    # Outbox de lembretes (services.notification_outbox): envios por lote,
+    # tentativas antes de desistir e espera base do backoff exponencial.
+    NOTIFICATION_OUTBOX_BATCH_SIZE = int(os.environ.get("NOTIFICATION_OUTBOX_BATCH_SIZE", "100"))
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("NOTIFICATION_OUTBOX_MAX_ATTEMPTS", "6"))
+    NOTIFICATION_OUTBOX_RETRY_SECONDS = int(os.environ.get("NOTIFICATION_OUTBOX_RETRY_SECONDS", "300"))
 
     # Google Analytics 4 (medição de visitantes). Sem o ID definido, nenhum
     # script de analytics é carregado nas páginas.
     GA_MEASUREMENT_ID = _env_optional("GA_MEASUREMENT_ID")
 
+    # Eventos de produto (ProductEvent) saem do request por uma fila em memória
+    # e são gravados em lote por uma thread. Com TESTING a gravação é síncrona.
+    PRODUCT_EVENTS_ASYNC = _env_bool("PRODUCT_EVENTS_ASYNC", True)
+    PRODUCT_EVENTS_BATCH_SIZE = int(os.environ.get("PRODUCT_EVENTS_BATCH_SIZE", "100"))
+    PRODUCT_EVENTS_FLUSH_MS = int(os.environ.get("PRODUCT_EVENTS_FLUSH_MS", "1000"))
+    PRODUCT_EVENTS_QUEUE_SIZE = int(os.environ.get("PRODUCT_EVENTS_QUEUE_SIZE", "10000"))
+    # Fila cheia: espera até este tempo por espaço e então descarta o evento.
+    PRODUCT_EVENTS_ENQUEUE_TIMEOUT_MS = int(os.environ.get("PRODUCT_EVENTS_ENQUEUE_TIMEOUT_MS", "5"))
+
+    # Derivados responsivos das imagens enviadas (services.image_pipeline):
+    # gerados por threads do processo (desligado: no próprio request); com
+    # TESTING ficam pendentes até flush().
+    IMAGE_DERIVATIVES_ASYNC = _env_bool("IMAGE_DERIVATIVES_ASYNC", True)
+    IMAGE_DERIVATIVE_WORKERS = int(os.environ.get("IMAGE_DERIVATIVE_WORKERS", "2"))
+    # Cache local dos originais (padrão: diretório temporário do sistema).
+    IMAGE_CACHE_DIR = _env_optional("IMAGE_CACHE_DIR")
+    IMAGE_VARIANTS_CACHE_TTL = int(os.environ.get("IMAGE_VARIANTS_CACHE_TTL", "600"))
+
+    # Escritas pontuais na planilha PMO (status, observação, cor do tutor...)
+    # ficam numa fila que junta edições da mesma célula e é gravada por uma
+    # thread a cada PMO_SHEETS_FLUSH_SECONDS (um batchUpdate por planilha).
+    # Com TESTING, ou desligado, cada escrita vai direto para a API.
+    PMO_SHEETS_WRITE_BEHIND = _env_bool("PMO_SHEETS_WRITE_BEHIND", True)
+    PMO_SHEETS_FLUSH_SECONDS = float(os.environ.get("PMO_SHEETS_FLUSH_SECONDS", "3"))
+    # Erro de cota (429) ou 5xx: espera base do backoff exponencial e teto.
+    PMO_SHEETS_BACKOFF_SECONDS = float(os.environ.get("PMO_SHEETS_BACKOFF_SECONDS", "5"))
+    PMO_SHEETS_MAX_BACKOFF_SECONDS = float(os.environ.get("PMO_SHEETS_MAX_BACKOFF_SECONDS", "300"))
+
     # E-mail que recebe o aviso de novas solicitações (pedidos pagos,
     # agendamentos). Sem valor definido, nenhum aviso é enviado.
     ADMIN_NOTIFY_EMAIL = _env_optional("ADMIN_NOTIFY_EMAIL")
@@ -186,6 +249,11 @@ class Config:
     VAPID_PUBLIC_KEY = _env_optional("VAPID_PUBLIC_KEY")
     VAPID_PRIVATE_KEY = _env_optional("VAPID_PRIVATE_KEY")
     VAPID_CLAIM_EMAIL = _env_optional("VAPID_CLAIM_EMAIL")
+    # Envio em massa (services.push.dispatch_push): threads, envios por lote
+    # (commit + limpeza de inscrições mortas) e timeout HTTP por envio.
+    PUSH_MAX_WORKERS = int(os.environ.get("PUSH_MAX_WORKERS", "8"))
+    PUSH_BATCH_SIZE = int(os.environ.get("PUSH_BATCH_SIZE", "200"))
+    PUSH_TIMEOUT_SECONDS = float(os.environ.get("PUSH_TIMEOUT_SECONDS", "10"))
 
     # Token de acesso do Mercado Pago usado na integração de pagamentos
     MERCADOPAGO_ACCESS_TOKEN = _env_optional("MERCADOPAGO_ACCESS_TOKEN")
@@ -290,6 +358,26 @@ class Config:
         },
     }
 
+    # Onde ficam os ZIPs de XMLs fiscais gerados em background (padrão:
+    # ``instance/fiscal_exports``).
+    FISCAL_EXPORT_DIR = os.environ.get("FISCAL_EXPORT_DIR") or None
+    # Exportações de dados (clínica, SFA): linhas lidas por lote (``yield_per``),
+    # diretório dos arquivos gerados em background (padrão:
+    # ``instance/data_exports``) e a partir de quantas linhas a exportação da
+    # clínica vai automaticamente para a fila (0 desliga).
+    DATA_EXPORT_BATCH_SIZE = int(os.environ.get("DATA_EXPORT_BATCH_SIZE", "500"))
+    DATA_EXPORT_DIR = os.environ.get("DATA_EXPORT_DIR") or None
+    DATA_EXPORT_BACKGROUND_ROWS = int(os.environ.get("DATA_EXPORT_BACKGROUND_ROWS", "200000"))
+    # Bucket das exportações em background, visto pelo web dyno e pelo worker
+    # Celery. Sem bucket, os arquivos ficam nos diretórios acima e a geração
+    # roda numa thread do próprio processo (o worker não enxergaria o disco do
+    # web dyno), sem segurar o request.
+    DATA_EXPORT_BUCKET = os.environ.get("DATA_EXPORT_BUCKET") or os.environ.get("S3_BUCKET_NAME") or None
+    # Validade do link de download e prazo para uma exportação pendente
+    # terminar antes de ser dada como falha.
+    DATA_EXPORT_TTL_HOURS = float(os.environ.get("DATA_EXPORT_TTL_HOURS", "24"))
+    DATA_EXPORT_PENDING_MINUTES = float(os.environ.get("DATA_EXPORT_PENDING_MINUTES", "60"))
+
     NFSE_BETHA_WSDL = {
         "recepcionar_lote_rps": os.environ.get("NFSE_BETHA_WSDL_RECEPCIONAR_LOTE_RPS", ""),
         "consultar_situacao_lote_rps": os.environ.get(
@@ -5,13 +5,14 @@ Extraído de app.py durante a modularização. Registrar com:
     from context_processors import register_context_processors
     register_context_processors(app)
 
-O cache aqui é in-process com TTL curto: evita repetir as queries de badge
-(navbar) a cada request. As funções de invalidação são importadas pelas views
-que alteram os dados exibidos nos badges.
+Os badges da navbar passam por ``services.badge_cache`` (LRU em memória ou
+Redis compartilhado entre workers): todos os badges do usuário são lidos numa
+única ida ao cache por render e são invalidados no commit das mudanças em
+mensagens, consultas, exames e avisos de admin. As funções de invalidação
+abaixo continuam disponíveis para as views que alteram outros badges.
 """
 from __future__ import annotations
 
-import time as _time_module
 from types import SimpleNamespace
 
 from flask import current_app, request, session
@@ -26,87 +27,61 @@ from helpers import (
     has_veterinarian_profile,
     is_veterinarian,
 )
+from services.badge_cache import ADMINS_SCOPE, admin_user_ids, badge_cache
 from template_filters import whatsapp_chat_url
 from time_utils import utcnow
 
-# Performance: cache for context processor results (short TTL)
-_context_cache = {}
-_CONTEXT_CACHE_TTL = 30  # seconds
+def _get_cached_context(user_id, key: str):
+    """Valor em cache do badge (``None`` = recalcular)."""
+    return badge_cache.get(user_id, key)
 
 
-def _get_cached_context(user_id: int, key: str):
-    """Get cached context value if not expired."""
-    cache_key = f"{user_id}:{key}"
-    entry = _context_cache.get(cache_key)
-    if entry is not None:
-        value, timestamp = entry
-        if _time_module.time() - timestamp < _CONTEXT_CACHE_TTL:
-            return value
-    return None
-
-
-def _invalidate_cached_context(user_id: int, key: str) -> None:
+def _invalidate_cached_context(user_id, key: str) -> None:
     """Remove cached context value so the next request recomputes it.
 
     Usado ao marcar mensagens como lidas (ou aceitar consultas) para o badge
     da navbar atualizar imediatamente, sem esperar o TTL do cache.
     """
-    _context_cache.pop(f"{user_id}:{key}", None)
+    badge_cache.invalidate(user_id, key)
 
 
 def _invalidate_admin_unread_cache() -> None:
     """Invalida o contador de mensagens não lidas de todos os admins."""
-    from models import User
+    badge_cache.invalidate(ADMINS_SCOPE, 'unread_messages')
 
-    try:
-        for admin in User.query.filter_by(role='admin').all():
-            _invalidate_cached_context(admin.id, 'unread_messages')
-    except Exception:
-        pass
 
-
-def _set_cached_context(user_id: int, key: str, value):
-    """Cache context value with timestamp."""
-    cache_key = f"{user_id}:{key}"
-    _context_cache[cache_key] = (value, _time_module.time())
-    # Cleanup old entries periodically (keep cache small)
-    if len(_context_cache) > 500:
-        now = _time_module.time()
-        expired = [k for k, (_, ts) in list(_context_cache.items())
-                   if now - ts > _CONTEXT_CACHE_TTL * 2]
-        for k in expired:
-            _context_cache.pop(k, None)
-    return value
+def _set_cached_context(user_id, key: str, value):
+    """Grava o badge no cache (TTL em BADGE_CACHE_TTL)."""
+    return badge_cache.set(user_id, key, value)
 
 
 def _invalidate_admin_action_cache(user_id: int | None = None) -> None:
-    from models import User
-
     try:
         if user_id:
             _invalidate_cached_context(user_id, 'admin_action_notifications')
             return
-        for admin in User.query.filter_by(role='admin').all():
-            _invalidate_cached_context(admin.id, 'admin_action_notifications')
+        badge_cache.invalidate_many(
+            (admin_id, 'admin_action_notifications') for admin_id in admin_user_ids()
+        )
     except Exception:
         pass
 
 
 def inject_unread_count():
-    from models import Message, User
+    from models import Message
 
     try:
         if getattr(current_user, "is_authenticated", False):
-            user_id = current_user.id
-            cached = _get_cached_context(user_id, 'unread_messages')
+            # Todos os admins compartilham a mesma caixa: um só valor em cache.
+            scope = ADMINS_SCOPE if current_user.role == 'admin' else current_user.id
+            cached = _get_cached_context(scope, 'unread_messages')
             if cached is not None:
                 return dict(unread_messages=cached)
 
             if current_user.role == 'admin':
-                admin_ids = [u.id for u in User.query.filter_by(role='admin').all()]
                 unread = (
                     Message.query
-                    .filter(Message.receiver_id.in_(admin_ids), Message.lida.is_(False))
+                    .filter(Message.receiver_id.in_(admin_user_ids()), Message.lida.is_(False))
                     .count()
                 )
             else:
@@ -115,7 +90,7 @@ def inject_unread_count():
                     .filter_by(receiver_id=current_user.id, lida=False)
                     .count()
                 )
-            _set_cached_context(user_id, 'unread_messages', unread)
+            _set_cached_context(scope, 'unread_messages', unread)
         else:
             unread = 0
     except Exception:
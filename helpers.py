@@ -20,7 +20,7 @@ from services.appointment_status import (
     normalize_kind as normalize_appointment_kind,
     status_meta as appointment_status_meta,
 )
-from time_utils import BR_TZ, normalize_to_utc, utcnow
+from time_utils import BR_TZ, utcnow
 
 DEFAULT_APPOINTMENT_DURATION_MINUTES = 30
 
@@ -66,16 +66,32 @@ def reverse_geocode_city(lat, lon):
     return cidade or None
 
 
-def geocode_address(*, cep=None, rua=None, numero=None, bairro=None, cidade=None, estado=None):
+def geocode_address(
+    *,
+    cep=None,
+    rua=None,
+    numero=None,
+    bairro=None,
+    cidade=None,
+    estado=None,
+    session=None,
+    rate_limiter=None,
+    max_requests=None,
+):
     """Return latitude/longitude using OpenStreetMap with multiple fallbacks.
 
     The search prioritizes structured queries (street/number/city/state/CEP) to
     place markers as close as possible to the real address. When a precise match
     is not found, it progressively falls back to broader free-text searches.
 
+    ``session`` defaults to the process-wide session from
+    ``services.geocoding``. When given, ``rate_limiter.acquire()`` runs before
+    every HTTP request and ``max_requests`` caps how many fallbacks are tried.
+
     The first successful result is returned as ``(lat, lon)``. Any request
     failure or missing result yields ``None`` instead of raising an exception.
     """
+    from services.geocoding import http_session
 
     def _normalized(part):
         return (part or "").strip()
@@ -87,8 +103,8 @@ def geocode_address(*, cep=None, rua=None, numero=None, bairro=None, cidade=None
     estado = _normalized(estado)
     cep = _normalized(cep)
 
-    session = requests.Session()
-    session.headers.update({"User-Agent": "PetOrlandia/1.0 (+https://petorlandia.com)"})
+    session = session or http_session()
+    budget = [max_requests if max_requests is not None else float("inf")]
 
     def _extract_coords(payload):
         try:
@@ -101,6 +117,11 @@ def geocode_address(*, cep=None, rua=None, numero=None, bairro=None, cidade=None
         return lat, lon
 
     def _request(params: dict) -> tuple[float, float] | None:
+        if budget[0] <= 0:
+            return None
+        budget[0] -= 1
+        if rate_limiter is not None:
+            rate_limiter.acquire()
         try:
             response = session.get(
                 "https://nominatim.openstreetmap.org/search",
@@ -1120,104 +1141,17 @@ def get_available_times(veterinario_id, date, kind='consulta', *, include_booked
 
     When ``include_booked`` is ``True`` a dictionary with the available and
     booked slots is returned. Otherwise only the list of available times is
-    returned for backwards compatibility.
+    returned for backwards compatibility. Thin wrapper over
+    :func:`services.availability.compute_availability`; callers needing
+    several days or vets should use the engine directly.
     """
-    from models.agenda import Appointment, ExamAppointment, VetSchedule
-
-    weekday_map = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
-    dia_semana = weekday_map[date.weekday()]
-    schedules = (
-        VetSchedule.query
-        .filter_by(veterinario_id=veterinario_id, dia_semana=dia_semana)
-        .order_by(VetSchedule.hora_inicio)
-        .all()
-    )
-    if not schedules:
-        return {'available': [], 'booked': []} if include_booked else []
+    from services.availability import compute_availability
 
-    duration = get_appointment_duration(kind)
-    step = timedelta(minutes=30)
-
-    earliest_start = min(s.hora_inicio for s in schedules)
-    latest_end = max(s.hora_fim for s in schedules)
-
-    day_start = datetime.combine(date, earliest_start)
-    day_end = datetime.combine(date, latest_end)
-
-    window_local_start = day_start - MAX_APPOINTMENT_DURATION
-    window_local_end = day_end + MAX_APPOINTMENT_DURATION
-
-    window_utc_start = normalize_to_utc(window_local_start)
-    window_utc_end = normalize_to_utc(window_local_end)
-
-    appointments_cache = {}
-    exams_cache = {}
-    for window_start, window_end in (
-        (window_utc_start, window_utc_end),
-        (window_local_start, window_local_end),
-    ):
-        appts = (
-            Appointment.query
-            .filter(
-                Appointment.veterinario_id == veterinario_id,
-                Appointment.scheduled_at < window_end,
-                Appointment.scheduled_at > window_start,
-            )
-            .all()
-        )
-        for appt in appts:
-            appointments_cache.setdefault(appt.id, appt)
-
-        exams_conflicts = (
-            ExamAppointment.query
-            .filter(
-                ExamAppointment.specialist_id == veterinario_id,
-                ExamAppointment.scheduled_at < window_end,
-                ExamAppointment.scheduled_at > window_start,
-            )
-            .all()
-        )
-        for exam in exams_conflicts:
-            exams_cache.setdefault(exam.id, exam)
-
-    available = []
-    booked = [] if include_booked else None
-    available_seen = set()
-    booked_seen = set() if include_booked else None
-    for s in schedules:
-        current = datetime.combine(date, s.hora_inicio)
-        end = datetime.combine(date, s.hora_fim)
-        while current + duration <= end:
-            if s.intervalo_inicio and s.intervalo_fim:
-                intervalo_inicio = datetime.combine(date, s.intervalo_inicio)
-                intervalo_fim = datetime.combine(date, s.intervalo_fim)
-                if _intervals_overlap(current, current + duration, intervalo_inicio, intervalo_fim):
-                    current += step
-                    continue
-            time_str = current.strftime('%H:%M')
-            conflict = has_conflict_for_slot(
-                veterinario_id,
-                current,
-                duration,
-                preloaded_appointments=appointments_cache,
-                preloaded_exams=exams_cache,
-            )
-            if not conflict:
-                if time_str not in available_seen:
-                    available.append(time_str)
-                    available_seen.add(time_str)
-            elif include_booked:
-                if time_str not in booked_seen:
-                    booked.append(time_str)
-                    booked_seen.add(time_str)
-            current += step
-    available.sort()
+    vet_id = int(veterinario_id)
+    day = compute_availability([vet_id], date, date, kind)[vet_id][date]
     if include_booked:
-        booked = booked or []
-        booked = [t for t in booked if t not in available_seen]
-        booked.sort()
-        return {'available': available, 'booked': booked}
-    return available
+        return {'available': day['available'], 'booked': day['booked']}
+    return day['available']
 
 
 def get_weekly_schedule(veterinario_id, start_date, days=7, day_start=time(8, 0), day_end=time(18, 0)):
@@ -1227,99 +1161,16 @@ def get_weekly_schedule(veterinario_id, start_date, days=7, day_start=time(8, 0)
     arrays of available times, booked times and slots when the vet does
     not work. All times are returned as strings in ``HH:MM`` format.
     """
-    from models.agenda import Appointment, ExamAppointment, VetSchedule
-
-    step = timedelta(minutes=30)
-    weekday_map = ['Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo']
-
-    # Load all schedules for the veterinarian once and group them by weekday.
-    schedules_by_day = {}
-    vet_schedules = VetSchedule.query.filter_by(veterinario_id=veterinario_id).all()
-    for schedule in vet_schedules:
-        schedules_by_day.setdefault(schedule.dia_semana, []).append(schedule)
-
-    # Preload appointments/exams within the requested window so we can
-    # determine slot availability without issuing a query per slot.
-    range_start_local = datetime.combine(start_date, day_start)
-    range_end_local = datetime.combine(start_date + timedelta(days=days), day_end)
-    range_start_utc = normalize_to_utc(range_start_local)
-    range_end_utc = normalize_to_utc(range_end_local)
-
-    appointment_rows = (
-        Appointment.query
-        .filter_by(veterinario_id=veterinario_id)
-        .filter(Appointment.scheduled_at >= range_start_utc)
-        .filter(Appointment.scheduled_at < range_end_utc)
-        .with_entities(Appointment.scheduled_at)
-        .all()
-    )
-    exam_rows = (
-        ExamAppointment.query
-        .filter_by(specialist_id=veterinario_id)
-        .filter(ExamAppointment.scheduled_at >= range_start_utc)
-        .filter(ExamAppointment.scheduled_at < range_end_utc)
-        .with_entities(ExamAppointment.scheduled_at)
-        .all()
-    )
-
-    booked_datetimes = {
-        _to_utc_naive(row[0])
-        for row in appointment_rows + exam_rows
-        if row and row[0] is not None
-    }
-
-    result = []
-
-    for i in range(days):
-        dia = start_date + timedelta(days=i)
-        dia_semana = weekday_map[dia.weekday()]
-        schedules = schedules_by_day.get(dia_semana, [])
-
-        working_slots = set()
-        for schedule in schedules:
-            current = datetime.combine(dia, schedule.hora_inicio)
-            end = datetime.combine(dia, schedule.hora_fim)
-            while current < end:
-                if schedule.intervalo_inicio and schedule.intervalo_fim:
-                    intervalo_inicio = datetime.combine(dia, schedule.intervalo_inicio)
-                    intervalo_fim = datetime.combine(dia, schedule.intervalo_fim)
-                    if intervalo_inicio <= current < intervalo_fim:
-                        current += step
-                        continue
-                working_slots.add(current)
-                current += step
-
-        all_slots = []
-        current = datetime.combine(dia, day_start)
-        end_day = datetime.combine(dia, day_end)
-        while current < end_day:
-            all_slots.append(current)
-            current += step
-
-        available = []
-        booked = []
-        for slot in working_slots:
-            # booked_datetimes contém datetimes UTC naive (_to_utc_naive);
-            # remove o tzinfo para a igualdade funcionar (aware != naive
-            # nunca casa e marcava horário ocupado como disponível).
-            current_utc = normalize_to_utc(slot).replace(tzinfo=None)
-            time_str = slot.strftime('%H:%M')
-            if current_utc in booked_datetimes:
-                booked.append(time_str)
-            else:
-                available.append(time_str)
-
-        not_working = [s.strftime('%H:%M') for s in all_slots if s not in working_slots]
-        result.append(
-            {
-                'date': dia.isoformat(),
-                'available': sorted(available),
-                'booked': sorted(booked),
-                'not_working': sorted(not_working),
-            }
-        )
-
-    return result
+    from services.availability import load_availability, weekly_grid
+
+    if days <= 0:
+        return []
+    end_date = start_date + timedelta(days=days - 1)
+    vet_data = load_availability([veterinario_id], start_date, end_date)[int(veterinario_id)]
+    return [
+        weekly_grid(vet_data, start_date + timedelta(days=i), day_start, day_end)
+        for i in range(days)
+    ]
 
 
 def group_vet_schedules_by_day(schedules):
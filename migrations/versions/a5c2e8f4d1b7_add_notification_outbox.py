@@ -0,0 +1,62 @@
+"""add notification_outbox
+
+Revision ID: a5c2e8f4d1b7
+Revises: f3b9d6a1c8e2
+Create Date: 2026-10-17
+
+Os jobs de lembrete (consultas/exames/vacinas, tratamento, carrinho
+abandonado) enviavam e-mail, WhatsApp e push inline, abrindo uma conexão SMTP
+por mensagem; um SMTP lento travava o agendador e uma queda no meio reenviava
+tudo. Agora eles só enfileiram em notification_outbox, com chave única
+(kind, target, channel, day), e drenadores por canal enviam em lote.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'a5c2e8f4d1b7'
+down_revision = 'f3b9d6a1c8e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if 'notification_outbox' not in tables:
+        op.create_table(
+            'notification_outbox',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('kind', sa.String(length=50), nullable=False),
+            sa.Column('target', sa.String(length=120), nullable=False),
+            sa.Column('channel', sa.String(length=20), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column(
+                'user_id',
+                sa.Integer(),
+                sa.ForeignKey('user.id', ondelete='CASCADE'),
+                nullable=True,
+            ),
+            sa.Column('recipient', sa.String(length=255), nullable=True),
+            sa.Column('subject', sa.String(length=255), nullable=True),
+            sa.Column('body', sa.Text(), nullable=False),
+            sa.Column('url', sa.String(length=255), nullable=True),
+            sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+            sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.Column('sent_at', sa.DateTime(timezone=True), nullable=True),
+            sa.UniqueConstraint('kind', 'target', 'channel', 'day', name='uq_notification_outbox_key'),
+        )
+        op.create_index(
+            'ix_notification_outbox_due',
+            'notification_outbox',
+            ['channel', 'status', 'next_attempt_at'],
+        )
+
+
+def downgrade():
+    op.drop_index('ix_notification_outbox_due', table_name='notification_outbox')
+    op.drop_table('notification_outbox')
@@ -0,0 +1,45 @@
+"""add image_asset
+
+Revision ID: b8d3f1a6c2e9
+Revises: a5c2e8f4d1b7
+Create Date: 2026-10-17
+
+Uploads de imagem ganham derivados responsivos (160/480/1280 px em WebP e
+JPEG) gerados fora do request. image_asset liga a URL exibida ao hash do
+original (guardado uma única vez no storage) e lista os derivados prontos,
+que os templates usam para montar o srcset.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b8d3f1a6c2e9'
+down_revision = 'a5c2e8f4d1b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if 'image_asset' not in tables:
+        op.create_table(
+            'image_asset',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('url', sa.String(length=512), nullable=False),
+            sa.Column('content_hash', sa.String(length=64), nullable=False),
+            sa.Column('original_key', sa.String(length=255), nullable=False),
+            sa.Column('width', sa.Integer(), nullable=True),
+            sa.Column('height', sa.Integer(), nullable=True),
+            sa.Column('variants', sa.JSON(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        )
+        op.create_index('ix_image_asset_url', 'image_asset', ['url'], unique=True)
+        op.create_index('ix_image_asset_content_hash', 'image_asset', ['content_hash'])
+
+
+def downgrade():
+    op.drop_index('ix_image_asset_content_hash', table_name='image_asset')
+    op.drop_index('ix_image_asset_url', table_name='image_asset')
+    op.drop_table('image_asset')
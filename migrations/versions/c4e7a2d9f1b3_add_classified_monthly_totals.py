@@ -0,0 +1,50 @@
+"""add classified_monthly_totals
+
+Revision ID: c4e7a2d9f1b3
+Revises: b8d3f1a6c2e9
+Create Date: 2026-10-17
+
+DRE, fluxo de caixa, painel contábil e impostos somavam classified_transactions
+a cada visualização. classified_monthly_totals guarda soma e quantidade por
+(clínica, mês, categoria), mantidas por deltas a cada escrita; a carga inicial
+sai das transações já classificadas.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c4e7a2d9f1b3'
+down_revision = 'b8d3f1a6c2e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if 'classified_monthly_totals' not in tables:
+        op.create_table(
+            'classified_monthly_totals',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('clinic_id', sa.Integer(), nullable=False),
+            sa.Column('month', sa.Date(), nullable=False),
+            sa.Column('category', sa.String(length=80), nullable=False),
+            sa.Column('total', sa.Numeric(14, 2), nullable=False, server_default='0'),
+            sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.UniqueConstraint('clinic_id', 'month', 'category', name='uq_classified_monthly_total'),
+        )
+        if 'classified_transactions' in tables:
+            op.execute(
+                """
+                INSERT INTO classified_monthly_totals (clinic_id, month, category, total, count, updated_at)
+                SELECT clinic_id, month, category, COALESCE(SUM(value), 0), COUNT(id), CURRENT_TIMESTAMP
+                FROM classified_transactions
+                GROUP BY clinic_id, month, category
+                """
+            )
+
+
+def downgrade():
+    op.drop_table('classified_monthly_totals')
@@ -0,0 +1,150 @@
+"""add normalized search_document to medicamento
+
+Revision ID: c4e8a2f6b1d3
+Revises: a7f1c2d5b83e
+Create Date: 2026-10-17
+
+A busca de medicamentos (/api/bulario/buscar e /buscar_medicamentos) fazia
+ILIKE em nome, principio_ativo e CAST(conteudo_estruturado AS TEXT), repetido
+por token. Agora cada medicamento guarda um documento normalizado (sem
+acentos, caixa baixa) e a busca usa um único índice GIN trigram sobre ele.
+
+O preenchimento inicial roda em lotes por id; escritas seguintes são mantidas
+pelos listeners do modelo.
+"""
+import re
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c4e8a2f6b1d3'
+down_revision = 'a7f1c2d5b83e'
+branch_labels = None
+depends_on = None
+
+
+_INDEX_NAME = 'ix_medicamento_search_document_trgm'
+_LEGACY_INDEX_NAME = 'ix_medicamento_conteudo_estruturado_trgm'
+_BATCH_SIZE = 500
+
+# Cópia congelada de services.medication_search.montar_documento_busca na
+# data desta revisão: a migration não pode depender do código do app, que
+# continua mudando. Documentos gerados por versões mais novas do builder são
+# refeitos com ``flask reindex-medication-search``.
+_SEARCH_DOCUMENT_MAX_CHARS = 20000
+_NEOMICINA_RE = re.compile(r"\bneom?c?icina\b|\bneonicina\b|\bneomicicina\b")
+_ESPACOS_RE = re.compile(r"\s+")
+
+
+def _normalizar(valor) -> str:
+    texto = unicodedata.normalize("NFKD", str(valor or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _NEOMICINA_RE.sub("neomicina", texto)
+
+
+def _textos_conteudo(valor):
+    if isinstance(valor, str):
+        yield valor
+    elif isinstance(valor, dict):
+        for item in valor.values():
+            yield from _textos_conteudo(item)
+    elif isinstance(valor, (list, tuple)):
+        for item in valor:
+            yield from _textos_conteudo(item)
+    elif valor is not None and not isinstance(valor, bool):
+        yield str(valor)
+
+
+def _documento_busca(row) -> str:
+    partes = [row.nome, row.principio_ativo, row.classificacao, row.via_administracao]
+    partes.extend(_textos_conteudo(row.conteudo_estruturado))
+    texto = " ".join(_normalizar(parte) for parte in partes if parte)
+    return _ESPACOS_RE.sub(" ", texto).strip()[:_SEARCH_DOCUMENT_MAX_CHARS]
+
+
+def _has_column(bind, table: str, column: str) -> bool:
+    inspector = sa.inspect(bind)
+    return column in {c['name'] for c in inspector.get_columns(table)}
+
+
+def _has_index(bind, name: str) -> bool:
+    return bool(bind.execute(
+        sa.text("SELECT 1 FROM pg_indexes WHERE indexname = :name"), {'name': name}
+    ).scalar())
+
+
+def _backfill(bind):
+    medicamento = sa.table(
+        'medicamento',
+        sa.column('id', sa.Integer),
+        sa.column('nome', sa.String),
+        sa.column('principio_ativo', sa.String),
+        sa.column('classificacao', sa.String),
+        sa.column('via_administracao', sa.String),
+        sa.column('conteudo_estruturado', sa.JSON),
+        sa.column('search_document', sa.Text),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(
+                medicamento.c.id,
+                medicamento.c.nome,
+                medicamento.c.principio_ativo,
+                medicamento.c.classificacao,
+                medicamento.c.via_administracao,
+                medicamento.c.conteudo_estruturado,
+            )
+            .where(medicamento.c.id > last_id)
+            .order_by(medicamento.c.id)
+            .limit(_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            medicamento.update()
+            .where(medicamento.c.id == sa.bindparam('row_id'))
+            .values(search_document=sa.bindparam('document')),
+            [{'row_id': row.id, 'document': _documento_busca(row)} for row in rows],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade():
+    bind = op.get_bind()
+
+    if not _has_column(bind, 'medicamento', 'search_document'):
+        with op.batch_alter_table('medicamento') as batch:
+            batch.add_column(sa.Column('search_document', sa.Text(), nullable=True))
+
+    _backfill(bind)
+
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        # Substituto do índice trigram sobre CAST(conteudo_estruturado AS text):
+        # o search_document contém o mesmo texto (e nome/princípio/via).
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {_INDEX_NAME} ON medicamento "
+            "USING gin (search_document gin_trgm_ops)"
+        )
+        # Só remove o índice antigo quando o novo existe de fato; sem ele a
+        # busca voltaria a varrer a tabela.
+        if _has_index(bind, _INDEX_NAME):
+            op.execute(f"DROP INDEX IF EXISTS {_LEGACY_INDEX_NAME}")
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {_LEGACY_INDEX_NAME} ON medicamento "
+            "USING gin (CAST(conteudo_estruturado AS text) gin_trgm_ops)"
+        )
+        op.execute(f"DROP INDEX IF EXISTS {_INDEX_NAME}")
+
+    if _has_column(bind, 'medicamento', 'search_document'):
+        with op.batch_alter_table('medicamento') as batch:
+            batch.drop_column('search_document')
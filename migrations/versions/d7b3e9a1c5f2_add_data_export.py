@@ -0,0 +1,50 @@
+"""add data_export
+
+Revision ID: d7b3e9a1c5f2
+Revises: c4e7a2d9f1b3
+Create Date: 2026-10-18
+
+Exportações em background (XMLs fiscais, dados da clínica) marcavam o estado
+com um arquivo ``.part`` no disco local de quem reservou o token — o worker
+Celery gravava o ZIP no disco dele e o link respondia "pending" para sempre.
+data_export guarda o estado e a chave do objeto no storage compartilhado.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd7b3e9a1c5f2'
+down_revision = 'c4e7a2d9f1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if 'data_export' not in tables:
+        op.create_table(
+            'data_export',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('token', sa.String(length=64), nullable=False),
+            sa.Column('kind', sa.String(length=40), nullable=False),
+            sa.Column('owner_id', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(length=20), nullable=False, server_default='pending'),
+            sa.Column('storage_key', sa.String(length=300), nullable=False),
+            sa.Column('size_bytes', sa.BigInteger(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+        )
+        op.create_index('ix_data_export_token', 'data_export', ['token'], unique=True)
+        op.create_index('ix_data_export_owner', 'data_export', ['kind', 'owner_id'])
+        op.create_index('ix_data_export_expires_at', 'data_export', ['expires_at'])
+
+
+def downgrade():
+    op.drop_index('ix_data_export_expires_at', table_name='data_export')
+    op.drop_index('ix_data_export_owner', table_name='data_export')
+    op.drop_index('ix_data_export_token', table_name='data_export')
+    op.drop_table('data_export')
@@ -0,0 +1,36 @@
+"""add cache_version counters for in-process caches
+
+Revision ID: d8b3f1a6c2e9
+Revises: c4e8a2f6b1d3
+Create Date: 2026-10-17
+
+Contador por chave que os caches em memória de cada worker consultam para
+saber quando se descartar (ex.: snapshot do bulário).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd8b3f1a6c2e9'
+down_revision = 'c4e8a2f6b1d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'cache_version' in sa.inspect(bind).get_table_names():
+        return
+    op.create_table(
+        'cache_version',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('key', sa.String(length=80), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_cache_version_key', 'cache_version', ['key'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_cache_version_key', table_name='cache_version')
+    op.drop_table('cache_version')
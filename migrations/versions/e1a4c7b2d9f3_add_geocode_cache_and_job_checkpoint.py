@@ -0,0 +1,52 @@
+"""add geocode_cache and job_checkpoint
+
+Revision ID: e1a4c7b2d9f3
+Revises: d8b3f1a6c2e9
+Create Date: 2026-10-17
+
+geocode_cache guarda endereço normalizado → coordenadas, compartilhado pela
+fila de geocodificação de endereços e pelas rotas da PMO. job_checkpoint
+guarda o cursor de jobs em lote para retomar depois de um restart.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e1a4c7b2d9f3'
+down_revision = 'd8b3f1a6c2e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if 'geocode_cache' not in tables:
+        op.create_table(
+            'geocode_cache',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('address_key', sa.String(length=400), nullable=False),
+            sa.Column('latitude', sa.Float(), nullable=False),
+            sa.Column('longitude', sa.Float(), nullable=False),
+            sa.Column('source', sa.String(length=20), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        )
+        op.create_index('ix_geocode_cache_address_key', 'geocode_cache', ['address_key'], unique=True)
+
+    if 'job_checkpoint' not in tables:
+        op.create_table(
+            'job_checkpoint',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('key', sa.String(length=80), nullable=False),
+            sa.Column('position', sa.BigInteger(), nullable=False, server_default='0'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        )
+        op.create_index('ix_job_checkpoint_key', 'job_checkpoint', ['key'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_job_checkpoint_key', table_name='job_checkpoint')
+    op.drop_table('job_checkpoint')
+    op.drop_index('ix_geocode_cache_address_key', table_name='geocode_cache')
+    op.drop_table('geocode_cache')
@@ -0,0 +1,121 @@
+"""add animal_activity and animal.search_key
+
+Revision ID: f3b9d6a1c8e2
+Revises: e1a4c7b2d9f3
+Create Date: 2026-10-17
+
+/buscar_animais agrupava a agenda inteira (max(scheduled_at) por animal) a
+cada busca para ordenar por "atendidos recentemente", e filtrava com ILIKE em
+nome e microchip. animal_activity guarda a última atividade por animal e
+clínica (clinica_id = 0 para todas), mantida pelo listener de flush de
+Appointment/Consulta; search_key guarda nome + microchip normalizados, com
+índice trigram no Postgres.
+
+search_key é preenchido aqui, em lotes por id. As linhas de animal_activity
+são geradas por ``flask backfill-animal-activity`` depois do deploy.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'f3b9d6a1c8e2'
+down_revision = 'e1a4c7b2d9f3'
+branch_labels = None
+depends_on = None
+
+
+_TRGM_INDEX = 'ix_animal_search_key_trgm'
+_BATCH_SIZE = 500
+
+
+def _has_column(bind, table: str, column: str) -> bool:
+    inspector = sa.inspect(bind)
+    return column in {c['name'] for c in inspector.get_columns(table)}
+
+
+def _backfill_search_key(bind):
+    from models.pacientes import animal_search_key
+
+    animal = sa.table(
+        'animal',
+        sa.column('id', sa.Integer),
+        sa.column('name', sa.String),
+        sa.column('microchip_number', sa.String),
+        sa.column('search_key', sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(animal.c.id, animal.c.name, animal.c.microchip_number)
+            .where(animal.c.id > last_id)
+            .order_by(animal.c.id)
+            .limit(_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        bind.execute(
+            animal.update()
+            .where(animal.c.id == sa.bindparam('row_id'))
+            .values(search_key=sa.bindparam('key')),
+            [
+                {'row_id': row.id, 'key': animal_search_key(row.name, row.microchip_number)}
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+
+def upgrade():
+    bind = op.get_bind()
+    tables = set(sa.inspect(bind).get_table_names())
+
+    if not _has_column(bind, 'animal', 'search_key'):
+        with op.batch_alter_table('animal') as batch:
+            batch.add_column(sa.Column('search_key', sa.String(length=160), nullable=True))
+        op.create_index('ix_animal_search_key', 'animal', ['search_key'])
+
+    _backfill_search_key(bind)
+
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            f"CREATE INDEX IF NOT EXISTS {_TRGM_INDEX} ON animal "
+            "USING gin (search_key gin_trgm_ops)"
+        )
+
+    if 'animal_activity' not in tables:
+        op.create_table(
+            'animal_activity',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column(
+                'animal_id',
+                sa.Integer(),
+                sa.ForeignKey('animal.id', ondelete='CASCADE'),
+                nullable=False,
+            ),
+            sa.Column('clinica_id', sa.Integer(), nullable=False, server_default='0'),
+            sa.Column('last_appointment_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('last_consulta_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+            sa.UniqueConstraint('animal_id', 'clinica_id', name='uq_animal_activity_animal_clinica'),
+        )
+        op.create_index(
+            'ix_animal_activity_clinica_last_appointment',
+            'animal_activity',
+            ['clinica_id', 'last_appointment_at'],
+        )
+
+
+def downgrade():
+    bind = op.get_bind()
+
+    op.drop_index('ix_animal_activity_clinica_last_appointment', table_name='animal_activity')
+    op.drop_table('animal_activity')
+
+    if bind.dialect.name == 'postgresql':
+        op.execute(f"DROP INDEX IF EXISTS {_TRGM_INDEX}")
+
+    if _has_column(bind, 'animal', 'search_key'):
+        op.drop_index('ix_animal_search_key', table_name='animal')
+        with op.batch_alter_table('animal') as batch:
+            batch.drop_column('search_key')
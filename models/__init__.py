@@ -2,7 +2,9 @@
 
 from .base import *  # noqa: F401,F403
 from .clinica import ClinicInternshipCase, ClinicStaff  # noqa: F401
-from .base import CasaDeRacao, CasaDeRacaoHorario, CasaDeRacaoOnboardingInvite, PartnerInvite, StorePaymentAccount, SiteFlag, SiteText  # noqa: F401
+from .base import CacheVersion, CasaDeRacao, CasaDeRacaoHorario, CasaDeRacaoOnboardingInvite, DataExport, ImageAsset, JobCheckpoint, PartnerInvite, StorePaymentAccount, SiteFlag, SiteText  # noqa: F401
+from .pacientes import AnimalActivity  # noqa: F401
+from .comunicacao import NotificationOutbox  # noqa: F401
 from .agenda import AgendaEvento, Appointment, ExamAppointment, PlantaoModelo, PlantonistaEscala, VetSchedule
 from .loja import (
     DeliveryRequest,
@@ -20,6 +22,7 @@ from .loja import (
 )
 from .usuarios import (
     Endereco,
+    GeocodeCacheEntry,
     Specialty,
     User,
     UserRole,
@@ -104,6 +107,7 @@ __all__ = [
     "SavedAddress",
     "Transaction",
     "Endereco",
+    "GeocodeCacheEntry",
     "Specialty",
     "User",
     "UserRole",
@@ -155,12 +159,18 @@ __all__ = [
     "ReferralSignup",
     "SiteFlag",
     "SiteText",
+    "CacheVersion",
+    "DataExport",
+    "JobCheckpoint",
     "WaitlistLead",
     "ProductEvent",
+    "ImageAsset",
     "AdminActionNotification",
+    "AnimalActivity",
     "AnimalHealthRecord",
     "CarteirinhaImportacao",
     "PushSubscription",
+    "NotificationOutbox",
     "RacaoAssinatura",
     "RacaoAssinaturaCiclo",
 ]
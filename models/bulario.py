@@ -70,6 +70,10 @@ class Medicamento(db.Model):
         nullable=False,
     )
 
+    # Texto normalizado (sem acentos, caixa baixa) usado pela busca com índice
+    # trigram. Mantido pelos listeners abaixo; ver services/medication_search.
+    search_document = deferred(db.Column(db.Text))
+
     apresentacoes = db.relationship('ApresentacaoMedicamento', backref='medicamento', cascade='all, delete-orphan')
     doses = db.relationship('DoseMedicamento', backref='medicamento', cascade='all, delete-orphan', order_by='DoseMedicamento.id')
 
@@ -77,6 +81,14 @@ class Medicamento(db.Model):
         return self.nome
 
 
+@event.listens_for(Medicamento, "before_insert")
+@event.listens_for(Medicamento, "before_update")
+def _atualizar_search_document(mapper, connection, target):
+    from services.medication_search import montar_documento_busca
+
+    target.search_document = montar_documento_busca(target)
+
+
 class ApresentacaoMedicamento(db.Model):
     __tablename__ = 'apresentacao_medicamento'
     id = db.Column(db.Integer, primary_key=True)
@@ -155,3 +155,40 @@ class PushSubscription(db.Model):
         backref=db.backref('push_subscriptions', lazy='dynamic', cascade='all, delete-orphan'),
     )
 
+
+
+class NotificationOutbox(db.Model):
+    """Fila transacional de envios (e-mail, WhatsApp, push) dos jobs de lembrete.
+
+    Os jobs só enfileiram, na mesma transação do próprio trabalho; os
+    drenadores por canal (``services.notification_outbox``) enviam em lote e
+    guardam aqui tentativas e próximo horário. A chave (kind, target, channel,
+    day) garante no máximo um envio por dia mesmo se o job rodar de novo.
+    """
+
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.UniqueConstraint(
+            'kind', 'target', 'channel', 'day',
+            name='uq_notification_outbox_key',
+        ),
+        db.Index('ix_notification_outbox_due', 'channel', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    # Entidade que originou o envio, ex.: 'appointment:42'.
+    target = db.Column(db.String(120), nullable=False)
+    channel = db.Column(db.String(20), nullable=False)  # 'email' | 'whatsapp' | 'push'
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
+    recipient = db.Column(db.String(255), nullable=True)  # e-mail ou 'whatsapp:+55...'
+    subject = db.Column(db.String(255), nullable=True)
+    body = db.Column(db.Text, nullable=False)
+    url = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending | sent | dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime(timezone=True), nullable=True)
@@ -20,7 +20,7 @@ import uuid
 from sqlalchemy import Enum, event, func, case, inspect
 from enum import Enum
 from sqlalchemy import Enum as PgEnum
-from sqlalchemy.orm import synonym, object_session, deferred, validates
+from sqlalchemy.orm import Session as SASession, synonym, object_session, deferred, validates
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.exc import OperationalError, ProgrammingError
 from cryptography.fernet import InvalidToken
@@ -215,13 +215,24 @@ class ClassifiedTransaction(db.Model):
     )
 
     id = db.Column(db.Integer, primary_key=True)
-    clinic_id = db.Column(db.Integer, db.ForeignKey('clinica.id'), nullable=False, index=True)
+    # active_history: o valor antigo precisa estar carregado para o delta em
+    # ClassifiedMonthlyTotal mesmo quando o atributo foi expirado antes do set.
+    clinic_id = db.column_property(
+        db.Column(db.Integer, db.ForeignKey('clinica.id'), nullable=False, index=True),
+        active_history=True,
+    )
     date = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
-    month = db.Column(db.Date, nullable=False, index=True)
+    month = db.column_property(db.Column(db.Date, nullable=False, index=True), active_history=True)
     origin = db.Column(db.String(50), nullable=False)
     description = db.Column(db.String(255), nullable=False)
-    value = db.Column(db.Numeric(14, 2), nullable=False, default=Decimal('0.00'))
-    category = db.Column(db.String(80), nullable=False, index=True)
+    value = db.column_property(
+        db.Column(db.Numeric(14, 2), nullable=False, default=Decimal('0.00')),
+        active_history=True,
+    )
+    category = db.column_property(
+        db.Column(db.String(80), nullable=False, index=True),
+        active_history=True,
+    )
     subcategory = db.Column(db.String(80), nullable=True)
     raw_id = db.Column(db.String(80), nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), default=now_in_brazil, nullable=False)
@@ -235,6 +246,129 @@ class ClassifiedTransaction(db.Model):
         return f"<{self.origin} {self.category} R$ {self.value}>"
 
 
+class ClassifiedMonthlyTotal(db.Model):
+    """Soma e quantidade de ``ClassifiedTransaction`` por clínica, mês e categoria.
+
+    Mantida por deltas na mesma transação de quem grava as transações: o
+    ``after_flush`` abaixo cobre as escritas pelo ORM e o upsert em lote de
+    ``services.finance`` aplica os seus. ``flask reconcile-classified-totals``
+    confere contra as somas brutas e corrige divergências.
+    """
+
+    __tablename__ = 'classified_monthly_totals'
+    __table_args__ = (
+        db.UniqueConstraint('clinic_id', 'month', 'category', name='uq_classified_monthly_total'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Sem FK: a linha pode receber o delta negativo no mesmo flush que apaga a clínica.
+    clinic_id = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Date, nullable=False)
+    category = db.Column(db.String(80), nullable=False)
+    total = db.Column(db.Numeric(14, 2), nullable=False, default=Decimal('0.00'))
+    count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+
+
+_TOTALS_SESSION_KEY = 'classified_totals_previous'
+
+
+def _classified_total_key(obj, previous=False):
+    state = inspect(obj)
+    values = []
+    for name in ('clinic_id', 'month', 'category', 'value'):
+        history = state.attrs[name].history
+        if previous and history.deleted:
+            values.append(history.deleted[0])
+        else:
+            values.append(getattr(obj, name))
+    clinic_id, month, category, value = values
+    return (clinic_id, month, category), Decimal(value or 0)
+
+
+def apply_classified_total_deltas(connection, deltas):
+    """Soma ``{(clinic_id, month, category): (valor, quantidade)}`` aos totais."""
+    rows = [
+        {'clinic_id': key[0], 'month': key[1], 'category': key[2], 'total': value, 'count': count}
+        for key, (value, count) in deltas.items()
+        if key[0] is not None and (value or count)
+    ]
+    if not rows:
+        return 0
+
+    table = ClassifiedMonthlyTotal.__table__
+    now = utcnow()
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table).values([dict(row, updated_at=now) for row in rows])
+        statement = statement.on_conflict_do_update(
+            index_elements=['clinic_id', 'month', 'category'],
+            set_={
+                'total': table.c.total + statement.excluded.total,
+                'count': table.c.count + statement.excluded.count,
+                'updated_at': statement.excluded.updated_at,
+            },
+        )
+        connection.execute(statement)
+        return len(rows)
+
+    for row in rows:  # pragma: no cover - bancos sem upsert nativo
+        updated = connection.execute(
+            table.update()
+            .where(table.c.clinic_id == row['clinic_id'])
+            .where(table.c.month == row['month'])
+            .where(table.c.category == row['category'])
+            .values(total=table.c.total + row['total'], count=table.c.count + row['count'], updated_at=now)
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert().values(**row, updated_at=now))
+    return len(rows)
+
+
+@event.listens_for(SASession, 'before_flush')
+def _remember_classified_totals_before_flush(session, flush_context, instances):
+    previous = {}
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, ClassifiedTransaction) or obj in session.new:
+            continue
+        state = inspect(obj)
+        if state.transient or state.pending:
+            continue
+        if obj in session.dirty and not any(
+            state.attrs[name].history.has_changes() for name in ('clinic_id', 'month', 'category', 'value')
+        ):
+            continue
+        previous[id(obj)] = (obj, _classified_total_key(obj, previous=True))
+    # Sempre sobrescreve: um flush que falhou não pode deixar deltas para o próximo.
+    session.info[_TOTALS_SESSION_KEY] = previous
+
+
+@event.listens_for(SASession, 'after_flush')
+def _apply_classified_totals_after_flush(session, flush_context):
+    previous = session.info.pop(_TOTALS_SESSION_KEY, {})
+    deltas = {}
+
+    def _add(key, value, count):
+        current_value, current_count = deltas.get(key, (Decimal('0'), 0))
+        deltas[key] = (current_value + value, current_count + count)
+
+    for obj, (key, value) in previous.values():
+        _add(key, -value, -1)
+        if obj not in session.deleted:
+            new_key, new_value = _classified_total_key(obj)
+            _add(new_key, new_value, 1)
+    for obj in session.new:
+        if isinstance(obj, ClassifiedTransaction):
+            key, value = _classified_total_key(obj)
+            _add(key, value, 1)
+    if deltas:
+        apply_classified_total_deltas(session.connection(), deltas)
+
+
 class AccountingAccount(db.Model):
     __tablename__ = 'accounting_accounts'
     __table_args__ = (
@@ -338,11 +472,12 @@ class PJPayment(db.Model):
     )
     observacoes = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), nullable=False, default=now_in_brazil)
+    # UTC, como as demais colunas lidas pelo watermark da classificação em lote.
     updated_at = db.Column(
         db.DateTime(timezone=True),
         nullable=False,
-        default=now_in_brazil,
-        onupdate=now_in_brazil,
+        default=utcnow,
+        onupdate=utcnow,
     )
 
     clinica_id = synonym('clinic_id')
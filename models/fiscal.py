@@ -24,6 +24,21 @@ from security.crypto import (
 )
 
 
+def decrypt_fiscal_xml(clinic_id, blob):
+    """Decifra um XML fiscal sem carregar o ``FiscalDocument`` inteiro.
+
+    Ver o comentário de ``FiscalDocument._decrypt_xml`` sobre o fallback.
+    """
+    if not blob:
+        return blob
+    try:
+        return decrypt_text_for_clinic(clinic_id, blob)
+    except InvalidToken:
+        return blob
+    except MissingMasterKeyError:
+        raise
+
+
 class FiscalDocumentStatus(enum.Enum):
     DRAFT = "DRAFT"
     QUEUED = "QUEUED"
@@ -190,14 +205,7 @@ class FiscalDocument(db.Model):
     # script vai migrar depois. MissingMasterKeyError NÃO é engolida: sem
     # chave mestra, queremos barulho em produção, não silêncio.
     def _decrypt_xml(self, blob):
-        if not blob:
-            return blob
-        try:
-            return decrypt_text_for_clinic(self.clinic_id, blob)
-        except InvalidToken:
-            return blob
-        except MissingMasterKeyError:
-            raise
+        return decrypt_fiscal_xml(self.clinic_id, blob)
 
     def _encrypt_xml_for_set(self, value):
         if not value:
@@ -197,13 +197,19 @@ def product_category_choices():
 
 
 def product_category_map():
-    """Mapa slug -> ProductCategory, cacheado por requisição (evita N+1)."""
+    """Mapa slug -> categoria, cacheado por requisição (evita N+1).
+
+    Lido das facetas em cache do catálogo (``services.catalog_facets``), que
+    já carregam as categorias ativas e são invalidadas quando elas mudam.
+    """
     from flask import g, has_request_context
+    from services.catalog_facets import catalog_facets
+
     if has_request_context():
         cached = getattr(g, "_product_category_map", None)
         if cached is not None:
             return cached
-    mapping = {c.slug: c for c in get_active_product_categories()}
+    mapping = {c.slug: c for c in catalog_facets().categories}
     if has_request_context():
         try:
             g._product_category_map = mapping
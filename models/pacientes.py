@@ -17,10 +17,11 @@ from decimal import Decimal, ROUND_CEILING
 import unicodedata
 import enum
 import uuid
+from itertools import chain
 from sqlalchemy import Enum, event, func, case, inspect
 from enum import Enum
 from sqlalchemy import Enum as PgEnum
-from sqlalchemy.orm import synonym, object_session, deferred, validates
+from sqlalchemy.orm import Session, synonym, object_session, deferred, validates
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.exc import OperationalError, ProgrammingError
 from cryptography.fernet import InvalidToken
@@ -80,6 +81,9 @@ class Animal(db.Model):
     favorites = db.relationship('Favorite', backref='animal', cascade='all, delete-orphan', lazy=True)
 
     microchip_number = db.Column(db.String(50), nullable=True)
+    # Nome + microchip sem acento e em minúsculas (ver animal_search_key);
+    # recalculado a cada gravação e usado no filtro de /buscar_animais.
+    search_key = db.Column(db.String(160), nullable=True, index=True)
     neutered = db.Column(db.Boolean, default=False)
     health_plan = db.Column(db.String(100), nullable=True)
 
@@ -387,14 +391,155 @@ def _format_age_label(number, unit):
 # Partículas de nomes pt-BR que permanecem minúsculas (exceto como 1ª palavra)
 
 
+def animal_search_key(*parts):
+    """Texto de busca: sem acentos, minúsculo e com espaços simples."""
+    text = " ".join(str(part) for part in parts if part)
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(text.lower().split())
+
+
 @event.listens_for(Animal, "before_insert")
 def _normalize_animal_name_before_insert(mapper, connection, target):
     _normalize_model_name(target)
+    target.search_key = animal_search_key(target.name, target.microchip_number)
 
 
 @event.listens_for(Animal, "before_update")
 def _normalize_animal_name_before_update(mapper, connection, target):
     _normalize_model_name(target)
+    target.search_key = animal_search_key(target.name, target.microchip_number)
+
+
+class AnimalActivity(db.Model):
+    """Última atividade por animal e clínica, desnormalizada para a busca.
+
+    ``clinica_id = 0`` guarda o agregado de todas as clínicas. As linhas são
+    recalculadas no ``after_flush`` de qualquer sessão que grave ``Appointment``
+    ou ``Consulta``; ``flask backfill-animal-activity`` reconstrói tudo.
+    """
+
+    __tablename__ = 'animal_activity'
+    __table_args__ = (
+        db.UniqueConstraint('animal_id', 'clinica_id', name='uq_animal_activity_animal_clinica'),
+        db.Index('ix_animal_activity_clinica_last_appointment', 'clinica_id', 'last_appointment_at'),
+    )
+
+    ALL_CLINICS = 0
+
+    id = db.Column(db.Integer, primary_key=True)
+    animal_id = db.Column(
+        db.Integer,
+        db.ForeignKey('animal.id', ondelete='CASCADE'),
+        nullable=False,
+    )
+    clinica_id = db.Column(db.Integer, nullable=False, default=ALL_CLINICS)
+    last_appointment_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    last_consulta_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    updated_at = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+
+
+# tabela -> (coluna de data, campo em AnimalActivity)
+_ACTIVITY_SOURCES = {
+    'appointment': ('scheduled_at', 'last_appointment_at'),
+    'consulta': ('created_at', 'last_consulta_at'),
+}
+_ACTIVITY_CHUNK = 500
+
+
+def refresh_animal_activity(connection, animal_ids):
+    """Recalcula as linhas de ``animal_activity`` dos animais informados.
+
+    Duas agregações (agenda e consultas) restritas aos ids; as linhas novas
+    entram por upsert na chave ``(animal_id, clinica_id)`` — duas sessões
+    gravando o mesmo animal não colidem na constraint única — e só as linhas
+    que deixaram de existir são apagadas. Retorna quantas linhas foram gravadas.
+    """
+    ids = sorted({int(animal_id) for animal_id in animal_ids if animal_id})
+    if not ids:
+        return 0
+
+    rows = {}
+    for start in range(0, len(ids), _ACTIVITY_CHUNK):
+        chunk = ids[start:start + _ACTIVITY_CHUNK]
+        for table_name, (date_column, field) in _ACTIVITY_SOURCES.items():
+            source = db.metadata.tables[table_name]
+            query = (
+                db.select(source.c.animal_id, source.c.clinica_id, func.max(source.c[date_column]))
+                .where(source.c.animal_id.in_(chunk))
+                .group_by(source.c.animal_id, source.c.clinica_id)
+            )
+            for animal_id, clinica_id, last_at in connection.execute(query):
+                if last_at is None:
+                    continue
+                scopes = {AnimalActivity.ALL_CLINICS, clinica_id or AnimalActivity.ALL_CLINICS}
+                for scope in scopes:
+                    row = rows.setdefault((animal_id, scope), {
+                        'animal_id': animal_id,
+                        'clinica_id': scope,
+                        'last_appointment_at': None,
+                        'last_consulta_at': None,
+                    })
+                    if row[field] is None or last_at > row[field]:
+                        row[field] = last_at
+
+    table = AnimalActivity.__table__
+    stale = [
+        row_id
+        for row_id, animal_id, clinica_id in connection.execute(
+            db.select(table.c.id, table.c.animal_id, table.c.clinica_id).where(table.c.animal_id.in_(ids))
+        )
+        if (animal_id, clinica_id) not in rows
+    ]
+    if stale:
+        connection.execute(table.delete().where(table.c.id.in_(stale)))
+    if rows:
+        _upsert_animal_activity(connection, [dict(row, updated_at=utcnow()) for row in rows.values()])
+    return len(rows)
+
+
+def _upsert_animal_activity(connection, rows):
+    table = AnimalActivity.__table__
+    fields = ('last_appointment_at', 'last_consulta_at', 'updated_at')
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=['animal_id', 'clinica_id'],
+            set_={field: statement.excluded[field] for field in fields},
+        )
+        connection.execute(statement)
+        return
+
+    for row in rows:  # pragma: no cover - bancos sem upsert nativo
+        updated = connection.execute(
+            table.update()
+            .where(table.c.animal_id == row['animal_id'])
+            .where(table.c.clinica_id == row['clinica_id'])
+            .values({field: row[field] for field in fields})
+        )
+        if not updated.rowcount:
+            connection.execute(table.insert().values(row))
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_animal_activity_after_flush(session, flush_context):
+    animal_ids = set()
+    for obj in chain(session.new, session.dirty, session.deleted):
+        source = _ACTIVITY_SOURCES.get(getattr(obj, '__tablename__', None))
+        if source is None:
+            continue
+        state = inspect(obj)
+        tracked = ('animal_id', 'clinica_id', source[0])
+        if obj in session.dirty and not any(state.attrs[name].history.has_changes() for name in tracked):
+            continue
+        animal_ids.update(state.attrs.animal_id.history.sum())
+    if animal_ids:
+        refresh_animal_activity(session.connection(), animal_ids)
 
 
 # ──────────────────── Serviço de Vacinas Pagas ────────────────────
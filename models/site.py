@@ -118,6 +118,150 @@ class SiteText(db.Model):
         return row
 
 
+class CacheVersion(db.Model):
+    """Contador de versão compartilhado entre workers para caches em memória.
+
+    Cada cache de processo (ex.: snapshot do bulário) guarda a versão com que
+    foi montado e se descarta quando o contador no banco avança. Quem escreve
+    nos dados de origem chama :meth:`bump`.
+    """
+
+    __tablename__ = 'cache_version'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(80), unique=True, nullable=False, index=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=utcnow,
+        onupdate=utcnow,
+        nullable=False,
+    )
+
+    @classmethod
+    def get(cls, key: str) -> int:
+        try:
+            value = db.session.query(cls.version).filter_by(key=key).scalar()
+            return int(value or 0)
+        except Exception:
+            db.session.rollback()
+            return 0
+
+    @classmethod
+    def bump(cls, key: str) -> int:
+        """Incrementa a versão de ``key`` de forma atômica e faz commit."""
+        from sqlalchemy.exc import IntegrityError
+
+        def _increment():
+            return (
+                cls.query.filter_by(key=key)
+                .update({cls.version: cls.version + 1, cls.updated_at: utcnow()}, synchronize_session=False)
+            )
+
+        if not _increment():
+            db.session.add(cls(key=key, version=1))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Outro worker criou a linha entre o UPDATE e o INSERT.
+            db.session.rollback()
+            _increment()
+            db.session.commit()
+        return cls.get(key)
+
+    @classmethod
+    def bump_after_commit(cls, keys) -> None:
+        """Incrementa ``keys`` numa conexão própria, fora da sessão.
+
+        Para listeners ``after_commit``: a sessão já comitou e não pode emitir
+        SQL. Erros sobem para o chamador decidir se loga.
+        """
+        from sqlalchemy.exc import IntegrityError
+
+        table = cls.__table__
+
+        def _increment(conn, key):
+            return conn.execute(
+                table.update()
+                .where(table.c.key == key)
+                .values(version=table.c.version + 1, updated_at=utcnow())
+            ).rowcount
+
+        for key in sorted(set(keys)):
+            with db.engine.begin() as conn:
+                if _increment(conn, key):
+                    continue
+                try:
+                    with conn.begin_nested():
+                        conn.execute(table.insert().values(key=key, version=1, updated_at=utcnow()))
+                except IntegrityError:
+                    # Outro worker criou a linha entre o UPDATE e o INSERT.
+                    _increment(conn, key)
+
+
+class JobCheckpoint(db.Model):
+    """Cursor persistido de jobs em lote (ex.: último id processado).
+
+    Permite retomar um job longo de onde parou depois de um restart. ``set``
+    não faz commit: o cursor deve ser gravado na mesma transação do lote.
+    """
+
+    __tablename__ = 'job_checkpoint'
+
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(80), unique=True, nullable=False, index=True)
+    position = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=utcnow,
+        onupdate=utcnow,
+        nullable=False,
+    )
+
+    @classmethod
+    def get(cls, key: str) -> int:
+        value = db.session.query(cls.position).filter_by(key=key).scalar()
+        return int(value or 0)
+
+    @classmethod
+    def set(cls, key: str, position: int) -> None:
+        row = cls.query.filter_by(key=key).first()
+        if row is None:
+            db.session.add(cls(key=key, position=position))
+        else:
+            row.position = position
+
+
+class DataExport(db.Model):
+    """Estado de uma exportação gerada em background (ZIP baixado por token).
+
+    A linha é o ponto de encontro entre o web dyno, que reserva o token e
+    responde o link, e o worker que grava o arquivo: os dois leem o estado
+    daqui, nunca do disco local. ``storage_key`` aponta para o objeto no
+    storage compartilhado (ver ``services.data_export``).
+    """
+
+    __tablename__ = 'data_export'
+    __table_args__ = (
+        db.Index('ix_data_export_owner', 'kind', 'owner_id'),
+    )
+
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    token = db.Column(db.String(64), unique=True, nullable=False, index=True)
+    kind = db.Column(db.String(40), nullable=False)
+    owner_id = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=PENDING)
+    storage_key = db.Column(db.String(300), nullable=False)
+    size_bytes = db.Column(db.BigInteger, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
+    expires_at = db.Column(db.DateTime(timezone=True), nullable=False, index=True)
+
 
 class WaitlistLead(db.Model):
     """Interesse registrado numa funcionalidade ainda não publicada.
@@ -180,3 +324,24 @@ class ProductEvent(db.Model):
     )
 
     user = db.relationship('User')
+
+
+class ImageAsset(db.Model):
+    """Derivados responsivos de uma imagem enviada (ver services.image_pipeline).
+
+    Uma linha por URL exibida; ``content_hash`` é o sha256 do arquivo original,
+    guardado uma única vez em ``original_key``. ``variants`` é a lista
+    ``[{"w": 160, "webp": url, "jpeg": url}, ...]`` em ordem crescente — só é
+    gravada quando todos os derivados já estão no storage.
+    """
+
+    __tablename__ = 'image_asset'
+
+    id = db.Column(db.Integer, primary_key=True)
+    url = db.Column(db.String(512), unique=True, nullable=False, index=True)
+    content_hash = db.Column(db.String(64), nullable=False, index=True)
+    original_key = db.Column(db.String(255), nullable=False)
+    width = db.Column(db.Integer, nullable=True)
+    height = db.Column(db.Integer, nullable=True)
+    variants = db.Column(db.JSON, nullable=False, default=list)
+    created_at = db.Column(db.DateTime(timezone=True), default=utcnow, nullable=False)
@@ -95,6 +95,28 @@ class Endereco(db.Model):
         return " – ".join(partes)
 
 
+class GeocodeCacheEntry(db.Model):
+    """Coordenadas já resolvidas por endereço normalizado.
+
+    Compartilhado pela fila de geocodificação de ``Endereco`` e pelas rotas da
+    PMO (ver ``services.geocoding``). Só guarda resultados encontrados.
+    """
+
+    __tablename__ = 'geocode_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    address_key = db.Column(db.String(400), unique=True, nullable=False, index=True)
+    latitude = db.Column(db.Float, nullable=False)
+    longitude = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(20), nullable=True)  # 'endereco' | 'pmo'
+    updated_at = db.Column(
+        db.DateTime(timezone=True),
+        default=utcnow,
+        onupdate=utcnow,
+        nullable=False,
+    )
+
+
 class UserRole(enum.Enum):
     tutor = 'tutor'
     adotante = 'adotante'
@@ -0,0 +1,155 @@
+"""Sessões mTLS reaproveitáveis e cache do certificado A1 já parseado.
+
+Os clientes fiscais (NFS-e Nacional/Betha, NF-e SEFAZ) abriam uma
+``requests.Session`` nova a cada chamada, convertendo o PFX em PEM temporário
+no disco: cada emissão ou consulta pagava parse do PKCS#12, escrita em disco e
+um handshake TLS completo. Os assinadores XML também reparseavam o PFX a cada
+documento.
+
+Aqui ficam:
+
+* ``load_pkcs12`` — parse do PKCS#12 com cache LRU em memória, chaveado pelo
+  sha256 do conteúdo + senha (um certificado novo nunca colide com o antigo);
+* ``MtlsSessionPool`` — uma sessão keep-alive por emissor. O certificado é
+  carregado num ``SSLContext`` e os PEMs temporários são apagados logo em
+  seguida; as conexões do pool do urllib3 reaproveitam o handshake.
+
+A troca do certificado de um emissor é detectada pelo digest do PFX; a camada
+de serviço também invalida explicitamente quando um ``FiscalCertificate`` muda.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+import requests
+from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat, pkcs12
+from requests.adapters import HTTPAdapter
+from urllib3.util.ssl_ import create_urllib3_context
+
+PKCS12_CACHE_SIZE = 32
+DEFAULT_POOL_MAXSIZE = 4
+
+_parsed: OrderedDict[str, tuple[Any, Any, list]] = OrderedDict()
+_parsed_lock = threading.Lock()
+
+
+def _digest(pfx_bytes: bytes, password: str | None) -> str:
+    digest = hashlib.sha256(pfx_bytes)
+    digest.update(b"\0")
+    digest.update((password or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_pkcs12(pfx_bytes: bytes, password: str | None) -> tuple[Any, Any, list]:
+    """``pkcs12.load_key_and_certificates`` com cache por conteúdo."""
+    key = _digest(pfx_bytes, password)
+    with _parsed_lock:
+        cached = _parsed.get(key)
+        if cached is not None:
+            _parsed.move_to_end(key)
+            return cached
+    password_bytes = password.encode("utf-8") if password else None
+    private_key, certificate, additional = pkcs12.load_key_and_certificates(pfx_bytes, password_bytes)
+    parsed = (private_key, certificate, list(additional or []))
+    with _parsed_lock:
+        _parsed[key] = parsed
+        while len(_parsed) > PKCS12_CACHE_SIZE:
+            _parsed.popitem(last=False)
+    return parsed
+
+
+def clear_pkcs12_cache() -> None:
+    with _parsed_lock:
+        _parsed.clear()
+
+
+def pkcs12_to_pem(pfx_bytes: bytes, password: str | None) -> tuple[bytes, bytes]:
+    """Cadeia de certificados e chave privada em PEM (chave sem senha)."""
+    private_key, certificate, additional = load_pkcs12(pfx_bytes, password)
+    if private_key is None or certificate is None:
+        raise ValueError("Certificado A1 inválido para conexão TLS.")
+    key_pem = private_key.private_bytes(
+        encoding=Encoding.PEM,
+        format=PrivateFormat.PKCS8,
+        encryption_algorithm=NoEncryption(),
+    )
+    cert_pem = b"".join(cert.public_bytes(Encoding.PEM) for cert in [certificate, *additional])
+    return cert_pem, key_pem
+
+
+class ClientCertAdapter(HTTPAdapter):
+    """``HTTPAdapter`` com o certificado do cliente já carregado no contexto TLS."""
+
+    def __init__(self, pfx_bytes: bytes, password: str | None, **kwargs):
+        self._ssl_context = create_urllib3_context()
+        cert_pem, key_pem = pkcs12_to_pem(pfx_bytes, password)
+        paths = []
+        try:
+            for content in (cert_pem, key_pem):
+                handle = tempfile.NamedTemporaryFile(delete=False)
+                paths.append(handle.name)
+                with handle:
+                    handle.write(content)
+            self._ssl_context.load_cert_chain(*paths)
+        finally:
+            for path in paths:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    continue
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = self._ssl_context
+        return super().init_poolmanager(*args, **kwargs)
+
+    def proxy_manager_for(self, *args, **kwargs):
+        kwargs["ssl_context"] = self._ssl_context
+        return super().proxy_manager_for(*args, **kwargs)
+
+
+class MtlsSessionPool:
+    """Uma ``requests.Session`` com mTLS por chave (em geral, o emissor fiscal)."""
+
+    def __init__(self, *, pool_maxsize: int = DEFAULT_POOL_MAXSIZE):
+        self._pool_maxsize = pool_maxsize
+        self._sessions: dict[Hashable, tuple[str, requests.Session]] = {}
+        self._lock = threading.Lock()
+
+    def session(self, key: Hashable, pfx_bytes: bytes, password: str | None) -> requests.Session:
+        digest = _digest(pfx_bytes, password)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and entry[0] == digest:
+                return entry[1]
+            session = requests.Session()
+            adapter = ClientCertAdapter(pfx_bytes, password, pool_maxsize=self._pool_maxsize)
+            session.mount("https://", adapter)
+            self._sessions[key] = (digest, session)
+        if entry is not None:
+            entry[1].close()
+        return session
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+        if entry is not None:
+            entry[1].close()
+
+    def clear(self) -> None:
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions.clear()
+        for _digest_value, session in entries:
+            session.close()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+fiscal_session_pool = MtlsSessionPool()
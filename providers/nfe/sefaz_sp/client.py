@@ -4,20 +4,29 @@ from __future__ import annotations
 from contextlib import contextmanager
 from dataclasses import dataclass
 import logging
-import os
-import tempfile
-from typing import Any, Optional
-
-from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat, pkcs12
-from zeep import Client, Settings
-from zeep.exceptions import Fault, TransportError, XMLSyntaxError as ZeepXMLSyntaxError
-from zeep.plugins import HistoryPlugin
-from zeep.transports import Transport
+from typing import Any, Hashable, Optional
+
 import requests
 
+from providers.fiscal.mtls import ClientCertAdapter, MtlsSessionPool
+
 
 logger = logging.getLogger(__name__)
 
+# WSDL/XSD baixados ficam em memória: cada chamada só refaz o parse.
+# Zeep (e o lxml por trás) só é importado na primeira chamada SOAP: o import
+# do app não paga por um SDK que só o fluxo fiscal usa.
+_WSDL_CACHE = None
+
+
+def _wsdl_cache():
+    global _WSDL_CACHE
+    if _WSDL_CACHE is None:
+        from zeep.cache import InMemoryCache
+
+        _WSDL_CACHE = InMemoryCache(timeout=3600)
+    return _WSDL_CACHE
+
 
 @dataclass
 class SefazSoapResponse:
@@ -59,29 +68,46 @@ class SefazSpNfeClient:
         pfx_bytes: Optional[bytes] = None,
         pfx_password: Optional[str] = None,
         timeout: int = 30,
+        session_pool: Optional[MtlsSessionPool] = None,
+        pool_key: Hashable | None = None,
     ) -> None:
         self.wsdl_config = wsdl_config
         self.pfx_bytes = pfx_bytes
         self.pfx_password = pfx_password
         self.timeout = timeout
+        self.session_pool = session_pool
+        self.pool_key = pool_key
 
     @contextmanager
     def _transport(self):
+        from zeep.plugins import HistoryPlugin
+        from zeep.transports import Transport
+
         history = HistoryPlugin()
-        session = requests.Session()
-        session.timeout = self.timeout
-        cert_files = None
-        if self.pfx_bytes:
-            cert_files = _pfx_to_temp_pem(self.pfx_bytes, self.pfx_password)
-            session.cert = cert_files
-        transport = Transport(session=session)
+        pooled = bool(self.pfx_bytes) and self.session_pool is not None
+        if pooled:
+            session = self.session_pool.session(self.pool_key, self.pfx_bytes, self.pfx_password)
+        else:
+            session = requests.Session()
+            if self.pfx_bytes:
+                session.mount("https://", ClientCertAdapter(self.pfx_bytes, self.pfx_password))
+        # Timeout por request: a sessão do pool é compartilhada entre clientes.
+        transport = Transport(
+            session=session,
+            cache=_wsdl_cache(),
+            timeout=self.timeout,
+            operation_timeout=self.timeout,
+        )
         try:
             yield history, transport
         finally:
-            if cert_files:
-                _cleanup_cert_files(cert_files)
+            if not pooled:
+                session.close()
 
     def _call(self, wsdl: str, operation: str, payload: dict[str, Any]) -> SefazSoapResponse:
+        from zeep import Client, Settings
+        from zeep.exceptions import Fault, TransportError, XMLSyntaxError as ZeepXMLSyntaxError
+
         with self._transport() as (history, transport):
             client = Client(
                 wsdl=wsdl,
@@ -142,6 +168,9 @@ class SefazSpNfeClient:
         # test_connection é o ponto onde o usuário clica "testar certificado"
         # no onboarding. Se algo estourar aqui e não logarmos, a UI mostra
         # só "Erro inesperado" e o suporte fica cego.
+        from zeep import Client
+        from zeep.exceptions import TransportError, XMLSyntaxError as ZeepXMLSyntaxError
+
         try:
             Client(wsdl=self.wsdl_config.autorizacao)
             return SefazSoapResponse(True, None, None, None)
@@ -168,38 +197,3 @@ def _history_xml(history_item) -> str | None:
     # lxml _Element ou string: devolve como está.
     return str(envelope) if not isinstance(envelope, str) else envelope
 
-
-def _pfx_to_temp_pem(pfx_bytes: bytes, password: str | None) -> tuple[str, str]:
-    password_bytes = password.encode("utf-8") if password else None
-    private_key, certificate, additional = pkcs12.load_key_and_certificates(
-        pfx_bytes,
-        password_bytes,
-    )
-    if private_key is None or certificate is None:
-        raise ValueError("Certificado A1 inválido para conexão TLS.")
-
-    key_pem = private_key.private_bytes(
-        encoding=Encoding.PEM,
-        format=PrivateFormat.PKCS8,
-        encryption_algorithm=NoEncryption(),
-    )
-    cert_chain = [certificate] + list(additional or [])
-    cert_pem = b"".join(cert.public_bytes(Encoding.PEM) for cert in cert_chain)
-
-    cert_file = tempfile.NamedTemporaryFile(delete=False)
-    key_file = tempfile.NamedTemporaryFile(delete=False)
-    cert_file.write(cert_pem)
-    key_file.write(key_pem)
-    cert_file.flush()
-    key_file.flush()
-    cert_file.close()
-    key_file.close()
-    return cert_file.name, key_file.name
-
-
-def _cleanup_cert_files(cert_files: tuple[str, str]) -> None:
-    for path in cert_files:
-        try:
-            os.unlink(path)
-        except FileNotFoundError:
-            continue
@@ -6,14 +6,12 @@ from dataclasses import dataclass
 import base64
 import gzip
 import json
-import os
-import tempfile
-from typing import Any, Optional
+from typing import Any, Hashable, Optional
 
-from cryptography.hazmat.primitives.serialization import Encoding, PrivateFormat, NoEncryption, pkcs12
 from lxml import etree
 import requests
 
+from providers.fiscal.mtls import ClientCertAdapter, MtlsSessionPool
 from security.xml_safe import safe_lxml_fromstring
 
 
@@ -139,10 +137,15 @@ class NacionalNfseClient:
         *,
         pfx_bytes: Optional[bytes] = None,
         pfx_password: Optional[str] = None,
+        session_pool: Optional[MtlsSessionPool] = None,
+        pool_key: Hashable | None = None,
     ) -> None:
         self.config = config
         self.pfx_bytes = pfx_bytes
         self.pfx_password = pfx_password
+        # Com pool, a sessão keep-alive do emissor sobrevive entre chamadas.
+        self.session_pool = session_pool
+        self.pool_key = pool_key
 
     @property
     def base_url(self) -> str:
@@ -153,17 +156,16 @@ class NacionalNfseClient:
 
     @contextmanager
     def _session(self):
+        if self.pfx_bytes and self.session_pool is not None:
+            yield self.session_pool.session(self.pool_key, self.pfx_bytes, self.pfx_password)
+            return
         session = requests.Session()
-        cert_files = None
         if self.pfx_bytes:
-            cert_files = _pfx_to_temp_pem(self.pfx_bytes, self.pfx_password)
-            session.cert = cert_files
+            session.mount("https://", ClientCertAdapter(self.pfx_bytes, self.pfx_password))
         try:
             yield session
         finally:
             session.close()
-            if cert_files:
-                _cleanup_cert_files(cert_files)
 
     def emitir_dps(self, signed_xml: str) -> NacionalNfseResponse:
         body = {"dpsXmlGZipB64": encode_gzip_b64(signed_xml)}
@@ -265,38 +267,3 @@ class NacionalNfseClient:
 def re_digits(value: Any) -> str:
     return "".join(ch for ch in str(value or "") if ch.isdigit())
 
-
-def _pfx_to_temp_pem(pfx_bytes: bytes, password: str | None) -> tuple[str, str]:
-    password_bytes = password.encode("utf-8") if password else None
-    private_key, certificate, additional = pkcs12.load_key_and_certificates(
-        pfx_bytes,
-        password_bytes,
-    )
-    if private_key is None or certificate is None:
-        raise ValueError("Certificado A1 invalido para conexao TLS.")
-
-    key_pem = private_key.private_bytes(
-        encoding=Encoding.PEM,
-        format=PrivateFormat.PKCS8,
-        encryption_algorithm=NoEncryption(),
-    )
-    cert_chain = [certificate] + list(additional or [])
-    cert_pem = b"".join(cert.public_bytes(Encoding.PEM) for cert in cert_chain)
-
-    cert_file = tempfile.NamedTemporaryFile(delete=False)
-    key_file = tempfile.NamedTemporaryFile(delete=False)
-    cert_file.write(cert_pem)
-    key_file.write(key_pem)
-    cert_file.flush()
-    key_file.flush()
-    cert_file.close()
-    key_file.close()
-    return cert_file.name, key_file.name
-
-
-def _cleanup_cert_files(cert_files: tuple[str, str]) -> None:
-    for path in cert_files:
-        try:
-            os.unlink(path)
-        except FileNotFoundError:
-            continue
@@ -1,19 +1,15 @@
 """XML signature helper for Sistema Nacional NFS-e layouts."""
 from __future__ import annotations
 
-from cryptography.hazmat.primitives.serialization import pkcs12
 from lxml import etree
 from signxml import XMLSigner
 
+from providers.fiscal.mtls import load_pkcs12
 from security.xml_safe import safe_lxml_fromstring
 
 
 def _load_pfx(pfx_bytes: bytes, password: str | None):
-    password_bytes = password.encode("utf-8") if password else None
-    private_key, certificate, _additional = pkcs12.load_key_and_certificates(
-        pfx_bytes,
-        password_bytes,
-    )
+    private_key, certificate, _additional = load_pkcs12(pfx_bytes, password)
     if certificate is None or private_key is None:
         raise ValueError("Certificado A1 invalido para assinatura XML.")
     return private_key, certificate
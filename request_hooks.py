@@ -26,6 +26,7 @@ from werkzeug.exceptions import HTTPException, NotFound
 
 from extensions import db
 from helpers import ensure_veterinarian_membership, has_veterinarian_profile
+from services.sql_profiler import sql_profiler
 from sqlalchemy import text
 
 
@@ -248,6 +249,7 @@ def register_request_hooks(app):
     app.before_request(_redirect_insecure_request)
     app.before_request(_attach_request_id)
     app.after_request(_set_request_id_header)
+    sql_profiler.init_app(app)
     app.add_url_rule("/live", endpoint="health_live", view_func=lambda: _health_response(False), methods=["GET"])
     app.add_url_rule("/ready", endpoint="health_ready", view_func=lambda: _health_response(True), methods=["GET"])
     app.register_error_handler(HTTPException, handle_http_exception)
@@ -1,7 +1,6 @@
 import logging
 import os
 
-import boto3
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 
@@ -9,11 +8,21 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
-)
+# Cliente criado no primeiro upload: importar boto3 custa caro no startup.
+s3 = None
+
+
+def _client():
+    global s3
+    if s3 is None:
+        import boto3
+
+        s3 = boto3.client(
+            "s3",
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY")
+        )
+    return s3
 
 BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 
@@ -23,7 +32,7 @@ def upload_to_s3(file, filename, folder="uploads"):
         logger.warning("S3 bucket is not configured; skipping upload for %s", filepath)
         return None
 
-    s3.upload_fileobj(
+    _client().upload_fileobj(
         file,
         BUCKET_NAME,
         filepath,
@@ -24,7 +24,7 @@ from app import (
     verificar_datas_proximas,
 )
 from scripts.sync_pmo_full_status import run_pmo_full_sync
-from services.finance import run_transactions_history_backfill
+from services.finance import reconcile_classified_totals, run_transactions_history_backfill
 
 
 DEFAULT_DAY = 2
@@ -32,6 +32,7 @@ DEFAULT_HOUR = 4
 DEFAULT_MINUTE = 30
 DEFAULT_MONTHS = 6
 DEFAULT_PMO_SYNC_MINUTES = 10
+DEFAULT_OUTBOX_DRAIN_SECONDS = 60
 
 
 def _release_job_memory() -> None:
@@ -128,6 +129,33 @@ def _run_backfill() -> None:
             )
 
 
+def _run_classified_totals_reconciliation() -> None:
+    with app.app_context():
+        result = reconcile_classified_totals()
+        log = current_app.logger.warning if result.repaired else current_app.logger.info
+        log(
+            '[Scheduler] Totais mensais conferidos: %s linhas em %s clínicas, %s corrigidas.',
+            result.checked,
+            result.clinics,
+            result.repaired,
+        )
+
+
+def _run_export_cleanup() -> None:
+    with app.app_context():
+        # Registra os tipos de exportação (cada módulo cria seu ExportStore).
+        import services.clinic_data_export  # noqa: F401
+        import services.fiscal.xml_export  # noqa: F401
+        from services.data_export import cleanup_exports
+
+        try:
+            removed = cleanup_exports()
+        except Exception:
+            current_app.logger.exception('[Scheduler] Falha ao limpar exportações vencidas.')
+            return
+        current_app.logger.info('[Scheduler] Exportações vencidas removidas: %s', removed)
+
+
 @_memory_bounded_job
 def _run_pmo_sync() -> None:
     with app.app_context():
@@ -164,6 +192,17 @@ def _run_pmo_doses_compile() -> None:
             )
 
 
+@_memory_bounded_job
+def _run_outbox_drain(channel: str) -> None:
+    with app.app_context():
+        from services.notification_outbox import drain
+
+        try:
+            drain(channel)
+        except Exception:
+            current_app.logger.exception("[Scheduler] Falha ao drenar outbox (%s).", channel)
+
+
 def main() -> None:
     timezone = os.getenv('SCHEDULER_TZ') or os.getenv('ACCOUNTING_BACKFILL_TZ', 'UTC')
     scheduler = BlockingScheduler(timezone=timezone)
@@ -226,6 +265,8 @@ def main() -> None:
         ('winback-pos-trial', enviar_winback_pos_trial, 11, 30),
         ('carrinho-abandonado', enviar_lembretes_carrinho_abandonado, 15, 0),
         ('snapshot-financeiro', _run_financial_snapshot_job, 2, 30),
+        ('conciliacao-totais-classificados', _run_classified_totals_reconciliation, 3, 45),
+        ('limpeza-exportacoes', _run_export_cleanup, 4, 30),
         ('mercadopago-oauth-renewal', _run_mercadopago_oauth_renewal_job, 3, 15),
     ]
     for job_id, func, hour, minute in daily_jobs:
@@ -238,6 +279,22 @@ def main() -> None:
             coalesce=True,
         )
 
+    # Os lembretes acima só enfileiram; cada canal drena o outbox no seu job
+    # para que um SMTP lento não atrase WhatsApp e push.
+    outbox_interval = _env_int(
+        "NOTIFICATION_OUTBOX_DRAIN_SECONDS", DEFAULT_OUTBOX_DRAIN_SECONDS, 10, 3600
+    )
+    for channel in ('email', 'whatsapp', 'push'):
+        scheduler.add_job(
+            _run_outbox_drain,
+            IntervalTrigger(seconds=outbox_interval),
+            args=(channel,),
+            id=f'outbox-{channel}',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
     with app.app_context():
         current_app.logger.info(
             'Agendador iniciado. Backfill mensal em %s. PMO a cada %s minuto(s). '
@@ -0,0 +1,128 @@
+"""Guardas de schema do startup, uma vez por deploy.
+
+``app.py`` garante no import colunas e tabelas que migrations antigas podem
+não ter criado (``ALTER TABLE``/``CREATE TABLE`` defensivos). Cada guarda faz
+várias consultas de introspecção (``inspect(db.engine)``) — repetidas em todo
+worker que sobe, inclusive nas reciclagens por ``--max-requests``, sem que o
+schema tenha mudado.
+
+``run_schema_guards`` calcula um fingerprint barato do que pode mudar o
+resultado das guardas — id do deploy, banco, versão do alembic e o código das
+próprias guardas — e só roda as guardas quando ele difere do último
+gravado em ``SCHEMA_GUARDS_CACHE_PATH`` (padrão ``instance/schema_guards.json``).
+O fingerprint só é gravado quando todas as guardas terminam bem, então uma
+falha é tentada de novo no próximo startup. SQLite em memória (testes) sempre
+roda: cada processo tem um banco novo.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Callable, Iterable
+
+from sqlalchemy import text
+
+CACHE_FILENAME = "schema_guards.json"
+# Variáveis que identificam o build em produção (Heroku, CI genérico).
+DEPLOY_ENV_VARS = ("HEROKU_SLUG_COMMIT", "HEROKU_RELEASE_VERSION", "SOURCE_VERSION", "GIT_COMMIT")
+
+SchemaGuard = Callable[[], "bool | None"]
+
+
+def deploy_id() -> str:
+    return "|".join(f"{name}={os.environ[name]}" for name in DEPLOY_ENV_VARS if os.environ.get(name))
+
+
+def _hash_code(code, digest) -> None:
+    digest.update(code.co_code)
+    digest.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if hasattr(const, "co_code"):
+            _hash_code(const, digest)
+        elif isinstance(const, frozenset):
+            # Ordem de frozenset de strings muda com o hash seed do processo.
+            digest.update(repr(sorted(map(repr, const))).encode())
+        else:
+            digest.update(repr(const).encode())
+
+
+def _guard_signature(guard: SchemaGuard) -> str:
+    """Nome + hash do bytecode: mudar o código da guarda invalida o cache."""
+    code = getattr(guard, "__code__", None)
+    if code is None:
+        return getattr(guard, "__qualname__", repr(guard))
+    digest = hashlib.sha256()
+    _hash_code(code, digest)
+    return f"{guard.__qualname__}:{digest.hexdigest()[:16]}"
+
+
+def _alembic_revision(engine) -> str:
+    try:
+        with engine.connect() as connection:
+            rows = connection.execute(text("SELECT version_num FROM alembic_version")).scalars().all()
+    except Exception:  # noqa: BLE001 - banco sem alembic_version (dev/create_all)
+        return ""
+    return ",".join(sorted(rows))
+
+
+def is_ephemeral_database(engine) -> bool:
+    url = engine.url
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+def schema_fingerprint(engine, guards: Iterable[SchemaGuard]) -> str:
+    parts = [
+        deploy_id(),
+        engine.url.render_as_string(hide_password=True),
+        _alembic_revision(engine),
+        *sorted(_guard_signature(guard) for guard in guards),
+    ]
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def cache_path(app) -> Path:
+    configured = app.config.get("SCHEMA_GUARDS_CACHE_PATH")
+    return Path(configured) if configured else Path(app.instance_path) / CACHE_FILENAME
+
+
+def _read_fingerprint(path: Path) -> str | None:
+    try:
+        return json.loads(path.read_text(encoding="utf-8")).get("fingerprint")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _write_fingerprint(path: Path, fingerprint: str) -> None:
+    # Vários workers sobem juntos: grava num temporário e troca atômico.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f"{path.name}.{os.getpid()}.part")
+    partial.write_text(json.dumps({"fingerprint": fingerprint}), encoding="utf-8")
+    os.replace(partial, path)
+
+
+def run_schema_guards(app, engine, guards: Iterable[SchemaGuard]) -> bool:
+    """Roda ``guards`` se o fingerprint do schema mudou; ``True`` se rodou.
+
+    Uma guarda que devolve ``False`` conta como falha (o fingerprint não é
+    gravado); ``None`` conta como sucesso.
+    """
+    guards = list(guards)
+    cached = bool(app.config.get("SCHEMA_GUARDS_CACHE", True)) and not is_ephemeral_database(engine)
+    fingerprint = path = None
+    if cached:
+        fingerprint = schema_fingerprint(engine, guards)
+        path = cache_path(app)
+        if _read_fingerprint(path) == fingerprint:
+            app.logger.debug("Guardas de schema já aplicadas neste deploy (%s).", fingerprint[:12])
+            return False
+
+    results = [guard() for guard in guards]
+    if cached and all(result is not False for result in results):
+        try:
+            _write_fingerprint(path, fingerprint)
+        except OSError as exc:
+            app.logger.warning("Não foi possível gravar o fingerprint das guardas de schema: %s", exc)
+    return True
@@ -214,6 +214,10 @@ def run_backfill(*, dry_run: bool = True, only_sheet: str = "") -> Counter:
         raise RuntimeError("URL da planilha PMO inválida.")
 
     service = _get_sheets_service_rw()
+    # As escritas deste script já são espaçadas pela cota (time.sleep) e o
+    # processo termina logo depois: com a fila write-behind as marcações
+    # podiam ficar só no banco. Aqui a planilha é gravada na hora.
+    app.config["PMO_SHEETS_WRITE_BEHIND"] = False
 
     sheets = list_vacina_pmo_sheets()
     for sheet_info in sheets:
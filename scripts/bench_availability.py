@@ -0,0 +1,149 @@
+"""
+bench_availability.py
+=====================
+Mede custo de queries e CPU da disponibilidade de agenda: varredura legada
+(``has_conflict_for_slot`` por slot, um dia por vez) contra o motor em lote
+de ``services.availability``.
+
+Roda num SQLite em memória com dados sintéticos (por padrão 20 vets × 30
+dias, ~6 agendamentos por vet/dia).
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_availability.py [--vets 20] [--days 30]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time as time_mod
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _seed(db, vets, days, start):
+    from models import Animal, Appointment, Clinica, User, Veterinario, VetSchedule
+
+    rng = random.Random(42)
+    db.session.add(Clinica(id=1, nome="Bench"))
+    tutor = User(id=1, name="Tutor", email="tutor@bench")
+    tutor.set_password("x")
+    db.session.add_all([tutor, Animal(id=1, name="Rex", user_id=1, clinica_id=1)])
+    for vet_id in range(1, vets + 1):
+        user = User(id=1000 + vet_id, name=f"Vet {vet_id}", email=f"vet{vet_id}@bench", worker="veterinario")
+        user.set_password("x")
+        db.session.add_all([user, Veterinario(id=vet_id, user_id=user.id, crmv=str(vet_id), clinica_id=1)])
+        for dia in ("Segunda", "Terça", "Quarta", "Quinta", "Sexta"):
+            db.session.add(VetSchedule(
+                veterinario_id=vet_id, dia_semana=dia,
+                hora_inicio=time(8, 0), hora_fim=time(18, 0),
+                intervalo_inicio=time(12, 0), intervalo_fim=time(13, 0),
+            ))
+        for offset in range(days):
+            for _ in range(6):
+                slot = datetime.combine(start + timedelta(days=offset), time(8, 0)) + timedelta(
+                    minutes=30 * rng.randrange(20)
+                )
+                db.session.add(Appointment(
+                    animal_id=1, tutor_id=1, veterinario_id=vet_id, clinica_id=1,
+                    scheduled_at=slot + timedelta(hours=3), status="scheduled",
+                ))
+    db.session.commit()
+
+
+def _legacy_day(vet_id, day, kind="consulta"):
+    """Reprodução da varredura antiga: 4 queries por dia e checagem slot a slot."""
+    from helpers import MAX_APPOINTMENT_DURATION, get_appointment_duration, has_conflict_for_slot
+    from models import Appointment, ExamAppointment, VetSchedule
+    from time_utils import normalize_to_utc
+
+    weekday = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"][day.weekday()]
+    schedules = VetSchedule.query.filter_by(veterinario_id=vet_id, dia_semana=weekday).all()
+    duration = get_appointment_duration(kind)
+    appointments, exams = {}, {}
+    day_start = datetime.combine(day, time.min) - MAX_APPOINTMENT_DURATION
+    day_end = datetime.combine(day, time.max) + MAX_APPOINTMENT_DURATION
+    for window_start, window_end in (
+        (normalize_to_utc(day_start), normalize_to_utc(day_end)),
+        (day_start, day_end),
+    ):
+        for appt in Appointment.query.filter(
+            Appointment.veterinario_id == vet_id,
+            Appointment.scheduled_at > window_start,
+            Appointment.scheduled_at < window_end,
+        ):
+            appointments.setdefault(appt.id, appt)
+        for exam in ExamAppointment.query.filter(
+            ExamAppointment.specialist_id == vet_id,
+            ExamAppointment.scheduled_at > window_start,
+            ExamAppointment.scheduled_at < window_end,
+        ):
+            exams.setdefault(exam.id, exam)
+    available = []
+    for schedule in schedules:
+        current = datetime.combine(day, schedule.hora_inicio)
+        end = datetime.combine(day, schedule.hora_fim)
+        while current + duration <= end:
+            if not has_conflict_for_slot(
+                vet_id, current, duration,
+                preloaded_appointments=appointments, preloaded_exams=exams,
+            ):
+                available.append(current.strftime("%H:%M"))
+            current += timedelta(minutes=30)
+    return available
+
+
+def _measure(db, label, fn):
+    from sqlalchemy import event
+
+    counter = {"queries": 0}
+
+    def _count(*_args):
+        counter["queries"] += 1
+
+    event.listen(db.engine, "before_cursor_execute", _count)
+    db.session.expire_all()
+    started_wall = time_mod.perf_counter()
+    started_cpu = time_mod.process_time()
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _count)
+    wall = time_mod.perf_counter() - started_wall
+    cpu = time_mod.process_time() - started_cpu
+    print(f"{label:<28} queries={counter['queries']:>6}  wall={wall * 1000:9.1f} ms  cpu={cpu * 1000:9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vets", type=int, default=20)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--skip-legacy", action="store_true", help="Não roda a varredura legada (lenta).")
+    args = parser.parse_args()
+
+    from app import app, db
+    from helpers import get_available_times
+    from services.availability import compute_availability
+
+    start = date(2024, 6, 3)
+    vet_ids = list(range(1, args.vets + 1))
+    days = [start + timedelta(days=offset) for offset in range(args.days)]
+
+    with app.app_context():
+        db.create_all()
+        _seed(db, args.vets, args.days, start)
+        print(f"{args.vets} vets × {args.days} dias")
+        if not args.skip_legacy:
+            _measure(db, "legado (slot a slot)", lambda: [_legacy_day(v, d) for v in vet_ids for d in days])
+        _measure(db, "get_available_times por dia", lambda: [get_available_times(v, d) for v in vet_ids for d in days])
+        _measure(db, "motor em lote", lambda: compute_availability(vet_ids, days[0], days[-1]))
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+bench_data_export.py
+====================
+Pico de memória da exportação de dados da clínica (``/clinica/<id>/exportar-dados``)
+em função do número de linhas:
+
+* antigo — tabelas com ``.all()``, listas de dicionários, ``json.dumps`` de
+  cada arquivo inteiro e o ZIP montado num ``BytesIO``;
+* em stream — ``yield_per`` + ``iter_json_array`` + ``stream_zip``: o pico
+  deve ficar estável conforme a clínica cresce.
+
+Mede com ``tracemalloc`` (só alocações Python) e mostra tempo e tamanho do
+ZIP. Roda num SQLite em memória com pacientes e vacinas sintéticos.
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_data_export.py [--sizes 2000 10000 40000] [--batch-size 500]
+"""
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _seed(db, clinic_id, tutor_id, size):
+    from models import Animal, Vacina
+
+    have = Animal.query.filter_by(clinica_id=clinic_id).count()
+    for start in range(have, size, 1000):
+        animals = [
+            Animal(name=f"Pet {index}", user_id=tutor_id, clinica_id=clinic_id)
+            for index in range(start, min(size, start + 1000))
+        ]
+        db.session.add_all(animals)
+        db.session.flush()
+        db.session.add_all(Vacina(animal_id=animal.id, nome="V10", tipo="Polivalente") for animal in animals)
+        db.session.commit()
+        db.session.expunge_all()
+
+
+def _legacy_export(clinica):
+    """A exportação como era antes do stream (dados inteiros em memória)."""
+    from models import Animal, Vacina
+    from services.clinic_data_export import README
+    from services.data_export import model_row
+
+    animals = Animal.query.filter_by(clinica_id=clinica.id).all()
+    animal_ids = [animal.id for animal in animals]
+    vacinas = Vacina.query.filter(Vacina.animal_id.in_(animal_ids)).all() if animal_ids else []
+    files = {
+        "pacientes.json": [model_row(animal) for animal in animals],
+        "vacinas.json": [model_row(vacina) for vacina in vacinas],
+    }
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as bundle:
+        bundle.writestr("LEIA-ME.txt", README)
+        for filename, payload in files.items():
+            bundle.writestr(filename, json.dumps(payload, ensure_ascii=False, indent=2))
+    return len(archive.getvalue())
+
+
+def _streamed_export(clinica):
+    from services.clinic_data_export import stream_clinic_export
+
+    return sum(len(chunk) for chunk in stream_clinic_export(clinica))
+
+
+def _measure(label, db, run, clinica_id):
+    from models import Clinica
+
+    db.session.expunge_all()
+    clinica = db.session.get(Clinica, clinica_id)
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = run(clinica)
+    elapsed = time.perf_counter() - started
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<12} {elapsed * 1000:9.1f} ms  pico={peak / 1024 / 1024:8.2f} MiB  zip={size / 1024:9.1f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 10000, 40000])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    from app import app, db
+    from models import Clinica, User
+
+    app.config["DATA_EXPORT_BATCH_SIZE"] = args.batch_size
+    with app.app_context():
+        db.create_all()
+        tutor = User(name="Tutor bench", email="tutor@bench.local", password_hash="x")
+        clinica = Clinica(nome="Clínica bench")
+        db.session.add_all([tutor, clinica])
+        db.session.commit()
+        clinic_id, tutor_id = clinica.id, tutor.id
+        for size in sorted(args.sizes):
+            _seed(db, clinic_id, tutor_id, size)
+            print(f"{size} pacientes + {size} vacinas")
+            _measure("antigo", db, _legacy_export, clinic_id)
+            _measure("em stream", db, _streamed_export, clinic_id)
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
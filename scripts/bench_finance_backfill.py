@@ -0,0 +1,139 @@
+"""
+bench_finance_backfill.py
+=========================
+Backfill de classificação contábil (``classify-transactions-history`` e o job
+das 04:30) em N clínicas × M meses:
+
+* mês a mês (antigo) — ``classify_transactions_for_month`` por clínica e mês,
+  com upsert linha a linha;
+* em lote — ``classify_transactions_bulk``: uma query por origem para a janela
+  toda, diff em memória e ``INSERT ... ON CONFLICT`` em blocos;
+* reexecução em lote sem mudanças — só leituras; pagamentos PJ abaixo do
+  watermark nem são lidos.
+
+Mostra tempo e número de statements SQL. Roda num SQLite em memória com
+lançamentos sintéticos.
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_finance_backfill.py [--clinics 20] [--months 6] [--per-month 40]
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _seed(db, clinics, month_starts, per_month):
+    from models import Clinica, Orcamento, OrcamentoItem, Order, OrderItem, PJPayment, Product, User
+    from time_utils import now_in_brazil
+
+    stale = now_in_brazil() - timedelta(days=1)
+    product = Product(name="Ração bench", price=25.0, stock=10)
+    db.session.add(product)
+    for index in range(clinics):
+        clinic = Clinica(nome=f"Clínica {index:03d}")
+        db.session.add(clinic)
+        db.session.flush()
+        buyer = User(name=f"Tutor {index}", email=f"tutor{index}@bench.local", password_hash="x", clinica_id=clinic.id)
+        db.session.add(buyer)
+        db.session.flush()
+        for month_start in month_starts:
+            orcamento = Orcamento(clinica_id=clinic.id, descricao="Bench", created_at=datetime.combine(month_start, datetime.min.time()) + timedelta(days=3))
+            order = Order(user_id=buyer.id, created_at=datetime.combine(month_start, datetime.min.time()) + timedelta(days=5))
+            db.session.add_all([orcamento, order])
+            db.session.flush()
+            db.session.add_all(
+                OrcamentoItem(orcamento_id=orcamento.id, clinica_id=clinic.id, descricao=f"Serviço {n}", valor=Decimal("80.00") + n)
+                for n in range(per_month)
+            )
+            db.session.add_all(
+                OrderItem(order_id=order.id, product_id=product.id, item_name=f"Produto {n}", quantity=1 + n % 3, unit_price=Decimal("25.00"))
+                for n in range(per_month)
+            )
+            db.session.add_all(
+                PJPayment(
+                    clinic_id=clinic.id, prestador_nome="Vet", prestador_cnpj="00.000.000/0001-00",
+                    valor=Decimal("1500.00"), data_servico=month_start + timedelta(days=n % 27),
+                    data_pagamento=month_start + timedelta(days=n % 27), updated_at=stale,
+                )
+                for n in range(max(1, per_month // 10))
+            )
+    db.session.commit()
+
+
+class _Counter:
+    def __init__(self):
+        self.statements = 0
+
+    def __call__(self, *_args):
+        self.statements += 1
+
+
+def _measure(label, counter, run):
+    counter.statements = 0
+    started = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<28} {elapsed:8.2f} s  statements={counter.statements}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clinics", type=int, default=20)
+    parser.add_argument("--months", type=int, default=6)
+    parser.add_argument("--per-month", type=int, default=40)
+    args = parser.parse_args()
+
+    from dateutil.relativedelta import relativedelta
+    from sqlalchemy import event
+
+    from app import app, db
+    from models import ClassifiedTransaction, Clinica, JobCheckpoint
+    from services.finance import classify_transactions_bulk, classify_transactions_for_month
+
+    base = date.today().replace(day=1)
+    month_starts = sorted(base - relativedelta(months=offset) for offset in range(args.months))
+    with app.app_context():
+        db.create_all()
+        _seed(db, args.clinics, month_starts, args.per_month)
+        clinic_ids = [clinic_id for (clinic_id,) in db.session.query(Clinica.id).order_by(Clinica.id)]
+        counter = _Counter()
+        event.listen(db.engine, "before_cursor_execute", counter)
+        print(f"{args.clinics} clínicas × {args.months} meses, {ClassifiedTransaction.query.count()} classificados")
+
+        def per_month():
+            for clinic_id in clinic_ids:
+                for month_start in month_starts:
+                    classify_transactions_for_month(clinic_id, month_start)
+
+        def bulk():
+            classify_transactions_bulk(clinic_ids, month_starts)
+            db.session.commit()
+
+        def reset():
+            ClassifiedTransaction.query.delete()
+            JobCheckpoint.query.delete()
+            db.session.commit()
+            db.session.expunge_all()
+
+        _measure("mês a mês (antigo)", counter, per_month)
+        _measure("mês a mês, sem mudanças", counter, per_month)
+        reset()
+        _measure("em lote", counter, bulk)
+        _measure("em lote, sem mudanças", counter, bulk)
+
+        event.remove(db.engine, "before_cursor_execute", counter)
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+bench_fiscal_xml_export.py
+==========================
+Pico de memória da exportação de XMLs fiscais (``/fiscal/exports/xmls``):
+
+* caminho antigo — ``.all()`` nos ``FiscalDocument``, ZIP inteiro num
+  ``BytesIO`` e cópia com ``getvalue()``;
+* caminho novo — ``iter_authorized_xmls`` (``yield_per``, só as colunas
+  necessárias) alimentando ``stream_zip``, com os pedaços descartados como
+  faria o WSGI ao enviá-los.
+
+Mede com ``tracemalloc`` num SQLite em memória com N documentos sintéticos.
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_fiscal_xml_export.py [--documents 10000] [--xml-size 6000]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+os.environ.setdefault("FISCAL_MASTER_KEY", "bench-master-key")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _seed(db, documents, xml_size):
+    from models import Clinica, FiscalDocument, FiscalDocumentStatus, FiscalDocumentType, FiscalEmitter
+    from security.crypto import encrypt_text_for_clinic
+
+    clinic = Clinica(id=1, nome="Clínica Bench")
+    emitter = FiscalEmitter(id=1, clinic_id=1, cnpj="12345678000195", razao_social="Bench LTDA")
+    db.session.add_all([clinic, emitter])
+    db.session.flush()
+    filler = "x" * xml_size
+    rows = [
+        {
+            "emitter_id": 1,
+            "clinic_id": 1,
+            "doc_type": FiscalDocumentType.NFSE,
+            "status": FiscalDocumentStatus.AUTHORIZED,
+            "nfse_number": str(index),
+            "_xml_authorized": encrypt_text_for_clinic(1, f"<nfse n='{index}'>{filler}</nfse>"),
+        }
+        for index in range(documents)
+    ]
+    db.session.bulk_insert_mappings(FiscalDocument, rows)
+    db.session.commit()
+
+
+def _old_export(filters):
+    from services.fiscal.xml_export import _filename, authorized_xml_query
+
+    documents = authorized_xml_query(filters).all()
+    buffer = io.BytesIO()
+    used_names = set()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for document in documents:
+            identifier = document.nfse_number or document.access_key or document.id
+            zip_file.writestr(_filename(document.doc_type, identifier, used_names), document.xml_authorized)
+    return len(buffer.getvalue())
+
+
+def _new_export(filters):
+    from services.fiscal.xml_export import iter_authorized_xmls, stream_zip
+
+    return sum(len(chunk) for chunk in stream_zip(iter_authorized_xmls(filters)))
+
+
+def _measure(label, db, export, filters):
+    db.session.expunge_all()
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = export(filters)
+    elapsed = time.perf_counter() - started
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} pico={peak / 1024 / 1024:8.1f} MiB  tempo={elapsed:6.2f} s  zip={size / 1024 / 1024:.1f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--xml-size", type=int, default=6000)
+    args = parser.parse_args()
+
+    from app import app, db
+    from services.fiscal.xml_export import XmlExportFilters
+
+    with app.app_context():
+        db.create_all()
+        _seed(db, args.documents, args.xml_size)
+        filters = XmlExportFilters(clinic_id=1)
+        _measure("BytesIO + .all() (antigo)", db, _old_export, filters)
+        _measure("stream_zip + yield_per", db, _new_export, filters)
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
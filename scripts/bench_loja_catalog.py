@@ -0,0 +1,121 @@
+"""
+bench_loja_catalog.py
+=====================
+Queries SQL e latência por visualização da vitrine (``/loja``) e da rolagem
+infinita (``/loja/data?format=json&cursor=``):
+
+* primeira visita — monta as facetas do catálogo (agregação por vendedor e
+  categoria);
+* visitas seguintes — facetas em memória, página sem COUNT;
+* rolagem — cursor (keyset) até o fim do catálogo, sem COUNT nem OFFSET.
+
+Roda num SQLite em memória com N produtos sintéticos espalhados por clínicas.
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_loja_catalog.py [--products 5000] [--clinics 20] [--views 50]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _seed(db, products, clinics):
+    from models import Clinica, Product
+    from models.base import SiteFlag
+
+    db.session.add_all([Clinica(id=index + 1, nome=f"Clínica {index:03d}") for index in range(clinics)])
+    db.session.flush()
+    categories = ["racao", "higiene", "brinquedos", "acessorios", "farmacia"]
+    rows = [
+        {
+            "name": f"Produto {index:06d}",
+            "description": "Produto sintético",
+            "price": float(5 + index % 300),
+            "stock": 10,
+            "status": "active",
+            "is_demo": False,
+            "category": categories[index % len(categories)],
+            "clinica_id": index % clinics + 1,
+        }
+        for index in range(products)
+    ]
+    db.session.bulk_insert_mappings(Product, rows)
+    SiteFlag.set("loja_em_breve", False)
+    db.session.commit()
+
+
+class _Counter:
+    def __init__(self):
+        self.statements = 0
+
+    def __call__(self, *_args):
+        self.statements += 1
+
+
+def _measure(label, client, counter, urls):
+    counter.statements = 0
+    started = time.perf_counter()
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<32} queries/view={counter.statements / len(urls):6.1f}  "
+        f"ms/view={elapsed * 1000 / len(urls):7.2f}"
+    )
+
+
+def _scroll_urls(client, per_filter):
+    urls, cursor = [], None
+    while len(urls) < per_filter:
+        url = f"/loja/data?format=json&cursor={cursor or ''}"
+        urls.append(url)
+        cursor = client.get(url).get_json()["next_cursor"]
+        if not cursor:
+            break
+    return urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--clinics", type=int, default=20)
+    parser.add_argument("--views", type=int, default=50)
+    args = parser.parse_args()
+
+    from sqlalchemy import event
+
+    from app import app, db
+    from services.catalog_facets import reset_catalog_facets
+
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, RATELIMIT_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        _seed(db, args.products, args.clinics)
+        counter = _Counter()
+        event.listen(db.engine, "before_cursor_execute", counter)
+        client = app.test_client()
+
+        reset_catalog_facets()
+        _measure("/loja (facetas frias)", client, counter, ["/loja"])
+        pages = [f"/loja?page={page % 20 + 1}" for page in range(args.views)]
+        _measure("/loja (facetas em memória)", client, counter, pages)
+        _measure("/loja?category=racao", client, counter, [f"{url}&category=racao" for url in pages])
+        _measure("/loja/data?page=N (numerada)", client, counter,
+                 [f"/loja/data?format=json&page={page % 20 + 1}" for page in range(args.views)])
+        _measure("/loja/data?cursor= (keyset)", client, counter, _scroll_urls(client, args.views))
+
+        event.remove(db.engine, "before_cursor_execute", counter)
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+bench_mcp.py
+============
+Latência do servidor MCP (``POST /mcp``) em três cenários:
+
+* ``tools/list`` montando o catálogo a cada request (comportamento antigo)
+  contra o catálogo cacheado por processo, e a revalidação com ETag (304);
+* ``tools/call`` típico (``obter_resumo_clinico_animal``) com o token
+  verificado no banco a cada request contra o cache de tokens verificados;
+* N chamadas em N requests contra um único batch JSON-RPC.
+
+Roda num SQLite em memória, pelo test client do Flask.
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_mcp.py [--requests 300] [--batch 10]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+BEARER = "bench-mcp-token"
+SCOPES = "profile pets:read clinical_summary:read"
+
+
+def _seed(db):
+    from models import Animal, OAuthAccessToken, User
+    from time_utils import utcnow
+
+    user = User(id=1, name="Tutor", email="tutor@bench")
+    user.set_password("x")
+    db.session.add_all([user, Animal(id=1, name="Rex", user_id=1)])
+    db.session.add(OAuthAccessToken(
+        client_id="bench",
+        user_id=1,
+        access_token=BEARER,
+        resource="https://www.petorlandia.com.br/mcp",
+        scope=SCOPES,
+        expires_at=utcnow() + timedelta(hours=1),
+    ))
+    db.session.commit()
+
+
+def _rpc(method, req_id=1, **params):
+    return {"jsonrpc": "2.0", "id": req_id, "method": method, "params": params}
+
+
+def _measure(label, requests, send):
+    samples = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = send()
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code in (200, 304), response.status_code
+    samples.sort()
+    p50 = statistics.median(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<40} p50={p50:7.2f} ms  p95={p95:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=10)
+    args = parser.parse_args()
+
+    from app import app, db
+    from services.mcp_registry import mcp_tools
+    from services.oauth_token_cache import token_cache
+
+    app.config["RATELIMIT_ENABLED"] = False
+    headers = {"Authorization": f"Bearer {BEARER}"}
+    call = _rpc("tools/call", name="obter_resumo_clinico_animal", arguments={"animal_id": 1})
+
+    with app.app_context():
+        db.create_all()
+        _seed(db)
+        client = app.test_client()
+
+        def list_uncached():
+            mcp_tools.reset_catalogue()
+            return client.post("/mcp", json=_rpc("tools/list"), headers=headers)
+
+        _measure("tools/list (catálogo por request)", args.requests, list_uncached)
+        _measure("tools/list (catálogo cacheado)", args.requests,
+                 lambda: client.post("/mcp", json=_rpc("tools/list"), headers=headers))
+        etag = client.post("/mcp", json=_rpc("tools/list"), headers=headers).headers["ETag"]
+        _measure("tools/list (If-None-Match → 304)", args.requests,
+                 lambda: client.post("/mcp", json=_rpc("tools/list"), headers={**headers, "If-None-Match": etag}))
+
+        def call_uncached():
+            token_cache.clear()
+            return client.post("/mcp", json=call, headers=headers)
+
+        _measure("tools/call (token verificado no banco)", args.requests, call_uncached)
+        _measure("tools/call (token em cache)", args.requests,
+                 lambda: client.post("/mcp", json=call, headers=headers))
+
+        def one_by_one():
+            for _ in range(args.batch):
+                response = client.post("/mcp", json=call, headers=headers)
+            return response
+
+        batch = [dict(call, id=index) for index in range(args.batch)]
+        _measure(f"{args.batch}× tools/call em requests separados", max(args.requests // 10, 10), one_by_one)
+        _measure(f"{args.batch}× tools/call num batch JSON-RPC", max(args.requests // 10, 10),
+                 lambda: client.post("/mcp", json=batch, headers=headers))
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
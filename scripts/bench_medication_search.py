@@ -0,0 +1,125 @@
+"""
+bench_medication_search.py
+==========================
+Latência da busca de medicamentos: filtro legado (ILIKE em nome,
+principio_ativo e CAST(conteudo_estruturado AS TEXT), repetido por token)
+contra ``services.medication_search.buscar_ids_medicamentos``.
+
+Sem ``--use-database`` roda num SQLite em memória com um catálogo sintético
+do tamanho do importado do VetSmart (~12k itens). Com ``--use-database``
+mede o banco configurado em SQLALCHEMY_DATABASE_URI/DATABASE_URL (ex.: uma
+cópia do Postgres de produção com o catálogo completo).
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_medication_search.py [--size 12000] [--repeat 20]
+  python scripts/bench_medication_search.py --use-database
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+CONSULTAS = ("dipirona", "amoxicilina clavulanato", "cetoconazol neomicina", "otite", "prednisolona 20")
+
+_PRINCIPIOS = (
+    "Amoxicilina", "Clavulanato de Potássio", "Dipirona", "Meloxicam", "Prednisolona",
+    "Cetoconazol", "Neomicina", "Betametasona", "Enrofloxacino", "Metronidazol",
+    "Tramadol", "Gabapentina", "Omeprazol", "Ivermectina", "Fluralaner",
+)
+_INDICACOES = (
+    "Infecções urinárias e de pele.", "Otite externa bacteriana.", "Dor aguda e febre.",
+    "Dermatite atópica e prurido.", "Gastrite e úlceras.", "Controle de pulgas e carrapatos.",
+)
+
+
+def _seed(db, size):
+    from models import Medicamento, User
+
+    rng = random.Random(7)
+    user = User(name="Bench", email="bench@bulario")
+    user.set_password("x")
+    db.session.add(user)
+    db.session.flush()
+    for idx in range(size):
+        principios = rng.sample(_PRINCIPIOS, rng.choice((1, 1, 2, 3)))
+        db.session.add(Medicamento(
+            nome=f"{' + '.join(principios)} {idx}",
+            principio_ativo="; ".join(principios),
+            classificacao=rng.choice(("Antibiótico", "Anti-inflamatório", "Antifúngico")),
+            conteudo_estruturado={
+                "indicacoes": rng.choice(_INDICACOES),
+                "produtos_vetsmart": [{"nome": f"Produto {idx}", "fabricante": "Lab"}],
+            },
+            created_by=user.id,
+        ))
+        if idx % 1000 == 999:
+            db.session.flush()
+    db.session.commit()
+
+
+def _legacy(db, q):
+    from sqlalchemy import Text, cast, or_
+
+    from models import Medicamento
+    from services.medication_search import normalizar_texto_busca, tokens_busca
+
+    filtros = []
+    for termo in [q] + tokens_busca(normalizar_texto_busca(q)):
+        like = f"%{termo}%"
+        filtros.extend([
+            Medicamento.nome.ilike(like),
+            Medicamento.principio_ativo.ilike(like),
+            cast(Medicamento.conteudo_estruturado, Text).ilike(like),
+        ])
+    return [
+        row.id for row in db.session.query(Medicamento.id)
+        .filter(or_(*filtros)).order_by(Medicamento.nome).limit(120).all()
+    ]
+
+
+def _timeit(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=12000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--use-database", action="store_true", help="Usa o banco configurado em vez do sintético.")
+    args = parser.parse_args()
+
+    if not args.use_database:
+        os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+
+    from app import app, db
+    from services.medication_search import buscar_ids_medicamentos
+
+    with app.app_context():
+        if not args.use_database:
+            db.create_all()
+            _seed(db, args.size)
+        # Primeira chamada aquece o índice em memória (fallback SQLite).
+        buscar_ids_medicamentos("aquecimento")
+        print(f"dialeto={db.engine.dialect.name}")
+        print(f"{'consulta':<28}{'legado p50/p95 (ms)':>24}{'índice p50/p95 (ms)':>24}")
+        for q in CONSULTAS:
+            legado = _timeit(lambda: _legacy(db, q), args.repeat)
+            indice = _timeit(lambda: buscar_ids_medicamentos(q), args.repeat)
+            print(f"{q:<28}{legado[0]:>12.1f}/{legado[1]:<11.1f}{indice[0]:>12.1f}/{indice[1]:<11.1f}")
+
+
+if __name__ == "__main__":
+    main()
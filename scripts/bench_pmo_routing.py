@@ -0,0 +1,113 @@
+"""
+bench_pmo_routing.py
+====================
+Rota de um dia de vacinação da PMO: vizinho mais próximo legado (haversine
+recalculado dentro do ``min()`` a cada passo) contra
+``services.pmo_routing.optimize_route`` (matriz única + 2-opt/Or-opt).
+
+Gera casas sintéticas dentro dos limites de Orlândia, com alguns condomínios
+(unidades no mesmo ponto) misturados às casas avulsas, e compara tempo e
+quilômetros percorridos saindo da Vigilância Sanitária.
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_pmo_routing.py [--sizes 15,24,40,80] [--rounds 5] [--budget 0.5]
+"""
+
+import argparse
+import math
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from services.pmo_routing import haversine_km, optimize_route  # noqa: E402
+from services.vacina_pmo_service import (  # noqa: E402
+    PMO_DEFAULT_ROUTE_ORIGIN_COORDS,
+    PMO_ORLANDIA_BOUNDS,
+)
+
+
+def _legacy_nearest_neighbor(origin, points):
+    remaining = list(enumerate(points))
+    current = origin
+    ordered = []
+    while remaining:
+        index, (point_id, coords) = min(
+            enumerate(remaining),
+            key=lambda item: (haversine_km(current, item[1][1]), item[1][0]),
+        )
+        ordered.append(point_id)
+        current = coords
+        remaining.pop(index)
+    return ordered
+
+
+def _length(origin, points, order):
+    total = 0.0
+    current = origin
+    for index in order:
+        total += haversine_km(current, points[index])
+        current = points[index]
+    return total
+
+
+def _synthetic_day(rng, size):
+    # Núcleo urbano: ~3 km em volta do centro, não a caixa inteira do município.
+    center_lat = (PMO_ORLANDIA_BOUNDS["min_lat"] + PMO_ORLANDIA_BOUNDS["max_lat"]) / 2
+    center_lng = (PMO_ORLANDIA_BOUNDS["min_lng"] + PMO_ORLANDIA_BOUNDS["max_lng"]) / 2
+    spread = 0.03
+    points, groups = [], []
+    condo = 0
+    while len(points) < size:
+        lat = center_lat + rng.uniform(-spread, spread)
+        lng = center_lng + rng.uniform(-spread, spread) / math.cos(math.radians(center_lat))
+        if rng.random() < 0.1:
+            condo += 1
+            for _ in range(min(rng.randint(2, 5), size - len(points))):
+                points.append((lat, lng))
+                groups.append(f"condo-{condo}")
+        else:
+            points.append((lat, lng))
+            groups.append(None)
+    return points, groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="15,24,40,80")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=0.5)
+    args = parser.parse_args()
+
+    origin = PMO_DEFAULT_ROUTE_ORIGIN_COORDS
+    rng = random.Random(42)
+    print(f"{'casas':>6} {'legado ms':>10} {'legado km':>10} {'novo ms':>9} {'novo km':>9} {'ganho':>7}")
+    for size in (int(value) for value in args.sizes.split(",") if value.strip()):
+        legacy_ms, legacy_km, new_ms, new_km = [], [], [], []
+        for _ in range(args.rounds):
+            points, groups = _synthetic_day(rng, size)
+
+            started = time.perf_counter()
+            order = _legacy_nearest_neighbor(origin, points)
+            legacy_ms.append((time.perf_counter() - started) * 1000)
+            legacy_km.append(_length(origin, points, order))
+
+            started = time.perf_counter()
+            result = optimize_route(origin, points, groups=groups, time_budget=args.budget)
+            new_ms.append((time.perf_counter() - started) * 1000)
+            new_km.append(result.distance_after_km)
+
+        gain = 1 - statistics.mean(new_km) / statistics.mean(legacy_km)
+        print(
+            f"{size:>6} {statistics.median(legacy_ms):>10.2f} {statistics.mean(legacy_km):>10.2f}"
+            f" {statistics.median(new_ms):>9.2f} {statistics.mean(new_km):>9.2f} {gain:>7.1%}"
+        )
+    print("\n(o legado ignora condomínios; o novo mantém as unidades juntas)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+bench_product_events.py
+=======================
+Latência de um request com e sem ``track_event``: sem rastreamento, gravação
+síncrona (add + commit no request, o comportamento antigo) e fila em lote
+(``services.product_event_buffer``).
+
+Roda num SQLite em arquivo temporário (commit real em disco, como no
+Postgres) com um request mínimo em ``test_request_context``.
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_product_events.py [--requests 2000]
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _measure(app, requests, track):
+    from services.product_analytics import track_event
+
+    samples = []
+    for index in range(requests):
+        with app.test_request_context(f"/planos?utm_source=bench&i={index}"):
+            started = time.perf_counter()
+            if track:
+                track_event("pricing_viewed", plan="basico")
+            samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp(prefix="bench_events_")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmpdir}/bench.db"
+    os.environ.pop("DATABASE_URL", None)
+
+    from app import app, db
+    from models import ProductEvent
+    from services.product_event_buffer import event_buffer
+
+    app.config["TESTING"] = False
+    app.logger.setLevel(logging.WARNING)  # o log por evento dominaria a medição
+    with app.app_context():
+        db.create_all()
+
+        print(f"{'modo':<12} {'p50 ms':>8} {'p99 ms':>8}")
+        p50, p99 = _measure(app, args.requests, track=False)
+        print(f"{'sem evento':<12} {p50:>8.3f} {p99:>8.3f}")
+
+        app.config["PRODUCT_EVENTS_ASYNC"] = False
+        p50, p99 = _measure(app, args.requests, track=True)
+        print(f"{'síncrono':<12} {p50:>8.3f} {p99:>8.3f}")
+
+        app.config["PRODUCT_EVENTS_ASYNC"] = True
+        p50, p99 = _measure(app, args.requests, track=True)
+        event_buffer.shutdown()
+        print(f"{'em lote':<12} {p50:>8.3f} {p99:>8.3f}")
+
+        print(f"\nfila: {event_buffer.stats()}")
+        print(f"eventos gravados: {ProductEvent.query.count()}")
+
+
+if __name__ == "__main__":
+    main()
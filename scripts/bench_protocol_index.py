@@ -0,0 +1,141 @@
+"""
+bench_protocol_index.py
+=======================
+Latência de ``recommend_protocols`` (painel de sugestões da consulta) com
+1 mil e 10 mil protocolos ativos:
+
+* varredura antiga — carrega todos os protocolos com as três coleções em
+  ``selectinload`` e roda ``_score_protocol`` em cada um;
+* índice — ``ProtocolIndex`` da clínica em memória, pontuando só candidatos e
+  carregando as coleções dos ``limit`` vencedores.
+
+Também mede o tempo de montar o índice (primeira consulta após um save).
+Roda num SQLite em memória com protocolos sintéticos.
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_protocol_index.py [--sizes 1000 10000] [--queries 50]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+TERMOS = [
+    "otite", "dermatite", "tosse", "vomito", "diarreia", "fratura", "prurido", "febre", "apatia",
+    "anorexia", "poliuria", "polidipsia", "convulsao", "claudicacao", "dispneia", "ictericia",
+    "alopecia", "hematuria", "disuria", "epistaxe", "ataxia", "sialorreia", "tenesmo", "edema",
+]
+
+
+def _seed(db, size, rng):
+    from models import Clinica, ProtocoloClinico, ProtocoloClinicoExame
+
+    db.session.add(Clinica(id=1, nome="Clínica Bench"))
+    db.session.flush()
+    rows = [
+        {
+            "nome": f"Protocolo {index:05d} {rng.choice(TERMOS)}",
+            "suspeita_principal": f"{rng.choice(TERMOS)} {rng.choice(TERMOS)} {index}",
+            "especie": rng.choice([None, "cao", "gato"]),
+            "sinais_gatilho": " ".join(rng.sample(TERMOS, 4)),
+            "prioridade": rng.randint(1, 100),
+            "versao": 1,
+            "ativo": True,
+            "clinica_id": rng.choice([None, 1]),
+        }
+        for index in range(size)
+    ]
+    db.session.bulk_insert_mappings(ProtocoloClinico, rows)
+    db.session.flush()
+    exams = [
+        {"protocolo_id": pid, "nome": "Hemograma", "prioridade": 0}
+        for (pid,) in db.session.query(ProtocoloClinico.id)
+    ]
+    db.session.bulk_insert_mappings(ProtocoloClinicoExame, exams)
+    db.session.commit()
+
+
+def _old_recommend(context, clinic_id, limit=5):
+    from sqlalchemy import or_
+    from sqlalchemy.orm import selectinload
+
+    from models import ProtocoloClinico
+    from services.clinical_suggestions import _score_protocol, serialize_protocol
+
+    query = (
+        ProtocoloClinico.query
+        .options(
+            selectinload(ProtocoloClinico.exames_sugeridos),
+            selectinload(ProtocoloClinico.medicamentos_sugeridos),
+            selectinload(ProtocoloClinico.retornos_sugeridos),
+        )
+        .filter_by(ativo=True)
+        .filter(or_(ProtocoloClinico.clinica_id.is_(None), ProtocoloClinico.clinica_id == clinic_id))
+    )
+    ranked = []
+    for protocol in query.order_by(ProtocoloClinico.prioridade.asc(), ProtocoloClinico.nome.asc()).all():
+        score, reasons = _score_protocol(protocol, context)
+        if score > 0:
+            ranked.append((score, protocol, reasons))
+    ranked.sort(key=lambda entry: entry[0], reverse=True)
+    return [serialize_protocol(protocol, context, reasons, score) for score, protocol, reasons in ranked[:limit]]
+
+
+def _contexts(rng, count):
+    return [
+        {
+            "suspeita_clinica": rng.choice(TERMOS),
+            "queixa_principal": " ".join(rng.sample(TERMOS, 2)),
+            "historico_clinico": rng.choice(TERMOS),
+            "especie": rng.choice(["cao", "gato", None]),
+        }
+        for _ in range(count)
+    ]
+
+
+def _measure(label, db, recommend, contexts):
+    started = time.perf_counter()
+    for context in contexts:
+        recommend(context, 1)
+        db.session.expunge_all()
+    elapsed = time.perf_counter() - started
+    print(f"  {label:<26} {elapsed * 1000 / len(contexts):8.2f} ms/consulta")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    from app import app, db
+    from services.clinical_suggestions import protocol_index, recommend_protocols, reset_protocol_index
+
+    rng = random.Random(42)
+    with app.app_context():
+        for size in args.sizes:
+            db.create_all()
+            _seed(db, size, rng)
+            contexts = _contexts(rng, args.queries)
+            print(f"{size} protocolos")
+
+            reset_protocol_index()
+            started = time.perf_counter()
+            index = protocol_index(1)
+            print(f"  {'montagem do índice':<26} {(time.perf_counter() - started) * 1000:8.2f} ms ({len(index)} protocolos)")
+            _measure("varredura (antigo)", db, _old_recommend, contexts[: max(1, args.queries // 5)])
+            _measure("índice", db, lambda context, clinic_id: recommend_protocols(context, clinic_id=clinic_id), contexts)
+
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+bench_sfa_analysis.py
+=====================
+Análise de respostas (``/sfa/analise-respostas``) e exportação analítica
+(``/sfa/export/analitico.csv``) sobre coortes sintéticas geradas com
+``gerar_lote_pacientes_teste_sfa``:
+
+* antigo — T10/T30 carregados paciente a paciente e cada ``dados_json``
+  decodificado de novo a cada uso (cache limpo antes de cada rodada);
+* em lote — ``carregar_respostas_em_lote`` (uma query por etapa) e payloads
+  e schemas já decodificados em memória.
+
+Mostra tempo e número de statements SQL. Roda num SQLite em memória.
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_sfa_analysis.py [--sizes 500 2000] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+def _seed(db, size):
+    from models.sfa import SfaPaciente, SfaSinanLog
+    from services.sfa_service import gerar_lote_pacientes_teste_sfa
+
+    lote = 0
+    while SfaPaciente.query.count() < size:
+        resumo = gerar_lote_pacientes_teste_sfa(min(100, size - SfaPaciente.query.count()))
+        lote += 1
+        # O lote usa o segundo atual no token e na chave do SINAN; renomeia
+        # para que o próximo lote, no mesmo segundo, não colida.
+        for paciente in SfaPaciente.query.filter(SfaPaciente.id_estudo.in_(resumo["ids_estudo"])):
+            paciente.token_acesso = f"{paciente.token_acesso}-{lote}"
+        for log in SfaSinanLog.query.filter(SfaSinanLog.id_estudo_vinculado.in_(resumo["ids_estudo"])):
+            log.chave_dedup = f"{log.chave_dedup}-{lote}"
+        db.session.commit()
+
+
+class _Counter:
+    def __init__(self):
+        self.statements = 0
+
+    def __call__(self, *_args):
+        self.statements += 1
+
+
+def _measure(label, db, counter, run, repeat):
+    from models.sfa import SfaPaciente
+
+    counter.statements = 0
+    elapsed = 0.0
+    for _ in range(repeat):
+        db.session.expunge_all()
+        started = time.perf_counter()
+        run(SfaPaciente.query.order_by(SfaPaciente.id).all())
+        elapsed += time.perf_counter() - started
+    print(f"  {label:<24} {elapsed * 1000 / repeat:9.1f} ms  statements={counter.statements // repeat}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 2000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from sqlalchemy import event
+
+    from app import app, db
+    from services.sfa_service import (
+        carregar_respostas_em_lote,
+        gerar_csv_exportacao_analitica,
+        limpar_cache_formularios_sfa,
+        montar_analise_respostas,
+    )
+
+    def antigo(pacientes):
+        limpar_cache_formularios_sfa()
+        montar_analise_respostas(pacientes)
+        limpar_cache_formularios_sfa()
+        gerar_csv_exportacao_analitica(pacientes)
+
+    def em_lote(pacientes):
+        pacientes = carregar_respostas_em_lote(pacientes)
+        montar_analise_respostas(pacientes)
+        gerar_csv_exportacao_analitica(pacientes)
+
+    with app.app_context():
+        for size in args.sizes:
+            db.create_all()
+            _seed(db, size)
+            counter = _Counter()
+            event.listen(db.engine, "before_cursor_execute", counter)
+            print(f"{size} pacientes (análise + CSV analítico)")
+            _measure("antigo", db, counter, antigo, args.repeat)
+            limpar_cache_formularios_sfa()
+            _measure("em lote", db, counter, em_lote, args.repeat)
+            event.remove(db.engine, "before_cursor_execute", counter)
+            db.session.remove()
+            db.drop_all()
+
+
+if __name__ == "__main__":
+    main()
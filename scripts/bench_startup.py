@@ -0,0 +1,156 @@
+"""
+bench_startup.py
+================
+Tempo de import do ``app.py`` (cold start de um worker) por fase, medido em
+processos novos:
+
+* fases — ``startup_profile.as_dict()`` (imports, config, extensions, admin,
+  schema_guards, routes, blueprints), mediana de ``--runs`` imports;
+* módulos — os maiores tempos cumulativos de ``python -X importtime``;
+* SDKs — confirma que boto3, googleapiclient, zeep e reportlab continuam
+  fora do import (só carregam no primeiro uso);
+* aliases — registro de blueprints com alias no formato antigo (varrendo o
+  ``url_map`` por regra) e indexado, num app sintético com ``--routes`` rotas
+  (duas rules por endpoint, o caso em que a varredura antiga se repetia).
+
+Uso:
+  cd <raiz do projeto>
+  python scripts/bench_startup.py [--runs 5] [--top 15] [--routes 400 1600]
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite:///:memory:")
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+HEAVY_SDKS = ("boto3", "googleapiclient", "zeep", "reportlab")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+elapsed = time.perf_counter() - started
+from startup_profile import startup_profile
+print(json.dumps({
+    "import_ms": round(elapsed * 1000, 1),
+    "profile": startup_profile.as_dict(),
+    "sdks": sorted(name for name in %r if name in sys.modules),
+}))
+""" % (HEAVY_SDKS,)
+
+
+def _env():
+    env = dict(os.environ)
+    env.pop("STARTUP_PROFILE", None)
+    return env
+
+
+def _probe_once():
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE],
+        cwd=PROJECT_ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def _importtime(top):
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=PROJECT_ROOT, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        # Só módulos importados direto pelo app (nível 1 de indentação).
+        if match and len(match.group(2)) <= 3 and match.group(3) != "app":
+            rows.append((int(match.group(1)), match.group(3)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def _legacy_register_with_alias(app, blueprint):
+    """Registro como era antes do índice (varre o url_map por regra)."""
+    app.register_blueprint(blueprint)
+    prefix = f"{blueprint.name}."
+    existing_endpoints = set(app.view_functions)
+    for rule in list(app.url_map.iter_rules()):
+        if not rule.endpoint.startswith(prefix):
+            continue
+        alias = rule.endpoint[len(prefix):]
+        if alias in existing_endpoints:
+            if app.view_functions[alias] is not app.view_functions[rule.endpoint]:
+                continue
+            if any(r.rule == rule.rule for r in app.url_map.iter_rules() if r.endpoint == alias):
+                continue
+        app.add_url_rule(
+            rule.rule, endpoint=alias, view_func=app.view_functions[rule.endpoint],
+            methods=rule.methods, defaults=rule.defaults,
+        )
+        existing_endpoints.add(alias)
+
+
+def _synthetic_blueprints(total_routes, per_blueprint=50):
+    from flask import Blueprint
+
+    blueprints = []
+    for index in range(0, total_routes, per_blueprint):
+        blueprint = Blueprint(f"dominio{index}", __name__)
+        # Duas rules por endpoint (rota nova + legada), como /animal/<id>/editar.
+        for route in range(index, min(total_routes, index + per_blueprint), 2):
+            view = lambda item_id: ""  # noqa: E731
+            blueprint.add_url_rule(f"/r{route}/<int:item_id>", f"rota_{route}", view)
+            blueprint.add_url_rule(f"/legado/r{route}/<int:item_id>", f"rota_{route}", view)
+        blueprints.append(blueprint)
+    return blueprints
+
+
+def _time_aliasing(register, total_routes):
+    from flask import Flask
+
+    app = Flask(__name__)
+    blueprints = _synthetic_blueprints(total_routes)
+    started = time.perf_counter()
+    for blueprint in blueprints:
+        register(app, blueprint)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--routes", type=int, nargs="+", default=[400, 1600])
+    args = parser.parse_args()
+
+    samples = [_probe_once() for _ in range(args.runs)]
+    print(f"import app ({args.runs} processos, mediana)")
+    print(f"  {'total':<16} {statistics.median(s['import_ms'] for s in samples):9.1f} ms")
+    for phase in samples[0]["profile"]["phases"]:
+        median = statistics.median(s["profile"]["phases"].get(phase, 0.0) for s in samples)
+        print(f"  {phase:<16} {median:9.1f} ms")
+    loaded = sorted({name for sample in samples for name in sample["sdks"]})
+    print(f"  SDKs pesados carregados no import: {', '.join(loaded) or 'nenhum'}")
+
+    print("\nmaiores imports diretos (-X importtime, cumulativo)")
+    for micros, name in _importtime(args.top):
+        print(f"  {name:<40} {micros / 1000:9.1f} ms")
+
+    from blueprint_utils import _register_with_alias
+
+    print("\nregistro de blueprints com alias")
+    for total in args.routes:
+        legacy = _time_aliasing(_legacy_register_with_alias, total)
+        indexed = _time_aliasing(_register_with_alias, total)
+        print(f"  {total:>5} rotas  antigo={legacy:9.1f} ms  indexado={indexed:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
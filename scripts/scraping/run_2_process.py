@@ -22,16 +22,34 @@ USO:
 
     # Limitar quantidade processada:
     python scripts/scraping/run_2_process.py --limite 100
+
+    # Reprocessar tudo, mesmo páginas inalteradas, com 4 processos:
+    python scripts/scraping/run_2_process.py --forcar --workers 4
+
+INCREMENTAL:
+    O parse roda num pool de processos (--workers, padrão = núcleos) e um único
+    escritor grava no banco em lotes (--lote, padrão 50; SAVEPOINT por produto,
+    um commit por lote).  Cada pid importado fica em
+    data/process_checkpoint.sqlite com o hash do HTML e a versão do parser
+    (PARSER_REV + hash do código de importar_medicamentos_vetsmart.py, mais
+    modelo e prompt do LLM quando --usar-llm); a
+    próxima execução pula páginas com o mesmo par.  Mudou o parser, tudo é
+    reprocessado; mudou só um HTML, só ele.  Ao fim são impressos páginas/s e
+    o tempo de cada etapa (hash, parse, banco).
 """
 
 import os
 import sys
 import json
 import re
+import time
+import sqlite3
+import hashlib
 import argparse
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 # ---------------------------------------------------------------------------
 # UTF-8 no console Windows
@@ -76,20 +94,93 @@ except ImportError:
 BASE_DIR  = _ROOT
 HTML_DIR  = BASE_DIR / "data" / "vetsmart_html"
 LOG_FILE  = BASE_DIR / "data" / "process.log"
+CKPT_FILE = BASE_DIR / "data" / "process_checkpoint.sqlite"
 
-LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+# Suba ao mudar validação/normalização DESTE arquivo; mudanças no parser
+# (importar_medicamentos_vetsmart.py) já mudam a versão pelo hash do código.
+PARSER_REV = 1
+# Modelo da extração de doses com --usar-llm (entra na versão do checkpoint).
+LLM_MODEL = "claude-haiku-4-5-20251001"
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler(str(LOG_FILE), encoding="utf-8"),
-    ],
-)
 log = logging.getLogger(__name__)
 
 
+def configurar_log() -> None:
+    # Fica fora do import: os processos do pool reimportam o módulo e não
+    # devem abrir o arquivo de log de novo.
+    LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s [%(levelname)s] %(message)s",
+        handlers=[
+            logging.StreamHandler(sys.stdout),
+            logging.FileHandler(str(LOG_FILE), encoding="utf-8"),
+        ],
+    )
+
+
+def versao_parser(usar_llm: bool = False) -> str:
+    """Versão gravada no checkpoint: rodar com ou sem LLM (ou trocar o modelo
+    ou o prompt) muda o resultado, então reprocessa as páginas."""
+    import importar_medicamentos_vetsmart as parser_mod
+
+    codigo = Path(parser_mod.__file__).read_bytes()
+    versao = f"{PARSER_REV}-{hashlib.sha1(codigo).hexdigest()[:12]}"
+    if usar_llm:
+        prompt = hashlib.sha1(_LLM_PROMPT_DOSES.encode("utf-8")).hexdigest()[:8]
+        versao += f"+llm-{LLM_MODEL}-{prompt}"
+    return versao
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint SQLite (hash do HTML + versão do parser por pid)
+# ---------------------------------------------------------------------------
+def abrir_checkpoint(path: Optional[Path] = None) -> sqlite3.Connection:
+    path = path or CKPT_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ckpt = sqlite3.connect(str(path))
+    ckpt.execute("""
+        CREATE TABLE IF NOT EXISTS processado (
+            pid            INTEGER PRIMARY KEY,
+            html_hash      TEXT NOT NULL,
+            parser_versao  TEXT NOT NULL,
+            status         TEXT NOT NULL,
+            atualizado     TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    ckpt.commit()
+    return ckpt
+
+
+def carregar_checkpoint(ckpt) -> Dict[int, Tuple[str, str]]:
+    return {
+        pid: (html_hash, versao)
+        for pid, html_hash, versao in ckpt.execute(
+            "SELECT pid, html_hash, parser_versao FROM processado"
+        )
+    }
+
+
+def marcar_processados(ckpt, linhas: List[Tuple[int, str, str, str]]) -> None:
+    """Grava ``(pid, html_hash, parser_versao, status)`` de um lote já comitado."""
+    if not linhas:
+        return
+    ckpt.executemany("""
+        INSERT INTO processado (pid, html_hash, parser_versao, status, atualizado)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(pid) DO UPDATE SET
+            html_hash     = excluded.html_hash,
+            parser_versao = excluded.parser_versao,
+            status        = excluded.status,
+            atualizado    = CURRENT_TIMESTAMP
+    """, linhas)
+    ckpt.commit()
+
+
+def hash_html(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
 # ---------------------------------------------------------------------------
 # Validação de doses antes da inserção
 # ---------------------------------------------------------------------------
@@ -205,7 +296,7 @@ def extrair_doses_com_llm(texto_admin: str, nome_produto: str) -> List[Dict]:
 
     try:
         msg = cliente.messages.create(
-            model="claude-haiku-4-5-20251001",
+            model=LLM_MODEL,
             max_tokens=1500,
             messages=[{"role": "user", "content": prompt}],
         )
@@ -274,51 +365,100 @@ def processar_html(pid: int, html: str, usar_llm: bool) -> Optional[Any]:
     return prod
 
 
+def _parse_worker(tarefa: Tuple[int, str, bool]) -> Tuple[int, Optional[Any], float]:
+    """Roda num processo do pool: lê e parseia um HTML.
+
+    Devolve ``(pid, produto ou None, segundos de parse)``.
+    """
+    pid, path, usar_llm = tarefa
+    inicio = time.perf_counter()
+    try:
+        html = Path(path).read_text(encoding="utf-8", errors="replace")
+    except OSError as e:
+        log.warning(f"  Erro ao ler {path}: {e}")
+        return pid, None, time.perf_counter() - inicio
+    prod = processar_html(pid, html, usar_llm=usar_llm)
+    return pid, prod, time.perf_counter() - inicio
+
+
+def parsear(tarefas: List[Tuple[int, str, bool]], workers: int):
+    """Itera ``_parse_worker`` sobre as tarefas, em paralelo se ``workers > 1``."""
+    if workers <= 1 or len(tarefas) <= 1:
+        yield from map(_parse_worker, tarefas)
+        return
+    chunksize = max(1, min(16, len(tarefas) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_parse_worker, tarefas, chunksize=chunksize)
+
+
 # ---------------------------------------------------------------------------
-# Importação para o banco
+# Importação para o banco (escritor único, em lotes)
 # ---------------------------------------------------------------------------
-def importar_produto(conn, prod, dry_run: bool) -> Dict[str, int]:
-    stats = {"apres": 0, "doses": 0, "med_novo": 0, "med_atualizado": 0}
+def _importar_produto(cur, prod) -> Dict[str, int]:
+    pa_norm = _norm(prod.principio_ativo or "")
+    existia = False
+    if pa_norm:
+        cur.execute("""
+            SELECT 1 FROM medicamento
+            WHERE LOWER(REGEXP_REPLACE(
+                    TRANSLATE(principio_ativo,
+                              'áàâãäéèêëíìîïóòôõöúùûüçÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇ',
+                              'aaaaaeeeeiiiiooooouuuucAAAAAEEEEIIIIOOOOOUUUUC'),
+                    '\\s+', ' ', 'g')) = %s
+            LIMIT 1
+        """, (pa_norm,))
+        existia = cur.fetchone() is not None
+
+    med_id = _encontrar_ou_criar_medicamento_por_pa(cur, prod)
+    return {
+        "apres": _inserir_apresentacoes_consolidado(cur, med_id, prod),
+        "doses": _inserir_doses_consolidado(cur, med_id, prod.doses or []),
+        "med_novo": 0 if existia else 1,
+        "med_atualizado": 1 if existia else 0,
+    }
 
-    if dry_run:
-        log.info(
-            f"  [dry-run] {prod.nome!r} PA={prod.principio_ativo!r} "
-            f"apres={len(prod.apresentacoes)} doses={len(prod.doses)}"
-        )
-        return stats
 
+def importar_lote(conn, prods: List[Any], dry_run: bool) -> Tuple[Dict[str, int], List[int]]:
+    """Importa um lote numa transação; devolve ``(stats, pids gravados)``.
+
+    Cada produto roda sob SAVEPOINT: erro num produto desfaz só ele, e o lote
+    inteiro sai num único commit.
+    """
+    stats = {"apres": 0, "doses": 0, "med_novo": 0, "med_atualizado": 0, "erros_db": 0}
+
+    if dry_run:
+        for prod in prods:
+            log.info(
+                f"  [dry-run] {prod.nome!r} PA={prod.principio_ativo!r} "
+                f"apres={len(prod.apresentacoes)} doses={len(prod.doses)}"
+            )
+        return stats, []
+
+    gravados = []
     try:
         with conn.cursor() as cur:
-            pa_norm = _norm(prod.principio_ativo or "")
-            existia = False
-            if pa_norm:
-                cur.execute("""
-                    SELECT 1 FROM medicamento
-                    WHERE LOWER(REGEXP_REPLACE(
-                            TRANSLATE(principio_ativo,
-                                      'áàâãäéèêëíìîïóòôõöúùûüçÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇ',
-                                      'aaaaaeeeeiiiiooooouuuucAAAAAEEEEIIIIOOOOOUUUUC'),
-                            '\\s+', ' ', 'g')) = %s
-                    LIMIT 1
-                """, (pa_norm,))
-                existia = cur.fetchone() is not None
-
-            med_id = _encontrar_ou_criar_medicamento_por_pa(cur, prod)
-            n_apres = _inserir_apresentacoes_consolidado(cur, med_id, prod)
-            n_doses = _inserir_doses_consolidado(cur, med_id, prod.doses or [])
-
-            stats["apres"]  = n_apres
-            stats["doses"]  = n_doses
-            stats["med_novo"]        = 0 if existia else 1
-            stats["med_atualizado"]  = 1 if existia else 0
-
+            for prod in prods:
+                cur.execute("SAVEPOINT produto")
+                try:
+                    parcial = _importar_produto(cur, prod)
+                except Exception as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT produto")
+                    log.error(f"  ✗ ERRO DB para {prod.nome!r}: {e}")
+                    stats["erros_db"] += 1
+                    continue
+                cur.execute("RELEASE SAVEPOINT produto")
+                for chave, valor in parcial.items():
+                    stats[chave] += valor
+                gravados.append(prod.vetsmart_id)
         conn.commit()
-
     except Exception as e:
-        log.error(f"  ✗ ERRO DB para {prod.nome!r}: {e}")
+        log.error(f"  ✗ ERRO DB no lote ({len(prods)} produtos): {e}")
         conn.rollback()
+        stats = {chave: 0 for chave in stats}
+        stats["erros_db"] = len(prods)
+        return stats, []
 
-    return stats
+    return stats, gravados
 
 
 # ---------------------------------------------------------------------------
@@ -338,7 +478,14 @@ def main():
                         help="Processa no máximo N produtos (0 = todos).")
     parser.add_argument("--html-dir",  type=str, default=str(HTML_DIR),
                         help="Diretório com os HTMLs (padrão: data/vetsmart_html/).")
+    parser.add_argument("--workers",   type=int, default=os.cpu_count() or 1,
+                        help="Processos de parse (padrão: núcleos; 1 = sem pool).")
+    parser.add_argument("--lote",      type=int, default=50,
+                        help="Produtos por commit no banco (padrão: 50).")
+    parser.add_argument("--forcar",    action="store_true",
+                        help="Ignora o checkpoint e reprocessa páginas inalteradas.")
     args = parser.parse_args()
+    configurar_log()
 
     html_dir = Path(args.html_dir)
     if not html_dir.exists():
@@ -355,59 +502,111 @@ def main():
         html_files = html_files[:args.limite]
 
     total = len(html_files)
-    log.info(f"Produtos a processar: {total} | dry_run={args.dry_run} | usar_llm={args.usar_llm}")
-
-    conn = conectar_banco()
+    versao = versao_parser(args.usar_llm)
+    log.info(
+        f"Produtos a processar: {total} | dry_run={args.dry_run} | usar_llm={args.usar_llm} "
+        f"| workers={args.workers} | parser={versao}"
+    )
 
     acum = {
-        "processados": 0, "ignorados": 0, "erros": 0,
+        "processados": 0, "ignorados": 0, "erros": 0, "pulados": 0, "erros_db": 0,
         "apres": 0, "doses": 0, "med_novos": 0, "med_atualizados": 0,
     }
-
-    for i, html_path in enumerate(html_files, 1):
+    tempos = {"hash": 0.0, "parse": 0.0, "banco": 0.0}
+    inicio = time.perf_counter()
+
+    # Etapa 1 — hash do conteúdo e descarte das páginas já processadas
+    ckpt = abrir_checkpoint()
+    vistos = {} if args.forcar else carregar_checkpoint(ckpt)
+    hashes: Dict[int, str] = {}
+    tarefas = []
+    t0 = time.perf_counter()
+    for html_path in html_files:
         pid = int(html_path.stem)
-        log.info(f"[{i}/{total}] pid={pid}")
-
         try:
-            html = html_path.read_text(encoding="utf-8", errors="replace")
-        except Exception as e:
+            html_hash = hash_html(html_path)
+        except OSError as e:
             log.warning(f"  Erro ao ler {html_path}: {e}")
             acum["erros"] += 1
             continue
-
-        prod = processar_html(pid, html, usar_llm=args.usar_llm)
-        if prod is None:
-            acum["ignorados"] += 1
+        if vistos.get(pid) == (html_hash, versao):
+            acum["pulados"] += 1
             continue
-
-        log.info(
-            f"  ✓ {prod.nome!r} PA={prod.principio_ativo!r} "
-            f"apres={len(prod.apresentacoes)} doses={len(prod.doses)}"
-        )
-
-        stats = importar_produto(conn, prod, dry_run=args.dry_run)
-        acum["processados"] += 1
+        hashes[pid] = html_hash
+        tarefas.append((pid, str(html_path), args.usar_llm))
+    tempos["hash"] = time.perf_counter() - t0
+    log.info(f"Inalterados (pulados): {acum['pulados']} | a parsear: {len(tarefas)}")
+
+    conn = conectar_banco() if tarefas else None
+
+    # Etapas 2 e 3 — parse no pool, escrita em lotes pelo processo principal
+    lote: List[Any] = []
+    marcas: List[Tuple[int, str, str, str]] = []
+
+    def descarregar():
+        t_db = time.perf_counter()
+        stats, gravados = importar_lote(conn, lote, dry_run=args.dry_run)
+        tempos["banco"] += time.perf_counter() - t_db
+        acum["processados"]     += len(gravados) if not args.dry_run else len(lote)
+        acum["erros_db"]        += stats["erros_db"]
         acum["apres"]           += stats["apres"]
         acum["doses"]           += stats["doses"]
         acum["med_novos"]       += stats["med_novo"]
         acum["med_atualizados"] += stats["med_atualizado"]
-
-    conn.close()
-
+        if not args.dry_run:
+            marcas.extend((pid, hashes[pid], versao, "importado") for pid in gravados)
+            marcar_processados(ckpt, marcas)
+        lote.clear()
+        marcas.clear()
+
+    for i, (pid, prod, segundos) in enumerate(parsear(tarefas, args.workers), 1):
+        tempos["parse"] += segundos
+        if prod is None:
+            acum["ignorados"] += 1
+            # Mesmo HTML + mesmo parser = mesmo resultado: não tenta de novo.
+            marcas.append((pid, hashes[pid], versao, "ignorado"))
+        else:
+            log.info(
+                f"[{i}/{len(tarefas)}] pid={pid} ✓ {prod.nome!r} PA={prod.principio_ativo!r} "
+                f"apres={len(prod.apresentacoes)} doses={len(prod.doses)}"
+            )
+            lote.append(prod)
+        if len(lote) >= args.lote:
+            descarregar()
+        if i % 200 == 0:
+            decorrido = time.perf_counter() - inicio
+            log.info(f"  {i}/{len(tarefas)} páginas — {i / decorrido:.1f} páginas/s")
+    if lote or marcas:
+        descarregar()
+
+    if conn is not None:
+        conn.close()
+    ckpt.close()
+
+    decorrido = time.perf_counter() - inicio
+    paginas_s = len(tarefas) / decorrido if decorrido else 0.0
     print(f"""
 {'='*65}
   RESULTADO — Fase 2 (process)
 {'='*65}
   HTMLs lidos:           {total}
+  Inalterados (pulados): {acum['pulados']}
   Processados:           {acum['processados']}
   Ignorados:             {acum['ignorados']}
   Erros leitura:         {acum['erros']}
+  Erros banco:           {acum['erros_db']}
   Medicamentos novos:    {acum['med_novos']}
   Medicamentos updtd:    {acum['med_atualizados']}
   Apresentações inser.:  {acum['apres']}
   Doses inseridas:       {acum['doses']}
   Dry-run:               {'SIM' if args.dry_run else 'NÃO'}
   LLM:                   {'SIM' if args.usar_llm else 'NÃO'}
+{'-'*65}
+  Parser:                {versao} ({args.workers} workers)
+  Tempo total:           {decorrido:.1f} s ({paginas_s:.1f} páginas/s)
+  Hash + checkpoint:     {tempos['hash']:.1f} s
+  Parse (soma workers):  {tempos['parse']:.1f} s
+  Banco (lotes de {args.lote}):  {tempos['banco']:.1f} s
 {'='*65}
 """)
 
@@ -0,0 +1,64 @@
+"""Reconstrução em lote de ``animal_activity`` e de ``Animal.search_key``.
+
+No dia a dia as linhas são mantidas pelo listener de flush em
+``models.pacientes``; este módulo cobre a carga inicial e reparos. O cursor
+fica em ``JobCheckpoint`` para o comando retomar de onde parou.
+"""
+
+from __future__ import annotations
+
+from extensions import db
+from models import Animal, JobCheckpoint
+from models.pacientes import animal_search_key, refresh_animal_activity
+
+CHECKPOINT_KEY = "animal_activity_backfill"
+
+
+def backfill_animal_activity(*, batch_size: int = 500, restart: bool = False) -> dict[str, int]:
+    """Recalcula atividade e chave de busca de todos os animais, em lotes por id."""
+    if restart:
+        JobCheckpoint.set(CHECKPOINT_KEY, 0)
+        db.session.commit()
+
+    cursor = JobCheckpoint.get(CHECKPOINT_KEY)
+    stats = {"animals": 0, "activity_rows": 0, "batches": 0}
+    animal_table = Animal.__table__
+    while True:
+        batch = db.session.execute(
+            db.select(
+                animal_table.c.id,
+                animal_table.c.name,
+                animal_table.c.microchip_number,
+                animal_table.c.search_key,
+            )
+            .where(animal_table.c.id > cursor)
+            .order_by(animal_table.c.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+
+        connection = db.session.connection()
+        changed = [
+            {"row_id": animal_id, "key": key}
+            for animal_id, name, microchip, current_key in batch
+            if (key := animal_search_key(name, microchip)) != current_key
+        ]
+        if changed:
+            connection.execute(
+                animal_table.update()
+                .where(animal_table.c.id == db.bindparam("row_id"))
+                .values(search_key=db.bindparam("key")),
+                changed,
+            )
+        stats["activity_rows"] += refresh_animal_activity(connection, [row.id for row in batch])
+
+        cursor = batch[-1].id
+        JobCheckpoint.set(CHECKPOINT_KEY, cursor)
+        db.session.commit()
+        stats["animals"] += len(batch)
+        stats["batches"] += 1
+
+    JobCheckpoint.set(CHECKPOINT_KEY, 0)
+    db.session.commit()
+    return stats
@@ -5,33 +5,16 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Iterable, List, Optional
 
-from sqlalchemy import func, or_, true
+from sqlalchemy import and_, func, or_, select
 from sqlalchemy.orm import contains_eager, joinedload
 
-from extensions import db
-from models import Animal
-from models.agenda import Appointment
+from models import Animal, AnimalActivity
+from models.pacientes import animal_search_key
 
 DEFAULT_LIMIT = 50
 VALID_SORTS = {"name_asc", "recent_added", "recent_attended"}
 
 
-def _build_last_appointment_subquery(clinic_scope: Optional[int]):
-    """Return a subquery selecting the last appointment per animal."""
-    query = (
-        db.session.query(
-            Appointment.animal_id,
-            func.max(Appointment.scheduled_at).label("last_at"),
-        )
-        .group_by(Appointment.animal_id)
-    )
-
-    if clinic_scope:
-        query = query.filter(Appointment.clinica_id == clinic_scope)
-
-    return query.subquery()
-
-
 def _coerce_sort(value: Optional[str]) -> str:
     if not value:
         return "recent_added"
@@ -55,7 +38,9 @@ def search_animals(
 
     like_term = f"%{(term or '').strip()}%"
 
-    last_appt = _build_last_appointment_subquery(clinic_scope)
+    # One activity row per animal: the scoped clinic's, or the all-clinics row.
+    activity_scope = clinic_scope or AnimalActivity.ALL_CLINICS
+    last_appointment_at = AnimalActivity.last_appointment_at
 
     # outerjoin Species and Breed so we can filter by their names
     query = (
@@ -67,18 +52,25 @@ def search_animals(
             contains_eager(Animal.species),
             contains_eager(Animal.breed),
         )
-        .outerjoin(last_appt, Animal.id == last_appt.c.animal_id)
-        .add_columns(last_appt.c.last_at.label("last_appointment_at"))
+        .outerjoin(
+            AnimalActivity,
+            and_(
+                AnimalActivity.animal_id == Animal.id,
+                AnimalActivity.clinica_id == activity_scope,
+            ),
+        )
+        .add_columns(last_appointment_at.label("last_appointment_at"))
         .filter(Animal.removido_em.is_(None))
     )
 
-    # Apply text filter only when a term is provided
+    # Apply text filter only when a term is provided. Name and microchip match
+    # the normalized search_key (trigram-indexed on Postgres); species and
+    # breed are small lookup tables, resolved to ids in subqueries.
     if (term or '').strip():
         filters = [
-            Animal.name.ilike(like_term),
-            Animal.microchip_number.ilike(like_term),
-            Species.name.ilike(like_term),
-            Breed.name.ilike(like_term),
+            Animal.search_key.like(f"%{animal_search_key(term)}%"),
+            Animal.species_id.in_(select(Species.id).where(Species.name.ilike(like_term))),
+            Animal.breed_id.in_(select(Breed.id).where(Breed.name.ilike(like_term))),
         ]
         query = query.filter(or_(*filters))
 
@@ -96,7 +88,7 @@ def search_animals(
     if sort_value == "name_asc":
         query = query.order_by(Animal.name.asc())
     elif sort_value == "recent_attended":
-        query = query.order_by(func.coalesce(last_appt.c.last_at, Animal.date_added).desc())
+        query = query.order_by(func.coalesce(last_appointment_at, Animal.date_added).desc())
     else:
         query = query.order_by(Animal.date_added.desc())
 
@@ -0,0 +1,271 @@
+"""Batch availability engine for veterinarian schedules.
+
+``helpers.get_available_times`` and ``helpers.get_weekly_schedule`` used to
+load appointments/exams twice per day (UTC and local windows) and then call
+``has_conflict_for_slot`` for every 30-minute slot. This module loads
+schedules, appointments and exams for many vets and many days in a single
+pass (three queries total) and computes free slots with a sorted sweep over
+merged busy intervals.
+
+Conflict semantics are the same as ``has_conflict_for_slot``: each stored
+``scheduled_at`` is expanded with ``_local_start_candidates`` (naive UTC and
+naive BRT interpretations of legacy data) and a slot is busy when it
+overlaps any of those intervals.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import datetime, time, timedelta
+
+from extensions import db
+from helpers import (
+    MAX_APPOINTMENT_DURATION,
+    _local_start_candidates,
+    _to_utc_naive,
+    get_appointment_duration,
+)
+from time_utils import normalize_to_utc
+
+SLOT_STEP = timedelta(minutes=30)
+WEEKDAY_NAMES = ('Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado', 'Domingo')
+
+
+@dataclass
+class VetAvailabilityData:
+    """Raw scheduling data for one veterinarian inside the loaded range."""
+
+    schedules_by_day: dict = field(default_factory=dict)
+    # (start_local, end_local) pairs, one per interpretation of each booking.
+    busy: list = field(default_factory=list)
+    # Naive UTC start of each booking (used by the weekly grid).
+    booked_utc: set = field(default_factory=set)
+    _merged: list | None = None
+    _merged_starts: list | None = None
+
+    def merged_busy(self):
+        """Return busy intervals sorted by start with overlaps merged."""
+
+        if self._merged is None:
+            merged = []
+            for start, end in sorted(self.busy):
+                if merged and start <= merged[-1][1]:
+                    if end > merged[-1][1]:
+                        merged[-1][1] = end
+                else:
+                    merged.append([start, end])
+            self._merged = [(start, end) for start, end in merged]
+            self._merged_starts = [start for start, _ in self._merged]
+        return self._merged
+
+
+def load_availability(vet_ids, start_date, end_date):
+    """Load schedules and bookings for ``vet_ids`` between two dates.
+
+    ``end_date`` is inclusive. Returns a dict ``{vet_id: VetAvailabilityData}``
+    built from exactly three queries regardless of the number of vets/days.
+    """
+
+    from models.agenda import Appointment, ExamAppointment, VetSchedule
+
+    vet_ids = sorted({int(v) for v in vet_ids if v is not None})
+    data = {vet_id: VetAvailabilityData() for vet_id in vet_ids}
+    if not vet_ids:
+        return data
+
+    schedules = (
+        VetSchedule.query
+        .filter(VetSchedule.veterinario_id.in_(vet_ids))
+        .order_by(VetSchedule.veterinario_id, VetSchedule.hora_inicio)
+        .all()
+    )
+    for schedule in schedules:
+        data[schedule.veterinario_id].schedules_by_day.setdefault(
+            schedule.dia_semana, []
+        ).append(schedule)
+
+    # A single window covering both the naive-local and the UTC readings of
+    # the range. UTC is ahead of BRT, so local start / UTC end bound both.
+    local_start = datetime.combine(start_date, time.min) - MAX_APPOINTMENT_DURATION
+    local_end = datetime.combine(end_date + timedelta(days=1), time.min) + MAX_APPOINTMENT_DURATION
+    utc_start = normalize_to_utc(local_start).replace(tzinfo=None)
+    utc_end = normalize_to_utc(local_end).replace(tzinfo=None)
+    window_start = min(local_start, utc_start)
+    window_end = max(local_end, utc_end)
+
+    appointment_rows = (
+        db.session.query(Appointment.veterinario_id, Appointment.scheduled_at, Appointment.kind)
+        .filter(
+            Appointment.veterinario_id.in_(vet_ids),
+            Appointment.scheduled_at > window_start,
+            Appointment.scheduled_at < window_end,
+        )
+        .all()
+    )
+    exam_rows = (
+        db.session.query(ExamAppointment.specialist_id, ExamAppointment.scheduled_at)
+        .filter(
+            ExamAppointment.specialist_id.in_(vet_ids),
+            ExamAppointment.scheduled_at > window_start,
+            ExamAppointment.scheduled_at < window_end,
+        )
+        .all()
+    )
+
+    durations = {}
+
+    def _duration(kind):
+        kind = kind or 'consulta'
+        if kind not in durations:
+            durations[kind] = get_appointment_duration(kind)
+        return durations[kind]
+
+    bookings = [(vet_id, scheduled_at, _duration(kind)) for vet_id, scheduled_at, kind in appointment_rows]
+    bookings.extend((vet_id, scheduled_at, _duration('exame')) for vet_id, scheduled_at in exam_rows)
+
+    for vet_id, scheduled_at, duration in bookings:
+        if scheduled_at is None:
+            continue
+        vet_data = data[vet_id]
+        vet_data.booked_utc.add(_to_utc_naive(scheduled_at))
+        for candidate in _local_start_candidates(scheduled_at):
+            vet_data.busy.append((candidate, candidate + duration))
+
+    return data
+
+
+def _working_windows(schedules, day):
+    """Yield ``(start, end, break_start, break_end)`` for ``day``."""
+
+    for schedule in schedules:
+        break_start = break_end = None
+        if schedule.intervalo_inicio and schedule.intervalo_fim:
+            break_start = datetime.combine(day, schedule.intervalo_inicio)
+            break_end = datetime.combine(day, schedule.intervalo_fim)
+        yield (
+            datetime.combine(day, schedule.hora_inicio),
+            datetime.combine(day, schedule.hora_fim),
+            break_start,
+            break_end,
+        )
+
+
+def candidate_slots(schedules, day, duration, step=SLOT_STEP):
+    """Return sorted slot starts that fit inside a shift and avoid its break."""
+
+    slots = set()
+    for start, end, break_start, break_end in _working_windows(schedules, day):
+        current = start
+        while current + duration <= end:
+            slot_end = current + duration
+            if not (break_start is not None and current < break_end and break_start < slot_end):
+                slots.add(current)
+            current += step
+    return sorted(slots)
+
+
+def split_free_and_booked(vet_data, slots, duration):
+    """Partition sorted ``slots`` into free/booked with a single sweep.
+
+    Both ``slots`` and the merged busy intervals are sorted by start, so the
+    busy pointer only moves forward: total cost is O(slots + bookings).
+    """
+
+    merged = vet_data.merged_busy()
+    free = []
+    booked = []
+    total = len(merged)
+    idx = 0
+    if slots and total:
+        # Merged intervals are disjoint, so only the one starting right
+        # before the first slot can still cover it.
+        idx = max(0, bisect_left(vet_data._merged_starts, slots[0]) - 1)
+    for slot_start in slots:
+        slot_end = slot_start + duration
+        while idx < total and merged[idx][1] <= slot_start:
+            idx += 1
+        if idx < total and merged[idx][0] < slot_end:
+            booked.append(slot_start)
+        else:
+            free.append(slot_start)
+    return free, booked
+
+
+def compute_availability(vet_ids, start_date, end_date, kind='consulta', *, preloaded=None):
+    """Return free and booked slots for several vets over a date range.
+
+    The result maps ``vet_id -> {date: {'available': [...], 'booked': [...]}}``
+    with times formatted as ``HH:MM``. ``end_date`` is inclusive. Pass
+    ``preloaded`` (from :func:`load_availability`) to reuse loaded data.
+    """
+
+    data = preloaded if preloaded is not None else load_availability(vet_ids, start_date, end_date)
+    duration = get_appointment_duration(kind)
+    result = {}
+    for vet_id in vet_ids:
+        vet_data = data.get(int(vet_id)) or VetAvailabilityData()
+        days = {}
+        day = start_date
+        while day <= end_date:
+            schedules = vet_data.schedules_by_day.get(WEEKDAY_NAMES[day.weekday()], [])
+            slots = candidate_slots(schedules, day, duration)
+            free, booked = split_free_and_booked(vet_data, slots, duration)
+            days[day] = {
+                'available': [slot.strftime('%H:%M') for slot in free],
+                'booked': [slot.strftime('%H:%M') for slot in booked],
+            }
+            day += timedelta(days=1)
+        result[vet_id] = days
+    return result
+
+
+def weekly_grid(vet_data, day, day_start, day_end, step=SLOT_STEP):
+    """Return the weekly-view grid (available/booked/not_working) for ``day``.
+
+    Kept separate from :func:`compute_availability` because the weekly view
+    marks a slot as booked only when a booking starts exactly on it and lists
+    every working slot start, not only those that fit a full appointment.
+    """
+
+    working = set()
+    for start, end, break_start, break_end in _working_windows(
+        vet_data.schedules_by_day.get(WEEKDAY_NAMES[day.weekday()], []), day
+    ):
+        current = start
+        while current < end:
+            if not (break_start is not None and break_start <= current < break_end):
+                working.add(current)
+            current += step
+
+    available = []
+    booked = []
+    for slot in sorted(working):
+        slot_utc = normalize_to_utc(slot).replace(tzinfo=None)
+        (booked if slot_utc in vet_data.booked_utc else available).append(slot.strftime('%H:%M'))
+
+    not_working = []
+    current = datetime.combine(day, day_start)
+    end_of_day = datetime.combine(day, day_end)
+    while current < end_of_day:
+        if current not in working:
+            not_working.append(current.strftime('%H:%M'))
+        current += step
+
+    return {
+        'date': day.isoformat(),
+        'available': available,
+        'booked': booked,
+        'not_working': not_working,
+    }
+
+
+__all__ = [
+    'SLOT_STEP',
+    'VetAvailabilityData',
+    'candidate_slots',
+    'compute_availability',
+    'load_availability',
+    'split_free_and_booked',
+    'weekly_grid',
+]
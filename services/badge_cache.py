@@ -0,0 +1,422 @@
+"""Cache dos badges da navbar (mensagens, exames, consultas, avisos de admin).
+
+Duas implementações com a mesma interface:
+
+* ``MemoryBadgeBackend`` — LRU em processo, limitado a
+  ``BADGE_CACHE_MAX_ENTRIES`` entradas, com TTL;
+* ``RedisBadgeBackend`` — compartilhado entre os workers do gunicorn; lê todos
+  os badges de um usuário com um único ``MGET``.
+
+``BADGE_CACHE_BACKEND`` escolhe (padrão: Redis quando há ``REDIS_URL``).
+
+A invalidação acompanha o commit: um listener de ``after_flush`` anota quem
+foi afetado por mudanças em ``Message``, ``Appointment``, ``ExamAppointment``,
+``AdminActionNotification``, ``Order`` e ``Clinica`` e ``after_commit`` apaga
+essas chaves. Rollback
+descarta as anotações. O TTL fica só como rede de segurança para os badges
+que não têm evento (convites, acesso a clínica).
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Iterable
+
+from flask import current_app, has_app_context, has_request_context, request
+from sqlalchemy import event, or_, select
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+DEFAULT_TTL = 30  # segundos
+DEFAULT_MAX_ENTRIES = 5000
+REDIS_PREFIX = "petorlandia:badges:"
+
+#: Escopo compartilhado: todos os admins enxergam o mesmo total de mensagens.
+ADMINS_SCOPE = "admins"
+
+#: Tudo que a navbar pode pedir para um usuário; lido de uma vez por render.
+BADGE_KEYS = (
+    "unread_messages",
+    "admin_action_notifications",
+    "pending_exam_count",
+    "pending_appointment_count",
+    "clinic_pending_appointment_count",
+    "pending_clinic_invites",
+    "has_clinic_access",
+    "minha_casa_de_racao",
+    "loja_has_orders",
+    "minha_clinica",
+)
+
+_SHARED_KEYS = {ADMINS_SCOPE: ("unread_messages",)}
+
+_PREFETCH_ENVIRON_KEY = "petorlandia.badge_prefetch"
+_SESSION_INFO_KEY = "badge_cache_invalidations"
+
+
+def _encode(value: Any) -> str:
+    def default(obj):
+        if isinstance(obj, datetime):
+            return {"__datetime__": obj.isoformat()}
+        if isinstance(obj, date):
+            return {"__date__": obj.isoformat()}
+        raise TypeError(f"{type(obj).__name__} não é serializável no cache de badges")
+
+    return json.dumps(value, default=default, separators=(",", ":"))
+
+
+def _decode(raw: str | bytes) -> Any:
+    def hook(obj):
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+        if "__date__" in obj:
+            return date.fromisoformat(obj["__date__"])
+        return obj
+
+    return json.loads(raw, object_hook=hook)
+
+
+class MemoryBadgeBackend:
+    name = "memory"
+
+    def __init__(self, *, max_entries: int = DEFAULT_MAX_ENTRIES, clock=time.monotonic):
+        self.max_entries = max_entries
+        self._clock = clock
+        self._data: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get_many(self, keys: list[str]) -> dict[str, Any]:
+        now = self._clock()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if expires_at <= now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, values: dict[str, Any], ttl: int) -> None:
+        expires_at = self._clock() + ttl
+        with self._lock:
+            for key, value in values.items():
+                self._data[key] = (value, expires_at)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def size(self) -> int:
+        return len(self._data)
+
+
+class RedisBadgeBackend:
+    name = "redis"
+
+    def __init__(self, client, *, prefix: str = REDIS_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def get_many(self, keys: list[str]) -> dict[str, Any]:
+        if not keys:
+            return {}
+        raw_values = self.client.mget([self.prefix + key for key in keys])
+        return {key: _decode(raw) for key, raw in zip(keys, raw_values) if raw is not None}
+
+    def set_many(self, values: dict[str, Any], ttl: int) -> None:
+        pipe = self.client.pipeline(transaction=False)
+        for key, value in values.items():
+            pipe.set(self.prefix + key, _encode(value), ex=ttl)
+        pipe.execute()
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        names = [self.prefix + key for key in keys]
+        if names:
+            self.client.delete(*names)
+
+    def clear(self) -> None:
+        names = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if names:
+            self.client.delete(*names)
+
+    def size(self) -> int | None:
+        return None
+
+
+class BadgeCache:
+    """Frente única dos context processors para o backend escolhido.
+
+    Falhas do backend (Redis fora do ar) viram miss e contam em ``errors``:
+    o badge é recalculado no banco e a página continua renderizando.
+    """
+
+    def __init__(self, backend=None, *, ttl: int | None = None):
+        self._backend = backend
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> dict[str, int]:
+        return {"hits": 0, "misses": 0, "sets": 0, "invalidations": 0, "round_trips": 0, "errors": 0}
+
+    # -- configuração ---------------------------------------------------
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = self._backend_from_config()
+        return self._backend
+
+    def configure(self, backend=None, *, ttl: int | None = None) -> None:
+        self._backend = backend
+        self._ttl = ttl
+        self.reset_stats()
+
+    @property
+    def ttl(self) -> int:
+        if self._ttl is not None:
+            return self._ttl
+        if has_app_context():
+            return int(current_app.config.get("BADGE_CACHE_TTL", DEFAULT_TTL))
+        return DEFAULT_TTL
+
+    @staticmethod
+    def _backend_from_config():
+        config = current_app.config if has_app_context() else {}
+        redis_url = config.get("REDIS_URL")
+        kind = (config.get("BADGE_CACHE_BACKEND") or ("redis" if redis_url else "memory")).lower()
+        if kind == "redis" and redis_url:
+            from redis import Redis
+
+            client = Redis.from_url(redis_url, socket_connect_timeout=1, socket_timeout=1)
+            return RedisBadgeBackend(client)
+        return MemoryBadgeBackend(max_entries=int(config.get("BADGE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)))
+
+    # -- leitura/escrita ------------------------------------------------
+    @staticmethod
+    def _key(scope, key: str) -> str:
+        return f"{scope}:{key}"
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def _backend_call(self, method: str, *args):
+        self._count("round_trips")
+        try:
+            return getattr(self.backend, method)(*args)
+        except Exception:  # noqa: BLE001 — cache nunca derruba a página
+            self._count("errors")
+            if has_app_context():
+                current_app.logger.warning("badge_cache_%s_failed", method, exc_info=True)
+            return None
+
+    def _prefetched(self, scope) -> dict[str, Any] | None:
+        """Badges do escopo lidos neste request (uma ida ao backend por render)."""
+        if not has_request_context():
+            return None
+        cache = request.environ.setdefault(_PREFETCH_ENVIRON_KEY, {})
+        if scope not in cache:
+            wanted = {scope: BADGE_KEYS}
+            # O total compartilhado dos admins vem junto, na mesma ida.
+            wanted.update({
+                shared: keys for shared, keys in _SHARED_KEYS.items() if shared not in cache
+            })
+            names = [self._key(s, key) for s, keys in wanted.items() for key in keys]
+            found = self._backend_call("get_many", names) or {}
+            for s, keys in wanted.items():
+                cache[s] = {key: found[self._key(s, key)] for key in keys if self._key(s, key) in found}
+        return cache[scope]
+
+    def get(self, scope, key: str):
+        values = self._prefetched(scope)
+        if values is None:
+            found = self._backend_call("get_many", [self._key(scope, key)]) or {}
+            value = found.get(self._key(scope, key))
+        else:
+            value = values.get(key)
+        self._count("hits" if value is not None else "misses")
+        return value
+
+    def set(self, scope, key: str, value):
+        self._backend_call("set_many", {self._key(scope, key): value}, self.ttl)
+        self._count("sets")
+        if has_request_context():
+            prefetch = request.environ.get(_PREFETCH_ENVIRON_KEY, {})
+            if scope in prefetch:
+                prefetch[scope][key] = value
+        return value
+
+    def invalidate_many(self, pairs: Iterable[tuple[Any, str]]) -> None:
+        pairs = set(pairs)
+        if not pairs:
+            return
+        self._backend_call("delete_many", [self._key(scope, key) for scope, key in pairs])
+        self._count("invalidations", len(pairs))
+        if has_request_context():
+            prefetch = request.environ.get(_PREFETCH_ENVIRON_KEY, {})
+            for scope, key in pairs:
+                prefetch.get(scope, {}).pop(key, None)
+
+    def invalidate(self, scope, key: str) -> None:
+        self.invalidate_many([(scope, key)])
+
+    def clear(self) -> None:
+        self._backend_call("clear")
+        if has_request_context():
+            request.environ.pop(_PREFETCH_ENVIRON_KEY, None)
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = self._empty_stats()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        backend = self.backend
+        stats.update(
+            backend=backend.name,
+            ttl_seconds=self.ttl,
+            hit_rate=round(stats["hits"] / lookups, 4) if lookups else None,
+            entries=backend.size(),
+            evictions=getattr(backend, "evictions", None),
+        )
+        return stats
+
+
+badge_cache = BadgeCache()
+
+
+# -- ids de admin ---------------------------------------------------------
+_ADMIN_IDS_TTL = 300
+_admin_ids_cache: tuple[float, tuple[int, ...]] | None = None
+
+
+def admin_user_ids() -> tuple[int, ...]:
+    """Ids dos admins, memorizados (mudam raramente; ver ``_reset_admin_ids``)."""
+    global _admin_ids_cache
+    cached = _admin_ids_cache
+    if cached is not None and time.monotonic() - cached[0] < _ADMIN_IDS_TTL:
+        return cached[1]
+    from extensions import db
+    from models import User
+
+    ids = tuple(row[0] for row in db.session.query(User.id).filter(User.role == "admin").all())
+    _admin_ids_cache = (time.monotonic(), ids)
+    return ids
+
+
+def reset_admin_ids() -> None:
+    global _admin_ids_cache
+    _admin_ids_cache = None
+
+
+# -- invalidação dirigida por commit -------------------------------------
+def _column_values(obj, attr: str) -> set:
+    """Valor atual e anterior (se mudou no flush) de uma coluna."""
+    history = sa_inspect(obj).attrs[attr].history
+    values = set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ())
+    current = getattr(obj, attr, None)
+    if current is not None:
+        values.add(current)
+    values.discard(None)
+    return values
+
+
+def _collect_invalidations(session: Session, flush_context) -> None:
+    from models import (
+        AdminActionNotification,
+        Appointment,
+        Clinica,
+        ExamAppointment,
+        Message,
+        Order,
+        User,
+        Veterinario,
+    )
+
+    pending: set[tuple[Any, str]] = set()
+    appointment_users: set[int] = set()
+    appointment_vets: set[int] = set()
+    exam_vets: set[int] = set()
+    clinic_ids: set[int] = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Message):
+            for receiver_id in _column_values(obj, "receiver_id"):
+                pending.add((receiver_id, "unread_messages"))
+            pending.add((ADMINS_SCOPE, "unread_messages"))
+        elif isinstance(obj, AdminActionNotification):
+            for recipient_id in _column_values(obj, "recipient_user_id"):
+                pending.add((recipient_id, "admin_action_notifications"))
+        elif isinstance(obj, Appointment):
+            appointment_vets |= _column_values(obj, "veterinario_id")
+            appointment_users |= _column_values(obj, "created_by")
+            clinic_ids |= _column_values(obj, "clinica_id")
+        elif isinstance(obj, ExamAppointment):
+            exam_vets |= _column_values(obj, "specialist_id")
+        elif isinstance(obj, Order):
+            for user_id in _column_values(obj, "user_id"):
+                pending.add((user_id, "loja_has_orders"))
+        elif isinstance(obj, Clinica):
+            for owner_id in _column_values(obj, "owner_id"):
+                pending.add((owner_id, "minha_clinica"))
+        elif isinstance(obj, User) and (
+            obj in session.new or obj in session.deleted or "role" in sa_inspect(obj).committed_state
+        ):
+            reset_admin_ids()
+
+    for user_id in appointment_users:
+        pending.add((user_id, "pending_appointment_count"))
+    if appointment_vets or exam_vets or clinic_ids:
+        # Veterinário → usuário, na mesma conexão do flush.
+        conditions = [Veterinario.id.in_(appointment_vets | exam_vets)]
+        if clinic_ids:
+            conditions.append(Veterinario.clinica_id.in_(clinic_ids))
+        rows = session.connection().execute(
+            select(Veterinario.id, Veterinario.user_id, Veterinario.clinica_id).where(or_(*conditions))
+        )
+        for vet_id, user_id, clinica_id in rows:
+            if vet_id in appointment_vets:
+                pending.add((user_id, "pending_appointment_count"))
+            if vet_id in exam_vets:
+                pending.add((user_id, "pending_exam_count"))
+            if clinica_id in clinic_ids or vet_id in appointment_vets:
+                pending.add((user_id, "clinic_pending_appointment_count"))
+
+    if pending:
+        session.info.setdefault(_SESSION_INFO_KEY, set()).update(pending)
+
+
+def _apply_invalidations(session: Session) -> None:
+    pending = session.info.pop(_SESSION_INFO_KEY, None)
+    if pending:
+        badge_cache.invalidate_many(pending)
+
+
+def _discard_invalidations(session: Session, *_args) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+event.listen(Session, "after_flush", _collect_invalidations)
+event.listen(Session, "after_commit", _apply_invalidations)
+event.listen(Session, "after_rollback", _discard_invalidations)
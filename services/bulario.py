@@ -625,7 +625,13 @@ def _itens_legados_de_conteudo(valor: Any) -> List[Any]:
 
 
 def _conteudo_carregado_sem_lazyload(medicamento) -> Dict[str, Any]:
-    conteudo = getattr(medicamento, "__dict__", {}).get("conteudo_estruturado") or {}
+    estado = getattr(medicamento, "__dict__", None)
+    if estado is None:
+        # Registros do snapshot (services.bulario_snapshot) usam __slots__ e
+        # não têm lazy-load: o conteúdo já está em memória.
+        conteudo = getattr(medicamento, "conteudo_estruturado", None) or {}
+    else:
+        conteudo = estado.get("conteudo_estruturado") or {}
     if not isinstance(conteudo, dict):
         return {}
     return conteudo
@@ -0,0 +1,425 @@
+"""Snapshot em memória, somente leitura, do catálogo do bulário.
+
+O autocomplete de prescrição, ``sugerir_dose`` e as páginas de detalhe
+reidratavam ``Medicamento``/``DoseMedicamento``/``ApresentacaoMedicamento``
+e re-serializavam tudo a cada request, embora o catálogo mude poucas vezes
+por semana. Aqui o catálogo inteiro é carregado em três queries para
+registros compactos com ``__slots__`` — duck-typed com os modelos, então as
+funções de ``services.bulario`` funcionam sem alteração — e as serializações
+são memorizadas por registro.
+
+Invalidação:
+  * ``bump_versao_catalogo()`` incrementa ``CacheVersion('bulario_catalogo')``
+    no banco; os demais workers percebem na próxima checagem (no máximo a cada
+    ``BULARIO_SNAPSHOT_CHECK_SECONDS``, padrão 5 s).
+  * Escritas ORM em medicamentos, doses e apresentações descartam o snapshot
+    deste processo no ``after_commit`` (rollback não invalida nada).
+
+As serializações memorizadas por registro ficam num LRU de
+``MEMO_MAX_ENTRIES`` chaves: parte dos argumentos (nome de exibição, filtro de
+nome comercial) vem de texto livre da busca.
+
+Seções HTML cruas do VetSmart (``raw_sections*``) ficam fora do snapshot:
+são grandes e só a página admin de detalhe as usa
+(``secoes_vetsmart``).
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+CATALOGO_CACHE_KEY = "bulario_catalogo"
+DEFAULT_CHECK_SECONDS = 5.0
+MEMO_MAX_ENTRIES = 32
+_SESSION_INFO_KEY = "bulario_catalogo_alterado"
+_CHAVES_CONTEUDO_FORA_DO_SNAPSHOT = ("raw_sections", "raw_sections_html")
+
+_CAMPOS_MEDICAMENTO = (
+    "id", "nome", "classificacao", "principio_ativo", "via_administracao",
+    "dosagem_recomendada", "frequencia", "duracao_tratamento", "observacoes",
+    "bula", "conteudo_estruturado", "species_scope", "vetsmart_produto_id",
+    "created_by",
+)
+_CAMPOS_DOSE = (
+    "id", "medicamento_id", "especie", "faixa_peso", "via", "dose", "frequencia",
+    "duracao", "observacao", "especie_code", "peso_min_kg", "peso_max_kg",
+    "dose_min", "dose_max", "dose_unidade", "intervalo_horas",
+    "intervalo_min_horas", "intervalo_max_horas", "duracao_min_dias",
+    "duracao_max_dias", "dose_raw_text", "fonte", "confianca", "indicacao",
+)
+_CAMPOS_APRESENTACAO = (
+    "id", "medicamento_id", "forma", "concentracao", "nome_variante",
+    "concentracao_valor", "concentracao_unidade", "volume_valor",
+    "volume_unidade", "nome_comercial", "fabricante", "vetsmart_produto_id",
+)
+
+
+class _Registro:
+    __slots__ = ()
+
+    def __init__(self, valores):
+        for campo, valor in zip(self.__slots__, valores):
+            setattr(self, campo, valor)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} id={getattr(self, 'id', None)}>"
+
+
+class DoseRecord(_Registro):
+    __slots__ = _CAMPOS_DOSE
+
+    def __str__(self):
+        partes = [p for p in [self.especie, self.faixa_peso, self.dose] if p]
+        return " · ".join(partes) or f"Dose #{self.id}"
+
+
+class ApresentacaoRecord(_Registro):
+    __slots__ = _CAMPOS_APRESENTACAO + ("medicamento",)
+
+    def __str__(self):
+        return f"{self.medicamento.nome} – {self.forma} ({self.concentracao})"
+
+
+class MedicamentoRecord(_Registro):
+    __slots__ = _CAMPOS_MEDICAMENTO + ("doses", "apresentacoes", "_memo")
+
+    def __init__(self, valores):
+        super().__init__(valores)
+        self.doses = []
+        self.apresentacoes = []
+        self._memo = OrderedDict()
+
+    def __str__(self):
+        return self.nome
+
+
+def _conteudo_compacto(conteudo):
+    if not isinstance(conteudo, dict):
+        return conteudo
+    if not any(chave in conteudo for chave in _CHAVES_CONTEUDO_FORA_DO_SNAPSHOT):
+        return conteudo
+    return {k: v for k, v in conteudo.items() if k not in _CHAVES_CONTEUDO_FORA_DO_SNAPSHOT}
+
+
+def _tamanho_aproximado(raiz) -> int:
+    """Soma ``sys.getsizeof`` do grafo alcançável (sem contar duplicados)."""
+
+    vistos = set()
+    pilha = [raiz]
+    total = 0
+    while pilha:
+        obj = pilha.pop()
+        if id(obj) in vistos:
+            continue
+        vistos.add(id(obj))
+        total += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pilha.extend(obj.keys())
+            pilha.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            pilha.extend(obj)
+        elif isinstance(obj, _Registro):
+            pilha.extend(getattr(obj, campo, None) for campo in obj.__slots__ if campo != "_memo")
+    return total
+
+
+class CatalogoSnapshot:
+    """Catálogo carregado numa versão específica."""
+
+    def __init__(self, versao: int, medicamentos: Dict[int, MedicamentoRecord]):
+        self.versao = versao
+        self.medicamentos = medicamentos
+        self.montado_em = time.time()
+        self.total_doses = sum(len(m.doses) for m in medicamentos.values())
+        self.total_apresentacoes = sum(len(m.apresentacoes) for m in medicamentos.values())
+        self.bytes_aproximados = _tamanho_aproximado(medicamentos)
+
+    @classmethod
+    def carregar(cls, versao: int) -> "CatalogoSnapshot":
+        from extensions import db
+        from models import ApresentacaoMedicamento, DoseMedicamento, Medicamento
+
+        medicamentos: Dict[int, MedicamentoRecord] = {}
+        colunas_med = [getattr(Medicamento, campo) for campo in _CAMPOS_MEDICAMENTO]
+        for linha in db.session.query(*colunas_med).order_by(Medicamento.id):
+            registro = MedicamentoRecord(linha)
+            registro.conteudo_estruturado = _conteudo_compacto(registro.conteudo_estruturado)
+            medicamentos[registro.id] = registro
+
+        colunas_dose = [getattr(DoseMedicamento, campo) for campo in _CAMPOS_DOSE]
+        for linha in db.session.query(*colunas_dose).order_by(DoseMedicamento.id):
+            dono = medicamentos.get(linha.medicamento_id)
+            if dono is not None:
+                dono.doses.append(DoseRecord(linha))
+
+        colunas_ap = [getattr(ApresentacaoMedicamento, campo) for campo in _CAMPOS_APRESENTACAO]
+        for linha in db.session.query(*colunas_ap).order_by(ApresentacaoMedicamento.id):
+            dono = medicamentos.get(linha.medicamento_id)
+            if dono is not None:
+                registro = ApresentacaoRecord(tuple(linha) + (dono,))
+                dono.apresentacoes.append(registro)
+
+        return cls(versao, medicamentos)
+
+
+class _EstadoSnapshot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.snapshot: Optional[CatalogoSnapshot] = None
+        self.sujo = False
+        self.checado_em = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self.recargas = 0
+
+    def resetar(self):
+        with self.lock:
+            self.snapshot = None
+            self.sujo = False
+            self.checado_em = 0.0
+            self.hits = self.misses = 0
+            self.memo_hits = self.memo_misses = 0
+            self.recargas = 0
+
+
+_estado = _EstadoSnapshot()
+
+
+def _intervalo_checagem() -> float:
+    if has_app_context():
+        return float(current_app.config.get("BULARIO_SNAPSHOT_CHECK_SECONDS", DEFAULT_CHECK_SECONDS))
+    return DEFAULT_CHECK_SECONDS
+
+
+def _versao_no_banco() -> int:
+    from models import CacheVersion
+
+    return CacheVersion.get(CATALOGO_CACHE_KEY)
+
+
+def obter_snapshot() -> CatalogoSnapshot:
+    """Snapshot vigente, recarregando quando a versão do catálogo mudou."""
+
+    agora = time.monotonic()
+    snapshot = _estado.snapshot
+    if snapshot is not None and not _estado.sujo:
+        if agora - _estado.checado_em < _intervalo_checagem():
+            _estado.hits += 1
+            return snapshot
+        versao = _versao_no_banco()
+        _estado.checado_em = agora
+        if versao == snapshot.versao:
+            _estado.hits += 1
+            return snapshot
+    else:
+        versao = _versao_no_banco()
+
+    with _estado.lock:
+        _estado.sujo = False
+        novo = CatalogoSnapshot.carregar(versao)
+        _estado.snapshot = novo
+        _estado.checado_em = agora
+        _estado.misses += 1
+        _estado.recargas += 1
+    return novo
+
+
+def obter_medicamento(medicamento_id) -> Optional[MedicamentoRecord]:
+    try:
+        chave = int(medicamento_id)
+    except (TypeError, ValueError):
+        return None
+    return obter_snapshot().medicamentos.get(chave)
+
+
+def obter_medicamentos(ids: Iterable[int]) -> List[MedicamentoRecord]:
+    """Registros na ordem de ``ids``; ids inexistentes são ignorados."""
+
+    medicamentos = obter_snapshot().medicamentos
+    return [medicamentos[i] for i in ids if i in medicamentos]
+
+
+def _memorizado(registro: MedicamentoRecord, chave, calcular: Callable[[], Any]):
+    memo = registro._memo
+    try:
+        valor = memo[chave]
+    except KeyError:
+        _estado.memo_misses += 1
+        valor = memo[chave] = calcular()
+        while len(memo) > MEMO_MAX_ENTRIES:
+            try:
+                memo.popitem(last=False)
+            except KeyError:  # outra thread esvaziou primeiro
+                break
+    else:
+        _estado.memo_hits += 1
+        try:
+            memo.move_to_end(chave)
+        except KeyError:
+            pass
+    return valor
+
+
+def serializar_autocomplete(registro, nome_exibicao=None, nome_comercial_filtro=None) -> Dict[str, Any]:
+    """``serializar_medicamento_autocomplete`` memorizado (cópia rasa)."""
+
+    from services.bulario import serializar_medicamento_autocomplete
+
+    payload = _memorizado(
+        registro,
+        ("autocomplete", nome_exibicao, nome_comercial_filtro),
+        lambda: serializar_medicamento_autocomplete(
+            registro, nome_exibicao=nome_exibicao, nome_comercial_filtro=nome_comercial_filtro
+        ),
+    )
+    return dict(payload)
+
+
+def serializar_busca(registro, nome_exibicao=None, nome_comercial_filtro=None) -> Dict[str, Any]:
+    """``serializar_medicamento_busca`` memorizado (cópia rasa)."""
+
+    from services.bulario import serializar_medicamento_busca
+
+    payload = _memorizado(
+        registro,
+        ("busca", nome_exibicao, nome_comercial_filtro),
+        lambda: serializar_medicamento_busca(
+            registro, nome_exibicao=nome_exibicao, nome_comercial_filtro=nome_comercial_filtro
+        ),
+    )
+    return dict(payload)
+
+
+def monografia(registro) -> Dict[str, Any]:
+    from services.bulario import montar_monografia_medicamento
+
+    return _memorizado(registro, ("monografia",), lambda: montar_monografia_medicamento(registro))
+
+
+def secoes_vetsmart(medicamento_id) -> List[Dict[str, Any]]:
+    """Seções brutas do VetSmart, lidas direto do banco (página admin).
+
+    Busca só ``conteudo_estruturado`` desse medicamento, já que as chaves
+    ``raw_sections*`` não entram no snapshot.
+    """
+
+    from types import SimpleNamespace
+
+    from extensions import db
+    from models import Medicamento
+    from services.bulario import extrair_secoes_vetsmart
+
+    conteudo = (
+        db.session.query(Medicamento.conteudo_estruturado)
+        .filter(Medicamento.id == medicamento_id)
+        .scalar()
+    )
+    return extrair_secoes_vetsmart(SimpleNamespace(conteudo_estruturado=conteudo))
+
+
+def invalidar_snapshot_local() -> None:
+    """Descarta o snapshot deste processo na próxima leitura."""
+
+    _estado.sujo = True
+
+
+def bump_versao_catalogo() -> Optional[int]:
+    """Marca o catálogo como alterado para todos os workers. Faz commit.
+
+    Roda depois do commit da escrita: se o bump falhar, a escrita já está
+    salva, então a falha só é logada (os outros workers ficam com o snapshot
+    antigo até o próximo bump) e devolve ``None``.
+    """
+
+    from extensions import db
+    from models import CacheVersion
+
+    invalidar_snapshot_local()
+    try:
+        return CacheVersion.bump(CATALOGO_CACHE_KEY)
+    except Exception:  # noqa: BLE001
+        db.session.rollback()
+        if has_app_context():
+            current_app.logger.warning("bulario_catalogo_bump_failed", exc_info=True)
+        return None
+
+
+# -- invalidação dirigida por commit -------------------------------------
+def _coletar_escritas(session: Session, _flush_context) -> None:
+    from models import ApresentacaoMedicamento, DoseMedicamento, Medicamento
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Medicamento, DoseMedicamento, ApresentacaoMedicamento)):
+            session.info[_SESSION_INFO_KEY] = True
+            return
+
+
+def _aplicar_escritas(session: Session) -> None:
+    if session.info.pop(_SESSION_INFO_KEY, False):
+        invalidar_snapshot_local()
+
+
+def _descartar_escritas(session: Session, *_args) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+event.listen(Session, "after_flush", _coletar_escritas)
+event.listen(Session, "after_commit", _aplicar_escritas)
+event.listen(Session, "after_rollback", _descartar_escritas)
+
+
+def resetar_snapshot() -> None:
+    """Zera snapshot e contadores (testes)."""
+
+    _estado.resetar()
+
+
+def estatisticas_snapshot() -> Dict[str, Any]:
+    snapshot = _estado.snapshot
+    consultas = _estado.hits + _estado.misses
+    memo_total = _estado.memo_hits + _estado.memo_misses
+    return {
+        "carregado": snapshot is not None,
+        "versao": snapshot.versao if snapshot else None,
+        "montado_em": snapshot.montado_em if snapshot else None,
+        "medicamentos": len(snapshot.medicamentos) if snapshot else 0,
+        "doses": snapshot.total_doses if snapshot else 0,
+        "apresentacoes": snapshot.total_apresentacoes if snapshot else 0,
+        "bytes_aproximados": snapshot.bytes_aproximados if snapshot else 0,
+        "hits": _estado.hits,
+        "misses": _estado.misses,
+        "hit_rate": round(_estado.hits / consultas, 4) if consultas else None,
+        "memo_hits": _estado.memo_hits,
+        "memo_misses": _estado.memo_misses,
+        "memo_hit_rate": round(_estado.memo_hits / memo_total, 4) if memo_total else None,
+        "recargas": _estado.recargas,
+    }
+
+
+__all__ = [
+    "ApresentacaoRecord",
+    "CATALOGO_CACHE_KEY",
+    "CatalogoSnapshot",
+    "DoseRecord",
+    "MedicamentoRecord",
+    "bump_versao_catalogo",
+    "estatisticas_snapshot",
+    "invalidar_snapshot_local",
+    "monografia",
+    "obter_medicamento",
+    "obter_medicamentos",
+    "resetar_snapshot",
+    "serializar_autocomplete",
+    "secoes_vetsmart",
+    "serializar_busca",
+]
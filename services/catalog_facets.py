@@ -0,0 +1,324 @@
+"""Read model do catálogo da loja: facetas, totais e paginação por cursor.
+
+Cada render de ``/loja`` recalculava, além da página de produtos, a lista de
+vendedores (duas queries com DISTINCT), as categorias com produto (outra
+DISTINCT), o total do catálogo e o COUNT do ``paginate``; ``/loja/data`` repetia
+o COUNT a cada rolagem.
+
+Aqui as facetas são montadas de uma vez por processo, em quatro queries (uma
+agregação ``GROUP BY vendedor, categoria`` sobre os produtos visíveis, nomes
+das clínicas, nomes das casas de ração e categorias ativas), e ficam em memória
+até mudarem:
+
+* listeners de sessão anotam escritas em ``Product``, ``ProductVariant``,
+  ``ProductCategory``, ``Clinica`` e ``CasaDeRacao`` no flush; no commit o
+  snapshot local é descartado e ``CacheVersion('loja_catalogo')`` avança;
+* os demais workers comparam a versão no banco no máximo a cada
+  ``LOJA_FACETS_CHECK_SECONDS`` (padrão 5 s), como o snapshot do bulário.
+
+Com as contagens por (vendedor, categoria) em mãos, a paginação numerada da
+loja dispensa o COUNT quando não há busca textual nem filtro de estoque. A
+rolagem infinita (``/loja/data?format=json&cursor=``) usa keyset e não conta
+nada: pede ``per_page + 1`` linhas para saber se há próxima página.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from flask import current_app, has_app_context
+from sqlalchemy import and_, event, func, or_, tuple_
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+CATALOG_CACHE_KEY = "loja_catalogo"
+DEFAULT_CHECK_SECONDS = 5.0
+_SESSION_INFO_KEY = "catalog_facets_dirty"
+# Colunas de Clinica/CasaDeRacao que aparecem nas facetas.
+_VENDOR_COLUMNS = ("nome", "logotipo", "status")
+
+
+@dataclass(frozen=True)
+class CategoryFacet:
+    slug: str
+    label: str
+    icon: str
+    position: int
+
+    @property
+    def value(self) -> str:
+        """Mesmo contrato de ``ProductCategory.value`` usado pelos chips."""
+        return self.slug
+
+    def __str__(self) -> str:
+        return self.label or self.slug
+
+
+@dataclass
+class CatalogFacets:
+    """Facetas de uma vitrine (com ou sem produtos de demonstração)."""
+
+    version: int
+    #: {key, nome, logotipo}; ``logo_url`` depende do request e sai na view
+    vendedores: list[dict[str, Any]]
+    categories: list[CategoryFacet]
+    #: (chave do vendedor ou '', slug da categoria ou '') -> produtos visíveis
+    counts: dict[tuple[str, str], int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return self.counts.get(("", ""), 0)
+
+    def count(self, vendedor: str = "", categoria: str = "") -> int:
+        return self.counts.get((vendor_key(vendedor), categoria or ""), 0)
+
+    def categories_for(self, vendedor: str = "") -> list[CategoryFacet]:
+        key = vendor_key(vendedor)
+        return [category for category in self.categories if (key, category.slug) in self.counts]
+
+
+def vendor_key(vendedor: str) -> str:
+    """Normaliza o parâmetro ``vendedor``; valor inválido vale como "todos"."""
+    if vendedor and vendedor[:2] in {"c_", "r_"}:
+        try:
+            return f"{vendedor[:2]}{int(vendedor[2:])}"
+        except ValueError:
+            pass
+    return ""
+
+
+def _load(version: int, include_demo: bool) -> CatalogFacets:
+    from extensions import db
+    from models import CasaDeRacao, Clinica, Product, get_active_product_categories
+
+    from app import _build_loja_query
+
+    rows = (
+        _build_loja_query("", "all", include_demo=include_demo)
+        .order_by(None)
+        .with_entities(Product.clinica_id, Product.casa_de_racao_id, Product.category, func.count(Product.id))
+        .group_by(Product.clinica_id, Product.casa_de_racao_id, Product.category)
+        .all()
+    )
+    counts: dict[tuple[str, str], int] = {}
+    clinic_ids: set[int] = set()
+    casa_ids: set[int] = set()
+    for clinica_id, casa_id, category, amount in rows:
+        vendors = [""]
+        if clinica_id:
+            clinic_ids.add(clinica_id)
+            vendors.append(f"c_{clinica_id}")
+        if casa_id:
+            casa_ids.add(casa_id)
+            vendors.append(f"r_{casa_id}")
+        for vendor in vendors:
+            counts[(vendor, "")] = counts.get((vendor, ""), 0) + amount
+            if category:
+                counts[(vendor, category)] = counts.get((vendor, category), 0) + amount
+
+    vendedores = []
+    if clinic_ids:
+        for clinic_id, nome, logotipo in (
+            db.session.query(Clinica.id, Clinica.nome, Clinica.logotipo)
+            .filter(Clinica.id.in_(clinic_ids))
+            .order_by(Clinica.nome)
+        ):
+            vendedores.append({"key": f"c_{clinic_id}", "nome": nome, "logotipo": logotipo})
+    if casa_ids:
+        for casa_id, nome, logotipo in (
+            db.session.query(CasaDeRacao.id, CasaDeRacao.nome, CasaDeRacao.logotipo)
+            .filter(CasaDeRacao.id.in_(casa_ids))
+            .order_by(CasaDeRacao.nome)
+        ):
+            vendedores.append({"key": f"r_{casa_id}", "nome": nome, "logotipo": logotipo})
+
+    categories = [
+        CategoryFacet(slug=c.slug, label=c.label, icon=c.icon or "fa-tag", position=c.position or 0)
+        for c in get_active_product_categories()
+    ]
+    return CatalogFacets(version=version, vendedores=vendedores, categories=categories, counts=counts)
+
+
+class _FacetsState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.snapshots: dict[bool, CatalogFacets] = {}
+        self.checked_at = 0.0
+        self.dirty = False
+        self.hits = self.misses = 0
+
+
+_state = _FacetsState()
+
+
+def _check_interval() -> float:
+    if has_app_context():
+        return float(current_app.config.get("LOJA_FACETS_CHECK_SECONDS", DEFAULT_CHECK_SECONDS))
+    return DEFAULT_CHECK_SECONDS
+
+
+def _db_version() -> int:
+    from models import CacheVersion
+
+    return CacheVersion.get(CATALOG_CACHE_KEY)
+
+
+def catalog_facets(include_demo: bool = False) -> CatalogFacets:
+    """Facetas vigentes, remontadas quando o catálogo mudou."""
+    now = time.monotonic()
+    snapshot = _state.snapshots.get(include_demo)
+    if snapshot is not None and not _state.dirty:
+        if now - _state.checked_at < _check_interval():
+            _state.hits += 1
+            return snapshot
+        version = _db_version()
+        if version == snapshot.version:
+            _state.checked_at = now
+            _state.hits += 1
+            return snapshot
+    else:
+        version = _db_version()
+
+    with _state.lock:
+        if _state.dirty or any(s.version != version for s in _state.snapshots.values()):
+            _state.snapshots = {}
+            _state.dirty = False
+        fresh = _load(version, include_demo)
+        _state.snapshots[include_demo] = fresh
+        _state.checked_at = now
+        _state.misses += 1
+    return fresh
+
+
+def invalidate_local() -> None:
+    """Descarta as facetas deste processo na próxima leitura."""
+    _state.dirty = True
+
+
+def reset_catalog_facets() -> None:
+    """Zera snapshot e contadores (testes)."""
+    _state.reset()
+
+
+def facets_stats() -> dict[str, Any]:
+    lookups = _state.hits + _state.misses
+    return {
+        "hits": _state.hits,
+        "misses": _state.misses,
+        "hit_rate": round(_state.hits / lookups, 4) if lookups else None,
+        "snapshots": sorted(_state.snapshots),
+    }
+
+
+# -- paginação por cursor ------------------------------------------------
+def _sort_columns(filtro: str):
+    """Colunas da ordenação de ``_build_loja_query`` com ``id`` de desempate."""
+    from models import Product
+
+    if filtro == "new":
+        return [(Product.id, True)]
+    if filtro == "priceLow":
+        return [(Product.price, False), (Product.id, False)]
+    if filtro == "priceHigh":
+        return [(Product.price, True), (Product.id, True)]
+    return [(Product.name, False), (Product.id, False)]
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> list | None:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def keyset_page(query, filtro: str, cursor: str | None, per_page: int):
+    """``(itens, próximo cursor ou None)`` sem COUNT nem OFFSET.
+
+    ``query`` vem de ``_build_loja_query``; a ordenação é refeita aqui com o
+    ``id`` como desempate para o cursor ser estável.
+    """
+    columns = _sort_columns(filtro)
+    query = query.order_by(None).order_by(*[col.desc() if desc else col.asc() for col, desc in columns])
+    values = decode_cursor(cursor)
+    if values is not None and len(values) == len(columns):
+        if all(desc == columns[0][1] for _col, desc in columns):
+            key = tuple_(*[col for col, _desc in columns])
+            bound = tuple_(*values)
+            query = query.filter(key < bound if columns[0][1] else key > bound)
+        else:  # pragma: no cover - todas as ordenações atuais têm direção única
+            clauses = []
+            for index, (col, desc) in enumerate(columns):
+                equal = [c == v for (c, _d), v in zip(columns[:index], values)]
+                clauses.append(and_(*equal, col < values[index] if desc else col > values[index]))
+            query = query.filter(or_(*clauses))
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    if len(rows) <= per_page:
+        return items, None
+    last = items[-1]
+    return items, encode_cursor([getattr(last, col.key) for col, _desc in columns])
+
+
+# -- invalidação dirigida por commit -------------------------------------
+def _collect(session: Session, _flush_context) -> None:
+    from models import CasaDeRacao, Clinica, Product, ProductCategory, ProductVariant
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Product, ProductVariant, ProductCategory)):
+            session.info[_SESSION_INFO_KEY] = True
+            return
+        if isinstance(obj, (Clinica, CasaDeRacao)):
+            if obj in session.new or obj in session.deleted:
+                session.info[_SESSION_INFO_KEY] = True
+                return
+            state = sa_inspect(obj)
+            if any(
+                name in state.attrs.keys() and state.attrs[name].history.has_changes()
+                for name in _VENDOR_COLUMNS
+            ):
+                session.info[_SESSION_INFO_KEY] = True
+                return
+
+
+def _apply(session: Session) -> None:
+    if not session.info.pop(_SESSION_INFO_KEY, False):
+        return
+    invalidate_local()
+    _bump_version()
+
+
+def _discard(session: Session, *_args) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+def _bump_version() -> None:
+    """Avança ``CacheVersion`` numa conexão própria (a sessão já comitou)."""
+    from models import CacheVersion
+
+    try:
+        CacheVersion.bump_after_commit([CATALOG_CACHE_KEY])
+    except Exception:  # noqa: BLE001 - os outros workers ainda veem pelo TTL da checagem
+        if has_app_context():
+            current_app.logger.warning("catalog_facets_bump_failed", exc_info=True)
+
+
+event.listen(Session, "after_flush", _collect)
+event.listen(Session, "after_commit", _apply)
+event.listen(Session, "after_rollback", _discard)
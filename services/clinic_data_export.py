@@ -0,0 +1,159 @@
+"""Exportação portável dos dados da clínica (ZIP com um arquivo por tabela).
+
+Cada tabela é lida com ``yield_per`` e serializada em pedaços direto para o
+ZIP em stream (``services.data_export``) — a memória fica limitada ao lote,
+não ao tamanho da clínica. Vacinas, itens de orçamento e tutores são filtrados
+por subquery em vez de listas de ids montadas em Python.
+
+Clínicas muito grandes podem ser exportadas em background: o ZIP vai para o
+storage de exportações (``services.data_export.ExportStore``) e o dono recebe
+um link de download.
+"""
+from __future__ import annotations
+
+from typing import Iterator
+
+from flask import current_app
+from sqlalchemy import select
+
+from extensions import db
+from models import Animal, Appointment, Clinica, Consulta, Orcamento, OrcamentoItem, User, Vacina
+from services.data_export import (
+    ExportStore,
+    iter_json_array,
+    iter_ndjson,
+    iter_query,
+    json_value,
+    model_row,
+    stream_zip,
+)
+
+FORMATS = ('json', 'ndjson')
+README = (
+    'Exportação PetOrlândia em JSON UTF-8. '
+    'Cada arquivo representa uma parte da operação da clínica. '
+    'Guarde este arquivo em local seguro: ele contém dados pessoais e clínicos.'
+)
+README_NDJSON = (
+    'Exportação PetOrlândia em NDJSON UTF-8 (um objeto JSON por linha). '
+    'Cada arquivo representa uma parte da operação da clínica. '
+    'Guarde este arquivo em local seguro: ele contém dados pessoais e clínicos.'
+)
+
+_store = ExportStore('clinic_data', 'DATA_EXPORT_DIR', 'data_exports')
+
+
+def download_name(clinica_id: int) -> str:
+    return f'petorlandia-clinica-{clinica_id}-dados.zip'
+
+
+def _clinic_animal_ids(clinica_id: int):
+    return select(Animal.id).where(Animal.clinica_id == clinica_id)
+
+
+def _table_queries(clinica_id: int) -> list[tuple[str, object]]:
+    return [
+        ('pacientes', Animal.query.filter_by(clinica_id=clinica_id).order_by(Animal.id)),
+        ('agendamentos', Appointment.query.filter_by(clinica_id=clinica_id).order_by(Appointment.id)),
+        ('consultas', Consulta.query.filter_by(clinica_id=clinica_id).order_by(Consulta.id)),
+        ('vacinas', Vacina.query.filter(Vacina.animal_id.in_(_clinic_animal_ids(clinica_id))).order_by(Vacina.id)),
+        ('orcamentos', Orcamento.query.filter_by(clinica_id=clinica_id).order_by(Orcamento.id)),
+        ('orcamento_itens', OrcamentoItem.query.filter(
+            OrcamentoItem.orcamento_id.in_(select(Orcamento.id).where(Orcamento.clinica_id == clinica_id))
+        ).order_by(OrcamentoItem.id)),
+    ]
+
+
+def _tutor_query(clinica_id: int):
+    tutor_ids = select(Animal.user_id).where(Animal.clinica_id == clinica_id, Animal.user_id.isnot(None))
+    return User.query.filter(User.id.in_(tutor_ids)).order_by(User.id)
+
+
+def _tutor_rows(clinica_id: int) -> Iterator[dict]:
+    for user in iter_query(_tutor_query(clinica_id)):
+        yield {
+            'id': user.id,
+            'nome': user.name,
+            'email': user.email,
+            'telefone': user.phone,
+            'cpf': user.cpf,
+        }
+
+
+def _model_rows(query) -> Iterator[dict]:
+    for row in iter_query(query):
+        yield model_row(row)
+
+
+def export_entries(clinica: Clinica, fmt: str = 'json') -> Iterator[tuple[str, object]]:
+    """``(nome do arquivo, conteúdo)`` do ZIP; tabelas saem como geradores."""
+    if fmt not in FORMATS:
+        raise ValueError(f'Formato de exportação inválido: {fmt}')
+    writer = iter_ndjson if fmt == 'ndjson' else iter_json_array
+    yield 'LEIA-ME.txt', README_NDJSON if fmt == 'ndjson' else README
+    clinica_row = {
+        'id': clinica.id,
+        'nome': clinica.nome,
+        'status': clinica.status,
+        'cnpj': clinica.cnpj,
+        'endereco': clinica.endereco,
+        'telefone': clinica.telefone,
+        'email': clinica.email,
+        'created_at': json_value(clinica.created_at),
+    }
+    yield f'clinica.{fmt}', writer([clinica_row])
+    yield f'tutores.{fmt}', writer(_tutor_rows(clinica.id))
+    for name, query in _table_queries(clinica.id):
+        yield f'{name}.{fmt}', writer(_model_rows(query))
+
+
+def stream_clinic_export(clinica: Clinica, fmt: str = 'json') -> Iterator[bytes]:
+    return stream_zip(export_entries(clinica, fmt))
+
+
+def count_export_rows(clinica_id: int) -> int:
+    """Total de linhas da exportação (uma ``COUNT`` por tabela)."""
+    queries = [query for _name, query in _table_queries(clinica_id)] + [_tutor_query(clinica_id)]
+    return sum(query.order_by(None).count() for query in queries)
+
+
+def should_export_in_background(clinica_id: int) -> bool:
+    """Clínicas acima de ``DATA_EXPORT_BACKGROUND_ROWS`` linhas vão para a fila."""
+    threshold = int(current_app.config.get('DATA_EXPORT_BACKGROUND_ROWS') or 0)
+    return threshold > 0 and count_export_rows(clinica_id) >= threshold
+
+
+def export_status(clinica_id: int, token: str) -> str:
+    """``ready``, ``pending`` (ainda gravando), ``failed`` ou ``missing``."""
+    return _store.status(clinica_id, token)
+
+
+def export_response(clinica_id: int, token: str):
+    return _store.response(clinica_id, token, download_name=download_name(clinica_id))
+
+
+def export_to_storage(clinica_id: int, token: str, fmt: str = 'json') -> int:
+    """Grava o ZIP no storage de exportações; retorna o tamanho em bytes."""
+    clinica = db.session.get(Clinica, clinica_id)
+    if clinica is None:
+        _store.fail(clinica_id, token, 'Clínica não encontrada.')
+        raise ValueError(f'Clínica {clinica_id} não encontrada.')
+    size = _store.write(clinica_id, token, stream_clinic_export(clinica, fmt))
+    current_app.logger.info(
+        'clinic_data_export clinica_id=%s token=%s format=%s bytes=%d',
+        clinica_id, token[:6], fmt, size,
+    )
+    return size
+
+
+def queue_clinic_export(clinica_id: int, fmt: str = 'json') -> str:
+    """Agenda a exportação em background e devolve o token do download."""
+    token = _store.reserve(clinica_id)
+
+    def enqueue():
+        from app.jobs.tasks import export_clinic_data
+
+        export_clinic_data.delay(clinica_id, token, fmt)
+
+    _store.run(enqueue, lambda: export_to_storage(clinica_id, token, fmt))
+    return token
@@ -1,15 +1,34 @@
-"""Serviços de sugestão clínica baseada em protocolos curados."""
+"""Serviços de sugestão clínica baseada em protocolos curados.
+
+``recommend_protocols`` não percorre mais todos os protocolos da clínica a cada
+tela de consulta: um :class:`ProtocolIndex` por clínica guarda os protocolos
+ativos já normalizados (tokens, suspeita, espécie) em índices invertidos e só
+os candidatos — protocolos que casam por suspeita ou termo, mais os de maior
+prioridade que ainda podem entrar no ranking só pelo bônus — são pontuados. As
+coleções (exames, medicamentos, retornos) são carregadas só para os ``limit``
+vencedores.
+
+O índice é montado sob demanda e descartado no commit de qualquer escrita em
+``ProtocoloClinico`` da clínica (ou global); os demais workers percebem pelo
+``CacheVersion`` da clínica, conferido no máximo a cada
+``PROTOCOL_INDEX_CHECK_SECONDS`` (padrão 5 s).
+"""
 
 from __future__ import annotations
 
 import re
+import threading
+import time
 import unicodedata
-from collections import Counter
+from collections import Counter, defaultdict
+from dataclasses import dataclass
 from datetime import date, timedelta
 from typing import Any
 
-from sqlalchemy import or_
-from sqlalchemy.orm import selectinload
+from flask import current_app, has_app_context
+from sqlalchemy import event, or_
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session, selectinload
 
 from extensions import db
 from models import AuditoriaSugestaoClinica, ProtocoloClinico
@@ -35,22 +54,29 @@ def _tokenize(value: str | None) -> list[str]:
     return [token for token in normalized.split(" ") if len(token) >= 3]
 
 
+_SPECIES_ALIASES = {
+    "cao": frozenset({"cao", "caes", "canino", "cachorro", "cadela"}),
+    "gato": frozenset({"gato", "gatos", "felino", "gata"}),
+}
+
+
+def _species_aliases(value: str | None) -> frozenset[str]:
+    normalized = _normalize_token(value)
+    return _SPECIES_ALIASES.get(normalized, frozenset({normalized}))
+
+
 def _species_matches(protocol_species: str | None, animal_species: str | None) -> bool:
     if not protocol_species:
         return True
-    protocol_value = _normalize_token(protocol_species)
-    animal_value = _normalize_token(animal_species)
-    if not animal_value:
+    if not _normalize_token(animal_species):
         return True
+    return not _species_aliases(protocol_species).isdisjoint(_species_aliases(animal_species))
 
-    aliases = {
-        "cao": {"cao", "caes", "canino", "cachorro", "cadela"},
-        "gato": {"gato", "gatos", "felino", "gata"},
-    }
 
-    protocol_aliases = aliases.get(protocol_value, {protocol_value})
-    animal_aliases = aliases.get(animal_value, {animal_value})
-    return not protocol_aliases.isdisjoint(animal_aliases)
+def _priority_bonus(prioridade: int | None) -> int:
+    if not prioridade:
+        return 0
+    return max(0, 20 - min(prioridade, 20))
 
 
 def _score_protocol(protocol: ProtocoloClinico, context: dict[str, Any]) -> tuple[int, list[str]]:
@@ -75,18 +101,7 @@ def _score_protocol(protocol: ProtocoloClinico, context: dict[str, Any]) -> tupl
     else:
         return (-1, ["Espécie incompatível com o protocolo."])
 
-    source_text = " ".join(
-        filter(
-            None,
-            [
-                context.get("suspeita_clinica"),
-                context.get("queixa_principal"),
-                context.get("historico_clinico"),
-                context.get("exame_fisico"),
-            ],
-        )
-    )
-    source_tokens = Counter(_tokenize(source_text))
+    source_tokens = Counter(_tokenize(_source_text(context)))
     protocol_tokens = set(
         _tokenize(" ".join(filter(None, [protocol.nome, protocol.suspeita_principal, protocol.sinais_gatilho])))
     )
@@ -95,12 +110,25 @@ def _score_protocol(protocol: ProtocoloClinico, context: dict[str, Any]) -> tupl
         score += min(30, len(overlap) * 6)
         reasons.append("Encontrados sinais/termos relacionados: " + ", ".join(sorted(overlap)[:5]) + ".")
 
-    if protocol.prioridade:
-        score += max(0, 20 - min(protocol.prioridade, 20))
+    score += _priority_bonus(protocol.prioridade)
 
     return (score, reasons)
 
 
+def _source_text(context: dict[str, Any]) -> str:
+    return " ".join(
+        filter(
+            None,
+            [
+                context.get("suspeita_clinica"),
+                context.get("queixa_principal"),
+                context.get("historico_clinico"),
+                context.get("exame_fisico"),
+            ],
+        )
+    )
+
+
 def _followup_label(item) -> str:
     if item.prazo_min_dias and item.prazo_max_dias and item.prazo_min_dias != item.prazo_max_dias:
         prazo = f"{item.prazo_min_dias} a {item.prazo_max_dias} dias"
@@ -180,15 +208,160 @@ def serialize_protocol(protocol: ProtocoloClinico, context: dict[str, Any], reas
     }
 
 
-def recommend_protocols(context: dict[str, Any], clinic_id: int | None = None, limit: int = 5) -> list[dict[str, Any]]:
+# -- índice de protocolos ------------------------------------------------
+PROTOCOL_INDEX_CACHE_KEY = "protocolos_clinicos"
+DEFAULT_INDEX_CHECK_SECONDS = 5.0
+_SESSION_INFO_KEY = "protocol_index_dirty"
+_GLOBAL = "global"
+
+
+def _trigrams(value: str) -> set[str]:
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+@dataclass(frozen=True)
+class IndexedProtocol:
+    """Campos de ``ProtocoloClinico`` que entram na pontuação, já normalizados."""
+
+    id: int
+    position: int
+    suspeita: str
+    especie: str | None
+    especie_aliases: frozenset[str] | None
+    tokens: frozenset[str]
+    bonus: int
+
+    def species_ok(self, animal_aliases: frozenset[str] | None) -> bool:
+        return (
+            self.especie_aliases is None
+            or animal_aliases is None
+            or not self.especie_aliases.isdisjoint(animal_aliases)
+        )
+
+
+class ProtocolIndex:
+    """Protocolos ativos de uma clínica (mais os globais) prontos para ranquear.
+
+    ``rank`` devolve o mesmo resultado que pontuar todos com ``_score_protocol``
+    e ordenar por (score desc, prioridade, nome): fora dos candidatos por
+    suspeita e termo, a pontuação depende só da prioridade, então bastam os
+    ``limit`` primeiros de cada grupo de espécie para completar o ranking.
+    """
+
+    def __init__(self, version: tuple[int, int], entries: list[IndexedProtocol]):
+        self.version = version
+        self.entries = entries
+        self.by_token: dict[str, list[int]] = defaultdict(list)
+        self.by_suspeita: dict[str, list[int]] = defaultdict(list)
+        self.by_trigram: dict[str, set[int]] = defaultdict(set)
+        groups: dict[frozenset[str] | None, list[int]] = defaultdict(list)
+        for entry in entries:
+            for token in entry.tokens:
+                self.by_token[token].append(entry.position)
+            if entry.suspeita:
+                self.by_suspeita[entry.suspeita].append(entry.position)
+                for trigram in _trigrams(entry.suspeita):
+                    self.by_trigram[trigram].add(entry.position)
+            groups[entry.especie_aliases].append(entry.position)
+        self.suspeita_lengths = sorted({len(value) for value in self.by_suspeita})
+        # Por espécie, na ordem em que o bônus de prioridade ranqueia sozinho.
+        self.by_species = {
+            key: sorted(positions, key=lambda pos: (-entries[pos].bonus, pos))
+            for key, positions in groups.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _suspicion_candidates(self, suspicion: str) -> set[int]:
+        found: set[int] = set()
+        # suspeita do protocolo contida na suspeita informada (inclui igualdade)
+        size = len(suspicion)
+        for length in self.suspeita_lengths:
+            if length > size:
+                break
+            for start in range(size - length + 1):
+                found.update(self.by_suspeita.get(suspicion[start:start + length], ()))
+        # suspeita informada contida na do protocolo
+        if size >= 3:
+            postings = sorted((self.by_trigram.get(t, set()) for t in _trigrams(suspicion)), key=len)
+            narrowed = set.intersection(*postings) if postings and postings[0] else set()
+            found.update(pos for pos in narrowed if suspicion in self.entries[pos].suspeita)
+        else:
+            found.update(
+                pos for positions in self.by_suspeita.values() for pos in positions
+                if suspicion in self.entries[pos].suspeita
+            )
+        return found
+
+    def rank(self, context: dict[str, Any], limit: int = 5) -> list[tuple[int, int, list[str]]]:
+        """``[(score, protocolo_id, motivos)]`` dos ``limit`` melhores."""
+        animal_species = context.get("especie")
+        animal_aliases = _species_aliases(animal_species) if _normalize_token(animal_species) else None
+        suspicion = _normalize_token(context.get("suspeita_clinica"))
+
+        overlap: dict[int, list[str]] = defaultdict(list)
+        for token in set(_tokenize(_source_text(context))):
+            for pos in self.by_token.get(token, ()):
+                overlap[pos].append(token)
+
+        candidates = set(overlap)
+        if suspicion:
+            candidates |= self._suspicion_candidates(suspicion)
+        for key, positions in self.by_species.items():
+            if key is None or animal_aliases is None or not key.isdisjoint(animal_aliases):
+                candidates.update(positions[:limit])
+
+        ranked: list[tuple[int, int, int, list[str]]] = []
+        for pos in candidates:
+            entry = self.entries[pos]
+            if not entry.species_ok(animal_aliases):
+                continue
+            reasons: list[str] = []
+            score = 0
+            if suspicion and entry.suspeita:
+                if suspicion == entry.suspeita:
+                    score += 80
+                    reasons.append("Suspeita clínica coincide com o protocolo.")
+                elif suspicion in entry.suspeita or entry.suspeita in suspicion:
+                    score += 55
+                    reasons.append("Suspeita clínica muito próxima da hipótese principal do protocolo.")
+            score += 20
+            if entry.especie:
+                reasons.append(f"Compatível com a espécie registrada ({animal_species}).")
+            tokens = overlap.get(pos)
+            if tokens:
+                score += min(30, len(tokens) * 6)
+                reasons.append("Encontrados sinais/termos relacionados: " + ", ".join(sorted(tokens)[:5]) + ".")
+            score += entry.bonus
+            ranked.append((score, pos, entry.id, reasons))
+
+        ranked.sort(key=lambda item: (-item[0], item[1]))
+        return [(score, protocol_id, reasons) for score, _pos, protocol_id, reasons in ranked[:limit]]
+
+
+def _clinic_cache_key(clinic_id: int | None) -> str:
+    return f"{PROTOCOL_INDEX_CACHE_KEY}:{clinic_id or _GLOBAL}"
+
+
+def _index_versions(clinic_id: int | None) -> tuple[int, int]:
+    from models import CacheVersion
+
+    global_version = CacheVersion.get(_clinic_cache_key(None))
+    return (global_version, CacheVersion.get(_clinic_cache_key(clinic_id)) if clinic_id else 0)
+
+
+def build_protocol_index(clinic_id: int | None, version: tuple[int, int] = (0, 0)) -> ProtocolIndex:
     query = (
-        ProtocoloClinico.query
-        .options(
-            selectinload(ProtocoloClinico.exames_sugeridos),
-            selectinload(ProtocoloClinico.medicamentos_sugeridos),
-            selectinload(ProtocoloClinico.retornos_sugeridos),
+        db.session.query(
+            ProtocoloClinico.id,
+            ProtocoloClinico.nome,
+            ProtocoloClinico.suspeita_principal,
+            ProtocoloClinico.especie,
+            ProtocoloClinico.sinais_gatilho,
+            ProtocoloClinico.prioridade,
         )
-        .filter_by(ativo=True)
+        .filter(ProtocoloClinico.ativo.is_(True))
     )
     if clinic_id:
         query = query.filter(
@@ -196,16 +369,153 @@ def recommend_protocols(context: dict[str, Any], clinic_id: int | None = None, l
         )
     else:
         query = query.filter(ProtocoloClinico.clinica_id.is_(None))
+    rows = query.order_by(
+        ProtocoloClinico.prioridade.asc(), ProtocoloClinico.nome.asc(), ProtocoloClinico.id.asc()
+    ).all()
+    entries = [
+        IndexedProtocol(
+            id=row.id,
+            position=position,
+            suspeita=_normalize_token(row.suspeita_principal),
+            especie=row.especie,
+            especie_aliases=_species_aliases(row.especie) if row.especie else None,
+            tokens=frozenset(_tokenize(" ".join(filter(None, [row.nome, row.suspeita_principal, row.sinais_gatilho])))),
+            bonus=_priority_bonus(row.prioridade),
+        )
+        for position, row in enumerate(rows)
+    ]
+    return ProtocolIndex(version, entries)
+
+
+class _IndexState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.indexes: dict[int | None, tuple[ProtocolIndex, float]] = {}
+        self.hits = self.misses = 0
+
+
+_state = _IndexState()
+
+
+def _check_interval() -> float:
+    if has_app_context():
+        return float(current_app.config.get("PROTOCOL_INDEX_CHECK_SECONDS", DEFAULT_INDEX_CHECK_SECONDS))
+    return DEFAULT_INDEX_CHECK_SECONDS
+
+
+def protocol_index(clinic_id: int | None) -> ProtocolIndex:
+    """Índice vigente da clínica, remontado quando algum protocolo dela mudou."""
+    key = clinic_id or None
+    now = time.monotonic()
+    cached = _state.indexes.get(key)
+    if cached is not None:
+        index, checked_at = cached
+        if now - checked_at < _check_interval():
+            _state.hits += 1
+            return index
+        version = _index_versions(key)
+        if version == index.version:
+            _state.indexes[key] = (index, now)
+            _state.hits += 1
+            return index
+    else:
+        version = _index_versions(key)
+
+    with _state.lock:
+        fresh = build_protocol_index(key, version)
+        _state.indexes[key] = (fresh, now)
+        _state.misses += 1
+    return fresh
+
+
+def invalidate_protocol_index(clinic_id: int | None = None) -> None:
+    """Descarta o índice da clínica; ``None`` (protocolo global) descarta todos."""
+    if clinic_id is None:
+        _state.indexes.clear()
+    else:
+        _state.indexes.pop(clinic_id, None)
+
+
+def reset_protocol_index() -> None:
+    """Zera índices e contadores (testes)."""
+    _state.reset()
+
+
+def protocol_index_stats() -> dict[str, Any]:
+    lookups = _state.hits + _state.misses
+    return {
+        "hits": _state.hits,
+        "misses": _state.misses,
+        "hit_rate": round(_state.hits / lookups, 4) if lookups else None,
+        "clinics": len(_state.indexes),
+    }
+
+
+def recommend_protocols(context: dict[str, Any], clinic_id: int | None = None, limit: int = 5) -> list[dict[str, Any]]:
+    ranked = protocol_index(clinic_id).rank(context, limit)
+    if not ranked:
+        return []
 
-    ranked: list[tuple[int, ProtocoloClinico, list[str]]] = []
-    for protocol in query.order_by(ProtocoloClinico.prioridade.asc(), ProtocoloClinico.nome.asc()).all():
-        score, reasons = _score_protocol(protocol, context)
-        if score <= 0:
+    protocols = {
+        protocol.id: protocol
+        for protocol in ProtocoloClinico.query
+        .options(
+            selectinload(ProtocoloClinico.exames_sugeridos),
+            selectinload(ProtocoloClinico.medicamentos_sugeridos),
+            selectinload(ProtocoloClinico.retornos_sugeridos),
+        )
+        .filter(ProtocoloClinico.id.in_([protocol_id for _score, protocol_id, _reasons in ranked]))
+    }
+    return [
+        serialize_protocol(protocols[protocol_id], context, reasons, score)
+        for score, protocol_id, reasons in ranked
+        if protocol_id in protocols
+    ]
+
+
+# -- invalidação dirigida por commit -------------------------------------
+def _collect_protocol_writes(session: Session, _flush_context) -> None:
+    touched = session.info.get(_SESSION_INFO_KEY)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, ProtocoloClinico):
             continue
-        ranked.append((score, protocol, reasons))
+        if touched is None:
+            touched = session.info[_SESSION_INFO_KEY] = set()
+        touched.add(obj.clinica_id)
+        history = sa_inspect(obj).attrs.clinica_id.history
+        touched.update(history.deleted or ())
+
+
+def _apply_protocol_writes(session: Session) -> None:
+    touched = session.info.pop(_SESSION_INFO_KEY, None)
+    if not touched:
+        return
+    for clinic_id in touched:
+        invalidate_protocol_index(clinic_id)
+    _bump_versions([_clinic_cache_key(clinic_id) for clinic_id in touched])
+
+
+def _discard_protocol_writes(session: Session, *_args) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+def _bump_versions(keys: list[str]) -> None:
+    """Avança ``CacheVersion`` numa conexão própria (a sessão já comitou)."""
+    from models import CacheVersion
+
+    try:
+        CacheVersion.bump_after_commit(keys)
+    except Exception:  # noqa: BLE001 - os outros workers ainda veem pelo TTL da checagem
+        if has_app_context():
+            current_app.logger.warning("protocol_index_bump_failed", exc_info=True)
+
 
-    ranked.sort(key=lambda entry: entry[0], reverse=True)
-    return [serialize_protocol(protocol, context, reasons, score) for score, protocol, reasons in ranked[:limit]]
+event.listen(Session, "after_flush", _collect_protocol_writes)
+event.listen(Session, "after_commit", _apply_protocol_writes)
+event.listen(Session, "after_rollback", _discard_protocol_writes)
 
 
 def log_suggestion_event(
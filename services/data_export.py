@@ -0,0 +1,478 @@
+"""Exportações de dados em stream: CSV/NDJSON/JSON por gerador e ZIP em pedaços.
+
+As exportações antigas (dados da clínica, CSVs do SFA) carregavam as tabelas
+com ``.all()``, montavam listas de dicionários, serializavam cada arquivo
+inteiro e ainda empacotavam tudo num ``BytesIO``. O pico de memória crescia
+linearmente com o número de linhas — várias cópias da mesma exportação.
+
+Este módulo reúne as peças que mantêm a memória limitada pelo tamanho do lote:
+
+* ``iter_query`` percorre uma query com ``yield_per``;
+* ``iter_csv``, ``iter_ndjson`` e ``iter_json_array`` transformam linhas em
+  pedaços de texto, sem montar o arquivo inteiro;
+* ``stream_zip`` gera o ZIP em pedaços (entradas com *data descriptor*, sem
+  ``seek``), aceitando o conteúdo de cada entrada como texto ou gerador;
+* ``ExportStore`` grava o mesmo stream no storage compartilhado (modo em
+  background) e responde o estado do link de download por token.
+
+O estado de cada exportação em background fica na tabela ``data_export``, não
+no disco: o web dyno reserva o token, o worker Celery grava o arquivo e os
+dois enxergam a mesma linha. O arquivo vai para o bucket S3
+(``DATA_EXPORT_BUCKET``); sem bucket, cai num diretório local e a geração
+roda numa thread do próprio processo (um worker Celery não veria esse disco),
+sem segurar o request que pediu a exportação. Exportações
+expiram após ``DATA_EXPORT_TTL_HOURS`` e uma reserva que não termina em
+``DATA_EXPORT_PENDING_MINUTES`` vira ``failed``; ``cleanup_exports`` (job do
+scheduler) apaga linhas e arquivos vencidos.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+from flask import current_app, redirect, send_file
+
+from extensions import db
+from time_utils import utcnow
+
+DEFAULT_BATCH_SIZE = 500
+# Linhas acumuladas antes de cada pedaço de texto sair do gerador.
+DEFAULT_FLUSH_ROWS = 500
+_TOKEN_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+DEFAULT_TTL_HOURS = 24
+DEFAULT_PENDING_MINUTES = 60
+# Acima disso o upload para o S3 vai de um arquivo temporário, não da RAM.
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+PRESIGNED_URL_SECONDS = 300
+# Threads do processo web que geram exportações quando não há bucket.
+LOCAL_EXPORT_WORKERS = 2
+
+_local_executor: ThreadPoolExecutor | None = None
+_local_executor_lock = threading.Lock()
+
+
+def batch_size() -> int:
+    return int(current_app.config.get("DATA_EXPORT_BATCH_SIZE") or DEFAULT_BATCH_SIZE)
+
+
+def iter_query(query, size: int | None = None) -> Iterator[Any]:
+    """Itera a query em lotes de ``size`` linhas (``yield_per``)."""
+    return iter(query.yield_per(size or batch_size()))
+
+
+def json_value(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+def model_row(obj) -> dict:
+    """Colunas do model como dicionário serializável em JSON."""
+    return {column.name: json_value(getattr(obj, column.name)) for column in obj.__table__.columns}
+
+
+def iter_csv(
+    header: Iterable[str] | None, rows: Iterable[Iterable[Any]], *, flush_rows: int = DEFAULT_FLUSH_ROWS
+) -> Iterator[str]:
+    buffer = io.StringIO(newline="")
+    writer = csv.writer(buffer)
+    if header is not None:
+        writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % flush_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    tail = buffer.getvalue()
+    if tail:
+        yield tail
+
+
+def iter_ndjson(rows: Iterable[dict], *, flush_rows: int = DEFAULT_FLUSH_ROWS) -> Iterator[str]:
+    """Um objeto JSON por linha (``application/x-ndjson``)."""
+    lines: list[str] = []
+    for row in rows:
+        lines.append(json.dumps(row, ensure_ascii=False, default=json_value))
+        if len(lines) >= flush_rows:
+            yield "\n".join(lines) + "\n"
+            lines.clear()
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_json_array(rows: Iterable[dict], *, flush_rows: int = DEFAULT_FLUSH_ROWS) -> Iterator[str]:
+    """Mesmo texto de ``json.dumps(list(rows), indent=2)``, gerado em pedaços."""
+    parts: list[str] = []
+    empty = True
+    for row in rows:
+        item = "  " + json.dumps(row, ensure_ascii=False, indent=2, default=json_value).replace("\n", "\n  ")
+        parts.append(("[\n" if empty else ",\n") + item)
+        empty = False
+        if len(parts) >= flush_rows:
+            yield "".join(parts)
+            parts.clear()
+    parts.append("[]" if empty else "\n]")
+    yield "".join(parts)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino sem ``seek`` para o ``ZipFile``: acumula bytes até o ``drain``."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._offset = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._offset
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _as_bytes(data) -> bytes:
+    return data.encode("utf-8") if isinstance(data, str) else data
+
+
+def stream_zip(entries: Iterable[tuple[str, Any]]) -> Iterator[bytes]:
+    """Gera o ZIP em pedaços.
+
+    O conteúdo de cada entrada pode ser ``str``/``bytes`` (entra inteiro) ou
+    um iterável de pedaços, comprimidos e enviados conforme chegam — só um
+    pedaço (mais o comprimido) fica em memória.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for filename, content in entries:
+            if isinstance(content, (str, bytes)):
+                zip_file.writestr(filename, content)
+            else:
+                info = zipfile.ZipInfo(filename, date_time=time.localtime()[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with zip_file.open(info, "w", force_zip64=True) as handle:
+                    for piece in content:
+                        handle.write(_as_bytes(piece))
+                        chunk = sink.drain()
+                        if chunk:
+                            yield chunk
+            chunk = sink.drain()
+            if chunk:
+                yield chunk
+    chunk = sink.drain()
+    if chunk:
+        yield chunk
+
+
+def new_export_token() -> str:
+    return secrets.token_urlsafe(24)
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite devolve datetime sem fuso mesmo com ``timezone=True``.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class LocalExportStorage:
+    """Diretório local: só serve quando quem grava é o processo que entrega."""
+
+    shared = False
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def put(self, key: str, chunks: Iterable[bytes]) -> int:
+        # Grava em ``.part`` e renomeia: o link nunca entrega arquivo pela metade.
+        self.root.mkdir(parents=True, exist_ok=True)
+        final_path = self.root / key
+        partial_path = final_path.with_name(final_path.name + ".part")
+        try:
+            with partial_path.open("wb") as handle:
+                for chunk in chunks:
+                    handle.write(chunk)
+            os.replace(partial_path, final_path)
+        except BaseException:
+            partial_path.unlink(missing_ok=True)
+            raise
+        return final_path.stat().st_size
+
+    def delete(self, key: str) -> None:
+        (self.root / key).unlink(missing_ok=True)
+
+    def response(self, key: str, *, download_name: str, mimetype: str):
+        return send_file(
+            self.root / key, mimetype=mimetype, as_attachment=True, download_name=download_name, max_age=0
+        )
+
+    def remove_orphans(self, older_than: datetime) -> int:
+        """Apaga ``.part`` esquecidos por processos que morreram no meio."""
+        removed = 0
+        if not self.root.is_dir():
+            return removed
+        for path in self.root.glob("*.part"):
+            if datetime.fromtimestamp(path.stat().st_mtime, timezone.utc) < older_than:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+
+_s3 = None
+
+
+def _s3_client():
+    global _s3
+    if _s3 is None:
+        import boto3  # SDK pesado: só carrega na primeira exportação
+
+        _s3 = boto3.client(
+            "s3",
+            aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+            aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        )
+    return _s3
+
+
+class S3ExportStorage:
+    """Bucket S3 visto pelo web dyno e pelo worker; o download sai por URL assinada."""
+
+    shared = True
+
+    def __init__(self, bucket: str, prefix: str, client_factory: Callable = _s3_client):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._client_factory = client_factory
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}"
+
+    def put(self, key: str, chunks: Iterable[bytes]) -> int:
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as spool:
+            for chunk in chunks:
+                spool.write(chunk)
+            size = spool.tell()
+            spool.seek(0)
+            self._client_factory().upload_fileobj(
+                spool, self.bucket, self._key(key), ExtraArgs={"ContentType": "application/zip"}
+            )
+        return size
+
+    def delete(self, key: str) -> None:
+        self._client_factory().delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def response(self, key: str, *, download_name: str, mimetype: str):
+        url = self._client_factory().generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._key(key),
+                "ResponseContentType": mimetype,
+                "ResponseContentDisposition": f'attachment; filename="{download_name}"',
+            },
+            ExpiresIn=PRESIGNED_URL_SECONDS,
+        )
+        return redirect(url)
+
+    def remove_orphans(self, older_than: datetime) -> int:
+        return 0  # upload_fileobj é atômico: não deixa objeto parcial
+
+
+_STORES: dict[str, "ExportStore"] = {}
+
+
+class ExportStore:
+    """Arquivos de exportação gerados em background, baixados por token.
+
+    ``kind`` separa os tipos de exportação na tabela ``data_export`` e no
+    bucket (``exports/<kind>/``); sem bucket, os arquivos ficam em
+    ``config[config_key]`` (padrão ``instance/<subdir>``). Cada arquivo é
+    ``<dono>-<token><suffix>``.
+    """
+
+    def __init__(self, kind: str, config_key: str, default_subdir: str, suffix: str = ".zip"):
+        self.kind = kind
+        self.config_key = config_key
+        self.default_subdir = default_subdir
+        self.suffix = suffix
+        _STORES[kind] = self
+
+    def directory(self) -> Path:
+        configured = current_app.config.get(self.config_key)
+        return Path(configured) if configured else Path(current_app.instance_path) / self.default_subdir
+
+    def storage(self):
+        bucket = current_app.config.get("DATA_EXPORT_BUCKET")
+        if bucket:
+            return S3ExportStorage(bucket, f"exports/{self.kind}")
+        return LocalExportStorage(self.directory())
+
+    @staticmethod
+    def ttl() -> timedelta:
+        return timedelta(hours=float(current_app.config.get("DATA_EXPORT_TTL_HOURS") or DEFAULT_TTL_HOURS))
+
+    @staticmethod
+    def pending_timeout() -> timedelta:
+        minutes = current_app.config.get("DATA_EXPORT_PENDING_MINUTES") or DEFAULT_PENDING_MINUTES
+        return timedelta(minutes=float(minutes))
+
+    def _record(self, owner_id: int, token: str):
+        from models import DataExport
+
+        if not _TOKEN_PATTERN.match(token or ""):
+            raise ValueError("Token de exportação inválido.")
+        return DataExport.query.filter_by(token=token, kind=self.kind, owner_id=int(owner_id)).first()
+
+    def reserve(self, owner_id: int) -> str:
+        """Novo token já registrado como ``pending`` (com commit)."""
+        from models import DataExport
+
+        token = new_export_token()
+        db.session.add(DataExport(
+            token=token,
+            kind=self.kind,
+            owner_id=int(owner_id),
+            status=DataExport.PENDING,
+            storage_key=f"{int(owner_id)}-{token}{self.suffix}",
+            expires_at=utcnow() + self.ttl(),
+        ))
+        db.session.commit()
+        return token
+
+    def status(self, owner_id: int, token: str) -> str:
+        """``ready``, ``pending`` (ainda gravando), ``failed`` ou ``missing``."""
+        from models import DataExport
+
+        record = self._record(owner_id, token)
+        now = utcnow()
+        if record is None or _aware(record.expires_at) <= now:
+            return "missing"
+        if record.status == DataExport.PENDING and _aware(record.created_at) + self.pending_timeout() <= now:
+            # Worker morreu ou nunca pegou a tarefa: não deixa o link em "pending".
+            self._finish(record, DataExport.FAILED, error="Exportação não terminou no prazo.")
+        return record.status
+
+    def _finish(self, record, status: str, *, size: int | None = None, error: str | None = None) -> None:
+        record.status = status
+        record.size_bytes = size
+        record.error = error[:500] if error else None
+        record.finished_at = utcnow()
+        db.session.commit()
+
+    def write(self, owner_id: int, token: str, chunks: Iterable[bytes]) -> int:
+        """Grava os pedaços no storage e marca ``ready``; retorna o tamanho em bytes."""
+        from models import DataExport
+
+        record = self._record(owner_id, token)
+        if record is None:
+            raise ValueError("Exportação não reservada.")
+        try:
+            size = self.storage().put(record.storage_key, chunks)
+        except BaseException as exc:
+            db.session.rollback()
+            self.fail(owner_id, token, exc)
+            raise
+        self._finish(record, DataExport.READY, size=size)
+        return size
+
+    def fail(self, owner_id: int, token: str, error) -> None:
+        from models import DataExport
+
+        record = self._record(owner_id, token)
+        if record is not None:
+            self._finish(record, DataExport.FAILED, error=str(error) or error.__class__.__name__)
+
+    def response(self, owner_id: int, token: str, *, download_name: str, mimetype: str = "application/zip"):
+        """Resposta de download de uma exportação ``ready``."""
+        record = self._record(owner_id, token)
+        if record is None:
+            raise ValueError("Exportação não encontrada.")
+        return self.storage().response(record.storage_key, download_name=download_name, mimetype=mimetype)
+
+    def run(self, enqueue: Callable[[], Any], run_locally: Callable[[], Any]) -> None:
+        """Entrega a geração ao Celery só quando o worker enxerga o storage.
+
+        Sem storage compartilhado (ou sem fila), gera numa thread do processo:
+        o request devolve o token na hora, mesmo para períodos enormes. Em
+        TESTING roda na thread atual, para o teste ver o estado final.
+        """
+        if self.storage().shared:
+            try:
+                enqueue()
+                return
+            except Exception:  # noqa: BLE001 - fallback para ambientes sem celery
+                current_app.logger.warning("Fila Celery indisponível, exportação %s gerada localmente.", self.kind)
+        app = current_app._get_current_object()
+        if app.testing:
+            self._run_locally(app, run_locally)
+        else:
+            _executor().submit(self._run_in_thread, app, run_locally)
+
+    def _run_locally(self, app, run_locally: Callable[[], Any]) -> None:
+        try:
+            run_locally()
+        except Exception:  # noqa: BLE001 - a falha já ficou no registro; o link responde 410
+            app.logger.exception("Falha ao gerar exportação %s", self.kind)
+
+    def _run_in_thread(self, app, run_locally: Callable[[], Any]) -> None:
+        with app.app_context():
+            try:
+                self._run_locally(app, run_locally)
+            finally:
+                db.session.remove()
+
+    def cleanup(self) -> int:
+        """Apaga exportações expiradas (linha e arquivo); retorna quantas."""
+        from models import DataExport
+
+        now = utcnow()
+        storage = self.storage()
+        expired = DataExport.query.filter(DataExport.kind == self.kind, DataExport.expires_at <= now).all()
+        for record in expired:
+            try:
+                storage.delete(record.storage_key)
+            except Exception:  # noqa: BLE001 - objeto já removido ou storage fora do ar
+                current_app.logger.warning("Falha ao apagar exportação %s", record.storage_key, exc_info=True)
+            db.session.delete(record)
+        db.session.commit()
+        storage.remove_orphans(now - self.pending_timeout())
+        return len(expired)
+
+
+def _executor() -> ThreadPoolExecutor:
+    global _local_executor
+    with _local_executor_lock:
+        if _local_executor is None:
+            _local_executor = ThreadPoolExecutor(
+                max_workers=LOCAL_EXPORT_WORKERS, thread_name_prefix="data-export",
+            )
+        return _local_executor
+
+
+def cleanup_exports() -> dict[str, int]:
+    """Limpa todos os tipos de exportação registrados (job do scheduler)."""
+    return {kind: store.cleanup() for kind, store in _STORES.items()}
@@ -8,13 +8,13 @@ import re
 import zipfile
 from collections import defaultdict
 from dataclasses import dataclass
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal, ROUND_HALF_UP
 from typing import Callable, Iterable, List, Optional, Sequence, Tuple
 
 from dateutil.relativedelta import relativedelta
 from flask import current_app, has_app_context
-from sqlalchemy import and_, cast, func, or_, inspect as sa_inspect
+from sqlalchemy import and_, cast, func, literal, or_, select, union_all, inspect as sa_inspect
 from sqlalchemy.exc import NoSuchTableError, OperationalError, ProgrammingError
 from sqlalchemy.orm import load_only
 from sqlalchemy.sql.sqltypes import Numeric
@@ -25,6 +25,7 @@ from models import (
     AccountingAccount,
     BankStatementTransaction,
     BlocoOrcamento,
+    ClassifiedMonthlyTotal,
     ClassifiedTransaction,
     ClinicFinancialSnapshot,
     ClinicNotification,
@@ -33,6 +34,7 @@ from models import (
     Consulta,
     FiscalDocument,
     FiscalDocumentStatus,
+    JobCheckpoint,
     Orcamento,
     OrcamentoItem,
     Order,
@@ -42,9 +44,15 @@ from models import (
     ServicoClinica,
     User,
 )
-from time_utils import utcnow
+from models.financeiro import apply_classified_total_deltas
+from time_utils import now_in_brazil, utcnow
 
 ZERO = Decimal("0.00")
+CLASSIFY_BULK_CHUNK = 500
+# Folga do watermark: cobre transações que gravaram updated_at antes da
+# leitura mas só comitaram depois. O watermark é um epoch comparado em UTC,
+# a mesma convenção de ``utcnow()`` nas colunas ``updated_at``.
+CLASSIFY_WATERMARK_OVERLAP = timedelta(minutes=10)
 _TABLE_COLUMN_CACHE: dict[str, set[str]] = {}
 REQUIRED_PJ_PAYMENT_COLUMNS = {"tipo_prestador", "plantao_horas"}
 MANUAL_ENTRY_MODEL_CANDIDATES = (
@@ -203,19 +211,39 @@ def _month_range(month_start: date) -> tuple[datetime, datetime]:
     return range_start, range_end
 
 
+def _classified_totals_query(clinic_id: int, categories: Sequence[str]):
+    return (
+        db.session.query(
+            func.coalesce(func.sum(ClassifiedMonthlyTotal.total), 0),
+            func.coalesce(func.sum(ClassifiedMonthlyTotal.count), 0),
+        )
+        .filter(ClassifiedMonthlyTotal.clinic_id == clinic_id)
+        .filter(ClassifiedMonthlyTotal.category.in_(list(categories)))
+    )
+
+
 def _classified_sum_for_month(clinic_id: int, month_start: date, categories: Sequence[str]) -> Decimal:
     if not categories:
         return ZERO
-    total = (
-        db.session.query(func.coalesce(func.sum(ClassifiedTransaction.value), 0))
-        .filter(ClassifiedTransaction.clinic_id == clinic_id)
-        .filter(ClassifiedTransaction.month == month_start)
-        .filter(ClassifiedTransaction.category.in_(list(categories)))
-        .scalar()
+    total, _count = (
+        _classified_totals_query(clinic_id, categories)
+        .filter(ClassifiedMonthlyTotal.month == month_start)
+        .one()
     )
     return _ensure_decimal(total)
 
 
+def _classified_count_for_month(clinic_id: int, month_start: date, categories: Sequence[str]) -> int:
+    if not categories:
+        return 0
+    _total, count = (
+        _classified_totals_query(clinic_id, categories)
+        .filter(ClassifiedMonthlyTotal.month == month_start)
+        .one()
+    )
+    return int(count or 0)
+
+
 def _classified_sum_for_range(
     clinic_id: int,
     month_start: date,
@@ -226,13 +254,11 @@ def _classified_sum_for_range(
         return ZERO
     window_start = month_start - relativedelta(months=months - 1)
     window_end = month_start + relativedelta(months=1)
-    total = (
-        db.session.query(func.coalesce(func.sum(ClassifiedTransaction.value), 0))
-        .filter(ClassifiedTransaction.clinic_id == clinic_id)
-        .filter(ClassifiedTransaction.month >= window_start)
-        .filter(ClassifiedTransaction.month < window_end)
-        .filter(ClassifiedTransaction.category.in_(list(categories)))
-        .scalar()
+    total, _count = (
+        _classified_totals_query(clinic_id, categories)
+        .filter(ClassifiedMonthlyTotal.month >= window_start)
+        .filter(ClassifiedMonthlyTotal.month < window_end)
+        .one()
     )
     return _ensure_decimal(total)
 
@@ -255,16 +281,17 @@ def _service_revenue_total(clinic_id: int, start_dt: datetime, end_dt: datetime)
     return _ensure_decimal(total)
 
 
-def _order_clinic_filters(clinic_id: int):
-    order_clinic_column = None
+def _order_clinic_column():
+    """Coluna que liga o pedido à clínica (na falta dela, a clínica do comprador)."""
     if hasattr(Order, 'clinica_id'):
-        order_clinic_column = Order.clinica_id
-    elif hasattr(Order, 'clinic_id'):
-        order_clinic_column = Order.clinic_id
+        return Order.clinica_id
+    if hasattr(Order, 'clinic_id'):
+        return Order.clinic_id
+    return User.clinica_id
 
-    if order_clinic_column is not None:
-        return [order_clinic_column == clinic_id]
-    return [User.clinica_id == clinic_id]
+
+def _order_clinic_filters(clinic_id: int):
+    return [_order_clinic_column() == clinic_id]
 
 
 def _product_revenue_total(clinic_id: int, start_dt: datetime, end_dt: datetime) -> Decimal:
@@ -423,12 +450,32 @@ def _upsert_classified_transaction(
     return record, changed
 
 
-def _classify_service_transactions(
-    clinic_id: int,
-    month_start: date,
-    start_dt: datetime,
-    end_dt: datetime,
-) -> Tuple[List[ClassifiedTransaction], bool]:
+@dataclass(frozen=True)
+class _ClassificationSource:
+    """Uma origem de lançamentos: consulta por clínicas/período e regra de classificação.
+
+    ``classify`` recebe uma linha da consulta e o mês padrão (usado só quando a
+    linha não tem data) e devolve os campos do ``ClassifiedTransaction``. O
+    mesmo objeto atende a classificação mês a mês e o backfill em lote.
+    """
+
+    origin: str
+    label: str
+    query: object
+    clinic_column: object
+    classify: Callable[[object, date], dict]
+    updated_column: object = None
+
+
+def _model_updated_column(model):
+    column = getattr(model, 'updated_at', None)
+    table_name = getattr(model, '__tablename__', None)
+    if column is None or not table_name or not _table_has_column(table_name, column.key):
+        return None
+    return column
+
+
+def _service_source(clinic_ids: Sequence[int], start_dt: datetime, end_dt: datetime) -> _ClassificationSource:
     item_date_expr = func.coalesce(
         Orcamento.created_at,
         Consulta.created_at,
@@ -437,6 +484,7 @@ def _classify_service_transactions(
 
     query = (
         db.session.query(
+            OrcamentoItem.clinica_id.label('clinic_id'),
             OrcamentoItem.id.label('item_id'),
             item_date_expr.label('item_date'),
             OrcamentoItem.descricao.label('descricao'),
@@ -447,44 +495,29 @@ def _classify_service_transactions(
         .outerjoin(Consulta, Consulta.id == OrcamentoItem.consulta_id)
         .outerjoin(BlocoOrcamento, BlocoOrcamento.id == OrcamentoItem.bloco_id)
         .outerjoin(ServicoClinica, ServicoClinica.id == OrcamentoItem.servico_id)
-        .filter(OrcamentoItem.clinica_id == clinic_id)
+        .filter(OrcamentoItem.clinica_id.in_(list(clinic_ids)))
         .filter(item_date_expr >= start_dt, item_date_expr < end_dt)
     )
-    records: List[ClassifiedTransaction] = []
-    changed = False
-    for row in query.all():
-        occurred_at = _ensure_datetime(row.item_date, month_start)
-        value = _ensure_decimal(row.valor)
-        description = _prepare_description(row.descricao, "Serviço")
-        subcategory = _prepare_subcategory(row.servico_nome or row.descricao)
-        record, record_changed = _upsert_classified_transaction(
-            clinic_id,
-            month_start,
-            raw_id=f"service:{row.item_id}",
-            date_value=occurred_at,
-            origin="service",
-            description=description,
-            value=value,
-            category="receita_servico",
-            subcategory=subcategory,
-        )
-        records.append(record)
-        changed = changed or record_changed
-        _log(
-            "[Contabilidade] Classificado: Serviço -> receita_servico (%s)",
-            _format_currency(value),
-        )
-    return records, changed
 
+    def classify(row, default_month: date) -> dict:
+        return {
+            'clinic_id': row.clinic_id,
+            'raw_id': f"service:{row.item_id}",
+            'date': _ensure_datetime(row.item_date, default_month),
+            'description': _prepare_description(row.descricao, "Serviço"),
+            'value': _ensure_decimal(row.valor),
+            'category': "receita_servico",
+            'subcategory': _prepare_subcategory(row.servico_nome or row.descricao),
+        }
 
-def _classify_product_sales(
-    clinic_id: int,
-    month_start: date,
-    start_dt: datetime,
-    end_dt: datetime,
-) -> Tuple[List[ClassifiedTransaction], bool]:
+    return _ClassificationSource("service", "Serviço", query, OrcamentoItem.clinica_id, classify)
+
+
+def _product_sale_source(clinic_ids: Sequence[int], start_dt: datetime, end_dt: datetime) -> _ClassificationSource:
+    clinic_column = _order_clinic_column()
     query = (
         db.session.query(
+            clinic_column.label('clinic_id'),
             OrderItem.id.label('item_id'),
             Order.created_at.label('order_date'),
             OrderItem.item_name.label('item_name'),
@@ -498,83 +531,56 @@ def _classify_product_sales(
         .outerjoin(Product, Product.id == OrderItem.product_id)
         .outerjoin(User, User.id == Order.user_id)
         .filter(Order.created_at >= start_dt, Order.created_at < end_dt)
+        .filter(clinic_column.in_(list(clinic_ids)))
     )
-    for clause in _order_clinic_filters(clinic_id):
-        query = query.filter(clause)
 
-    records: List[ClassifiedTransaction] = []
-    changed = False
-    for row in query.all():
-        occurred_at = _ensure_datetime(row.order_date, month_start)
+    def classify(row, default_month: date) -> dict:
         quantity = Decimal(row.quantity or 0)
         unit_price = _ensure_decimal(row.unit_price if row.unit_price is not None else row.product_price)
-        value = unit_price * quantity
-        description = _prepare_description(row.item_name or row.product_name, "Venda de produto")
-        subcategory = _prepare_subcategory(row.product_category or row.product_name)
-        record, record_changed = _upsert_classified_transaction(
-            clinic_id,
-            month_start,
-            raw_id=f"product:{row.item_id}",
-            date_value=occurred_at,
-            origin="product_sale",
-            description=description,
-            value=value,
-            category="receita_produto",
-            subcategory=subcategory,
-        )
-        records.append(record)
-        changed = changed or record_changed
-        _log(
-            "[Contabilidade] Classificado: Venda -> receita_produto (%s)",
-            _format_currency(value),
-        )
-    return records, changed
+        return {
+            'clinic_id': row.clinic_id,
+            'raw_id': f"product:{row.item_id}",
+            'date': _ensure_datetime(row.order_date, default_month),
+            'description': _prepare_description(row.item_name or row.product_name, "Venda de produto"),
+            'value': unit_price * quantity,
+            'category': "receita_produto",
+            'subcategory': _prepare_subcategory(row.product_category or row.product_name),
+        }
 
+    return _ClassificationSource("product_sale", "Venda", query, clinic_column, classify)
 
-def _classify_manual_entries(
-    clinic_id: int,
-    month_start: date,
-    start_dt: datetime,
-    end_dt: datetime,
-) -> Tuple[List[ClassifiedTransaction], bool]:
+
+def _manual_entry_source(
+    clinic_ids: Sequence[int], start_dt: datetime, end_dt: datetime
+) -> Optional[_ClassificationSource]:
     model = _resolve_manual_model()
     if model is None or not hasattr(model, 'clinic_id'):
-        return [], False
+        return None
 
     amount_column = _resolve_column(model, MANUAL_AMOUNT_FIELDS)
     date_column = _resolve_column(model, MANUAL_DATE_FIELDS)
     description_column = _resolve_column(model, MANUAL_DESCRIPTION_FIELDS)
     if amount_column is None or date_column is None:
-        return [], False
+        return None
 
-    query = model.query.filter(model.clinic_id == clinic_id)
+    query = model.query.filter(model.clinic_id.in_(list(clinic_ids)))
     query = query.filter(date_column >= start_dt, date_column < end_dt)
 
-    records: List[ClassifiedTransaction] = []
-    changed = False
-    for entry in query.all():
-        date_value = getattr(entry, date_column.key)
-        amount_value = getattr(entry, amount_column.key)
+    def classify(entry, default_month: date) -> dict:
         description = getattr(entry, description_column.key, None) if description_column else None
-        value = _ensure_decimal(amount_value)
-        record, record_changed = _upsert_classified_transaction(
-            clinic_id,
-            month_start,
-            raw_id=f"manual:{getattr(entry, 'id', id(entry))}",
-            date_value=_ensure_datetime(date_value, month_start),
-            origin="manual",
-            description=_prepare_description(description, "Lançamento manual"),
-            value=value,
-            category="receita_servico",
-            subcategory=_prepare_subcategory("ajuste_manual"),
-        )
-        records.append(record)
-        changed = changed or record_changed
-        _log(
-            "[Contabilidade] Classificado: Manual -> receita_servico (%s)",
-            _format_currency(value),
-        )
-    return records, changed
+        return {
+            'clinic_id': entry.clinic_id,
+            'raw_id': f"manual:{getattr(entry, 'id', id(entry))}",
+            'date': _ensure_datetime(getattr(entry, date_column.key), default_month),
+            'description': _prepare_description(description, "Lançamento manual"),
+            'value': _ensure_decimal(getattr(entry, amount_column.key)),
+            'category': "receita_servico",
+            'subcategory': _prepare_subcategory("ajuste_manual"),
+        }
+
+    return _ClassificationSource(
+        "manual", "Manual", query, model.clinic_id, classify, _model_updated_column(model)
+    )
 
 
 def _resolve_optional_model(candidates: Sequence[str]):
@@ -585,15 +591,12 @@ def _resolve_optional_model(candidates: Sequence[str]):
     return None
 
 
-def _classify_veterinarian_payments(
-    clinic_id: int,
-    month_start: date,
-    start_dt: datetime,
-    end_dt: datetime,
-) -> Tuple[List[ClassifiedTransaction], bool]:
+def _vet_payment_source(
+    clinic_ids: Sequence[int], start_dt: datetime, end_dt: datetime
+) -> Optional[_ClassificationSource]:
     model = _resolve_optional_model(VET_PAYMENT_MODEL_CANDIDATES)
     if model is None or not hasattr(model, 'clinica_id'):
-        return [], False
+        return None
 
     amount_column = _resolve_column(model, VET_PAYMENT_AMOUNT_FIELDS)
     date_column = _resolve_column(model, VET_PAYMENT_DATE_FIELDS)
@@ -601,9 +604,9 @@ def _classify_veterinarian_payments(
     invoice_column = _resolve_column(model, VET_PAYMENT_INVOICE_FIELDS)
     raw_column = _resolve_column(model, VET_PAYMENT_RAW_FIELDS)
     if amount_column is None or date_column is None:
-        return [], False
+        return None
 
-    query = model.query.filter(model.clinica_id == clinic_id)
+    query = model.query.filter(model.clinica_id.in_(list(clinic_ids)))
     service_date_column = getattr(model, 'data_servico', None)
     table_name = getattr(model, '__tablename__', None)
     service_date_available = False
@@ -640,6 +643,7 @@ def _classify_veterinarian_payments(
                 table_name,
             )
 
+    clinic_key = getattr(model, 'clinic_id', None)
     load_only_columns = []
     for column in (
         amount_column,
@@ -647,6 +651,7 @@ def _classify_veterinarian_payments(
         description_column,
         invoice_column,
         raw_column,
+        clinic_key if clinic_key is not None else model.clinica_id,
     ):
         if column is not None and column not in load_only_columns:
             load_only_columns.append(column)
@@ -657,13 +662,21 @@ def _classify_veterinarian_payments(
         load_only_columns.append(provider_type_column)
     if service_date_column is not None and service_date_column not in load_only_columns:
         load_only_columns.append(service_date_column)
+    # O listener de ``load`` (extensions) lê todas as colunas DateTime; deixá-las
+    # adiadas dispararia um SELECT por pagamento.
+    for timestamp_name in ('created_at', 'updated_at'):
+        timestamp_column = getattr(model, timestamp_name, None)
+        if (
+            timestamp_column is not None
+            and table_name
+            and _table_has_column(table_name, timestamp_column.key)
+            and timestamp_column not in load_only_columns
+        ):
+            load_only_columns.append(timestamp_column)
     if load_only_columns:
         query = query.options(load_only(*load_only_columns))
 
-    records: List[ClassifiedTransaction] = []
-    changed = False
-    for entry in query.all():
-        amount_value = getattr(entry, amount_column.key)
+    def classify(entry, default_month: date) -> dict:
         date_value = getattr(entry, date_column.key)
         if not date_value and service_date_column is not None:
             date_value = getattr(entry, service_date_column.key)
@@ -679,25 +692,19 @@ def _classify_veterinarian_payments(
             if provider_type_available and provider_type_column is not None
             else None
         )
-        provider_type = determine_pj_payment_subcategory(provider_value)
-        record, record_changed = _upsert_classified_transaction(
-            clinic_id,
-            month_start,
-            raw_id=f"vet_payment:{raw_value}",
-            date_value=_ensure_datetime(date_value, month_start),
-            origin="vet_payment",
-            description=_prepare_description(description, "Pagamento PJ"),
-            value=_ensure_decimal(amount_value),
-            category="pagamento_pj",
-            subcategory=_prepare_subcategory(provider_type),
-        )
-        records.append(record)
-        changed = changed or record_changed
-        _log(
-            "[Contabilidade] Classificado: Pagamento PJ -> pagamento_pj (%s)",
-            _format_currency(record.value),
-        )
-    return records, changed
+        return {
+            'clinic_id': entry.clinica_id,
+            'raw_id': f"vet_payment:{raw_value}",
+            'date': _ensure_datetime(date_value, default_month),
+            'description': _prepare_description(description, "Pagamento PJ"),
+            'value': _ensure_decimal(getattr(entry, amount_column.key)),
+            'category': "pagamento_pj",
+            'subcategory': _prepare_subcategory(determine_pj_payment_subcategory(provider_value)),
+        }
+
+    return _ClassificationSource(
+        "vet_payment", "Pagamento PJ", query, model.clinica_id, classify, _model_updated_column(model)
+    )
 
 
 def _detect_expense_category(entry, kind_field, cogs_flag_field) -> str:
@@ -712,15 +719,12 @@ def _detect_expense_category(entry, kind_field, cogs_flag_field) -> str:
     return "despesa_insumo"
 
 
-def _classify_expenses(
-    clinic_id: int,
-    month_start: date,
-    start_dt: datetime,
-    end_dt: datetime,
-) -> Tuple[List[ClassifiedTransaction], bool]:
+def _expense_source(
+    clinic_ids: Sequence[int], start_dt: datetime, end_dt: datetime
+) -> Optional[_ClassificationSource]:
     model = _resolve_optional_model(EXPENSE_MODEL_CANDIDATES)
     if model is None or not hasattr(model, 'clinica_id'):
-        return [], False
+        return None
 
     amount_column = _resolve_column(model, EXPENSE_AMOUNT_FIELDS)
     date_column = _resolve_column(model, EXPENSE_DATE_FIELDS)
@@ -728,41 +732,115 @@ def _classify_expenses(
     kind_column = _resolve_column(model, EXPENSE_KIND_FIELDS)
     cogs_flag = _resolve_column(model, EXPENSE_COGS_FLAGS)
     if amount_column is None or date_column is None:
-        return [], False
+        return None
 
-    query = model.query.filter(model.clinica_id == clinic_id)
+    query = model.query.filter(model.clinica_id.in_(list(clinic_ids)))
     query = query.filter(date_column >= start_dt, date_column < end_dt)
 
+    def classify(entry, default_month: date) -> dict:
+        description = getattr(entry, name_column.key, "Despesa") if name_column else "Despesa"
+        return {
+            'clinic_id': entry.clinica_id,
+            'raw_id': f"expense:{getattr(entry, 'id', id(entry))}",
+            'date': _ensure_datetime(getattr(entry, date_column.key), default_month),
+            'description': _prepare_description(description, "Despesa"),
+            'value': _ensure_decimal(getattr(entry, amount_column.key)),
+            'category': _detect_expense_category(entry, kind_column, cogs_flag),
+            'subcategory': _prepare_subcategory(description),
+        }
+
+    return _ClassificationSource(
+        "expense", "Despesa", query, model.clinica_id, classify, _model_updated_column(model)
+    )
+
+
+CLASSIFICATION_SOURCES = (
+    _service_source,
+    _product_sale_source,
+    _manual_entry_source,
+    _vet_payment_source,
+    _expense_source,
+)
+
+
+def _classify_source(
+    clinic_id: int,
+    month_start: date,
+    source: Optional[_ClassificationSource],
+) -> Tuple[List[ClassifiedTransaction], bool]:
+    if source is None:
+        return [], False
     records: List[ClassifiedTransaction] = []
     changed = False
-    for entry in query.all():
-        amount_value = getattr(entry, amount_column.key)
-        date_value = getattr(entry, date_column.key)
-        description = getattr(entry, name_column.key, "Despesa") if name_column else "Despesa"
-        category = _detect_expense_category(entry, kind_column, cogs_flag)
-        subcategory = description
-        raw_value = getattr(entry, 'id', id(entry))
+    for row in source.query.all():
+        entry = source.classify(row, month_start)
         record, record_changed = _upsert_classified_transaction(
             clinic_id,
             month_start,
-            raw_id=f"expense:{raw_value}",
-            date_value=_ensure_datetime(date_value, month_start),
-            origin="expense",
-            description=_prepare_description(description, "Despesa"),
-            value=_ensure_decimal(amount_value),
-            category=category,
-            subcategory=_prepare_subcategory(subcategory),
+            raw_id=entry['raw_id'],
+            date_value=entry['date'],
+            origin=source.origin,
+            description=entry['description'],
+            value=entry['value'],
+            category=entry['category'],
+            subcategory=entry['subcategory'],
         )
         records.append(record)
         changed = changed or record_changed
         _log(
-            "[Contabilidade] Classificado: Despesa -> %s (%s)",
-            category,
+            "[Contabilidade] Classificado: %s -> %s (%s)",
+            source.label,
+            entry['category'],
             _format_currency(record.value),
         )
     return records, changed
 
 
+def _classify_service_transactions(
+    clinic_id: int,
+    month_start: date,
+    start_dt: datetime,
+    end_dt: datetime,
+) -> Tuple[List[ClassifiedTransaction], bool]:
+    return _classify_source(clinic_id, month_start, _service_source([clinic_id], start_dt, end_dt))
+
+
+def _classify_product_sales(
+    clinic_id: int,
+    month_start: date,
+    start_dt: datetime,
+    end_dt: datetime,
+) -> Tuple[List[ClassifiedTransaction], bool]:
+    return _classify_source(clinic_id, month_start, _product_sale_source([clinic_id], start_dt, end_dt))
+
+
+def _classify_manual_entries(
+    clinic_id: int,
+    month_start: date,
+    start_dt: datetime,
+    end_dt: datetime,
+) -> Tuple[List[ClassifiedTransaction], bool]:
+    return _classify_source(clinic_id, month_start, _manual_entry_source([clinic_id], start_dt, end_dt))
+
+
+def _classify_veterinarian_payments(
+    clinic_id: int,
+    month_start: date,
+    start_dt: datetime,
+    end_dt: datetime,
+) -> Tuple[List[ClassifiedTransaction], bool]:
+    return _classify_source(clinic_id, month_start, _vet_payment_source([clinic_id], start_dt, end_dt))
+
+
+def _classify_expenses(
+    clinic_id: int,
+    month_start: date,
+    start_dt: datetime,
+    end_dt: datetime,
+) -> Tuple[List[ClassifiedTransaction], bool]:
+    return _classify_source(clinic_id, month_start, _expense_source([clinic_id], start_dt, end_dt))
+
+
 def classify_transactions_for_month(
     clinic_id: int,
     month: Optional[date | datetime | str] = None,
@@ -792,6 +870,273 @@ def classify_transactions_for_month(
     return records
 
 
+@dataclass
+class BulkClassificationStats:
+    read: int = 0
+    written: int = 0
+    unchanged: int = 0
+
+
+def _watermark_datetime(column, position: int) -> datetime:
+    """Watermark epoch as UTC: naive for plain ``DateTime`` columns, aware for
+    ``DateTime(timezone=True)`` so Postgres never applies the session timezone."""
+
+    moment = datetime.fromtimestamp(position, timezone.utc)
+    if getattr(column.type, 'timezone', False):
+        return moment
+    return moment.replace(tzinfo=None)
+
+
+def _classification_watermark_key(origin: str, clinic_id: int, first_month: date, last_month: date) -> str:
+    # A janela faz parte da chave: janela nova (virada de mês) começa do zero.
+    return f"finance_classify:{origin}:{clinic_id}:{first_month:%Y%m}-{last_month:%Y%m}"
+
+
+def _classification_snapshot(entry: dict, origin: str, month_start: date) -> tuple:
+    return (
+        entry['date'],
+        month_start,
+        origin,
+        entry['description'],
+        entry['value'],
+        entry['category'],
+        entry['subcategory'],
+    )
+
+
+def _existing_classifications(
+    clinic_ids: Sequence[int],
+    origin: str,
+    first_month: date,
+    last_month: date,
+) -> dict[tuple[int, str], tuple]:
+    rows = (
+        db.session.query(
+            ClassifiedTransaction.clinic_id,
+            ClassifiedTransaction.raw_id,
+            ClassifiedTransaction.date,
+            ClassifiedTransaction.month,
+            ClassifiedTransaction.origin,
+            ClassifiedTransaction.description,
+            ClassifiedTransaction.value,
+            ClassifiedTransaction.category,
+            ClassifiedTransaction.subcategory,
+        )
+        .filter(ClassifiedTransaction.clinic_id.in_(list(clinic_ids)))
+        .filter(ClassifiedTransaction.origin == origin)
+        .filter(ClassifiedTransaction.month >= first_month, ClassifiedTransaction.month <= last_month)
+    )
+    return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
+
+def _previous_classifications(
+    rows: list[dict],
+    existing: dict[tuple[int, str], tuple],
+) -> dict[tuple[int, str], tuple]:
+    """``(clinic_id, raw_id) -> (month, category, value)`` já gravados para ``rows``.
+
+    O diff só conhece a origem/janela corrente; o que ficou de fora (lançamento
+    que mudou de mês, por exemplo) é buscado por ``raw_id``.
+    """
+    previous = {
+        key: (snapshot[1], snapshot[5], snapshot[4])
+        for key, snapshot in existing.items()
+    }
+    missing: dict[int, list[str]] = defaultdict(list)
+    for row in rows:
+        key = (row['clinic_id'], row['raw_id'])
+        if key not in previous:
+            missing[row['clinic_id']].append(row['raw_id'])
+    for clinic_id, raw_ids in missing.items():
+        for offset in range(0, len(raw_ids), CLASSIFY_BULK_CHUNK):
+            chunk = raw_ids[offset:offset + CLASSIFY_BULK_CHUNK]
+            for raw_id, month, category, value in (
+                db.session.query(
+                    ClassifiedTransaction.raw_id,
+                    ClassifiedTransaction.month,
+                    ClassifiedTransaction.category,
+                    ClassifiedTransaction.value,
+                )
+                .filter(ClassifiedTransaction.clinic_id == clinic_id)
+                .filter(ClassifiedTransaction.raw_id.in_(chunk))
+            ):
+                previous[(clinic_id, raw_id)] = (month, category, value)
+    return previous
+
+
+def _classified_total_deltas(rows: list[dict], previous: dict[tuple[int, str], tuple]) -> dict:
+    deltas: dict[tuple, tuple[Decimal, int]] = {}
+
+    def _add(key, value, count):
+        current_value, current_count = deltas.get(key, (ZERO, 0))
+        deltas[key] = (current_value + _ensure_decimal(value), current_count + count)
+
+    for row in rows:
+        old = previous.get((row['clinic_id'], row['raw_id']))
+        if old is not None:
+            _add((row['clinic_id'], old[0], old[1]), -_ensure_decimal(old[2]), -1)
+        _add((row['clinic_id'], row['month'], row['category']), row['value'], 1)
+    return deltas
+
+
+def _bulk_upsert_classified(rows: list[dict], existing: dict[tuple[int, str], tuple]) -> None:
+    """``INSERT ... ON CONFLICT (clinic_id, raw_id) DO UPDATE`` em blocos.
+
+    Os totais mensais recebem os deltas na mesma transação; o upsert em Core
+    não passa pelo listener de flush do ORM.
+    """
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:  # pragma: no cover - bancos sem upsert nativo seguem linha a linha
+        for row in rows:
+            _upsert_classified_transaction(
+                row['clinic_id'],
+                row['month'],
+                raw_id=row['raw_id'],
+                date_value=row['date'],
+                origin=row['origin'],
+                description=row['description'],
+                value=row['value'],
+                category=row['category'],
+                subcategory=row['subcategory'],
+            )
+        db.session.flush()
+        return
+
+    deltas = _classified_total_deltas(rows, _previous_classifications(rows, existing))
+    table = ClassifiedTransaction.__table__
+    updated_columns = ('date', 'month', 'origin', 'description', 'value', 'category', 'subcategory')
+    for offset in range(0, len(rows), CLASSIFY_BULK_CHUNK):
+        statement = insert(table).values(rows[offset:offset + CLASSIFY_BULK_CHUNK])
+        statement = statement.on_conflict_do_update(
+            index_elements=['clinic_id', 'raw_id'],
+            set_={name: statement.excluded[name] for name in updated_columns},
+        )
+        db.session.execute(statement)
+    apply_classified_total_deltas(db.session.connection(), deltas)
+
+
+def _save_classification_watermarks(positions: dict[str, int]) -> None:
+    if not positions:
+        return
+    table = JobCheckpoint.__table__
+    existing = {
+        key for (key,) in db.session.query(JobCheckpoint.key).filter(JobCheckpoint.key.in_(list(positions)))
+    }
+    by_position: dict[int, list[str]] = defaultdict(list)
+    for key in existing:
+        by_position[positions[key]].append(key)
+    for position, keys in by_position.items():
+        db.session.execute(
+            table.update().where(table.c.key.in_(keys)).values(position=position, updated_at=utcnow())
+        )
+    missing = [
+        {'key': key, 'position': position, 'updated_at': utcnow()}
+        for key, position in positions.items()
+        if key not in existing
+    ]
+    if missing:
+        db.session.execute(table.insert(), missing)
+
+
+def classify_transactions_bulk(
+    clinic_ids: Iterable[int],
+    month_starts: Iterable[date | datetime | str],
+) -> BulkClassificationStats:
+    """Classify every source for many clinics/months with set-based queries.
+
+    Each source is read once for the whole window, classified in memory and
+    diffed against the rows already stored; only new or changed rows are
+    written, with bulk upserts. Sources that expose ``updated_at`` are read
+    incrementally from a per-clinic watermark kept in ``JobCheckpoint``.
+    The caller commits.
+    """
+
+    clinic_ids = sorted(set(clinic_ids))
+    months = sorted({_normalize_month(month) for month in month_starts})
+    stats = BulkClassificationStats()
+    if not clinic_ids or not months:
+        return stats
+
+    first_month, last_month = months[0], months[-1]
+    start_dt = _month_range(first_month)[0]
+    end_dt = _month_range(last_month)[1]
+    month_set = set(months)
+    watermark_position = int((utcnow() - CLASSIFY_WATERMARK_OVERLAP).timestamp())
+    watermarks: dict[str, int] = {}
+
+    for builder in CLASSIFICATION_SOURCES:
+        source = builder(clinic_ids, start_dt, end_dt)
+        if source is None:
+            continue
+
+        groups: list[tuple[list[int], int]] = [(clinic_ids, 0)]
+        if source.updated_column is not None:
+            keys = {
+                clinic_id: _classification_watermark_key(source.origin, clinic_id, first_month, last_month)
+                for clinic_id in clinic_ids
+            }
+            stored = dict(
+                db.session.query(JobCheckpoint.key, JobCheckpoint.position)
+                .filter(JobCheckpoint.key.in_(list(keys.values())))
+            )
+            by_position: dict[int, list[int]] = defaultdict(list)
+            for clinic_id, key in keys.items():
+                by_position[int(stored.get(key) or 0)].append(clinic_id)
+                watermarks[key] = watermark_position
+            groups = sorted(by_position.items(), key=lambda item: item[0])
+            groups = [(ids, position) for position, ids in groups]
+
+        for group_ids, position in groups:
+            group_source = source if group_ids == clinic_ids else builder(group_ids, start_dt, end_dt)
+            query = group_source.query
+            if position:
+                query = query.filter(
+                    group_source.updated_column > _watermark_datetime(group_source.updated_column, position)
+                )
+            existing = _existing_classifications(group_ids, source.origin, first_month, last_month)
+
+            pending: list[dict] = []
+            for row in query.all():
+                entry = group_source.classify(row, first_month)
+                month_start = _normalize_month(entry['date'])
+                if month_start not in month_set:
+                    continue
+                stats.read += 1
+                snapshot = _classification_snapshot(entry, source.origin, month_start)
+                if existing.get((entry['clinic_id'], entry['raw_id'])) == snapshot:
+                    stats.unchanged += 1
+                    continue
+                pending.append({
+                    'clinic_id': entry['clinic_id'],
+                    'raw_id': entry['raw_id'],
+                    'date': entry['date'],
+                    'month': month_start,
+                    'origin': source.origin,
+                    'description': entry['description'],
+                    'value': entry['value'],
+                    'category': entry['category'],
+                    'subcategory': entry['subcategory'],
+                    'created_at': now_in_brazil(),
+                })
+            _bulk_upsert_classified(pending, existing)
+            stats.written += len(pending)
+
+    _save_classification_watermarks(watermarks)
+    _log(
+        "[Contabilidade] Classificação em lote: %s lançamentos lidos, %s gravados, %s inalterados",
+        stats.read,
+        stats.written,
+        stats.unchanged,
+    )
+    return stats
+
+
 @dataclass
 class HistoryBackfillFailure:
     clinic_id: int
@@ -814,7 +1159,12 @@ def run_transactions_history_backfill(
     progress_callback: Optional[Callable[[int, date], None]] = None,
     error_callback: Optional[Callable[[int, date, Exception], None]] = None,
 ) -> HistoryBackfillResult:
-    """Execute classification for multiple clinics/months returning a summary."""
+    """Execute classification for multiple clinics/months returning a summary.
+
+    Runs :func:`classify_transactions_bulk` for the whole window in a single
+    transaction; if it fails, falls back to classifying month by month so one
+    bad clinic/month is reported without blocking the others.
+    """
 
     if months <= 0:
         raise ValueError("O número de meses deve ser maior que zero.")
@@ -825,35 +1175,162 @@ def run_transactions_history_backfill(
         for offset in range(months)
     )
 
-    query = Clinica.query
+    query = db.session.query(Clinica.id)
     if clinic_ids:
         query = query.filter(Clinica.id.in_(list(clinic_ids)))
-    clinics = query.order_by(Clinica.id.asc()).all()
-    clinic_ids_list = [clinic.id for clinic in clinics]
+    clinic_ids_list = [clinic_id for (clinic_id,) in query.order_by(Clinica.id.asc())]
     if not clinic_ids_list:
         return HistoryBackfillResult(0, [], month_starts, [])
 
+    try:
+        classify_transactions_bulk(clinic_ids_list, month_starts)
+        db.session.commit()
+    except Exception as exc:
+        db.session.rollback()
+        _log("[Backfill] Classificação em lote falhou, seguindo mês a mês: %s", exc)
+        return _run_history_backfill_per_month(clinic_ids_list, month_starts, progress_callback, error_callback)
+
+    if progress_callback:
+        for clinic_id in clinic_ids_list:
+            for month_start in month_starts:
+                progress_callback(clinic_id, month_start)
+    return HistoryBackfillResult(
+        len(clinic_ids_list) * len(month_starts), clinic_ids_list, month_starts, []
+    )
+
+
+def _run_history_backfill_per_month(
+    clinic_ids: list[int],
+    month_starts: list[date],
+    progress_callback: Optional[Callable[[int, date], None]] = None,
+    error_callback: Optional[Callable[[int, date, Exception], None]] = None,
+) -> HistoryBackfillResult:
     failures: list[HistoryBackfillFailure] = []
     processed = 0
-    for clinic in clinics:
+    for clinic_id in clinic_ids:
         for month_start in month_starts:
             try:
-                classify_transactions_for_month(clinic.id, month_start)
+                classify_transactions_for_month(clinic_id, month_start)
                 processed += 1
                 if progress_callback:
-                    progress_callback(clinic.id, month_start)
+                    progress_callback(clinic_id, month_start)
             except Exception as exc:  # pragma: no cover - defensive logging
                 db.session.rollback()
                 _log(
                     "[Backfill] Falha ao classificar clínica %s no mês %s: %s",
-                    clinic.id,
+                    clinic_id,
                     f"{month_start:%Y-%m}",
                     exc,
                 )
-                failures.append(HistoryBackfillFailure(clinic.id, month_start, str(exc)))
+                failures.append(HistoryBackfillFailure(clinic_id, month_start, str(exc)))
                 if error_callback:
-                    error_callback(clinic.id, month_start, exc)
-    return HistoryBackfillResult(processed, clinic_ids_list, month_starts, failures)
+                    error_callback(clinic_id, month_start, exc)
+    return HistoryBackfillResult(processed, clinic_ids, month_starts, failures)
+
+
+@dataclass
+class ClassifiedTotalsReconciliation:
+    clinics: int
+    checked: int
+    repaired: int
+
+
+def reconcile_classified_totals(
+    clinic_ids: Optional[Iterable[int]] = None,
+    batch_size: int = 50,
+) -> ClassifiedTotalsReconciliation:
+    """Check ``classified_monthly_totals`` against raw sums and repair drift.
+
+    Writes that bypass the ORM (bulk deletes, manual SQL) are not seen by the
+    flush listener; this job recomputes the totals per clinic and repairs only
+    the rows that disagree. Commits once per batch of clinics.
+
+    Raw sums and stored totals are read in a single statement (one snapshot)
+    and the repair is applied as a relative delta
+    (``total = total + (expected - observed)``), the same upsert the flush
+    listener uses. A listener delta committed concurrently therefore adds on
+    top of the correction instead of being overwritten by it.
+    """
+
+    if clinic_ids:
+        ids = sorted(set(clinic_ids))
+    else:
+        ids = sorted(
+            {clinic_id for (clinic_id,) in db.session.query(ClassifiedTransaction.clinic_id).distinct()}
+            | {clinic_id for (clinic_id,) in db.session.query(ClassifiedMonthlyTotal.clinic_id).distinct()}
+        )
+
+    table = ClassifiedMonthlyTotal.__table__
+    checked = repaired = 0
+    for offset in range(0, len(ids), batch_size):
+        batch = ids[offset:offset + batch_size]
+        raw = (
+            select(
+                ClassifiedTransaction.clinic_id.label('clinic_id'),
+                ClassifiedTransaction.month.label('month'),
+                ClassifiedTransaction.category.label('category'),
+                func.coalesce(func.sum(ClassifiedTransaction.value), 0).label('expected_total'),
+                func.count(ClassifiedTransaction.id).label('expected_count'),
+                literal(0).label('stored_total'),
+                literal(0).label('stored_count'),
+            )
+            .where(ClassifiedTransaction.clinic_id.in_(batch))
+            .group_by(
+                ClassifiedTransaction.clinic_id,
+                ClassifiedTransaction.month,
+                ClassifiedTransaction.category,
+            )
+        )
+        stored = select(
+            table.c.clinic_id,
+            table.c.month,
+            table.c.category,
+            literal(0),
+            literal(0),
+            table.c.total,
+            func.coalesce(table.c.count, 0),
+        ).where(table.c.clinic_id.in_(batch))
+        combined = union_all(raw, stored).subquery()
+        rows = db.session.execute(
+            select(
+                combined.c.clinic_id,
+                combined.c.month,
+                combined.c.category,
+                func.sum(combined.c.expected_total),
+                func.sum(combined.c.expected_count),
+                func.sum(combined.c.stored_total),
+                func.sum(combined.c.stored_count),
+            ).group_by(combined.c.clinic_id, combined.c.month, combined.c.category)
+        ).all()
+
+        deltas = {}
+        for clinic_id, month, category, expected_total, expected_count, stored_total, stored_count in rows:
+            checked += 1
+            wanted = (_quantize_currency(_ensure_decimal(expected_total)), int(expected_count or 0))
+            current = (_quantize_currency(_ensure_decimal(stored_total)), int(stored_count or 0))
+            if wanted == current:
+                continue
+            key = (clinic_id, _normalize_month(month), category)
+            deltas[key] = (wanted[0] - current[0], wanted[1] - current[1])
+            repaired += 1
+            _log(
+                "[Contabilidade] Total mensal corrigido: clínica %s, %s, %s: %s -> %s",
+                key[0],
+                f"{key[1]:%Y-%m}",
+                key[2],
+                current,
+                wanted,
+            )
+        apply_classified_total_deltas(db.session.connection(), deltas)
+        # Linhas zeradas (por exclusões ou pela correção acima) só ocupam espaço.
+        db.session.execute(
+            table.delete().where(
+                and_(table.c.clinic_id.in_(batch), table.c.count == 0, table.c.total == 0)
+            )
+        )
+        db.session.commit()
+
+    return ClassifiedTotalsReconciliation(len(ids), checked, repaired)
 
 
 def _plantonista_retention_rate(clinic: Clinica | None) -> Decimal:
@@ -1553,13 +2030,7 @@ def build_accounting_dashboard(clinic_id: int, month: Optional[date | datetime |
     classify_transactions_for_month(clinic_id, month_start)
     taxes = calculate_clinic_taxes(clinic_id, month_start)
     revenue = _sum_categories(clinic_id, month_start, REVENUE_CATEGORIES)
-    orders = (
-        db.session.query(func.count(ClassifiedTransaction.id))
-        .filter(ClassifiedTransaction.clinic_id == clinic_id)
-        .filter(ClassifiedTransaction.month == month_start)
-        .filter(ClassifiedTransaction.category.in_(list(REVENUE_CATEGORIES)))
-        .scalar()
-    ) or 0
+    orders = _classified_count_for_month(clinic_id, month_start, REVENUE_CATEGORIES)
     overdue = (
         db.session.query(func.coalesce(func.sum(AccountingAccount.net_amount), 0))
         .filter(AccountingAccount.clinic_id == clinic_id)
@@ -1,2 +1 @@
 """Fiscal service layer."""
-
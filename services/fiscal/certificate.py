@@ -4,11 +4,16 @@ from __future__ import annotations
 
 import re
 from datetime import datetime, timezone
+from itertools import chain
 
 from cryptography import x509
 from cryptography.x509.oid import ObjectIdentifier, NameOID
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.serialization import pkcs12
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from providers.fiscal.mtls import clear_pkcs12_cache, fiscal_session_pool
 
 
 _CNPJ_PATTERN = re.compile(
@@ -72,3 +77,46 @@ def parse_pfx(pfx_bytes: bytes, password: str | None) -> dict:
         "valid_to": _ensure_timezone(certificate.not_valid_after),
         "subject_cnpj": _normalize_cnpj(subject_cnpj),
     }
+
+
+# -- troca de certificado: derruba a sessão mTLS do emissor no commit -----
+_SESSION_INFO_KEY = "fiscal_certificate_changes"
+
+
+def _collect_certificate_changes(session: Session, flush_context) -> None:
+    from models import FiscalCertificate
+
+    emitter_ids = {
+        obj.emitter_id
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, FiscalCertificate)
+    }
+    if emitter_ids:
+        session.info.setdefault(_SESSION_INFO_KEY, set()).update(emitter_ids)
+
+
+def _apply_certificate_changes(session: Session) -> None:
+    emitter_ids = session.info.pop(_SESSION_INFO_KEY, None)
+    if not emitter_ids:
+        return
+    for emitter_id in emitter_ids:
+        fiscal_session_pool.invalidate(emitter_id)
+    clear_pkcs12_cache()
+
+
+def _discard_certificate_changes(session: Session, *_args) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+def register_certificate_listeners() -> None:
+    """Liga a invalidação do pool mTLS às sessões; chamar mais de uma vez é inócuo.
+
+    Chamado pelos serviços que emitem com ``fiscal_session_pool``.
+    """
+    for identifier, listener in (
+        ("after_flush", _collect_certificate_changes),
+        ("after_commit", _apply_certificate_changes),
+        ("after_rollback", _discard_certificate_changes),
+    ):
+        if not event.contains(Session, identifier, listener):
+            event.listen(Session, identifier, listener)
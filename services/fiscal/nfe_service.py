@@ -23,13 +23,18 @@ from models import (
     FiscalEvent,
     Order,
 )
+from providers.fiscal.mtls import fiscal_session_pool
 from providers.nfe.sefaz_sp.client import SefazSpNfeClient, get_sefaz_sp_wsdl_config
 from providers.nfe.xml_builder import UF_TO_CUF, build_cancel_event_xml, build_nfe_xml
 from providers.nfe.xml_signer import sign_event_xml, sign_nfe_xml
 from security.crypto import decrypt_bytes, decrypt_text
+from services.fiscal.certificate import register_certificate_listeners
 from services.fiscal.numbering import reserve_next_number
 from time_utils import now_in_brazil
 
+# Troca de certificado derruba a sessão mTLS do emissor no pool.
+register_certificate_listeners()
+
 
 def create_nfe_document(
     order_id: int,
@@ -602,6 +607,8 @@ def _build_sefaz_client(certificate: FiscalCertificate, env: str) -> SefazSpNfeC
         wsdl_config=wsdl_config,
         pfx_bytes=decrypt_bytes(certificate.pfx_encrypted),
         pfx_password=decrypt_text(certificate.pfx_password_encrypted),
+        session_pool=fiscal_session_pool,
+        pool_key=certificate.emitter_id,
     )
 
 
@@ -24,6 +24,7 @@ from models import (
     FiscalEvent,
     Orcamento,
 )
+from providers.fiscal.mtls import fiscal_session_pool
 from providers.nfse.betha import build_lote_xml, sign_betha_xml
 from providers.nfse.betha.client import BethaNfseClient
 from providers.nfse.betha.client import BethaWsdlConfig
@@ -38,9 +39,13 @@ from providers.nfse.nacional import (
 from providers.nfse.nacional.client import NacionalNfseResponse
 from security.crypto import decrypt_bytes, decrypt_text
 from security.redact import redact_sensitive_text, redact_xml
+from services.fiscal.certificate import register_certificate_listeners
 from services.fiscal.numbering import NumberingReservationError, reserve_next_number
 from time_utils import now_in_brazil
 
+# Troca de certificado derruba a sessão mTLS do emissor no pool.
+register_certificate_listeners()
+
 
 NFSE_NACIONAL_MUNICIPIO_IBGE_BY_KEY = {
     "belo_horizonte": "3106200",
@@ -609,6 +614,8 @@ def _build_nacional_client(
         config,
         pfx_bytes=decrypt_bytes(certificate.pfx_encrypted),
         pfx_password=decrypt_text(certificate.pfx_password_encrypted),
+        session_pool=fiscal_session_pool,
+        pool_key=certificate.emitter_id,
     )
 
 
@@ -903,6 +910,8 @@ def _build_betha_client(emitter: FiscalEmitter, certificate: FiscalCertificate)
         wsdl_config=wsdl_config,
         pfx_bytes=decrypt_bytes(certificate.pfx_encrypted),
         pfx_password=decrypt_text(certificate.pfx_password_encrypted),
+        session_pool=fiscal_session_pool,
+        pool_key=certificate.emitter_id,
     )
 
 
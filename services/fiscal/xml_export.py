@@ -0,0 +1,153 @@
+"""Exportação dos XMLs fiscais autorizados em ZIP, com memória limitada.
+
+A exportação antiga carregava todos os ``FiscalDocument`` do período com
+``.all()``, decifrava cada XML e montava o ZIP inteiro num ``BytesIO`` — e
+ainda copiava o buffer no ``getvalue()``. Um ano de notas ocupava várias cópias
+do arquivo na RAM do worker.
+
+Agora:
+
+* ``iter_authorized_xmls`` lê só as colunas necessárias com ``yield_per`` e
+  decifra um XML por vez;
+* ``stream_zip`` (de ``services.data_export``) gera o ZIP em pedaços: cada
+  XML comprimido sai para a resposta antes do próximo ser lido;
+* ``export_to_storage`` grava o mesmo ZIP no storage de exportações para o
+  modo em background (períodos muito grandes), baixado depois por um link.
+  O estado do link fica numa linha ``DataExport`` e o arquivo no bucket
+  compartilhado (``DATA_EXPORT_BUCKET``) — o worker Celery só recebe a tarefa
+  quando o bucket existe; sem ele a exportação roda numa thread do próprio
+  processo (o request não espera) e vai para ``FISCAL_EXPORT_DIR``.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from flask import current_app
+from sqlalchemy import func
+
+from models import FiscalDocument, FiscalDocumentStatus, FiscalDocumentType
+from models.fiscal import decrypt_fiscal_xml
+from services.data_export import ExportStore, stream_zip
+
+DEFAULT_BATCH_SIZE = 200
+
+
+@dataclass(frozen=True)
+class XmlExportFilters:
+    clinic_id: int
+    doc_type: FiscalDocumentType | None = None
+    start_dt: datetime | None = None
+    end_dt: datetime | None = None
+
+    def as_dict(self) -> dict:
+        return {
+            "clinic_id": self.clinic_id,
+            "doc_type": self.doc_type.name if self.doc_type else None,
+            "start_dt": self.start_dt.isoformat() if self.start_dt else None,
+            "end_dt": self.end_dt.isoformat() if self.end_dt else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "XmlExportFilters":
+        return cls(
+            clinic_id=int(data["clinic_id"]),
+            doc_type=FiscalDocumentType[data["doc_type"]] if data.get("doc_type") else None,
+            start_dt=datetime.fromisoformat(data["start_dt"]) if data.get("start_dt") else None,
+            end_dt=datetime.fromisoformat(data["end_dt"]) if data.get("end_dt") else None,
+        )
+
+
+def authorized_xml_query(filters: XmlExportFilters):
+    timestamp_field = func.coalesce(FiscalDocument.authorized_at, FiscalDocument.created_at)
+    query = (
+        FiscalDocument.query
+        .filter_by(clinic_id=filters.clinic_id)
+        .filter(FiscalDocument.status == FiscalDocumentStatus.AUTHORIZED)
+        .filter(FiscalDocument._xml_authorized.isnot(None))
+    )
+    if filters.doc_type:
+        query = query.filter(FiscalDocument.doc_type == filters.doc_type)
+    if filters.start_dt:
+        query = query.filter(timestamp_field >= filters.start_dt)
+    if filters.end_dt:
+        query = query.filter(timestamp_field < filters.end_dt + timedelta(days=1))
+    return query.order_by(timestamp_field.desc(), FiscalDocument.id.desc())
+
+
+def _filename(doc_type, identifier, used_names: set[str]) -> str:
+    prefix = doc_type.value.lower() if doc_type else "fiscal"
+    filename = f"{prefix}-{identifier}.xml"
+    counter = 1
+    while filename in used_names:
+        counter += 1
+        filename = f"{prefix}-{identifier}-{counter}.xml"
+    used_names.add(filename)
+    return filename
+
+
+def iter_authorized_xmls(
+    filters: XmlExportFilters, *, batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[tuple[str, str]]:
+    """``(nome do arquivo, xml)`` por documento, decifrando um de cada vez."""
+    rows = (
+        authorized_xml_query(filters)
+        .with_entities(
+            FiscalDocument.id,
+            FiscalDocument.doc_type,
+            FiscalDocument.nfse_number,
+            FiscalDocument.access_key,
+            FiscalDocument._xml_authorized,
+        )
+        .yield_per(batch_size)
+    )
+    used_names: set[str] = set()
+    for doc_id, doc_type, nfse_number, access_key, blob in rows:
+        xml = decrypt_fiscal_xml(filters.clinic_id, blob)
+        if not xml:
+            continue
+        yield _filename(doc_type, nfse_number or access_key or doc_id, used_names), xml
+
+
+_store = ExportStore("fiscal_xml", "FISCAL_EXPORT_DIR", "fiscal_exports")
+
+
+def export_status(clinic_id: int, token: str) -> str:
+    """``ready``, ``pending`` (ainda gravando), ``failed`` ou ``missing``."""
+    return _store.status(clinic_id, token)
+
+
+def export_response(clinic_id: int, token: str, download_name: str):
+    return _store.response(clinic_id, token, download_name=download_name)
+
+
+def export_to_storage(filters: XmlExportFilters, token: str) -> int:
+    """Grava o ZIP no storage de exportações; retorna quantos XMLs entraram."""
+    count = 0
+
+    def counted():
+        nonlocal count
+        for entry in iter_authorized_xmls(filters):
+            count += 1
+            yield entry
+
+    size = _store.write(filters.clinic_id, token, stream_zip(counted()))
+    current_app.logger.info(
+        "fiscal_xml_export clinic_id=%s token=%s documents=%d bytes=%d",
+        filters.clinic_id, token[:6], count, size,
+    )
+    return count
+
+
+def queue_xml_export(filters: XmlExportFilters) -> str:
+    """Agenda a exportação em background e devolve o token do download."""
+    token = _store.reserve(filters.clinic_id)
+
+    def enqueue():
+        from app.jobs.fiscal_tasks import export_fiscal_xmls
+
+        export_fiscal_xmls.delay(filters.as_dict(), token)
+
+    _store.run(enqueue, lambda: export_to_storage(filters, token))
+    return token
@@ -1,27 +1,68 @@
 import threading
-import time
-from typing import Any
+from typing import Any, Callable
 
 from flask import current_app
-from sqlalchemy import or_
+from sqlalchemy import bindparam, or_
 
 from extensions import db
 from helpers import geocode_address
+from models import JobCheckpoint
 from models.usuarios import Endereco
+from services.geocoding import TokenBucket, geocode_cache, geocode_cache_key, http_session
+
+CHECKPOINT_KEY = "geocode_queue.endereco"
+DEFAULT_CHUNK_SIZE = 200
+DEFAULT_RATE_PER_SECOND = 1.0  # política de uso do Nominatim
+DEFAULT_MAX_REQUESTS_PER_ADDRESS = 4
+
+_ADDRESS_FIELDS = ("rua", "numero", "bairro", "cidade", "estado", "cep")
+
+
+def _missing_coords():
+    return or_(Endereco.latitude.is_(None), Endereco.longitude.is_(None))
 
 
 class AddressGeocodeQueue:
-    """Background worker that geocodes addresses without blocking requests."""
+    """Background worker that geocodes addresses without blocking requests.
 
-    def __init__(self, app):
+    Reads ``Endereco`` rows without coordinates in keyset-paginated chunks,
+    resolves each distinct normalized address once (shared cache first, then
+    ``geocoder`` under a token-bucket rate limit) and writes every chunk in a
+    single commit together with the resume cursor (``JobCheckpoint``). After
+    a restart, ``start()`` continues after the last committed chunk; a full
+    pass resets the cursor so addresses not found are retried next time.
+    """
+
+    def __init__(
+        self,
+        app,
+        *,
+        geocoder: Callable[..., Any] | None = None,
+        rate_limiter: TokenBucket | None = None,
+        chunk_size: int | None = None,
+    ):
         self._app = app
+        self._geocoder = geocoder or geocode_address
+        self._rate_limiter = rate_limiter
+        self._chunk_size = chunk_size
         self._lock = threading.Lock()
+        self._stop = threading.Event()
         self._running = False
-        self._stats: dict[str, Any] = {
+        self._stats: dict[str, Any] = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> dict[str, Any]:
+        return {
             "total": 0,
             "processed": 0,
             "updated": 0,
             "skipped": 0,
+            "cache_hits": 0,
+            "deduplicated": 0,
+            "geocoder_calls": 0,
+            "chunks": 0,
+            "cursor": 0,
+            "resumed_from": 0,
         }
 
     def start(self) -> bool:
@@ -31,6 +72,7 @@ class AddressGeocodeQueue:
             if self._running:
                 return False
             self._running = True
+            self._stop.clear()
             thread = threading.Thread(
                 target=self._run,
                 name="address-geocode-queue",
@@ -39,55 +81,35 @@ class AddressGeocodeQueue:
             thread.start()
         return True
 
+    def stop(self) -> None:
+        """Ask the worker to stop after the address being geocoded."""
+
+        self._stop.set()
+
     def status(self) -> dict[str, Any]:
         with self._lock:
-            return {
+            status = {
                 "running": self._running,
                 **self._stats,
             }
+        if self._rate_limiter is not None:
+            status["rate_limited_seconds"] = round(self._rate_limiter.waited_seconds, 2)
+        return status
+
+    def _config(self, key: str, default):
+        return self._app.config.get(key, default)
+
+    def _limiter(self) -> TokenBucket:
+        if self._rate_limiter is None:
+            rate = float(self._config("GEOCODE_RATE_PER_SECOND", DEFAULT_RATE_PER_SECOND))
+            burst = float(self._config("GEOCODE_RATE_BURST", 1))
+            self._rate_limiter = TokenBucket(rate, burst)
+        return self._rate_limiter
 
     def _run(self) -> None:
         try:
             with self._app.app_context():
-                addresses = (
-                    Endereco.query.filter(
-                        or_(Endereco.latitude.is_(None), Endereco.longitude.is_(None))
-                    )
-                    .order_by(Endereco.id)
-                    .all()
-                )
-                with self._lock:
-                    self._stats = {
-                        "total": len(addresses),
-                        "processed": 0,
-                        "updated": 0,
-                        "skipped": 0,
-                    }
-
-                for endereco in addresses:
-                    coords = geocode_address(
-                        cep=endereco.cep,
-                        rua=endereco.rua,
-                        numero=endereco.numero,
-                        bairro=endereco.bairro,
-                        cidade=endereco.cidade,
-                        estado=endereco.estado,
-                    )
-
-                    if coords:
-                        endereco.latitude, endereco.longitude = coords
-                        db.session.add(endereco)
-                        db.session.commit()
-                        self._increment("updated")
-                    else:
-                        current_app.logger.info(
-                            "Geocodificação ignorada para o endereço %s (dados incompletos ou não encontrado)",
-                            endereco.id,
-                        )
-                        self._increment("skipped")
-
-                    self._increment("processed")
-                    time.sleep(1)
+                self.run_pending()
         except Exception as exc:  # pragma: no cover - defensive guard in background thread
             with self._app.app_context():
                 current_app.logger.exception("Erro na fila de geocodificação: %s", exc)
@@ -95,6 +117,94 @@ class AddressGeocodeQueue:
             with self._lock:
                 self._running = False
 
+    def run_pending(self) -> dict[str, Any]:
+        """Process every pending chunk synchronously (requires app context)."""
+
+        chunk_size = self._chunk_size or int(self._config("GEOCODE_QUEUE_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+        cursor = JobCheckpoint.get(CHECKPOINT_KEY)
+        total = Endereco.query.filter(_missing_coords(), Endereco.id > cursor).count()
+        with self._lock:
+            self._stats = {**self._empty_stats(), "total": total, "cursor": cursor, "resumed_from": cursor}
+
+        while not self._stop.is_set():
+            rows = (
+                db.session.query(Endereco.id, *(getattr(Endereco, f) for f in _ADDRESS_FIELDS))
+                .filter(_missing_coords(), Endereco.id > cursor)
+                .order_by(Endereco.id)
+                .limit(chunk_size)
+                .all()
+            )
+            if not rows:
+                # Passada completa: a próxima começa do início e tenta de novo
+                # os endereços que não foram encontrados.
+                JobCheckpoint.set(CHECKPOINT_KEY, 0)
+                db.session.commit()
+                with self._lock:
+                    self._stats["cursor"] = 0
+                break
+            cursor = self._process_chunk(rows)
+        return self.status()
+
+    def _process_chunk(self, rows) -> int:
+        keys = [geocode_cache_key(*(getattr(row, f) for f in _ADDRESS_FIELDS)) for row in rows]
+        resolved = geocode_cache.get_many(keys)
+        cached_keys = set(resolved)
+        attempted: set[str] = set()
+        found: dict[str, tuple[float, float]] = {}
+        updates = []
+        last_id = None
+        max_requests = self._config("GEOCODE_MAX_REQUESTS_PER_ADDRESS", DEFAULT_MAX_REQUESTS_PER_ADDRESS)
+
+        for row, key in zip(rows, keys):
+            if self._stop.is_set():
+                break
+            if key and key not in resolved and key not in attempted:
+                attempted.add(key)
+                self._increment("geocoder_calls")
+                coords = self._geocoder(
+                    **{f: getattr(row, f) for f in _ADDRESS_FIELDS},
+                    session=http_session(),
+                    rate_limiter=self._limiter(),
+                    max_requests=max_requests,
+                )
+                if coords:
+                    resolved[key] = found[key] = coords
+            elif key in cached_keys:
+                self._increment("cache_hits")
+            elif key:
+                self._increment("deduplicated")
+
+            coords = resolved.get(key) if key else None
+            if coords:
+                updates.append({"row_id": row.id, "lat": coords[0], "lng": coords[1]})
+                self._increment("updated")
+            else:
+                current_app.logger.info(
+                    "Geocodificação ignorada para o endereço %s (dados incompletos ou não encontrado)",
+                    row.id,
+                )
+                self._increment("skipped")
+            self._increment("processed")
+            last_id = row.id
+
+        if last_id is None:
+            return rows[0].id - 1
+
+        if updates:
+            db.session.execute(
+                Endereco.__table__.update()
+                .where(Endereco.__table__.c.id == bindparam("row_id"))
+                .values(latitude=bindparam("lat"), longitude=bindparam("lng")),
+                updates,
+            )
+        geocode_cache.put_many(found, source="endereco")
+        JobCheckpoint.set(CHECKPOINT_KEY, last_id)
+        db.session.commit()
+        with self._lock:
+            self._stats["chunks"] += 1
+            self._stats["cursor"] = last_id
+        return last_id
+
     def _increment(self, key: str) -> None:
         with self._lock:
             if key not in self._stats:
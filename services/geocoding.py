@@ -0,0 +1,271 @@
+"""Infraestrutura compartilhada de geocodificação.
+
+* ``http_session()`` — uma única ``requests.Session`` por processo (keep-alive
+  com o Nominatim/Google) em vez de uma sessão nova por endereço.
+* ``TokenBucket`` — limitador de taxa para respeitar a política de uso do
+  Nominatim (1 req/s) sem ``sleep`` fixo entre endereços.
+* ``geocode_cache`` — cache ``endereço normalizado → (lat, lng)`` usado tanto
+  pela fila de endereços (``services.geocode_queue``) quanto pelas rotas da
+  PMO (``_pmo_geocode_address``). Camada em memória por processo + tabela
+  ``geocode_cache`` para sobreviver a restart de dyno. Toda chave sai de
+  ``geocode_cache_key`` — a fila e a PMO leem e gravam as mesmas entradas.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import requests
+
+USER_AGENT = "PetOrlandia/1.0 (+https://petorlandia.com)"
+
+Coords = Tuple[float, float]
+
+# Geração da chave do cache: o sufixo invalida as entradas antigas quando o
+# formato da chave ou a fonte muda. "g2" é compartilhada pela rota da PMO
+# (Google, com Nominatim de reserva) e pela fila de endereços (Nominatim):
+# uma coordenada vale para o mesmo endereço normalizado, venha de onde vier.
+GEOCODE_GENERATION = "g2"
+# Teto da camada em memória por processo; a tabela guarda o resto.
+MEMORY_MAX_ENTRIES = 5000
+
+_ESPACOS_RE = re.compile(r"\s+")
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def http_session() -> requests.Session:
+    """Sessão HTTP compartilhada (pool de conexões + User-Agent do projeto)."""
+
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers.update({"User-Agent": USER_AGENT})
+                _session = session
+    return _session
+
+
+class TokenBucket:
+    """Limitador de taxa clássico: ``rate`` fichas/s, rajada até ``capacity``.
+
+    ``acquire`` bloqueia até haver ficha. ``clock``/``sleep`` são injetáveis
+    para testes.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: float = 1.0,
+        *,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if rate <= 0:
+            raise ValueError("rate deve ser positivo")
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = max(0.0, now - self._updated)
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Consome ``tokens``; devolve quanto tempo esperou.
+
+        A ficha é reservada antes de dormir (saldo pode ficar negativo), então
+        threads concorrentes entram em fila sem laço de espera.
+        """
+
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            delay = max(0.0, -self._tokens / self.rate)
+            self.waited_seconds += delay
+        if delay:
+            self._sleep(delay)
+        return delay
+
+
+def normalize_address_key(*parts) -> str:
+    """Chave de cache: partes não vazias, sem acento, caixa baixa, espaços únicos."""
+
+    texto = ", ".join(str(part).strip() for part in parts if part and str(part).strip())
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _ESPACOS_RE.sub(" ", texto).strip()
+
+
+def geocode_cache_key(*parts) -> str:
+    """Chave do ``geocode_cache``: endereço normalizado + geração do geocoder."""
+
+    base = normalize_address_key(*parts)
+    return f"{base}|{GEOCODE_GENERATION}" if base else ""
+
+
+class _LRUDict(OrderedDict):
+    """Dict que descarta a entrada menos usada acima de ``max_entries``."""
+
+    def __init__(self, max_entries: int):
+        super().__init__()
+        self.max_entries = max_entries
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.max_entries:
+            self.popitem(last=False)
+
+
+class GeocodeCache:
+    """Cache ``chave → (lat, lng)``: dict em memória na frente da tabela.
+
+    Só resultados positivos são gravados; endereços não encontrados voltam a
+    ser tentados na próxima passada.
+    """
+
+    def __init__(self, max_entries: int = MEMORY_MAX_ENTRIES):
+        self.memory: Dict[str, Coords] = _LRUDict(max_entries)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Coords]:
+        if not key:
+            return None
+        found = self.get_many([key])
+        return found.get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Coords]:
+        """Resolve várias chaves com no máximo uma query.
+
+        A leitura roda num SAVEPOINT: se a tabela falhar (ex.: migration
+        pendente), só o savepoint volta e a transação de quem chamou continua.
+        """
+
+        from extensions import db
+        from models import GeocodeCacheEntry
+
+        keys = {key for key in keys if key}
+        found = {key: self.memory[key] for key in keys if key in self.memory}
+        pending = keys - found.keys()
+        if pending:
+            try:
+                with db.session.begin_nested():
+                    rows = (
+                        db.session.query(
+                            GeocodeCacheEntry.address_key,
+                            GeocodeCacheEntry.latitude,
+                            GeocodeCacheEntry.longitude,
+                        )
+                        .filter(GeocodeCacheEntry.address_key.in_(pending))
+                        .all()
+                    )
+            except Exception:
+                rows = []
+            for row in rows:
+                coords = (row.latitude, row.longitude)
+                self.memory[row.address_key] = coords
+                found[row.address_key] = coords
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries: Dict[str, Coords], *, source: str) -> None:
+        """Grava ``entries`` na memória e na sessão atual (quem chama faz commit)."""
+
+        from extensions import db
+
+        entries = {key: coords for key, coords in entries.items() if key and coords}
+        if not entries:
+            return
+        self.memory.update(entries)
+        _upsert_rows(db.session, entries, source)
+
+    def put(self, key: str, coords: Coords, *, source: str) -> None:
+        """Grava uma entrada numa transação própria.
+
+        Usado no meio de fluxos que ainda não querem commitar a sessão (rota
+        da PMO); falha de banco só perde a cópia persistente.
+        """
+
+        from flask import current_app
+
+        from extensions import db
+
+        if not key or not coords:
+            return
+        self.memory[key] = coords
+        try:
+            with db.engine.begin() as conn:
+                _upsert_rows(conn, {key: coords}, source)
+        except Exception:
+            current_app.logger.warning("Falha ao persistir geocodificação de %r", key, exc_info=True)
+
+    def clear_memory(self) -> None:
+        self.memory.clear()
+        self.hits = self.misses = 0
+
+
+def _upsert_rows(executor, entries: Dict[str, Coords], source: str) -> None:
+    from sqlalchemy import bindparam
+
+    from models import GeocodeCacheEntry
+
+    table = GeocodeCacheEntry.__table__
+    existing = {
+        row.address_key
+        for row in executor.execute(
+            table.select().with_only_columns(table.c.address_key)
+            .where(table.c.address_key.in_(list(entries)))
+        )
+    }
+    if existing:
+        executor.execute(
+            table.update()
+            .where(table.c.address_key == bindparam("key"))
+            .values(latitude=bindparam("lat"), longitude=bindparam("lng"), source=source),
+            [{"key": key, "lat": entries[key][0], "lng": entries[key][1]} for key in existing],
+        )
+    novos = [
+        {"address_key": key, "latitude": lat, "longitude": lng, "source": source}
+        for key, (lat, lng) in entries.items()
+        if key not in existing
+    ]
+    if novos:
+        executor.execute(table.insert(), novos)
+
+
+geocode_cache = GeocodeCache()
+
+
+__all__ = [
+    "Coords",
+    "GeocodeCache",
+    "TokenBucket",
+    "GEOCODE_GENERATION",
+    "USER_AGENT",
+    "geocode_cache",
+    "geocode_cache_key",
+    "http_session",
+    "normalize_address_key",
+]
@@ -0,0 +1,422 @@
+"""Derivados responsivos das imagens enviadas, fora do request.
+
+``upload_to_s3`` continua gravando a imagem exibida (JPEG 1280 px) na mesma
+chave de sempre. Para imagens ele agora também chama ``register_upload``, que
+só calcula o sha256 do arquivo original, guarda o original num cache local
+(``IMAGE_CACHE_DIR``) e agenda o trabalho pesado:
+
+* o original vai uma única vez para ``images/originals/<hash>`` no storage —
+  o mesmo arquivo enviado de novo (foto repetida em vários produtos) reaproveita
+  original e derivados já prontos;
+* os derivados 160/480/1280 px em WebP e JPEG vão para
+  ``images/<hash[:2]>/<hash>/<largura>.<ext>`` (conteúdo imutável);
+* ``ImageAsset`` liga a URL exibida ao hash e lista os derivados, gravada só
+  quando todos estão no storage.
+
+Os templates usam ``image_srcset``/``image_variant`` (globais do Jinja), que
+caem na URL original enquanto os derivados não existem. Grades de cards chamam
+antes ``prefetch_image_variants`` com as URLs da página: uma consulta ``IN``
+preenche o cache em vez de uma consulta por card. ``bake_image_rotation`` gira
+a partir do original em cache local em vez de baixar a imagem de novo.
+
+O worker é um ``ThreadPoolExecutor`` do processo (``IMAGE_DERIVATIVES_ASYNC``);
+desligado, o job roda no próprio request, e com TESTING fica pendente até
+``derivative_worker.flush()``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Callable
+
+from flask import current_app
+from PIL import Image, ImageOps
+from sqlalchemy.exc import SQLAlchemyError
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_WIDTHS = (160, 480, 1280)
+DERIVATIVE_FORMATS = {"webp": "image/webp", "jpeg": "image/jpeg"}
+DEFAULT_WORKERS = 2
+DEFAULT_VARIANTS_TTL = 600
+_MISSING_TTL = 30
+_IMMUTABLE = "public, max-age=31536000, immutable"
+_ORIGINAL_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+
+# ---------------------------------------------------------------- storage
+
+class LocalImageStorage:
+    """Storage em disco servido por ``/static/uploads`` (dev e testes)."""
+
+    def __init__(self, root: Path, url_prefix: str = "/static/uploads"):
+        self.root = Path(root)
+        self.url_prefix = url_prefix.rstrip("/")
+
+    def url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+    def exists(self, key: str) -> bool:
+        return (self.root / key).exists()
+
+    def read(self, key: str) -> bytes | None:
+        path = self.root / key
+        return path.read_bytes() if path.exists() else None
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return self.url(key)
+
+
+class S3ImageStorage:
+    """Storage no bucket S3 usado pelo ``upload_to_s3``."""
+
+    def __init__(self, client_factory: Callable, bucket: str):
+        self._client_factory = client_factory
+        self.bucket = bucket
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def url(self, key: str) -> str:
+        return f"https://{self.bucket}.s3.amazonaws.com/{key}"
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except Exception:  # noqa: BLE001 - 404 ou erro: trata como ausente
+            return False
+        return True
+
+    def read(self, key: str) -> bytes | None:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=key)["Body"].read()
+        except Exception:  # noqa: BLE001
+            return None
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        self.client.upload_fileobj(
+            BytesIO(data),
+            self.bucket,
+            key,
+            ExtraArgs={"ContentType": content_type, "CacheControl": _IMMUTABLE},
+        )
+        return self.url(key)
+
+
+# ------------------------------------------------------- imagem e chaves
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def original_key(digest: str) -> str:
+    return f"images/originals/{digest}"
+
+
+def derivative_key(digest: str, width: int, fmt: str) -> str:
+    extension = "jpg" if fmt == "jpeg" else fmt
+    return f"images/{digest[:2]}/{digest}/{width}.{extension}"
+
+
+def to_display_rgb(image: Image.Image) -> Image.Image:
+    """Aplica a orientação EXIF e achata transparência sobre branco.
+
+    JPEG não tem alfa; converter RGBA direto para RGB deixa o fundo
+    transparente dos produtos preto no catálogo.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode in {"RGBA", "LA"} or "transparency" in image.info:
+        foreground = image.convert("RGBA")
+        background = Image.new("RGBA", foreground.size, "white")
+        background.alpha_composite(foreground)
+        return background.convert("RGB")
+    return image.convert("RGB")
+
+
+def render_derivatives(image: Image.Image) -> list[tuple[int, dict[str, bytes]]]:
+    """``[(largura, {"webp": bytes, "jpeg": bytes}), ...]`` sem ampliar a foto."""
+    longest = max(image.size)
+    rendered = []
+    for index, width in enumerate(DERIVATIVE_WIDTHS):
+        if width > longest and index:
+            break
+        resized = image.copy()
+        resized.thumbnail((width, width))
+        encoded = {}
+        for fmt in DERIVATIVE_FORMATS:
+            buffer = BytesIO()
+            if fmt == "webp":
+                resized.save(buffer, format="WEBP", quality=80, method=4)
+            else:
+                resized.save(buffer, format="JPEG", optimize=True, quality=82, progressive=True)
+            encoded[fmt] = buffer.getvalue()
+        rendered.append((resized.width, encoded))
+    return rendered
+
+
+# -------------------------------------------------- cache local do original
+
+def _cache_dir() -> Path:
+    configured = current_app.config.get("IMAGE_CACHE_DIR")
+    path = Path(configured) if configured else Path(tempfile.gettempdir()) / "petorlandia-image-cache"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def cache_original(digest: str, data: bytes) -> None:
+    path = _cache_dir() / digest
+    if path.exists():
+        return
+    handle = tempfile.NamedTemporaryFile(dir=path.parent, delete=False)
+    try:
+        with handle:
+            handle.write(data)
+        os.replace(handle.name, path)
+    except BaseException:
+        Path(handle.name).unlink(missing_ok=True)
+        raise
+
+
+def cached_original(digest: str) -> bytes | None:
+    path = _cache_dir() / digest
+    return path.read_bytes() if path.exists() else None
+
+
+# ------------------------------------------------ URL -> derivados (leitura)
+
+class _VariantsCache:
+    """LRU com TTL de ``url -> variants``; ausência fica pouco tempo em cache."""
+
+    def __init__(self, maxsize: int = 4096):
+        self._maxsize = maxsize
+        self._entries: OrderedDict[str, tuple[float, list, str | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[url]
+                return None
+            self._entries.move_to_end(url)
+            return entry
+
+    def put(self, url: str, variants: list, digest: str | None, ttl: float) -> None:
+        with self._lock:
+            self._entries[url] = (time.monotonic() + ttl, variants, digest)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self._maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+variants_cache = _VariantsCache()
+
+
+def _fetch_assets(urls: list[str]) -> dict[str, tuple[list, str | None]]:
+    """Uma consulta para várias URLs; cacheia inclusive as que não têm asset."""
+    from models import ImageAsset
+
+    try:
+        # Savepoint: uma falha (tabela ausente) não desfaz a transação do request.
+        with db.session.begin_nested():
+            rows = (
+                db.session.query(ImageAsset.url, ImageAsset.variants, ImageAsset.content_hash)
+                .filter(ImageAsset.url.in_(urls))
+                .all()
+            )
+    except SQLAlchemyError:
+        logger.debug("image_asset lookup failed", exc_info=True)
+        rows = []
+    ttl = int(current_app.config.get("IMAGE_VARIANTS_CACHE_TTL", DEFAULT_VARIANTS_TTL))
+    found = {}
+    for row in rows:
+        found[row.url] = (list(row.variants or []), row.content_hash)
+        variants_cache.put(row.url, found[row.url][0], row.content_hash, ttl)
+    for url in urls:
+        if url not in found:
+            variants_cache.put(url, [], None, _MISSING_TTL)
+    return found
+
+
+def prefetch_image_variants(urls) -> str:
+    """Carrega de uma vez os derivados das ``urls`` de uma página.
+
+    Devolve ``""`` para poder ser chamada direto do template
+    (``{{ prefetch_image_variants(...) }}``).
+    """
+    pending = sorted({url for url in urls if url and variants_cache.get(url) is None})
+    if pending:
+        _fetch_assets(pending)
+    return ""
+
+
+def _lookup(url: str) -> tuple[list, str | None]:
+    entry = variants_cache.get(url)
+    if entry is not None:
+        return entry[1], entry[2]
+    return _fetch_assets([url]).get(url, ([], None))
+
+
+def image_variants(url: str | None) -> list[dict]:
+    """Derivados prontos de ``url`` (em ordem crescente) ou ``[]``."""
+    if not url:
+        return []
+    return _lookup(url)[0]
+
+
+def image_srcset(url: str | None, fmt: str = "jpeg") -> str:
+    """Valor do atributo ``srcset`` para ``url``; vazio sem derivados."""
+    return ", ".join(f"{item[fmt]} {item['w']}w" for item in image_variants(url) if item.get(fmt))
+
+
+def image_variant(url: str | None, width: int, fmt: str = "jpeg") -> str | None:
+    """Menor derivado com pelo menos ``width`` px; a própria ``url`` se não há."""
+    variants = image_variants(url)
+    for item in variants:
+        if item["w"] >= width and item.get(fmt):
+            return item[fmt]
+    if variants and variants[-1].get(fmt):
+        return variants[-1][fmt]
+    return url
+
+
+def original_bytes(url: str | None) -> bytes | None:
+    """Bytes do original por trás de uma URL exibida, do cache local se houver."""
+    if not url:
+        return None
+    digest = _lookup(url)[1]
+    if digest is None:
+        return None
+    return cached_original(digest)
+
+
+# ------------------------------------------------------------ o worker
+
+class DerivativeWorker:
+    """Gera e grava os derivados fora do request.
+
+    Em produção cada upload vira um job num ``ThreadPoolExecutor``; com
+    ``IMAGE_DERIVATIVES_ASYNC`` desligado o job roda na hora, e com TESTING
+    fica pendente até ``flush()``, para o teste decidir quando os derivados
+    existem.
+    """
+
+    def __init__(self):
+        self._executor: ThreadPoolExecutor | None = None
+        self._pending: list[tuple] = []
+        self._lock = threading.Lock()
+
+    def submit(self, app, digest: str, url: str, storage) -> None:
+        job = (app, digest, url, storage)
+        if app.testing:
+            with self._lock:
+                self._pending.append(job)
+        elif app.config.get("IMAGE_DERIVATIVES_ASYNC"):
+            with self._lock:
+                if self._executor is None:
+                    workers = int(app.config.get("IMAGE_DERIVATIVE_WORKERS", DEFAULT_WORKERS))
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-derivatives")
+            self._executor.submit(self._run, *job)
+        else:
+            self._run(*job)
+
+    def flush(self) -> int:
+        """Roda os jobs pendentes na thread atual; retorna quantos gravou."""
+        with self._lock:
+            jobs, self._pending = self._pending, []
+        return sum(1 for job in jobs if self._run(*job))
+
+    def discard(self) -> None:
+        with self._lock:
+            self._pending.clear()
+
+    def _run(self, app, digest: str, url: str, storage) -> bool:
+        try:
+            with app.app_context():
+                build_derivatives(digest, url, storage)
+                db.session.remove()
+            return True
+        except Exception:  # noqa: BLE001 - derivado é melhoria, não pode derrubar nada
+            app.logger.warning("Falha ao gerar derivados da imagem %s", url, exc_info=True)
+            return False
+
+
+derivative_worker = DerivativeWorker()
+
+
+def build_derivatives(digest: str, url: str, storage) -> list[dict]:
+    """Garante original e derivados no storage e grava o ``ImageAsset`` de ``url``."""
+    from models import ImageAsset
+
+    known = (
+        ImageAsset.query
+        .filter(ImageAsset.content_hash == digest, ImageAsset.url != url)
+        .order_by(ImageAsset.id)
+        .first()
+    )
+    if known is not None and known.variants:
+        variants, size = known.variants, (known.width, known.height)
+    else:
+        data = cached_original(digest)
+        if data is None:
+            data = storage.read(original_key(digest))
+            if data is None:
+                raise FileNotFoundError(f"original {digest} fora do cache e do storage")
+            cache_original(digest, data)
+        with Image.open(BytesIO(data)) as source:
+            original_type = _ORIGINAL_TYPES.get(source.format, "application/octet-stream")
+            image = to_display_rgb(source)
+        if not storage.exists(original_key(digest)):
+            storage.put(original_key(digest), data, original_type)
+        variants = []
+        for width, encoded in render_derivatives(image):
+            item = {"w": width}
+            for fmt, payload in encoded.items():
+                item[fmt] = storage.put(derivative_key(digest, width, fmt), payload, DERIVATIVE_FORMATS[fmt])
+            variants.append(item)
+        size = image.size
+
+    asset = ImageAsset.query.filter_by(url=url).first() or ImageAsset(url=url)
+    asset.content_hash = digest
+    asset.original_key = original_key(digest)
+    asset.width, asset.height = size
+    asset.variants = variants
+    db.session.add(asset)
+    db.session.commit()
+    ttl = int(current_app.config.get("IMAGE_VARIANTS_CACHE_TTL", DEFAULT_VARIANTS_TTL))
+    variants_cache.put(url, list(variants), digest, ttl)
+    return variants
+
+
+def register_upload(data: bytes, url: str, storage) -> str:
+    """Chamado depois do upload da imagem exibida; só hash, cache e agendamento."""
+    digest = content_hash(data)
+    cache_original(digest, data)
+    # A URL pode ter sido regravada com outro conteúdo (mesmo nome de arquivo).
+    variants_cache.put(url, [], digest, _MISSING_TTL)
+    derivative_worker.submit(current_app._get_current_object(), digest, url, storage)
+    return digest
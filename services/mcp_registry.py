@@ -0,0 +1,113 @@
+"""Registro das tools do servidor MCP.
+
+Cada tool é uma função registrada com ``@mcp_tools.tool(nome, scopes=...)``;
+o despacho de ``tools/call`` vira um lookup no dicionário em vez de uma
+cadeia de ``if``. Os escopos exigidos ficam no registro e são checados antes
+do handler.
+
+O catálogo de ``tools/list`` é estático: é montado uma vez por processo (uma
+variante para admins e outra para os demais usuários) e guardado já
+serializado, com um ETag (sha256 do JSON) para respostas ``304``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable
+
+
+@dataclass
+class McpToolCall:
+    """Contexto de uma chamada: o que o handler precisa da request."""
+
+    name: str
+    req_id: Any
+    user: Any
+    args: dict
+    scopes: set[str]
+
+
+@dataclass(frozen=True)
+class McpTool:
+    name: str
+    handler: Callable[[McpToolCall], Any]
+    scopes: tuple[str, ...] = ()
+    admin_only: bool = False
+
+
+@dataclass(frozen=True)
+class McpCatalogue:
+    tools: list[dict]
+    tools_json: str
+    etag: str
+
+
+class McpToolRegistry:
+    def __init__(self):
+        self._tools: dict[str, McpTool] = {}
+        self._catalogue_builder: Callable[[], list[dict]] | None = None
+        self._catalogues: dict[bool, McpCatalogue] = {}
+        self._lock = threading.Lock()
+
+    def tool(self, *names: str, scopes: tuple[str, ...] | list[str] = (), admin_only: bool = False):
+        """Registra o handler para um ou mais nomes de tool."""
+
+        def decorator(handler):
+            for name in names:
+                if name in self._tools:
+                    raise ValueError(f'Tool MCP registrada duas vezes: {name}')
+                self._tools[name] = McpTool(name, handler, tuple(scopes), admin_only)
+            return handler
+
+        return decorator
+
+    @contextmanager
+    def registering(self):
+        """Registra um lote de tools; o catálogo é invalidado uma vez no fim."""
+        try:
+            yield self.tool
+        finally:
+            self.reset_catalogue()
+
+    def catalogue_builder(self, builder: Callable[[], list[dict]]):
+        """Registra a função que monta os descritores de todas as tools."""
+        self._catalogue_builder = builder
+        self.reset_catalogue()
+        return builder
+
+    def get(self, name: str) -> McpTool | None:
+        return self._tools.get(name)
+
+    def names(self) -> list[str]:
+        return sorted(self._tools)
+
+    def catalogue(self, *, is_admin: bool) -> McpCatalogue:
+        cached = self._catalogues.get(is_admin)
+        if cached is not None:
+            return cached
+        with self._lock:
+            cached = self._catalogues.get(is_admin)
+            if cached is None:
+                cached = self._build(is_admin)
+                self._catalogues[is_admin] = cached
+        return cached
+
+    def _build(self, is_admin: bool) -> McpCatalogue:
+        if self._catalogue_builder is None:
+            raise RuntimeError('Catálogo de tools MCP não registrado')
+        hidden = set() if is_admin else {name for name, tool in self._tools.items() if tool.admin_only}
+        tools = [tool for tool in self._catalogue_builder() if tool.get('name') not in hidden]
+        tools_json = json.dumps(tools, ensure_ascii=False, separators=(',', ':'))
+        etag = hashlib.sha256(tools_json.encode('utf-8')).hexdigest()[:32]
+        return McpCatalogue(tools, tools_json, etag)
+
+    def reset_catalogue(self) -> None:
+        with self._lock:
+            self._catalogues.clear()
+
+
+mcp_tools = McpToolRegistry()
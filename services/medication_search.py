@@ -0,0 +1,252 @@
+"""Índice de busca de medicamentos do bulário.
+
+Cada ``Medicamento`` carrega um ``search_document``: texto normalizado (caixa
+baixa, sem acentos, grafias de neomicina corrigidas) com nome, princípio
+ativo, classificação, via e todo o texto de ``conteudo_estruturado``. O
+documento é recalculado por listeners do modelo a cada escrita, então as
+buscas não precisam mais de ``CAST(conteudo_estruturado AS TEXT)`` por linha.
+
+No PostgreSQL a busca usa o índice GIN trigram sobre ``search_document``
+(migração ``c4e8a2f6b1d3``) e ranqueia por tokens casados + ``similarity``.
+Em SQLite (dev/testes) o mesmo ranking roda sobre um índice em memória
+invalidado por versão quando um commit grava medicamentos: as escritas são
+coletadas no ``after_flush`` e aplicadas no ``after_commit``, então outra
+thread nunca reconstrói o índice a partir de dados ainda não commitados (ou
+desfeitos por rollback).
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import unicodedata
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+SEARCH_DOCUMENT_MAX_CHARS = 20000
+STOPWORDS_BUSCA = frozenset({"com", "para", "por", "uso", "mg", "ml"})
+
+_NEOMICINA_RE = re.compile(r"\bneom?c?icina\b|\bneonicina\b|\bneomicicina\b")
+_TOKEN_RE = re.compile(r"[a-z0-9]{3,}")
+_ESPACOS_RE = re.compile(r"\s+")
+_SESSION_INFO_KEY = "medicamentos_busca_alterados"
+
+
+def normalizar_texto_busca(valor) -> str:
+    """Caixa baixa, sem acentos e com erros comuns de digitação corrigidos."""
+
+    texto = unicodedata.normalize("NFKD", str(valor or "").lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return _NEOMICINA_RE.sub("neomicina", texto)
+
+
+def tokens_busca(termo_normalizado: str) -> list[str]:
+    """Tokens relevantes (3+ caracteres, sem stopwords) de um termo normalizado."""
+
+    return [
+        token
+        for token in _TOKEN_RE.findall(termo_normalizado)
+        if token not in STOPWORDS_BUSCA
+    ]
+
+
+def _textos_conteudo(valor):
+    if isinstance(valor, str):
+        yield valor
+    elif isinstance(valor, dict):
+        for item in valor.values():
+            yield from _textos_conteudo(item)
+    elif isinstance(valor, (list, tuple)):
+        for item in valor:
+            yield from _textos_conteudo(item)
+    elif valor is not None and not isinstance(valor, bool):
+        yield str(valor)
+
+
+def montar_documento_busca(med) -> str:
+    """Monta o ``search_document`` de um medicamento (ORM ou objeto similar)."""
+
+    partes = [
+        getattr(med, "nome", None),
+        getattr(med, "principio_ativo", None),
+        getattr(med, "classificacao", None),
+        getattr(med, "via_administracao", None),
+    ]
+    partes.extend(_textos_conteudo(getattr(med, "conteudo_estruturado", None)))
+    texto = " ".join(normalizar_texto_busca(parte) for parte in partes if parte)
+    return _ESPACOS_RE.sub(" ", texto).strip()[:SEARCH_DOCUMENT_MAX_CHARS]
+
+
+def _pontuar_documento(documento: str, termo: str, tokens: list[str]):
+    qtd_tokens = sum(1 for token in tokens if token in documento)
+    termo_inteiro = 1 if termo and termo in documento else 0
+    if not qtd_tokens and not termo_inteiro:
+        return None
+    todos = 1 if tokens and qtd_tokens == len(tokens) else 0
+    prefixo = 1 if termo and documento.startswith(termo) else 0
+    return (todos, qtd_tokens, termo_inteiro, prefixo)
+
+
+class _IndiceEmMemoria:
+    """Fallback para bancos sem pg_trgm: ``{id: documento}`` por versão."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versao = 0
+        self._versao_carregada = None
+        self._documentos: dict[int, str] = {}
+
+    def invalidar(self):
+        with self._lock:
+            self._versao += 1
+
+    def documentos(self):
+        from extensions import db
+        from models import Medicamento
+
+        with self._lock:
+            if self._versao_carregada == self._versao:
+                return self._documentos
+            versao = self._versao
+        linhas = db.session.query(
+            Medicamento.id,
+            Medicamento.search_document,
+            Medicamento.nome,
+            Medicamento.principio_ativo,
+            Medicamento.classificacao,
+            Medicamento.via_administracao,
+            Medicamento.conteudo_estruturado,
+        ).all()
+        documentos = {
+            linha.id: linha.search_document or montar_documento_busca(linha)
+            for linha in linhas
+        }
+        with self._lock:
+            if self._versao == versao:
+                self._documentos = documentos
+                self._versao_carregada = versao
+        return documentos
+
+    def buscar(self, termo: str, tokens: list[str], limite: int) -> list[int]:
+        pontuados = []
+        for med_id, documento in self.documentos().items():
+            pontos = _pontuar_documento(documento, termo, tokens)
+            if pontos is not None:
+                pontuados.append((pontos, med_id))
+        pontuados.sort(key=lambda item: (item[0], -item[1]), reverse=True)
+        return [med_id for _, med_id in pontuados[:limite]]
+
+
+_indice_memoria = _IndiceEmMemoria()
+
+
+def invalidar_indice_busca():
+    """Sinaliza que o catálogo mudou (chamado no commit que gravou medicamentos)."""
+
+    _indice_memoria.invalidar()
+
+
+# -- invalidação dirigida por commit -------------------------------------
+def _coletar_escritas(session: Session, _flush_context) -> None:
+    from models import Medicamento
+
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Medicamento):
+            session.info[_SESSION_INFO_KEY] = True
+            return
+
+
+def _aplicar_escritas(session: Session) -> None:
+    if session.info.pop(_SESSION_INFO_KEY, False):
+        invalidar_indice_busca()
+
+
+def _descartar_escritas(session: Session, *_args) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+event.listen(Session, "after_flush", _coletar_escritas)
+event.listen(Session, "after_commit", _aplicar_escritas)
+event.listen(Session, "after_rollback", _descartar_escritas)
+
+
+def _buscar_ids_postgres(termo: str, tokens: list[str], limite: int) -> list[int]:
+    from sqlalchemy import case, func, or_
+
+    from extensions import db
+    from models import Medicamento
+
+    documento = Medicamento.search_document
+    padroes = [termo] + [token for token in tokens if token != termo]
+    ordem = []
+    if tokens:
+        ordem.append(sum(
+            (case((documento.contains(token, autoescape=True), 1), else_=0) for token in tokens),
+            start=0,
+        ).desc())
+    ordem.extend([func.similarity(documento, termo).desc(), Medicamento.nome])
+    linhas = (
+        db.session.query(Medicamento.id)
+        .filter(or_(*(documento.contains(padrao, autoescape=True) for padrao in padroes)))
+        .order_by(*ordem)
+        .limit(limite)
+        .all()
+    )
+    return [linha.id for linha in linhas]
+
+
+def buscar_ids_medicamentos(termo: str, *, limite: int = 120) -> list[int]:
+    """IDs de medicamentos que casam ``termo``, do mais para o menos relevante.
+
+    ``termo`` pode vir cru; é normalizado aqui. Casa quando o documento contém
+    o termo inteiro ou qualquer um dos tokens, e ranqueia por quantidade de
+    tokens casados.
+    """
+
+    from extensions import db
+
+    termo_norm = normalizar_texto_busca(termo).strip()
+    tokens = tokens_busca(termo_norm)
+    if not termo_norm:
+        return []
+    if db.engine.dialect.name == "postgresql":
+        return _buscar_ids_postgres(termo_norm, tokens, limite)
+    return _indice_memoria.buscar(termo_norm, tokens, limite)
+
+
+def reindexar_documentos_busca(batch_size: int = 500) -> int:
+    """Recalcula ``search_document`` de todo o catálogo. Retorna o total."""
+
+    from extensions import db
+    from models import Medicamento
+
+    total = 0
+    ultimo_id = 0
+    while True:
+        lote = (
+            Medicamento.query
+            .filter(Medicamento.id > ultimo_id)
+            .order_by(Medicamento.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not lote:
+            break
+        for med in lote:
+            med.search_document = montar_documento_busca(med)
+        db.session.commit()
+        total += len(lote)
+        ultimo_id = lote[-1].id
+    invalidar_indice_busca()
+    return total
+
+
+__all__ = [
+    "buscar_ids_medicamentos",
+    "invalidar_indice_busca",
+    "montar_documento_busca",
+    "normalizar_texto_busca",
+    "reindexar_documentos_busca",
+    "tokens_busca",
+]
@@ -0,0 +1,212 @@
+"""Outbox de notificações: os jobs enfileiram, os drenadores enviam.
+
+``enqueue`` só adiciona a linha na sessão (sem commit), então o lembrete entra
+na mesma transação do job que o gerou e o job termina no tempo de montar as
+linhas. A chave única (kind, target, channel, day) faz o job ser idempotente:
+rodar de novo no mesmo dia, ou depois de cair no meio, não duplica envios.
+
+Cada canal tem seu drenador (``drain``), chamado pelo agendador em jobs
+separados — um SMTP lento não segura o WhatsApp nem o push. O e-mail sai em
+lotes numa única conexão SMTP. Falhas ficam na própria linha (``attempts``,
+``last_error``, ``next_attempt_at`` com backoff exponencial); depois de
+``NOTIFICATION_OUTBOX_MAX_ATTEMPTS`` a linha vira ``dead``.
+
+O registro legado em ``Notification`` é gravado no enfileiramento (e-mail e
+WhatsApp), como fazia ``notify_user``; o estado da entrega fica no outbox.
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Callable
+
+from flask import current_app
+from flask_mail import Message as MailMessage
+
+from extensions import db, mail
+from time_utils import now_in_brazil, utcnow
+
+CHANNELS = ('email', 'whatsapp', 'push')
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_MAX_ATTEMPTS = 6
+DEFAULT_RETRY_SECONDS = 300
+_MAX_BACKOFF = timedelta(hours=6)
+# Canais que deixam registro em ``Notification`` (o push nunca deixou).
+_RECORDED_CHANNELS = {'email', 'whatsapp'}
+
+# canal -> função(rows) -> {row.id: mensagem de erro ou None}
+_SENDERS: dict[str, Callable] = {}
+
+
+def register_sender(channel: str, sender: Callable) -> None:
+    """Registra o envio em lote de um canal (ver ``per_row``)."""
+    _SENDERS[channel] = sender
+
+
+def per_row(send_one: Callable) -> Callable:
+    """Adapta um envio unitário ``send_one(row)`` ao contrato de lote."""
+
+    def sender(rows):
+        results = {}
+        for row in rows:
+            try:
+                send_one(row)
+                results[row.id] = None
+            except Exception as exc:  # noqa: BLE001 - vira estado de retry
+                results[row.id] = str(exc) or exc.__class__.__name__
+        return results
+
+    return sender
+
+
+def enqueue(
+    *,
+    kind: str,
+    target: str,
+    channel: str,
+    body: str,
+    user_id: int | None = None,
+    recipient: str | None = None,
+    subject: str | None = None,
+    url: str | None = None,
+    day=None,
+):
+    """Adiciona o envio à sessão, sem commit. Retorna ``None`` se já existe."""
+    from models import Notification, NotificationOutbox
+
+    if channel not in CHANNELS:
+        raise ValueError(f'Canal de notificação desconhecido: {channel}')
+    day = day or now_in_brazil().date()
+    exists = (
+        db.session.query(NotificationOutbox.id)
+        .filter_by(kind=kind, target=target, channel=channel, day=day)
+        .first()
+    )
+    if exists:
+        return None
+    row = NotificationOutbox(
+        kind=kind,
+        target=target,
+        channel=channel,
+        day=day,
+        user_id=user_id,
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        url=url,
+    )
+    db.session.add(row)
+    if user_id and channel in _RECORDED_CHANNELS:
+        db.session.add(Notification(user_id=user_id, message=body, channel=channel, kind=kind))
+    return row
+
+
+def _config(name: str, default):
+    return type(default)(current_app.config.get(name, default))
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    base = timedelta(seconds=_config('NOTIFICATION_OUTBOX_RETRY_SECONDS', DEFAULT_RETRY_SECONDS))
+    return min(base * (2 ** max(attempts - 1, 0)), _MAX_BACKOFF)
+
+
+def _due_rows(channel: str, limit: int):
+    from models import NotificationOutbox
+
+    query = (
+        NotificationOutbox.query
+        .filter(
+            NotificationOutbox.channel == channel,
+            NotificationOutbox.status == 'pending',
+            NotificationOutbox.next_attempt_at <= utcnow(),
+        )
+        .order_by(NotificationOutbox.id)
+        .limit(limit)
+    )
+    if db.engine.dialect.name == 'postgresql':
+        # Dois drenadores do mesmo canal não pegam a mesma linha.
+        query = query.with_for_update(skip_locked=True)
+    return query.all()
+
+
+def drain(channel: str, *, batch_size: int | None = None) -> dict[str, int]:
+    """Envia tudo o que está vencido no canal, lote a lote, com commit por lote."""
+    sender = _SENDERS.get(channel)
+    if sender is None:
+        raise ValueError(f'Canal sem drenador registrado: {channel}')
+    batch_size = batch_size or _config('NOTIFICATION_OUTBOX_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    max_attempts = _config('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+    stats = {'batches': 0, 'sent': 0, 'retry': 0, 'dead': 0}
+
+    while True:
+        rows = _due_rows(channel, batch_size)
+        if not rows:
+            break
+        results = sender(rows)
+        now = utcnow()
+        for row in rows:
+            error = results.get(row.id, 'sem resultado do envio')
+            row.attempts = (row.attempts or 0) + 1
+            if error is None:
+                row.status = 'sent'
+                row.sent_at = now
+                row.last_error = None
+                stats['sent'] += 1
+                continue
+            row.last_error = error[:1000]
+            if row.attempts >= max_attempts:
+                row.status = 'dead'
+                stats['dead'] += 1
+            else:
+                row.next_attempt_at = now + _retry_delay(row.attempts)
+                stats['retry'] += 1
+        db.session.commit()
+        stats['batches'] += 1
+
+    if stats['batches']:
+        current_app.logger.info(
+            'notification_outbox channel=%s batches=%d sent=%d retry=%d dead=%d',
+            channel, stats['batches'], stats['sent'], stats['retry'], stats['dead'],
+        )
+    return stats
+
+
+def _send_email_batch(rows):
+    """Uma conexão SMTP para o lote inteiro."""
+    sender = current_app.config.get('MAIL_DEFAULT_SENDER')
+    if not sender:
+        return {row.id: 'MAIL_DEFAULT_SENDER não configurado' for row in rows}
+    results = {}
+    try:
+        with mail.connect() as connection:
+            for row in rows:
+                try:
+                    connection.send(MailMessage(
+                        subject=row.subject or 'PetOrlândia',
+                        sender=sender,
+                        recipients=[row.recipient],
+                        body=row.body,
+                    ))
+                    results[row.id] = None
+                except Exception as exc:  # noqa: BLE001
+                    results[row.id] = str(exc) or exc.__class__.__name__
+    except Exception as exc:  # noqa: BLE001 - falha ao abrir/fechar a conexão
+        error = f'SMTP: {exc}'
+        for row in rows:
+            results.setdefault(row.id, error)
+    return results
+
+
+def _send_push_batch(rows):
+    from services.push import PushMessage, dispatch_push
+
+    # Push é best-effort: dispatch_push não levanta e já poda inscrições mortas.
+    dispatch_push([
+        PushMessage(row.user_id, row.subject or 'PetOrlândia 🐾', row.body, url=row.url, tag='lembrete')
+        for row in rows
+    ])
+    return {row.id: None for row in rows}
+
+
+register_sender('email', _send_email_batch)
+register_sender('push', _send_push_batch)
@@ -182,12 +182,36 @@ def notify_admins(texto, *, kind, url=None):
     )
 
 
-def notify_user(user, subject, body, *, kind):
-    """Notify a user by email and record a legacy Notification row."""
+def notify_user(user, subject, body, *, kind, target=None):
+    """Notify a user by email and record a legacy Notification row.
+
+    With ``target`` (e.g. ``'order:42'``) the email goes through the
+    notification outbox instead: nothing is sent or committed here, and the
+    same (kind, target) is delivered at most once per day.
+    """
 
     if user is None:
         return
     email = (getattr(user, 'email', '') or '').strip()
-    if email and not email.endswith('@convite.petorlandia.local'):
+    if email.endswith('@convite.petorlandia.local'):
+        email = ''
+    if target is not None:
+        from models import Notification
+        from services.notification_outbox import enqueue
+
+        if email:
+            enqueue(
+                kind=kind,
+                target=target,
+                channel='email',
+                user_id=user.id,
+                recipient=email,
+                subject=subject,
+                body=body,
+            )
+        else:
+            db.session.add(Notification(user_id=user.id, message=body, channel='email', kind=kind))
+        return
+    if email:
         _send_email([email], subject, body)
     _add_notification(user.id, body, kind=kind)
@@ -0,0 +1,135 @@
+"""Cache curto dos access tokens OAuth já verificados.
+
+Cada request MCP validava o bearer com uma query em ``oauth_access_token``.
+Aqui guardamos, por processo, o resultado da verificação (usuário, escopos,
+resource e expiração) por ``OAUTH_TOKEN_CACHE_TTL`` segundos, nunca além da
+expiração do próprio token. A chave é o sha256 do bearer: o token em claro
+não fica na memória do cache.
+
+A revogação invalida na hora: um listener de ``after_flush`` anota os tokens
+alterados ou apagados e ``after_commit`` remove as entradas (rollback
+descarta). Outros workers só enxergam a revogação depois do TTL, por isso ele
+é curto.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+DEFAULT_TTL = 30  # segundos
+DEFAULT_MAX_ENTRIES = 2000
+_SESSION_INFO_KEY = 'oauth_token_cache_invalidations'
+
+
+@dataclass(frozen=True)
+class VerifiedToken:
+    token_id: int
+    user_id: int
+    scopes: frozenset[str]
+    resource: str | None
+    expires_at: datetime | None
+
+
+def token_key(bearer: str) -> str:
+    return hashlib.sha256(bearer.encode('utf-8')).hexdigest()
+
+
+def _epoch(value: datetime | None) -> float | None:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class VerifiedTokenCache:
+    def __init__(self, *, ttl: int | None = None, max_entries: int = DEFAULT_MAX_ENTRIES, clock=time.monotonic):
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, float | None, VerifiedToken]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self) -> int:
+        if self._ttl is not None:
+            return self._ttl
+        if has_app_context():
+            return int(current_app.config.get('OAUTH_TOKEN_CACHE_TTL', DEFAULT_TTL))
+        return DEFAULT_TTL
+
+    def get(self, bearer: str) -> VerifiedToken | None:
+        key = token_key(bearer)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            cached_until, token_expiry, token = entry
+            if self._clock() >= cached_until or (token_expiry is not None and time.time() >= token_expiry):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return token
+
+    def put(self, bearer: str, token: VerifiedToken) -> None:
+        ttl = self.ttl
+        if ttl <= 0:
+            return
+        key = token_key(bearer)
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, _epoch(token.expires_at), token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, bearer: str) -> None:
+        with self._lock:
+            self._entries.pop(token_key(bearer), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_cache = VerifiedTokenCache()
+
+
+# -- invalidação dirigida por commit -------------------------------------
+def _collect_invalidations(session: Session, flush_context) -> None:
+    from models import OAuthAccessToken
+
+    pending = set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, OAuthAccessToken):
+            continue
+        history = sa_inspect(obj).attrs.access_token.history
+        pending.update(value for value in (*history.deleted, obj.access_token) if value)
+    if pending:
+        session.info.setdefault(_SESSION_INFO_KEY, set()).update(pending)
+
+
+def _apply_invalidations(session: Session) -> None:
+    for bearer in session.info.pop(_SESSION_INFO_KEY, None) or ():
+        token_cache.invalidate(bearer)
+
+
+def _discard_invalidations(session: Session, *_args) -> None:
+    session.info.pop(_SESSION_INFO_KEY, None)
+
+
+event.listen(Session, 'after_flush', _collect_invalidations)
+event.listen(Session, 'after_commit', _apply_invalidations)
+event.listen(Session, 'after_rollback', _discard_invalidations)
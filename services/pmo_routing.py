@@ -0,0 +1,267 @@
+"""Roteirização dos dias de vacinação da PMO.
+
+Monta uma matriz de distâncias haversine uma única vez (origem + paradas) e
+melhora a ordem das paradas com busca local 2-opt e Or-opt dentro de um
+orçamento de tempo. O caminho é aberto: começa na origem (Vigilância
+Sanitária) e termina na última casa.
+
+Unidades de um mesmo condomínio entram como um único bloco (``groups``) e
+nunca são separadas; ``pinned_group`` força um bloco a ser a primeira parada.
+
+Sem NumPy: para as dezenas de paradas de um turno a matriz em listas custa
+poucos milissegundos e evita uma dependência nova.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Hashable, Optional, Sequence
+
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_TIME_BUDGET_SECONDS = 0.5
+OR_OPT_MAX_SEGMENT = 3
+
+Coords = tuple[float, float]
+
+
+def haversine_km(a: Coords, b: Coords) -> float:
+    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
+    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
+    value = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return EARTH_RADIUS_KM * 2 * math.asin(math.sqrt(min(1.0, value)))
+
+
+def distance_matrix(points: Sequence[Coords]) -> list[list[float]]:
+    """Matriz simétrica de distâncias (km); senos/cossenos calculados uma vez."""
+
+    n = len(points)
+    lat = [math.radians(p[0]) for p in points]
+    lon = [math.radians(p[1]) for p in points]
+    cos_lat = [math.cos(value) for value in lat]
+    matrix = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        row = matrix[i]
+        for j in range(i + 1, n):
+            value = (
+                math.sin((lat[j] - lat[i]) / 2) ** 2
+                + cos_lat[i] * cos_lat[j] * math.sin((lon[j] - lon[i]) / 2) ** 2
+            )
+            distance = EARTH_RADIUS_KM * 2 * math.asin(math.sqrt(min(1.0, value)))
+            row[j] = distance
+            matrix[j][i] = distance
+    return matrix
+
+
+def path_length(order: Sequence[int], matrix: list[list[float]], start: int = 0) -> float:
+    total = 0.0
+    current = start
+    for node in order:
+        total += matrix[current][node]
+        current = node
+    return total
+
+
+def nearest_neighbor_order(nodes: Sequence[int], matrix: list[list[float]], start: int = 0) -> list[int]:
+    remaining = list(nodes)
+    ordered: list[int] = []
+    current = start
+    while remaining:
+        row = matrix[current]
+        best = min(range(len(remaining)), key=lambda idx: (row[remaining[idx]], remaining[idx]))
+        current = remaining.pop(best)
+        ordered.append(current)
+    return ordered
+
+
+def _two_opt_pass(order: list[int], matrix: list[list[float]], start: int, deadline: float) -> bool:
+    """Primeira melhoria 2-opt (inversão de trecho) num caminho aberto."""
+
+    n = len(order)
+    for i in range(n - 1):
+        a = order[i - 1] if i else start
+        b = order[i]
+        row_a = matrix[a]
+        row_b = matrix[b]
+        for j in range(i + 1, n):
+            c = order[j]
+            removed = row_a[b]
+            added = row_a[c]
+            if j + 1 < n:
+                e = order[j + 1]
+                removed += matrix[c][e]
+                added += row_b[e]
+            if added < removed - 1e-9:
+                order[i:j + 1] = reversed(order[i:j + 1])
+                return True
+        if time.perf_counter() > deadline:
+            return False
+    return False
+
+
+def _or_opt_pass(order: list[int], matrix: list[list[float]], start: int, deadline: float) -> bool:
+    """Move trechos de 1..3 paradas (em qualquer sentido) para outra posição."""
+
+    n = len(order)
+    for length in range(1, min(OR_OPT_MAX_SEGMENT, n - 1) + 1):
+        for i in range(n - length + 1):
+            seg_first = order[i]
+            seg_last = order[i + length - 1]
+            prev = order[i - 1] if i else start
+            nxt = order[i + length] if i + length < n else None
+            removed = matrix[prev][seg_first] + (matrix[seg_last][nxt] if nxt is not None else 0.0)
+            bridged = matrix[prev][nxt] if nxt is not None else 0.0
+            gain = removed - bridged
+            rest = order[:i] + order[i + length:]
+            for pos in range(len(rest) + 1):
+                if pos == i:
+                    continue
+                left = rest[pos - 1] if pos else start
+                right = rest[pos] if pos < len(rest) else None
+                base = matrix[left][right] if right is not None else 0.0
+                forward = matrix[left][seg_first] + (matrix[seg_last][right] if right is not None else 0.0)
+                backward = matrix[left][seg_last] + (matrix[seg_first][right] if right is not None else 0.0)
+                cost = min(forward, backward) - base
+                if cost < gain - 1e-9:
+                    segment = order[i:i + length]
+                    if backward < forward:
+                        segment.reverse()
+                    order[:] = rest[:pos] + segment + rest[pos:]
+                    return True
+            if time.perf_counter() > deadline:
+                return False
+    return False
+
+
+def improve_order(
+    order: list[int],
+    matrix: list[list[float]],
+    *,
+    start: int = 0,
+    time_budget: float = DEFAULT_TIME_BUDGET_SECONDS,
+) -> tuple[list[int], int, bool]:
+    """2-opt + Or-opt até ótimo local ou fim do orçamento.
+
+    Retorna ``(ordem, melhorias, estourou_orçamento)``.
+    """
+
+    order = list(order)
+    deadline = time.perf_counter() + max(0.0, time_budget)
+    improvements = 0
+    while True:
+        if time.perf_counter() > deadline:
+            return order, improvements, True
+        if _two_opt_pass(order, matrix, start, deadline) or _or_opt_pass(order, matrix, start, deadline):
+            improvements += 1
+            continue
+        return order, improvements, time.perf_counter() > deadline
+
+
+@dataclass
+class RouteResult:
+    """Ordem otimizada (índices em ``points``) e distâncias antes/depois."""
+
+    order: list[int]
+    distance_before_km: float
+    distance_after_km: float
+    improvements: int = 0
+    elapsed_ms: float = 0.0
+    timed_out: bool = False
+    stats: dict = field(default_factory=dict)
+
+    @property
+    def saved_km(self) -> float:
+        return self.distance_before_km - self.distance_after_km
+
+
+def _expanded_length(origin: Coords, points: Sequence[Coords], order: Sequence[int]) -> float:
+    total = 0.0
+    current = origin
+    for index in order:
+        total += haversine_km(current, points[index])
+        current = points[index]
+    return total
+
+
+def optimize_route(
+    origin: Coords,
+    points: Sequence[Coords],
+    *,
+    groups: Optional[Sequence[Optional[Hashable]]] = None,
+    pinned_group: Optional[Hashable] = None,
+    time_budget: float = DEFAULT_TIME_BUDGET_SECONDS,
+) -> RouteResult:
+    """Melhor ordem de visita de ``points`` saindo de ``origin``.
+
+    ``groups[i]`` agrupa paradas que devem ficar juntas (``None`` = avulsa);
+    dentro do bloco a ordem de entrada é mantida. A ordem de entrada é o
+    "antes"; o resultado nunca é mais longo que ela.
+    """
+
+    started = time.perf_counter()
+    n = len(points)
+    groups = list(groups) if groups is not None else [None] * n
+    before = _expanded_length(origin, points, range(n))
+    if n < 2:
+        return RouteResult(list(range(n)), before, before)
+
+    # Blocos: paradas avulsas sozinhas, condomínios juntos (na ordem de entrada).
+    blocks: list[list[int]] = []
+    block_of_group: dict[Hashable, int] = {}
+    for index, key in enumerate(groups):
+        if key is None:
+            blocks.append([index])
+        elif key in block_of_group:
+            blocks[block_of_group[key]].append(index)
+        else:
+            block_of_group[key] = len(blocks)
+            blocks.append([index])
+
+    # Nó 0 = origem; o bloco k vira o nó k + 1, representado pela 1ª unidade.
+    matrix = distance_matrix([origin] + [points[block[0]] for block in blocks])
+    nodes = list(range(1, len(blocks) + 1))
+    start = 0
+    prefix: list[int] = []
+    if pinned_group is not None and pinned_group in block_of_group:
+        pinned_node = block_of_group[pinned_group] + 1
+        nodes.remove(pinned_node)
+        prefix = [pinned_node]
+        start = pinned_node
+
+    initial = nodes  # ordem de entrada
+    greedy = nearest_neighbor_order(nodes, matrix, start)
+    seed = min((initial, greedy), key=lambda candidate: path_length(candidate, matrix, start))
+    improved, improvements, timed_out = improve_order(seed, matrix, start=start, time_budget=time_budget)
+
+    order = [index for node in prefix + improved for index in blocks[node - 1]]
+    after = _expanded_length(origin, points, order)
+    if after > before:
+        order, after = list(range(n)), before
+    return RouteResult(
+        order=order,
+        distance_before_km=before,
+        distance_after_km=after,
+        improvements=improvements,
+        elapsed_ms=(time.perf_counter() - started) * 1000,
+        timed_out=timed_out,
+        stats={
+            "stops": n,
+            "blocks": len(blocks),
+            "greedy_km": path_length(greedy, matrix, start) + (matrix[0][start] if start else 0.0),
+        },
+    )
+
+
+__all__ = [
+    "RouteResult",
+    "distance_matrix",
+    "haversine_km",
+    "improve_order",
+    "nearest_neighbor_order",
+    "optimize_route",
+    "path_length",
+]
@@ -9,6 +9,8 @@ from flask import current_app, g, has_request_context, request, session
 from flask_login import current_user
 
 from extensions import db
+from services.product_event_buffer import event_buffer
+from time_utils import utcnow
 
 
 _SAFE_PROPERTY_KEYS = {
@@ -124,25 +126,32 @@ def track_event(
 
     actor_id, actor_role = _actor(user_id)
 
-    try:
-        from models import ProductEvent
-
-        db.session.add(ProductEvent(
-            event_name=str(name)[:80],
-            anonymous_id=anonymous_id,
-            session_id=session_id,
-            user_id=actor_id,
-            source_path=source_path,
-            referrer_host=referrer_host,
-            utm_source=(source or attribution.get("utm_source") or "")[:120] or None,
-            utm_medium=(attribution.get("utm_medium") or "")[:120] or None,
-            utm_campaign=(attribution.get("utm_campaign") or "")[:160] or None,
-            properties=safe_properties,
-        ))
-        db.session.commit()
-    except Exception:  # telemetry must never block the product
-        db.session.rollback()
-        current_app.logger.warning("product_event_persist_failed", exc_info=True)
+    row = {
+        "event_name": str(name)[:80],
+        "anonymous_id": anonymous_id,
+        "session_id": session_id,
+        "user_id": actor_id,
+        "source_path": source_path,
+        "referrer_host": referrer_host,
+        "utm_source": (source or attribution.get("utm_source") or "")[:120] or None,
+        "utm_medium": (attribution.get("utm_medium") or "")[:120] or None,
+        "utm_campaign": (attribution.get("utm_campaign") or "")[:160] or None,
+        "properties": safe_properties,
+        "created_at": utcnow(),
+    }
+    if current_app.config.get("PRODUCT_EVENTS_ASYNC") and not current_app.testing:
+        # Fora do caminho do request: a thread grava em lote numa conexão
+        # própria, sem commitar o que o chamador deixou pendente na sessão.
+        event_buffer.submit(current_app._get_current_object(), row)
+    else:
+        try:
+            from models import ProductEvent
+
+            db.session.add(ProductEvent(**row))
+            db.session.commit()
+        except Exception:  # telemetry must never block the product
+            db.session.rollback()
+            current_app.logger.warning("product_event_persist_failed", exc_info=True)
 
     current_app.logger.info(
         "product_event",
@@ -0,0 +1,184 @@
+"""Bounded in-process buffer that writes ``ProductEvent`` rows in batches."""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Any
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_MS = 1000
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_ENQUEUE_TIMEOUT_MS = 5
+
+_STOP = object()
+
+
+class ProductEventBuffer:
+    """Queue events on the request path and insert them from a worker thread.
+
+    ``submit`` only puts a plain dict on a bounded queue. The worker drains it
+    and writes each batch (``PRODUCT_EVENTS_BATCH_SIZE`` events, or whatever
+    arrived within ``PRODUCT_EVENTS_FLUSH_MS``) with one multi-row INSERT on
+    its own connection, so the caller's session is never committed. When the
+    queue is full, ``submit`` waits up to ``PRODUCT_EVENTS_ENQUEUE_TIMEOUT_MS``
+    and then drops the event, counting it in ``stats()``. Pending events are
+    flushed at interpreter exit.
+    """
+
+    def __init__(self, app=None):
+        self._app = app
+        self._queue: queue.Queue | None = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._atexit_registered = False
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> dict[str, Any]:
+        return {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "failed": 0,
+            "batches": 0,
+            "max_depth": 0,
+            "last_flush_ms": 0.0,
+        }
+
+    def _config(self, key: str, default: int) -> int:
+        return int(self._app.config.get(key, default)) if self._app is not None else default
+
+    def _ensure_started(self, app) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._app is None:
+                self._app = app
+            if self._queue is None:
+                self._queue = queue.Queue(maxsize=self._config("PRODUCT_EVENTS_QUEUE_SIZE", DEFAULT_QUEUE_SIZE))
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="product-event-buffer", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def submit(self, app, row: dict[str, Any]) -> bool:
+        """Enqueue a ready-to-insert ``product_event`` row; False if dropped."""
+
+        self._ensure_started(app)
+        timeout = self._config("PRODUCT_EVENTS_ENQUEUE_TIMEOUT_MS", DEFAULT_ENQUEUE_TIMEOUT_MS) / 1000
+        try:
+            if timeout > 0:
+                self._queue.put(row, timeout=timeout)
+            else:
+                self._queue.put_nowait(row)
+        except queue.Full:
+            self._increment("dropped")
+            return False
+        depth = self._queue.qsize()
+        with self._lock:
+            self._stats["enqueued"] += 1
+            if depth > self._stats["max_depth"]:
+                self._stats["max_depth"] = depth
+        return True
+
+    def _run(self) -> None:
+        batch_size = max(1, self._config("PRODUCT_EVENTS_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        interval = max(1, self._config("PRODUCT_EVENTS_FLUSH_MS", DEFAULT_FLUSH_MS)) / 1000
+        stopping = False
+        while not stopping:
+            batch: list[dict[str, Any]] = []
+            deadline = time.monotonic() + interval
+            while len(batch) < batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            if batch:
+                self._write(batch)
+            stopping = stopping or self._stop.is_set()
+
+    def flush(self) -> int:
+        """Write everything currently queued, in the caller's thread."""
+
+        if self._queue is None:
+            return 0
+        batch_size = max(1, self._config("PRODUCT_EVENTS_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+        written = 0
+        while True:
+            batch: list[dict[str, Any]] = []
+            while len(batch) < batch_size:
+                try:
+                    row = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if row is not _STOP:
+                    batch.append(row)
+            if not batch:
+                return written
+            written += self._write(batch)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Stop the worker and flush what is left."""
+
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            try:
+                self._queue.put_nowait(_STOP)  # acorda a thread parada no get()
+            except queue.Full:
+                pass  # cheia: a thread não está esperando e vê o _stop
+            thread.join(timeout)
+        self.flush()
+
+    def _write(self, batch: list[dict[str, Any]]) -> int:
+        from models import ProductEvent
+
+        started = time.perf_counter()
+        try:
+            with self._flush_lock, self._app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(ProductEvent.__table__.insert().values(batch))
+        except Exception:  # telemetry must never take the worker down
+            self._increment("failed", len(batch))
+            logger.warning("product_event_batch_failed", exc_info=True)
+            return 0
+        with self._lock:
+            self._stats["written"] += len(batch)
+            self._stats["batches"] += 1
+            self._stats["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return len(batch)
+
+    def _increment(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += amount
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["depth"] = self._queue.qsize() if self._queue is not None else 0
+        stats["running"] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+
+event_buffer = ProductEventBuffer()
@@ -8,11 +8,18 @@ Config esperada (env):
 Sem as chaves configuradas o módulo vira no-op silencioso: nenhuma rota
 quebra, apenas não há push. O envio nunca levanta exceção para o chamador —
 push é canal complementar, não crítico.
+
+Envio em massa (jobs de lembrete): monte uma lista de ``PushMessage`` e chame
+``dispatch_push`` uma vez, em vez de ``push_to_user`` por destinatário.
 """
 from __future__ import annotations
 
 import hashlib
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
 
 from flask import current_app
 
@@ -22,6 +29,10 @@ from time_utils import utcnow
 # Depois de tantas falhas consecutivas a inscrição é considerada morta.
 _MAX_FAILS = 5
 
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_TIMEOUT_SECONDS = 10
+
 
 def push_enabled() -> bool:
     return bool(
@@ -77,74 +88,244 @@ def delete_subscription(user_id: int, endpoint: str) -> bool:
     return True
 
 
-def push_to_user(user_id: int, title: str, body: str, url: str | None = None, tag: str | None = None) -> int:
-    """Envia push para todos os dispositivos do usuário. Retorna nº de envios OK.
+@dataclass(frozen=True)
+class PushMessage:
+    """Uma notificação para todos os dispositivos de ``user_id``."""
 
-    Best-effort: erros são logados, inscrições mortas (404/410) removidas.
-    """
-    if not push_enabled():
-        return 0
+    user_id: int
+    title: str
+    body: str
+    url: str | None = None
+    tag: str | None = None
+
+    def payload(self) -> str:
+        return json.dumps({
+            'title': self.title,
+            'body': self.body,
+            'url': self.url or '/',
+            'tag': self.tag or 'petorlandia',
+        }, ensure_ascii=False)
+
+
+@dataclass
+class PushBatchStats:
+    subscriptions: int = 0
+    sent: int = 0
+    failed: int = 0
+    pruned: int = 0
+    elapsed_ms: float = 0.0
+
+
+@dataclass
+class PushDispatchStats:
+    users: int = 0
+    subscriptions: int = 0
+    sent: int = 0
+    failed: int = 0
+    pruned: int = 0
+    batches: list[PushBatchStats] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
 
+
+_session_local = threading.local()
+
+
+def _requests_session():
+    """Uma ``requests.Session`` por thread do pool: reaproveita conexões TLS."""
+    session = getattr(_session_local, 'session', None)
+    if session is None:
+        import requests
+
+        session = requests.Session()
+        _session_local.session = session
+    return session
+
+
+def _send_one(webpush, job: dict, options: dict) -> tuple[int, str, int | None, str | None]:
+    """Roda nas threads do pool: só rede, sem sessão do banco nem app context."""
+    try:
+        webpush(
+            subscription_info=job['subscription_info'],
+            data=job['payload'],
+            vapid_private_key=options['private_key'],
+            vapid_claims={'sub': options['claims_email']},
+            ttl=86400,
+            timeout=options['timeout'],
+            requests_session=_requests_session(),
+        )
+        return job['id'], 'sent', None, None
+    except Exception as exc:  # noqa: BLE001 - classificado pelo chamador
+        status = getattr(getattr(exc, 'response', None), 'status_code', None)
+        if status in (404, 410):
+            return job['id'], 'gone', status, None
+        return job['id'], 'failed', status, str(exc)
+
+
+def _apply_results(results, fail_counts: dict[int, int], user_of: dict[int, int]):
+    """Grava o resultado do lote com poucas instruções em massa.
+
+    Retorna as estatísticas do lote e os ids apagados.
+    """
     from models import PushSubscription
 
-    subs = PushSubscription.query.filter_by(user_id=user_id).all()
-    if not subs:
-        return 0
+    batch = PushBatchStats(subscriptions=len(results))
+    sent_ids, dead_ids, failed_ids = [], [], []
+    for sub_id, outcome, status, error in results:
+        if outcome == 'sent':
+            sent_ids.append(sub_id)
+        elif outcome == 'gone':
+            dead_ids.append(sub_id)
+        else:
+            if fail_counts.get(sub_id, 0) + 1 >= _MAX_FAILS:
+                dead_ids.append(sub_id)
+            else:
+                failed_ids.append(sub_id)
+            batch.failed += 1
+            current_app.logger.warning(
+                'Falha de push (%s) p/ user %s: %s', status, user_of.get(sub_id), error
+            )
+
+    table = PushSubscription.__table__
+    dead = set(dead_ids)
+    sent = set(sent_ids) - dead
+    failed = set(failed_ids) - dead - sent
+    if sent:
+        db.session.execute(
+            table.update()
+            .where(table.c.id.in_(sent))
+            .values(last_success_at=utcnow(), fail_count=0)
+        )
+    if failed:
+        db.session.execute(
+            table.update()
+            .where(table.c.id.in_(failed))
+            .values(fail_count=db.func.coalesce(table.c.fail_count, 0) + 1)
+        )
+    if dead:
+        db.session.execute(table.delete().where(table.c.id.in_(dead)))
+    for sub_id in failed:
+        fail_counts[sub_id] = fail_counts.get(sub_id, 0) + 1
+    batch.sent = len(sent_ids)
+    batch.pruned = len(dead)
+    return batch, dead
+
+
+def dispatch_push(messages, *, max_workers: int | None = None, batch_size: int | None = None) -> PushDispatchStats:
+    """Envia várias notificações de uma vez e devolve estatísticas por lote.
+
+    As inscrições de todos os destinatários vêm de uma consulta só; o envio
+    roda num pool de ``PUSH_MAX_WORKERS`` threads, cada uma com sua sessão HTTP.
+    Inscrições 404/410 (ou com falhas demais) são apagadas em massa ao fim de
+    cada lote de ``PUSH_BATCH_SIZE`` envios, que é também quando se faz commit.
+    Best-effort como o resto do módulo: nunca levanta para o chamador.
+    """
+    stats = PushDispatchStats()
+    by_user: dict[int, list[PushMessage]] = {}
+    for message in messages:
+        if message.user_id:
+            by_user.setdefault(message.user_id, []).append(message)
+    stats.users = len(by_user)
+    if not by_user or not push_enabled():
+        return stats
 
     try:
-        from pywebpush import WebPushException, webpush
+        from pywebpush import webpush
     except ImportError:  # pragma: no cover - dependência opcional ausente
         current_app.logger.warning('pywebpush não instalado; push desabilitado.')
-        return 0
+        return stats
+
+    from models import PushSubscription
 
-    payload = json.dumps({
-        'title': title,
-        'body': body,
-        'url': url or '/',
-        'tag': tag or 'petorlandia',
-    }, ensure_ascii=False)
+    table = PushSubscription.__table__
+    subs = db.session.execute(
+        db.select(
+            table.c.id,
+            table.c.user_id,
+            table.c.endpoint,
+            table.c.p256dh,
+            table.c.auth,
+            table.c.fail_count,
+        )
+        .where(table.c.user_id.in_(list(by_user)))
+        .order_by(table.c.id)
+    ).all()
+    stats.subscriptions = len(subs)
+    if not subs:
+        return stats
 
     claims_email = current_app.config.get('VAPID_CLAIM_EMAIL') or 'mailto:contato@petorlandia.com.br'
     if not claims_email.startswith('mailto:'):
         claims_email = f'mailto:{claims_email}'
+    options = {
+        'private_key': current_app.config['VAPID_PRIVATE_KEY'],
+        'claims_email': claims_email,
+        'timeout': float(current_app.config.get('PUSH_TIMEOUT_SECONDS', DEFAULT_TIMEOUT_SECONDS)),
+    }
+    max_workers = max_workers or int(current_app.config.get('PUSH_MAX_WORKERS', DEFAULT_MAX_WORKERS))
+    batch_size = batch_size or int(current_app.config.get('PUSH_BATCH_SIZE', DEFAULT_BATCH_SIZE))
 
-    sent = 0
+    subs_by_user: dict[int, list] = {}
     for sub in subs:
-        try:
-            webpush(
-                subscription_info={
-                    'endpoint': sub.endpoint,
-                    'keys': {'p256dh': sub.p256dh, 'auth': sub.auth},
-                },
-                data=payload,
-                vapid_private_key=current_app.config['VAPID_PRIVATE_KEY'],
-                vapid_claims={'sub': claims_email},
-                ttl=86400,
-            )
-            sub.last_success_at = utcnow()
-            sub.fail_count = 0
-            sent += 1
-        except WebPushException as exc:
-            status = getattr(getattr(exc, 'response', None), 'status_code', None)
-            if status in (404, 410):
-                db.session.delete(sub)
-            else:
-                sub.fail_count = (sub.fail_count or 0) + 1
-                if sub.fail_count >= _MAX_FAILS:
-                    db.session.delete(sub)
-                current_app.logger.warning('Falha de push (%s) p/ user %s: %s', status, user_id, exc)
-        except Exception as exc:  # noqa: BLE001 - push nunca derruba o chamador
-            current_app.logger.warning('Erro inesperado de push p/ user %s: %s', user_id, exc)
+        subs_by_user.setdefault(sub.user_id, []).append(sub)
+    # Mensagem por mensagem: lotes seguidos raramente repetem a inscrição.
+    jobs = []
+    for user_id, user_messages in by_user.items():
+        for message in user_messages:
+            payload = message.payload()
+            for sub in subs_by_user.get(user_id, ()):
+                jobs.append({
+                    'id': sub.id,
+                    'subscription_info': {
+                        'endpoint': sub.endpoint,
+                        'keys': {'p256dh': sub.p256dh, 'auth': sub.auth},
+                    },
+                    'payload': payload,
+                })
+    fail_counts = {sub.id: sub.fail_count or 0 for sub in subs}
+    user_of = {sub.id: sub.user_id for sub in subs}
 
-    try:
-        db.session.commit()
-    except Exception:  # noqa: BLE001
-        db.session.rollback()
-    return sent
+    workers = max(1, min(max_workers, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='push') as pool:
+        start = 0
+        while start < len(jobs):
+            chunk = jobs[start:start + batch_size]
+            started = time.perf_counter()
+            results = list(pool.map(lambda job: _send_one(webpush, job, options), chunk))
+            try:
+                batch, gone = _apply_results(results, fail_counts, user_of)
+                db.session.commit()
+            except Exception as exc:  # noqa: BLE001
+                db.session.rollback()
+                current_app.logger.warning('Falha ao gravar resultado de push: %s', exc)
+                batch, gone = PushBatchStats(subscriptions=len(results)), set()
+            # A mesma inscrição aparece em mais de um lote quando o usuário
+            # recebe várias mensagens: depois de apagada, não tenta de novo.
+            start += len(chunk)
+            if gone:
+                jobs[start:] = [job for job in jobs[start:] if job['id'] not in gone]
+            batch.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+            stats.batches.append(batch)
+            stats.sent += batch.sent
+            stats.failed += batch.failed
+            stats.pruned += batch.pruned
+
+    current_app.logger.info(
+        'push_dispatch users=%d subscriptions=%d sent=%d failed=%d pruned=%d batches=%d',
+        stats.users, stats.subscriptions, stats.sent, stats.failed, stats.pruned, len(stats.batches),
+    )
+    return stats
+
+
+def push_to_user(user_id: int, title: str, body: str, url: str | None = None, tag: str | None = None) -> int:
+    """Envia push para todos os dispositivos do usuário. Retorna nº de envios OK.
+
+    Best-effort: erros são logados, inscrições mortas (404/410) removidas.
+    """
+    return dispatch_push([PushMessage(user_id, title, body, url=url, tag=tag)]).sent
 
 
 def push_to_users(user_ids, title: str, body: str, url: str | None = None, tag: str | None = None) -> int:
-    total = 0
-    for uid in set(u for u in user_ids if u):
-        total += push_to_user(uid, title, body, url=url, tag=tag)
-    return total
+    messages = [PushMessage(uid, title, body, url=url, tag=tag) for uid in set(u for u in user_ids if u)]
+    return dispatch_push(messages).sent
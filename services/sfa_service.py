@@ -26,17 +26,19 @@ import json
 import logging
 import os
 import re
+import threading
 import unicodedata
-from collections import Counter
+from collections import Counter, OrderedDict
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 from urllib.parse import parse_qs, quote, urlparse
 
 from extensions import db
 from flask import current_app, url_for
 from sqlalchemy.exc import InternalError, NoSuchTableError, OperationalError, ProgrammingError
+from services.data_export import iter_csv
 
 log = logging.getLogger("sfa_service")
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -358,6 +360,61 @@ def filtrar_pacientes_teste_sfa(pacientes):
     return [paciente for paciente in pacientes if paciente_eh_teste_sfa(paciente)]
 
 
+def carregar_respostas_em_lote(pacientes, chunk_size: int = 500) -> list:
+    """Preenche T0/T10/T30 de todos os pacientes com uma query por etapa e bloco.
+
+    Análise e exportação analítica percorrem as três etapas de cada paciente;
+    sem isto cada relacionamento ainda não carregado vira um SELECT por
+    paciente. Objetos que não são ``SfaPaciente`` passam intactos.
+    """
+    from sqlalchemy import inspect as sa_inspect
+    from sqlalchemy.orm.attributes import set_committed_value
+
+    from models.sfa import SfaPaciente, SfaRespostaT0, SfaRespostaT10, SfaRespostaT30
+
+    pacientes = list(pacientes or [])
+    persistidos = [
+        paciente
+        for paciente in pacientes
+        if isinstance(paciente, SfaPaciente) and paciente.id_estudo and sa_inspect(paciente).persistent
+    ]
+    for attr, model, uselist in (
+        ("resposta_t0", SfaRespostaT0, False),
+        ("respostas_t10", SfaRespostaT10, True),
+        ("respostas_t30", SfaRespostaT30, True),
+    ):
+        pendentes = [paciente for paciente in persistidos if attr in sa_inspect(paciente).unloaded]
+        if not pendentes:
+            continue
+        por_estudo: dict[str, list] = {}
+        ids = [paciente.id_estudo for paciente in pendentes]
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            for resposta in model.query.filter(model.id_estudo.in_(chunk)).order_by(model.id):
+                por_estudo.setdefault(resposta.id_estudo, []).append(resposta)
+        for paciente in pendentes:
+            respostas = por_estudo.get(paciente.id_estudo, [])
+            set_committed_value(paciente, attr, respostas if uselist else (respostas[0] if respostas else None))
+    return pacientes
+
+
+def carregar_respostas_em_blocos(pacientes, chunk_size: int = 500) -> Iterator:
+    """Versão em stream de ``carregar_respostas_em_lote``.
+
+    Consome ``pacientes`` (tipicamente uma query com ``yield_per``) em blocos
+    de ``chunk_size`` e devolve cada paciente com T0/T10/T30 já preenchidos,
+    sem manter a coorte inteira em memória.
+    """
+    bloco = []
+    for paciente in pacientes:
+        bloco.append(paciente)
+        if len(bloco) >= chunk_size:
+            yield from carregar_respostas_em_lote(bloco, chunk_size)
+            bloco = []
+    if bloco:
+        yield from carregar_respostas_em_lote(bloco, chunk_size)
+
+
 def _normalize_form_stage(form_stage: str) -> str:
     stage = str(form_stage or "").strip().lower()
     if stage not in DEFAULT_FORM_SCHEMA_FILES:
@@ -382,14 +439,42 @@ def _resolve_form_schema_path(form_stage: str) -> Path:
     return path
 
 
-def carregar_form_schema(form_stage: str) -> dict:
+# Schemas T0/T10/T30 lidos do disco, validados pelo (mtime, tamanho) do arquivo:
+# caminho -> (assinatura, texto, schema). O schema guardado é compartilhado e
+# só serve para leitura; carregar_form_schema devolve sempre uma cópia nova.
+_form_schema_cache: dict[str, tuple[tuple[int, int], str, dict]] = {}
+_form_schema_cache_lock = threading.Lock()
+
+
+def _form_schema_em_cache(form_stage: str) -> tuple[str, dict]:
     path = _resolve_form_schema_path(form_stage)
-    with path.open("r", encoding="utf-8") as handle:
-        schema = json.load(handle)
-    if not isinstance(schema, dict):
-        raise ValueError("Schema do formulario T0 invalido.")
-    schema["_path"] = str(path)
-    schema["_stage"] = _normalize_form_stage(form_stage)
+    stat = path.stat()
+    assinatura = (stat.st_mtime_ns, stat.st_size)
+    chave = str(path)
+    cached = _form_schema_cache.get(chave)
+    if cached is None or cached[0] != assinatura:
+        text = path.read_text(encoding="utf-8")
+        schema = json.loads(text)
+        if not isinstance(schema, dict):
+            raise ValueError("Schema do formulario T0 invalido.")
+        schema["_path"] = chave
+        schema["_stage"] = _normalize_form_stage(form_stage)
+        cached = (assinatura, text, schema)
+        with _form_schema_cache_lock:
+            _form_schema_cache[chave] = cached
+    return cached[1], cached[2]
+
+
+def _form_schema_compartilhado(form_stage: str) -> dict:
+    """Schema em cache para leitura (análise, exportações); não altere o retorno."""
+    return _form_schema_em_cache(form_stage)[1]
+
+
+def carregar_form_schema(form_stage: str) -> dict:
+    text, cached = _form_schema_em_cache(form_stage)
+    schema = json.loads(text)
+    schema["_path"] = cached["_path"]
+    schema["_stage"] = cached["_stage"]
     return schema
 
 
@@ -511,6 +596,8 @@ def salvar_form_schema(form_stage: str, schema: dict) -> Path:
     path = _resolve_form_schema_path(form_stage)
     path.parent.mkdir(parents=True, exist_ok=True)
     path.write_text(serializar_t0_form_schema(schema), encoding="utf-8")
+    with _form_schema_cache_lock:
+        _form_schema_cache.pop(str(path), None)  # mtime pode não mudar no mesmo tick
     return path
 
 
@@ -542,6 +629,29 @@ def _valor_html_data(valor: object) -> str:
     return data.isoformat() if data else ""
 
 
+# dados_json já decodificado por resposta: (tabela, id, timestamp) -> (texto,
+# payload). O texto confere a entrada, então uma resposta editada no lugar é
+# decodificada de novo; as mais antigas saem quando passa do limite.
+PAYLOAD_MEMO_MAX = 20000
+_payload_memo: OrderedDict[tuple, tuple[str, dict]] = OrderedDict()
+_payload_memo_lock = threading.Lock()
+
+
+def _chave_memo_payload(resposta) -> Optional[tuple]:
+    resposta_id = getattr(resposta, "id", None)
+    if resposta_id is None:
+        return None
+    tabela = getattr(resposta, "__tablename__", None) or type(resposta).__name__
+    return (tabela, resposta_id, getattr(resposta, "timestamp", None))
+
+
+def limpar_cache_formularios_sfa() -> None:
+    with _payload_memo_lock:
+        _payload_memo.clear()
+    with _form_schema_cache_lock:
+        _form_schema_cache.clear()
+
+
 def _carregar_payload_resposta(resposta) -> dict[str, object]:
     if not resposta:
         return {}
@@ -550,12 +660,28 @@ def _carregar_payload_resposta(resposta) -> dict[str, object]:
     if not raw:
         return {}
 
+    memo_key = _chave_memo_payload(resposta)
+    if memo_key is not None:
+        with _payload_memo_lock:
+            cached = _payload_memo.get(memo_key)
+            if cached is not None and cached[0] == raw:
+                _payload_memo.move_to_end(memo_key)
+                return dict(cached[1])
+
     try:
         payload = json.loads(raw)
     except (TypeError, ValueError, json.JSONDecodeError):
         return {}
+    if not isinstance(payload, dict):
+        return {}
 
-    return payload if isinstance(payload, dict) else {}
+    if memo_key is not None:
+        with _payload_memo_lock:
+            _payload_memo[memo_key] = (raw, payload)
+            _payload_memo.move_to_end(memo_key)
+            while len(_payload_memo) > PAYLOAD_MEMO_MAX:
+                _payload_memo.popitem(last=False)
+    return dict(payload)
 
 
 def _buscar_valor_respostas_anteriores(paciente, key: str) -> object:
@@ -755,7 +881,7 @@ def montar_visao_resposta_formulario(
     schema: Optional[dict] = None,
 ) -> dict:
     stage = _normalize_form_stage(form_stage)
-    schema = schema or carregar_form_schema(stage)
+    schema = schema or _form_schema_compartilhado(stage)
     payload = _carregar_payload_resposta(resposta)
 
     sections: list[dict[str, object]] = []
@@ -855,17 +981,29 @@ def _colunas_fixas_exportacao() -> list[str]:
 
 def _colunas_formulario_exportacao(form_stage: str, schema: Optional[dict] = None) -> list[str]:
     stage = _normalize_form_stage(form_stage)
-    schema = schema or carregar_form_schema(stage)
+    schema = schema or _form_schema_compartilhado(stage)
     return [f"{stage}__{field['key']}" for field in iterar_campos_form(schema)]
 
 
-def montar_linha_exportacao_analitica(paciente, schemas: Optional[dict[str, dict]] = None) -> dict[str, str]:
-    schemas = schemas or {
-        "t0": carregar_t0_form_schema(),
-        "t10": carregar_t10_form_schema(),
-        "t30": carregar_t30_form_schema(),
+def _schemas_exportacao() -> dict[str, dict]:
+    return {stage: _form_schema_compartilhado(stage) for stage in ("t0", "t10", "t30")}
+
+
+def _campos_exportacao_por_stage(schemas: dict[str, dict]) -> dict[str, list[tuple[str, str]]]:
+    """(coluna, chave do payload) de cada etapa, resolvido uma vez por exportação."""
+    return {
+        stage: [(f"{stage}__{field['key']}", field["key"]) for field in iterar_campos_form(schemas[stage])]
+        for stage in ("t0", "t10", "t30")
     }
 
+
+def montar_linha_exportacao_analitica(
+    paciente,
+    schemas: Optional[dict[str, dict]] = None,
+    campos: Optional[dict[str, list[tuple[str, str]]]] = None,
+) -> dict[str, str]:
+    campos = campos or _campos_exportacao_por_stage(schemas or _schemas_exportacao())
+
     row = {
         column: _serializar_valor_csv(getattr(paciente, column, ""))
         for column in _colunas_fixas_exportacao()
@@ -874,8 +1012,8 @@ def montar_linha_exportacao_analitica(paciente, schemas: Optional[dict[str, dict
     for stage in ("t0", "t10", "t30"):
         resposta, payload = obter_payload_formulario(paciente, stage)
         row[f"{stage}__respondido_em"] = _serializar_valor_csv(getattr(resposta, "timestamp", ""))
-        for field in iterar_campos_form(schemas[stage]):
-            row[f"{stage}__{field['key']}"] = _serializar_valor_csv(payload.get(field["key"]))
+        for column, key in campos[stage]:
+            row[column] = _serializar_valor_csv(payload.get(key))
 
     return row
 
@@ -1405,41 +1543,39 @@ def gerar_csv_assinaturas_tcle(assinaturas: Optional[list[dict[str, str]]] = Non
     return output.getvalue()
 
 
-def gerar_csv_exportacao_cadastro(pacientes) -> str:
-    output = io.StringIO(newline="")
+def iterar_csv_exportacao_cadastro(pacientes) -> Iterator[str]:
+    """CSV de cadastro em pedaços, para respostas em stream."""
     fieldnames = _colunas_fixas_exportacao()
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    for paciente in pacientes:
-        writer.writerow(
-            {
-                column: _serializar_valor_csv(getattr(paciente, column, ""))
-                for column in fieldnames
-            }
-        )
-    return output.getvalue()
+    linhas = (
+        [_serializar_valor_csv(getattr(paciente, column, "")) for column in fieldnames]
+        for paciente in pacientes
+    )
+    return iter_csv(fieldnames, linhas)
 
 
-def gerar_csv_exportacao_analitica(pacientes) -> str:
-    schemas = {
-        "t0": carregar_t0_form_schema(),
-        "t10": carregar_t10_form_schema(),
-        "t30": carregar_t30_form_schema(),
-    }
+def gerar_csv_exportacao_cadastro(pacientes) -> str:
+    return "".join(iterar_csv_exportacao_cadastro(pacientes))
+
+
+def iterar_csv_exportacao_analitica(pacientes) -> Iterator[str]:
+    """CSV analítico em pedaços; schemas e campos são resolvidos uma vez só."""
+    campos = _campos_exportacao_por_stage(_schemas_exportacao())
     fieldnames = (
         _colunas_fixas_exportacao()
         + [f"{stage}__respondido_em" for stage in ("t0", "t10", "t30")]
-        + _colunas_formulario_exportacao("t0", schemas["t0"])
-        + _colunas_formulario_exportacao("t10", schemas["t10"])
-        + _colunas_formulario_exportacao("t30", schemas["t30"])
+        + [column for stage in ("t0", "t10", "t30") for column, _key in campos[stage]]
     )
 
-    output = io.StringIO(newline="")
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    for paciente in pacientes:
-        writer.writerow(montar_linha_exportacao_analitica(paciente, schemas=schemas))
-    return output.getvalue()
+    def linhas():
+        for paciente in pacientes:
+            row = montar_linha_exportacao_analitica(paciente, campos=campos)
+            yield [row[column] for column in fieldnames]
+
+    return iter_csv(fieldnames, linhas())
+
+
+def gerar_csv_exportacao_analitica(pacientes) -> str:
+    return "".join(iterar_csv_exportacao_analitica(pacientes))
 
 
 def construir_valores_iniciais_form(paciente, schema: dict) -> dict[str, object]:
@@ -0,0 +1,388 @@
+"""Fila write-behind que agrupa as escritas de células no Google Sheets."""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import random
+import threading
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_SECONDS = 3.0
+DEFAULT_BACKOFF_SECONDS = 5.0
+DEFAULT_MAX_BACKOFF_SECONDS = 300.0
+
+# 429 = cota; 5xx = indisponibilidade passageira do Google. Ambos são
+# reenfileirados; qualquer outro erro descarta o lote daquela planilha.
+_RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+
+def _column_number(column: str) -> int:
+    number = 0
+    for char in column.upper():
+        number = number * 26 + (ord(char) - ord("A") + 1)
+    return number
+
+
+def _quote_title(title: str) -> str:
+    return "'" + title.replace("'", "''") + "'"
+
+
+def _error_status(exc: Exception) -> int | None:
+    status = getattr(getattr(exc, "resp", None), "status", None)
+    try:
+        return int(status) if status is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable_sheets_error(exc: Exception) -> bool:
+    """True para cota (429, ou 403 ``rateLimitExceeded``) e 5xx passageiro."""
+
+    status = _error_status(exc)
+    if status in _RETRYABLE_STATUSES:
+        return True
+    return status == 403 and "rateLimitExceeded" in str(exc)
+
+
+class SheetWriteBehind:
+    """Marca células sujas no request e grava a partir de uma thread.
+
+    ``set_cells`` guarda valores por ``(planilha, aba, linha)`` e
+    ``set_background`` a cor de fundo por célula; uma edição posterior da
+    mesma célula substitui a anterior, então alternar um animal dez vezes
+    custa uma escrita. A cada ``<prefixo>_FLUSH_SECONDS`` a thread envia, por
+    planilha, um ``values.batchUpdate`` com todas as linhas sujas e um
+    ``batchUpdate`` com os ``repeatCell`` de formatação. O cliente autorizado
+    vem de ``service_factory`` uma vez e é reutilizado, e os títulos
+    resolvidos por gid ficam em cache. Em erro de cota ou 5xx as edições
+    voltam para a fila (a mais nova vence) e o envio pausa com backoff
+    exponencial limitado a ``<prefixo>_MAX_BACKOFF_SECONDS``. O que estiver
+    pendente é enviado na saída do interpretador.
+    """
+
+    def __init__(
+        self,
+        service_factory: Callable[[], Any],
+        *,
+        title_resolver: Callable[[Any, str, str], str] | None = None,
+        config_prefix: str = "SHEETS",
+        name: str = "sheet-write-behind",
+        app=None,
+    ):
+        self._service_factory = service_factory
+        self._title_resolver = title_resolver
+        self._config_prefix = config_prefix
+        self._name = name
+        self._app = app
+        self._service = None
+        self._titles: dict[tuple[str, str], str] = {}
+        self._cells: dict[tuple[str, str, str, int], dict[str, Any]] = {}
+        self._formats: dict[tuple[str, int, int, int], dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._atexit_registered = False
+        self._failures = 0
+        self._retry_at = 0.0
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats() -> dict[str, Any]:
+        return {
+            "marked": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "value_batches": 0,
+            "format_batches": 0,
+            "cells_written": 0,
+            "retries": 0,
+            "dropped": 0,
+            "clients_built": 0,
+        }
+
+    def _config(self, key: str, default: float) -> float:
+        if self._app is None:
+            return default
+        return float(self._app.config.get(f"{self._config_prefix}_{key}", default))
+
+    def _ensure_started(self, app) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            if self._app is None:
+                self._app = app
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    # ------------------------------------------------------------------
+    # Lado do request
+    # ------------------------------------------------------------------
+    def set_cells(
+        self,
+        app,
+        spreadsheet_id: str,
+        row: int,
+        cells: dict[str, Any],
+        *,
+        sheet_title: str = "",
+        sheet_gid: str = "",
+    ) -> None:
+        """Marca ``{letra da coluna: valor}`` como sujo na ``row`` da aba."""
+
+        key = (spreadsheet_id, sheet_title or "", str(sheet_gid or ""), int(row))
+        with self._lock:
+            pending = self._cells.setdefault(key, {})
+            self._stats["coalesced"] += sum(1 for column in cells if column in pending)
+            self._stats["marked"] += len(cells)
+            pending.update(cells)
+        self._ensure_started(app)
+
+    def set_background(
+        self,
+        app,
+        spreadsheet_id: str,
+        sheet_id: int,
+        row: int,
+        column_index: int,
+        color: dict[str, Any],
+    ) -> None:
+        """Marca a cor de fundo de uma célula (coluna a partir de 0) como suja."""
+
+        key = (spreadsheet_id, int(sheet_id), int(row), int(column_index))
+        with self._lock:
+            if key in self._formats:
+                self._stats["coalesced"] += 1
+            self._stats["marked"] += 1
+            self._formats[key] = color
+        self._ensure_started(app)
+
+    # ------------------------------------------------------------------
+    # Thread de envio
+    # ------------------------------------------------------------------
+    def _run(self) -> None:
+        while not self._stop.wait(max(0.1, self._config("FLUSH_SECONDS", DEFAULT_FLUSH_SECONDS))):
+            try:
+                self.flush()
+            except Exception:  # nunca derruba a thread
+                logger.warning("sheet_write_behind_flush_failed", exc_info=True)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Para a thread e envia o que sobrou, ignorando o backoff."""
+
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+        self.flush(force=True)
+
+    def pending(self, spreadsheet_id: str | None = None) -> int:
+        """Células ainda na fila (de uma planilha, com ``spreadsheet_id``)."""
+        with self._lock:
+            return sum(
+                len(cells) for key, cells in self._cells.items() if spreadsheet_id in (None, key[0])
+            ) + sum(1 for key in self._formats if spreadsheet_id in (None, key[0]))
+
+    def flush(self, spreadsheet_id: str | None = None, *, force: bool = False) -> int:
+        """Envia agora as edições pendentes; retorna quantas chamadas à API fez.
+
+        Durante o backoff depois de um erro de cota nada sai, a não ser com
+        ``force``. ``spreadsheet_id`` limita o envio a uma planilha. Um erro
+        de cota no envio devolve as edições à fila: quem precisa delas na
+        planilha confere ``pending()`` depois.
+        """
+
+        if not force and time.monotonic() < self._retry_at:
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                cells = {key: values for key, values in self._cells.items() if spreadsheet_id in (None, key[0])}
+                formats = {key: color for key, color in self._formats.items() if spreadsheet_id in (None, key[0])}
+                for key in cells:
+                    del self._cells[key]
+                for key in formats:
+                    del self._formats[key]
+            if not cells and not formats:
+                return 0
+            if self._app is not None:
+                with self._app.app_context():
+                    return self._send(cells, formats)
+            return self._send(cells, formats)
+
+    def _client(self):
+        if self._service is None:
+            self._service = self._service_factory()
+            self._stats["clients_built"] += 1
+        return self._service
+
+    def _sheet_title(self, service, spreadsheet_id: str, title: str, gid: str) -> str:
+        if title or not gid:
+            return title
+        cache_key = (spreadsheet_id, gid)
+        if cache_key not in self._titles:
+            if self._title_resolver is None:
+                return ""
+            self._titles[cache_key] = self._title_resolver(service, spreadsheet_id, gid)
+        return self._titles[cache_key]
+
+    def _send(self, cells: dict, formats: dict) -> int:
+        spreadsheets = sorted({key[0] for key in cells} | {key[0] for key in formats})
+        calls = 0
+        for position, spreadsheet_id in enumerate(spreadsheets):
+            sheet_cells = {key: values for key, values in cells.items() if key[0] == spreadsheet_id}
+            sheet_formats = {key: color for key, color in formats.items() if key[0] == spreadsheet_id}
+            try:
+                calls += self._send_spreadsheet(spreadsheet_id, sheet_cells, sheet_formats)
+            except _RetryLater as retry:
+                # Cota do projeto esgotada: o que falta de todas as planilhas volta.
+                later = spreadsheets[position + 1:]
+                self._requeue(
+                    {**retry.cells, **{key: values for key, values in cells.items() if key[0] in later}},
+                    {**retry.formats, **{key: color for key, color in formats.items() if key[0] in later}},
+                )
+                self._back_off(retry.error)
+                break
+        else:
+            self._failures = 0
+            self._retry_at = 0.0
+        with self._lock:
+            self._stats["flushes"] += 1
+        return calls
+
+    def _send_spreadsheet(self, spreadsheet_id: str, cells: dict, formats: dict) -> int:
+        calls = 0
+        try:
+            service = self._client()
+            data = []
+            for (_sid, title, gid, row), values in sorted(cells.items(), key=lambda item: item[0][1:]):
+                resolved = self._sheet_title(service, spreadsheet_id, title, gid)
+                if not resolved:
+                    self._count_dropped(len(values))
+                    continue
+                data.extend(self._value_ranges(resolved, row, values))
+            if data:
+                service.spreadsheets().values().batchUpdate(
+                    spreadsheetId=spreadsheet_id,
+                    body={"valueInputOption": "USER_ENTERED", "data": data},
+                ).execute()
+                calls += 1
+                with self._lock:
+                    self._stats["value_batches"] += 1
+                    self._stats["cells_written"] += sum(len(entry["values"][0]) for entry in data)
+        except Exception as exc:
+            if is_retryable_sheets_error(exc):
+                raise _RetryLater(exc, cells, formats) from exc
+            self._discard(spreadsheet_id, exc, len(formats) + sum(len(values) for values in cells.values()))
+            return calls
+
+        if not formats:
+            return calls
+        try:
+            service.spreadsheets().batchUpdate(
+                spreadsheetId=spreadsheet_id,
+                body={"requests": [self._background_request(key, color) for key, color in sorted(formats.items(), key=lambda item: item[0][1:])]},
+            ).execute()
+            calls += 1
+            with self._lock:
+                self._stats["format_batches"] += 1
+        except Exception as exc:
+            if is_retryable_sheets_error(exc):
+                raise _RetryLater(exc, {}, formats) from exc
+            self._discard(spreadsheet_id, exc, len(formats))
+        return calls
+
+    @staticmethod
+    def _value_ranges(title: str, row: int, values: dict[str, Any]) -> list[dict[str, Any]]:
+        """Agrupa as colunas sujas de uma linha em intervalos A1 contíguos."""
+
+        columns = sorted(values, key=_column_number)
+        runs: list[list[str]] = []
+        for column in columns:
+            if runs and _column_number(column) == _column_number(runs[-1][-1]) + 1:
+                runs[-1].append(column)
+            else:
+                runs.append([column])
+        ranges = []
+        for run in runs:
+            cell_range = f"{run[0]}{row}" if len(run) == 1 else f"{run[0]}{row}:{run[-1]}{row}"
+            ranges.append({
+                "range": f"{_quote_title(title)}!{cell_range}",
+                "values": [[values[column] for column in run]],
+            })
+        return ranges
+
+    @staticmethod
+    def _background_request(key: tuple[str, int, int, int], color: dict[str, Any]) -> dict[str, Any]:
+        _sid, sheet_id, row, column_index = key
+        return {
+            "repeatCell": {
+                "range": {
+                    "sheetId": sheet_id,
+                    "startRowIndex": row - 1,
+                    "endRowIndex": row,
+                    "startColumnIndex": column_index,
+                    "endColumnIndex": column_index + 1,
+                },
+                "cell": {"userEnteredFormat": {"backgroundColor": color}},
+                "fields": "userEnteredFormat.backgroundColor",
+            }
+        }
+
+    def _requeue(self, cells: dict, formats: dict) -> None:
+        with self._lock:
+            for key, values in cells.items():
+                merged = dict(values)
+                merged.update(self._cells.get(key, {}))
+                self._cells[key] = merged
+            for key, color in formats.items():
+                self._formats.setdefault(key, color)
+            self._stats["retries"] += 1
+
+    def _back_off(self, exc: Exception) -> None:
+        self._failures += 1
+        base = self._config("BACKOFF_SECONDS", DEFAULT_BACKOFF_SECONDS)
+        delay = min(self._config("MAX_BACKOFF_SECONDS", DEFAULT_MAX_BACKOFF_SECONDS), base * 2 ** (self._failures - 1))
+        self._retry_at = time.monotonic() + delay * (1 + random.random() * 0.25)
+        logger.warning(
+            "sheet_write_behind_backoff status=%s attempt=%s delay=%.1fs",
+            _error_status(exc), self._failures, delay,
+        )
+
+    def _discard(self, spreadsheet_id: str, exc: Exception, amount: int) -> None:
+        # Aba renomeada/removida ou credencial revogada: esquece títulos e
+        # cliente para que a próxima rodada resolva tudo de novo.
+        self._titles = {key: title for key, title in self._titles.items() if key[0] != spreadsheet_id}
+        if _error_status(exc) in (401, 403):
+            self._service = None
+        self._count_dropped(amount)
+        logger.warning("sheet_write_behind_dropped spreadsheet=%s cells=%s", spreadsheet_id, amount, exc_info=True)
+
+    def _count_dropped(self, amount: int) -> None:
+        with self._lock:
+            self._stats["dropped"] += amount
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pending"] = self.pending()
+        stats["backoff_seconds"] = round(max(0.0, self._retry_at - time.monotonic()), 2)
+        stats["running"] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+
+class _RetryLater(Exception):
+    def __init__(self, error: Exception, cells: dict, formats: dict):
+        super().__init__(str(error))
+        self.error = error
+        self.cells = cells
+        self.formats = formats
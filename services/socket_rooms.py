@@ -0,0 +1,324 @@
+"""Estado das salas Socket.IO (Desafio de Palitos e ``/chamada``) fora do processo.
+
+Os handlers guardavam salas, assentos e o tabuleiro em dicts de módulo: com
+mais de um worker do gunicorn cada processo enxergava metade da sala e a
+sinalização WebRTC se perdia. Agora o estado fica num backend compartilhado,
+com a mesma interface nas duas implementações:
+
+* ``MemoryRoomBackend`` — em processo, para desenvolvimento e testes;
+* ``RedisRoomBackend`` — compartilhado entre workers; entrada/saída de sala e
+  jogadas usam ``WATCH``/``MULTI``, então dois workers nunca entregam o mesmo
+  assento nem sobrescrevem a jogada um do outro.
+
+A sessão de cada conexão (``sid`` -> sala e assento) expira em
+``SOCKETIO_SESSION_TTL`` segundos (curto, ~90s) e é renovada por qualquer
+evento da conexão — jogada, sinalização, chat ou o ``heartbeat`` que os
+clientes mandam a cada 30s. Sessões de um worker que morreu sem
+``disconnect`` param de ser renovadas e o assento delas é liberado na próxima
+entrada em até um TTL. A lista de assentos e o tabuleiro expiram em
+``SOCKETIO_ROOM_TTL`` (horas): os assentos são renovados junto com as sessões,
+o tabuleiro a cada jogada. ``SOCKETIO_ROOM_STATE_BACKEND`` escolhe o backend
+(padrão: Redis quando há ``SOCKETIO_MESSAGE_QUEUE``).
+"""
+
+from __future__ import annotations
+
+import copy
+import json
+import threading
+import time
+from typing import Any, Callable, NamedTuple
+
+from flask import current_app, has_app_context
+
+DEFAULT_TTL = 6 * 60 * 60  # segundos
+DEFAULT_SESSION_TTL = 90  # segundos; clientes mandam heartbeat a cada 30s
+REDIS_PREFIX = "petorlandia:rooms:"
+
+
+class RoomSeat(NamedTuple):
+    seat: int
+    participants: int
+
+
+class RoomExit(NamedTuple):
+    room: str
+    seat: int
+    remaining: int
+
+
+class MemoryRoomBackend:
+    name = "memory"
+
+    def __init__(self, *, clock=time.monotonic):
+        self._clock = clock
+        self._data: dict[tuple, tuple[Any, float]] = {}
+        self._lock = threading.RLock()
+
+    def _get(self, key: tuple):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            del self._data[key]
+            return None
+        return value
+
+    def _set(self, key: tuple, value, ttl: int) -> None:
+        self._data[key] = (value, self._clock() + ttl)
+
+    def join(
+        self, namespace: str, room: str, sid: str, capacity: int, ttl: int, session_ttl: int
+    ) -> RoomSeat | None:
+        with self._lock:
+            seats = {
+                seat: occupant
+                for seat, occupant in (self._get(("seats", namespace, room)) or {}).items()
+                if self._get(("session", namespace, occupant))
+            }
+            free = next((seat for seat in range(1, capacity + 1) if seat not in seats), None)
+            if free is None:
+                self._set(("seats", namespace, room), seats, ttl)
+                return None
+            seats[free] = sid
+            self._set(("seats", namespace, room), seats, ttl)
+            self._set(("session", namespace, sid), (room, free), session_ttl)
+            return RoomSeat(free, len(seats))
+
+    def session(self, namespace: str, sid: str) -> tuple[str, int] | None:
+        with self._lock:
+            return self._get(("session", namespace, sid))
+
+    def touch(self, namespace: str, sid: str, ttl: int, session_ttl: int) -> tuple[str, int] | None:
+        with self._lock:
+            session = self._get(("session", namespace, sid))
+            if session is None:
+                return None
+            self._set(("session", namespace, sid), session, session_ttl)
+            seats = self._get(("seats", namespace, session[0]))
+            if seats is not None:
+                self._set(("seats", namespace, session[0]), seats, ttl)
+            return session
+
+    def leave(self, namespace: str, sid: str) -> RoomExit | None:
+        with self._lock:
+            session = self._get(("session", namespace, sid))
+            self._data.pop(("session", namespace, sid), None)
+            if session is None:
+                return None
+            room, seat = session
+            seats = self._get(("seats", namespace, room)) or {}
+            if seats.get(seat) == sid:
+                seats.pop(seat)
+            if not seats:
+                self._data.pop(("seats", namespace, room), None)
+            return RoomExit(room, seat, len(seats))
+
+    def participants(self, namespace: str, room: str) -> int:
+        with self._lock:
+            return len(self._get(("seats", namespace, room)) or {})
+
+    def get_state(self, namespace: str, room: str) -> dict | None:
+        with self._lock:
+            return copy.deepcopy(self._get(("state", namespace, room)))
+
+    def update_state(self, namespace: str, room: str, apply: Callable[[dict | None], dict | None], ttl: int):
+        with self._lock:
+            updated = apply(copy.deepcopy(self._get(("state", namespace, room))))
+            if updated is not None:
+                self._set(("state", namespace, room), copy.deepcopy(updated), ttl)
+            return updated
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class RedisRoomBackend:
+    name = "redis"
+
+    def __init__(self, client, *, prefix: str = REDIS_PREFIX):
+        self.client = client
+        self.prefix = prefix
+
+    def _seats_key(self, namespace: str, room: str) -> str:
+        return f"{self.prefix}{namespace}:seats:{room}"
+
+    def _session_key(self, namespace: str, sid: str) -> str:
+        return f"{self.prefix}{namespace}:session:{sid}"
+
+    def _state_key(self, namespace: str, room: str) -> str:
+        return f"{self.prefix}{namespace}:state:{room}"
+
+    def join(
+        self, namespace: str, room: str, sid: str, capacity: int, ttl: int, session_ttl: int
+    ) -> RoomSeat | None:
+        seats_key = self._seats_key(namespace, room)
+
+        def transaction(pipe):
+            seats = {int(seat): occupant.decode() for seat, occupant in pipe.hgetall(seats_key).items()}
+            stale = [
+                seat for seat, occupant in seats.items()
+                if not pipe.exists(self._session_key(namespace, occupant))
+            ]
+            for seat in stale:
+                seats.pop(seat)
+            free = next((seat for seat in range(1, capacity + 1) if seat not in seats), None)
+            pipe.multi()
+            if stale:
+                pipe.hdel(seats_key, *stale)
+            if free is None:
+                return None
+            pipe.hset(seats_key, free, sid)
+            pipe.expire(seats_key, ttl)
+            pipe.set(self._session_key(namespace, sid), json.dumps([room, free]), ex=session_ttl)
+            return RoomSeat(free, len(seats) + 1)
+
+        return self.client.transaction(transaction, seats_key, value_from_callable=True)
+
+    def session(self, namespace: str, sid: str) -> tuple[str, int] | None:
+        raw = self.client.get(self._session_key(namespace, sid))
+        if raw is None:
+            return None
+        room, seat = json.loads(raw)
+        return room, int(seat)
+
+    def touch(self, namespace: str, sid: str, ttl: int, session_ttl: int) -> tuple[str, int] | None:
+        session = self.session(namespace, sid)
+        if session is None:
+            return None
+        # EXPIRE em chave que um ``leave`` concorrente apagou é no-op.
+        pipe = self.client.pipeline(transaction=False)
+        pipe.expire(self._session_key(namespace, sid), session_ttl)
+        pipe.expire(self._seats_key(namespace, session[0]), ttl)
+        pipe.execute()
+        return session
+
+    def leave(self, namespace: str, sid: str) -> RoomExit | None:
+        session = self.session(namespace, sid)
+        self.client.delete(self._session_key(namespace, sid))
+        if session is None:
+            return None
+        room, seat = session
+        seats_key = self._seats_key(namespace, room)
+
+        def transaction(pipe):
+            occupant = pipe.hget(seats_key, seat)
+            pipe.multi()
+            if occupant is not None and occupant.decode() == sid:
+                pipe.hdel(seats_key, seat)
+            pipe.hlen(seats_key)
+
+        remaining = self.client.transaction(transaction, seats_key)[-1]
+        return RoomExit(room, seat, int(remaining))
+
+    def participants(self, namespace: str, room: str) -> int:
+        return int(self.client.hlen(self._seats_key(namespace, room)))
+
+    def get_state(self, namespace: str, room: str) -> dict | None:
+        raw = self.client.get(self._state_key(namespace, room))
+        return json.loads(raw) if raw is not None else None
+
+    def update_state(self, namespace: str, room: str, apply: Callable[[dict | None], dict | None], ttl: int):
+        key = self._state_key(namespace, room)
+
+        def transaction(pipe):
+            raw = pipe.get(key)
+            updated = apply(json.loads(raw) if raw is not None else None)
+            pipe.multi()
+            if updated is not None:
+                pipe.set(key, json.dumps(updated, separators=(",", ":")), ex=ttl)
+            return updated
+
+        return self.client.transaction(transaction, key, value_from_callable=True)
+
+    def clear(self) -> None:
+        names = list(self.client.scan_iter(match=f"{self.prefix}*"))
+        if names:
+            self.client.delete(*names)
+
+
+class RoomState:
+    """Frente única dos handlers Socket.IO para o backend escolhido.
+
+    ``update_state`` recebe uma função pura ``estado atual -> novo estado``
+    (ou ``None`` para não gravar); no Redis ela pode rodar de novo se outro
+    worker mexeu na sala no meio da transação.
+    """
+
+    def __init__(self, backend=None, *, ttl: int | None = None, session_ttl: int | None = None):
+        self._backend = backend
+        self._ttl = ttl
+        self._session_ttl = session_ttl
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._backend_from_config()
+        return self._backend
+
+    def configure(self, backend=None, *, ttl: int | None = None, session_ttl: int | None = None) -> None:
+        self._backend = backend
+        self._ttl = ttl
+        self._session_ttl = session_ttl
+
+    @property
+    def ttl(self) -> int:
+        if self._ttl is not None:
+            return self._ttl
+        if has_app_context():
+            return int(current_app.config.get("SOCKETIO_ROOM_TTL") or DEFAULT_TTL)
+        return DEFAULT_TTL
+
+    @property
+    def session_ttl(self) -> int:
+        if self._session_ttl is not None:
+            return self._session_ttl
+        if has_app_context():
+            return int(current_app.config.get("SOCKETIO_SESSION_TTL") or DEFAULT_SESSION_TTL)
+        return DEFAULT_SESSION_TTL
+
+    @staticmethod
+    def _backend_from_config():
+        config = current_app.config if has_app_context() else {}
+        url = config.get("SOCKETIO_MESSAGE_QUEUE")
+        kind = (config.get("SOCKETIO_ROOM_STATE_BACKEND") or ("redis" if url else "memory")).lower()
+        if kind == "redis" and url:
+            from redis import Redis
+
+            return RedisRoomBackend(Redis.from_url(url, socket_connect_timeout=2, socket_timeout=2))
+        return MemoryRoomBackend()
+
+    def join(self, namespace: str, room: str, sid: str, *, capacity: int = 2) -> RoomSeat | None:
+        """Ocupa o primeiro assento livre; ``None`` quando a sala está cheia."""
+        return self.backend.join(namespace, room, sid, capacity, self.ttl, self.session_ttl)
+
+    def leave(self, namespace: str, sid: str) -> RoomExit | None:
+        return self.backend.leave(namespace, sid)
+
+    def session(self, namespace: str, sid: str) -> tuple[str, int] | None:
+        """``(sala, assento)`` da conexão, se ela entrou em alguma sala.
+
+        Todo evento da conexão passa por aqui, então a consulta também renova
+        o TTL da sessão e dos assentos da sala.
+        """
+        return self.backend.touch(namespace, sid, self.ttl, self.session_ttl)
+
+    def participants(self, namespace: str, room: str) -> int:
+        return self.backend.participants(namespace, room)
+
+    def get_state(self, namespace: str, room: str) -> dict | None:
+        return self.backend.get_state(namespace, room)
+
+    def update_state(self, namespace: str, room: str, apply: Callable[[dict | None], dict | None]):
+        return self.backend.update_state(namespace, room, apply, self.ttl)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+
+room_state = RoomState()
@@ -0,0 +1,204 @@
+"""Perfil de SQL por request: contagem, tempo de banco e suspeitas de N+1.
+
+Ligado por ``SQL_PROFILER_ENABLED``. Desligado, custa uma leitura de config
+por request: os listeners ``before_cursor_execute``/``after_cursor_execute``
+só são registrados na primeira request perfilada.
+
+Cada statement vira uma "impressão digital" (SQL sem literais e com listas
+``IN`` colapsadas). Uma impressão repetida ``SQL_PROFILER_N_PLUS_ONE_THRESHOLD``
+vezes na mesma request é o padrão típico de lazy load em loop e gera um aviso
+no log. O resumo de cada request vai para o log com o request id, e os
+agregados por endpoint ficam em ``sql_profiler.slowest_endpoints()``.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_N_PLUS_ONE_THRESHOLD = 10
+_ENVIRON_KEY = "petorlandia.sql_profile"
+_SAMPLE_CHARS = 240
+# Requests sem rota (404, varreduras) somam numa chave só: path livre faria
+# o agregado crescer sem limite.
+UNMATCHED_ENDPOINT = "<unmatched>"
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:[^()]|\([^()]*\))*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """SQL normalizado: mesmas consultas com parâmetros diferentes colidem."""
+    text = _STRING_LITERAL.sub("?", statement)
+    text = _IN_LIST.sub("IN (...)", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class RequestProfile:
+    __slots__ = ("query_count", "db_time", "fingerprints", "started")
+
+    def __init__(self):
+        self.query_count = 0
+        self.db_time = 0.0
+        self.fingerprints: Counter[str] = Counter()
+        self.started = time.perf_counter()
+
+    def record(self, statement: str, elapsed: float) -> None:
+        self.query_count += 1
+        self.db_time += elapsed
+        self.fingerprints[fingerprint(statement)] += 1
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(fp, count) for fp, count in self.fingerprints.most_common() if count >= threshold]
+
+
+def _current_profile() -> RequestProfile | None:
+    if not has_request_context():
+        return None
+    return request.environ.get(_ENVIRON_KEY)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile() is not None:
+        conn.info.setdefault("sql_profiler_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    if profile is None:
+        return
+    starts = conn.info.get("sql_profiler_start")
+    if not starts:
+        return
+    profile.record(statement, time.perf_counter() - starts.pop())
+
+
+class SqlProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listening = False
+        self._endpoints: dict[str, dict[str, Any]] = {}
+
+    def init_app(self, app) -> None:
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    @staticmethod
+    def enabled() -> bool:
+        return bool(current_app.config.get("SQL_PROFILER_ENABLED"))
+
+    def _listen(self) -> None:
+        with self._lock:
+            if self._listening:
+                return
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+            self._listening = True
+
+    def _start(self):
+        if not self.enabled():
+            return None
+        self._listen()
+        request.environ[_ENVIRON_KEY] = RequestProfile()
+        return None
+
+    def _finish(self, response):
+        profile = request.environ.pop(_ENVIRON_KEY, None)
+        if profile is None:
+            return response
+        summary = self.summarize(profile, endpoint=request.endpoint or UNMATCHED_ENDPOINT)
+        response.headers["Server-Timing"] = (
+            f"db;dur={summary['db_time_ms']:.1f};desc=\"{summary['query_count']} queries\""
+        )
+        return response
+
+    def summarize(self, profile: RequestProfile, *, endpoint: str) -> dict[str, Any]:
+        """Loga o resumo da request e soma no agregado do endpoint."""
+        threshold = int(
+            current_app.config.get("SQL_PROFILER_N_PLUS_ONE_THRESHOLD", DEFAULT_N_PLUS_ONE_THRESHOLD)
+        )
+        request_id = getattr(g, "request_id", None)
+        repeated = profile.repeated(threshold)
+        summary = {
+            "endpoint": endpoint,
+            "request_id": request_id,
+            "query_count": profile.query_count,
+            "db_time_ms": round(profile.db_time * 1000, 2),
+            "request_time_ms": round((time.perf_counter() - profile.started) * 1000, 2),
+            "n_plus_one": [
+                {"statement": fp[:_SAMPLE_CHARS], "count": count} for fp, count in repeated
+            ],
+        }
+        current_app.logger.info(
+            "sql_profile endpoint=%s queries=%d db_ms=%.1f request_ms=%.1f",
+            endpoint,
+            summary["query_count"],
+            summary["db_time_ms"],
+            summary["request_time_ms"],
+            extra={"sql_profile": summary},
+        )
+        for item in summary["n_plus_one"]:
+            current_app.logger.warning(
+                "sql_n_plus_one endpoint=%s count=%d statement=%s",
+                endpoint,
+                item["count"],
+                item["statement"],
+                extra={"sql_profile": summary},
+            )
+        self._aggregate(summary)
+        return summary
+
+    def _aggregate(self, summary: dict[str, Any]) -> None:
+        with self._lock:
+            stats = self._endpoints.setdefault(summary["endpoint"], {
+                "endpoint": summary["endpoint"],
+                "requests": 0,
+                "queries": 0,
+                "db_time_ms": 0.0,
+                "max_queries": 0,
+                "max_db_time_ms": 0.0,
+                "n_plus_one_requests": 0,
+                "slowest_request_id": None,
+                "top_repeated": None,
+            })
+            stats["requests"] += 1
+            stats["queries"] += summary["query_count"]
+            stats["db_time_ms"] += summary["db_time_ms"]
+            stats["max_queries"] = max(stats["max_queries"], summary["query_count"])
+            if summary["db_time_ms"] >= stats["max_db_time_ms"]:
+                stats["max_db_time_ms"] = summary["db_time_ms"]
+                stats["slowest_request_id"] = summary["request_id"]
+            if summary["n_plus_one"]:
+                stats["n_plus_one_requests"] += 1
+                stats["top_repeated"] = summary["n_plus_one"][0]
+
+    def slowest_endpoints(self, *, limit: int = 20, sort: str = "db_time") -> list[dict[str, Any]]:
+        with self._lock:
+            rows = [dict(stats) for stats in self._endpoints.values()]
+        for row in rows:
+            row["avg_queries"] = round(row["queries"] / row["requests"], 1)
+            row["avg_db_time_ms"] = round(row["db_time_ms"] / row["requests"], 2)
+            row["db_time_ms"] = round(row["db_time_ms"], 2)
+        key = {
+            "queries": lambda row: row["avg_queries"],
+            "n_plus_one": lambda row: row["n_plus_one_requests"],
+        }.get(sort, lambda row: row["avg_db_time_ms"])
+        rows.sort(key=key, reverse=True)
+        return rows[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._endpoints.clear()
+
+
+sql_profiler = SqlProfiler()
@@ -28,12 +28,15 @@ from models import (
     Vacina,
 )
 from sqlalchemy import func
+from services.geocoding import geocode_cache, geocode_cache_key, http_session
+from services.pmo_routing import RouteResult, optimize_route
 from services.sfa_service import (
     _extract_google_sheet_id,
     _get_sheets_service,
     _load_google_credentials_info,
     _resolve_sheet_title_by_gid,
 )
+from services.sheet_write_behind import SheetWriteBehind
 from time_utils import now_in_brazil, utcnow
 
 
@@ -109,6 +112,8 @@ PMO_DEFAULT_ROUTE_ORIGIN_ADDRESS = "Vigilância Sanitária Municipal, Rua Um, 17
 PMO_DEFAULT_ROUTE_ORIGIN_COORDS = (-20.7122478, -47.8838617)
 PMO_ROUTE_GEOCODE_LIMIT_ENV = "PMO_ROUTE_GEOCODE_LIMIT"
 PMO_ROUTE_GEOCODE_VARIANTS_ENV = "PMO_ROUTE_GEOCODE_VARIANTS"
+# Orçamento (segundos) da busca local 2-opt/Or-opt por rota.
+PMO_ROUTE_TIME_BUDGET_ENV = "PMO_ROUTE_TIME_BUDGET_SECONDS"
 PMO_ORLANDIA_BOUNDS = {
     "min_lat": -20.86,
     "max_lat": -20.55,
@@ -118,7 +123,9 @@ PMO_ORLANDIA_BOUNDS = {
 
 # Índice 0-based da coluna A (nome do tutor) para a API de formatação do Sheets.
 PMO_TUTOR_NAME_COLUMN_INDEX = 0
-_PMO_ROUTE_COORDS_CACHE: dict[str, tuple[float, float]] = {}
+# Camada em memória do cache de geocodificação compartilhado com a fila de
+# endereços (services.geocoding); a tabela geocode_cache fica atrás dela.
+_PMO_ROUTE_COORDS_CACHE: dict[str, tuple[float, float]] = geocode_cache.memory
 
 # Cores claras do painel padrão do Google Sheets para destacar o status da visita
 # diretamente na célula do nome do tutor.
@@ -409,15 +416,10 @@ def _pmo_extract_best_nominatim_coords(payload: list[dict[str, Any]]) -> tuple[f
     return None
 
 
-# Geração do geocoder: o sufixo invalida caches antigos quando trocamos a fonte de
-# geocodificação. "g2" = Google primário (antes era só Nominatim). Bumpar isto força
-# re-geocodificação de todos os endereços na próxima otimização de rota.
-_PMO_GEOCODE_GENERATION = "g2"
-
-
 def _pmo_geocode_cache_key(address: str) -> str:
-    base = _strip_accents(_normalize_text(address)).lower()
-    return f"{base}|{_PMO_GEOCODE_GENERATION}" if base else ""
+    # Mesma chave da fila de endereços (services.geocoding.geocode_cache_key);
+    # a geração do geocoder entra como sufixo lá.
+    return geocode_cache_key(address)
 
 
 def _pmo_geocode_google(address: str) -> tuple[float, float] | None:
@@ -436,7 +438,7 @@ def _pmo_geocode_google(address: str) -> tuple[float, float] | None:
         return None
     full = f"{normalized}, Orlândia, SP, Brasil"
     try:
-        response = requests.get(
+        response = http_session().get(
             "https://maps.googleapis.com/maps/api/geocode/json",
             params={
                 "address": full,
@@ -481,13 +483,14 @@ def _pmo_geocode_address(address: str) -> tuple[float, float] | None:
     if not normalized:
         return None
     cache_key = _pmo_geocode_cache_key(normalized)
-    if cache_key in _PMO_ROUTE_COORDS_CACHE:
-        return _PMO_ROUTE_COORDS_CACHE[cache_key]
+    cached = geocode_cache.get(cache_key)
+    if cached:
+        return cached
 
     # 1. Google (preciso). Já filtra por Orlândia internamente.
     coords = _pmo_geocode_google(normalized)
     if coords:
-        _PMO_ROUTE_COORDS_CACHE[cache_key] = coords
+        geocode_cache.put(cache_key, coords, source="pmo")
         return coords
 
     parts = _pmo_address_parts(normalized)
@@ -498,17 +501,19 @@ def _pmo_geocode_address(address: str) -> tuple[float, float] | None:
     # Structured search via helpers (better Nominatim structured params, 5 s timeout)
     try:
         from helpers import geocode_address as _geocode_helper
-        coords = _geocode_helper(rua=rua, numero=numero, bairro=bairro, cidade="Orlândia", estado="SP")
+        coords = _geocode_helper(
+            rua=rua, numero=numero, bairro=bairro, cidade="Orlândia", estado="SP",
+            session=http_session(),
+        )
     except Exception:
         coords = None
 
     if coords and _pmo_coords_in_orlandia(coords):
-        _PMO_ROUTE_COORDS_CACHE[cache_key] = coords
+        geocode_cache.put(cache_key, coords, source="pmo")
         return coords
 
     # Free-text Nominatim fallback with longer timeout
-    http = requests.Session()
-    http.headers.update({"User-Agent": "PetOrlandia/1.0 (+https://petorlandia.com)"})
+    http = http_session()
     for query in _pmo_address_queries(normalized)[:_pmo_route_geocode_variants()]:
         try:
             response = http.get(
@@ -521,7 +526,7 @@ def _pmo_geocode_address(address: str) -> tuple[float, float] | None:
         except (requests.RequestException, ValueError):
             coords = None
         if coords:
-            _PMO_ROUTE_COORDS_CACHE[cache_key] = coords
+            geocode_cache.put(cache_key, coords, source="pmo")
             return coords
     return None
 
@@ -580,34 +585,46 @@ def _pmo_route_origin_coords() -> tuple[float, float] | None:
         return PMO_DEFAULT_ROUTE_ORIGIN_COORDS
 
 
-def _haversine_km(a: tuple[float, float], b: tuple[float, float]) -> float:
-    lat1, lon1 = math.radians(a[0]), math.radians(a[1])
-    lat2, lon2 = math.radians(b[0]), math.radians(b[1])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    value = (
-        math.sin(dlat / 2) ** 2
-        + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
-    )
-    return 6371.0 * 2 * math.asin(math.sqrt(value))
+def _pmo_route_time_budget() -> float:
+    try:
+        return max(0.0, float(os.getenv(PMO_ROUTE_TIME_BUDGET_ENV, "0.5")))
+    except ValueError:
+        return 0.5
+
+
+_PMO_CONDO_NAME_RE = re.compile(r"condominios?\s+([^,;]+)")
+# Designadores de unidade que encerram o nome ("Residencial A Casa 3" -> "residencial a").
+_PMO_CONDO_UNIT_RE = re.compile(
+    r"\b(?:casa|bloco|bl|apto?|apartamento|unidade|lote|lt|torre|quadra|qd|sala)\b.*$"
+)
+
 
+def _pmo_address_condo_key(address: str) -> str:
+    """Nome completo e normalizado do condomínio citado no endereço.
 
-def _nearest_neighbor_route(
+    Vazio para casas avulsas. O nome inteiro (até a unidade) entra na chave:
+    "Condomínio Residencial A" e "Condomínio Residencial B" são blocos
+    diferentes na rota.
+    """
+    text = _strip_accents(_normalize_text(address)).lower()
+    match = _PMO_CONDO_NAME_RE.search(text)
+    if not match:
+        return ""
+    name = _PMO_CONDO_UNIT_RE.sub("", match.group(1))
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", name).split())
+
+
+def _pmo_optimize_stops(
     origin: tuple[float, float],
-    items: list[tuple[PmoVaccinationVisit, tuple[float, float]]],
-) -> list[PmoVaccinationVisit]:
-    remaining = items[:]
-    current = origin
-    ordered: list[PmoVaccinationVisit] = []
-    while remaining:
-        next_index, (visit, coords) = min(
-            enumerate(remaining),
-            key=lambda item: (_haversine_km(current, item[1][1]), item[1][0].source_row or 0, item[1][0].id),
-        )
-        ordered.append(visit)
-        current = coords
-        remaining.pop(next_index)
-    return ordered
+    coords: list[tuple[float, float]],
+    condo_keys: list[str],
+) -> RouteResult:
+    return optimize_route(
+        origin,
+        coords,
+        groups=[key or None for key in condo_keys],
+        time_budget=_pmo_route_time_budget(),
+    )
 
 
 def _is_summary_or_header(row: list[Any]) -> bool:
@@ -2082,7 +2099,12 @@ def _pmo_route_context(*, sheet_gid: str = "", sheet_title: str = "", shift: str
             "Confira se os endereços têm rua, número e bairro, e tente novamente em alguns instantes."
         )
 
-    optimized = _nearest_neighbor_route(origin_coords, geocoded) + ungeocoded
+    route = _pmo_optimize_stops(
+        origin_coords,
+        [coords for _visit, coords in geocoded],
+        [_pmo_address_condo_key(visit.address or "") for visit, _coords in geocoded],
+    )
+    optimized = [geocoded[index][0] for index in route.order] + ungeocoded
     return {
         "normalized_shift": normalized_shift,
         "spreadsheet_id": spreadsheet_id,
@@ -2096,6 +2118,8 @@ def _pmo_route_context(*, sheet_gid: str = "", sheet_title: str = "", shift: str
         "coords_by_visit_id": {visit.id: coords for visit, coords in geocoded},
         "unlocated_count": len(ungeocoded),
         "geocoded_now": geocoded_now,
+        "distance_before_km": round(route.distance_before_km, 2),
+        "distance_after_km": round(route.distance_after_km, 2),
     }
 
 
@@ -2111,6 +2135,8 @@ def preview_vacina_pmo_route(*, sheet_gid: str = "", sheet_title: str = "", shif
         "optimized_count": len(context["optimized"]),
         "unlocated_count": context["unlocated_count"],
         "geocoded_now": context["geocoded_now"],
+        "distance_before_km": context["distance_before_km"],
+        "distance_after_km": context["distance_after_km"],
         "preview": [
             _route_preview_item(visit, coords_by_visit_id.get(visit.id), index)
             for index, visit in enumerate(context["optimized"], start=1)
@@ -2180,6 +2206,8 @@ def optimize_vacina_pmo_route(
         "optimized_count": len(optimized),
         "unlocated_count": context["unlocated_count"],
         "geocoded_now": context["geocoded_now"],
+        "distance_before_km": context["distance_before_km"],
+        "distance_after_km": context["distance_after_km"],
         "backup_id": backup.id,
     }
 
@@ -2375,6 +2403,38 @@ def _count_vaccinated_by_species(visit: PmoVaccinationVisit) -> tuple[int, int]:
     return dogs, cats
 
 
+def _pmo_sheet_write_behind_enabled() -> bool:
+    try:
+        return bool(current_app.config.get("PMO_SHEETS_WRITE_BEHIND")) and not current_app.testing
+    except RuntimeError:  # fora de app context (scripts avulsos): escreve direto
+        return False
+
+
+def _queue_pmo_cells(visit: PmoVaccinationVisit, cells: dict[str, Any]) -> bool:
+    """Enfileira células da linha do tutor em ``pmo_sheet_writes`` (ver config)."""
+    pmo_sheet_writes.set_cells(
+        current_app._get_current_object(),
+        visit.spreadsheet_id,
+        visit.source_row,
+        cells,
+        sheet_title=visit.sheet_title or "",
+        sheet_gid=visit.sheet_gid or "",
+    )
+    return True
+
+
+def _queue_pmo_tutor_color(visit: PmoVaccinationVisit, sheet_id: int, color: dict[str, Any]) -> bool:
+    pmo_sheet_writes.set_background(
+        current_app._get_current_object(),
+        visit.spreadsheet_id,
+        sheet_id,
+        visit.source_row,
+        PMO_TUTOR_NAME_COLUMN_INDEX,
+        color,
+    )
+    return True
+
+
 def write_vaccinated_counts_to_sheet(visit: PmoVaccinationVisit) -> bool:
     """Escreve as quantidades vacinadas (M=cães, N=gatos) na linha de origem do tutor."""
     if not visit.spreadsheet_id or not visit.source_row:
@@ -2385,6 +2445,10 @@ def write_vaccinated_counts_to_sheet(visit: PmoVaccinationVisit) -> bool:
         return False  # nunca escreve na aba mestre (coluna M = Status PMO compilado)
 
     dogs_vac, cats_vac = _count_vaccinated_by_species(visit)
+    if _pmo_sheet_write_behind_enabled():
+        return _queue_pmo_cells(
+            visit, {PMO_DOGS_VACCINATED_COLUMN: dogs_vac, PMO_CATS_VACCINATED_COLUMN: cats_vac}
+        )
 
     try:
         service = _get_sheets_service_rw()
@@ -2435,6 +2499,8 @@ def write_note_to_sheet(visit: PmoVaccinationVisit) -> bool:
         return False
     if _pmo_is_master_sheet(visit.sheet_title):
         return False  # nunca escreve na aba mestre
+    if _pmo_sheet_write_behind_enabled():
+        return _queue_pmo_cells(visit, {PMO_NOTE_COLUMN: visit.note or ""})
 
     try:
         service = _get_sheets_service_rw()
@@ -2508,6 +2574,11 @@ def write_tutor_name_color_to_sheet(visit: PmoVaccinationVisit) -> bool:
     except (TypeError, ValueError):
         return False
 
+    color_key = _visit_status_color_key(visit)
+    color = PMO_STATUS_COLORS.get(color_key) if color_key else PMO_STATUS_CLEAR_COLOR
+    if _pmo_sheet_write_behind_enabled():
+        return _queue_pmo_tutor_color(visit, sheet_id, color)
+
     try:
         service = _get_sheets_service_rw()
     except Exception:
@@ -2521,9 +2592,6 @@ def write_tutor_name_color_to_sheet(visit: PmoVaccinationVisit) -> bool:
             pass
         return False
 
-    color_key = _visit_status_color_key(visit)
-    color = PMO_STATUS_COLORS.get(color_key) if color_key else PMO_STATUS_CLEAR_COLOR
-
     try:
         service.spreadsheets().batchUpdate(
             spreadsheetId=visit.spreadsheet_id,
@@ -2569,6 +2637,8 @@ def write_animal_names_to_sheet(visit: PmoVaccinationVisit) -> bool:
         return False  # nunca escreve na aba mestre
 
     names = ", ".join(animal.name for animal in visit.animals if animal.name)
+    if _pmo_sheet_write_behind_enabled():
+        return _queue_pmo_cells(visit, {PMO_ANIMAL_NAMES_COLUMN: names})
 
     try:
         service = _get_sheets_service_rw()
@@ -2615,6 +2685,8 @@ def write_animal_counts_to_sheet(visit: PmoVaccinationVisit) -> bool:
         return False
     if _pmo_is_master_sheet(visit.sheet_title):
         return False  # nunca escreve na aba mestre
+    if _pmo_sheet_write_behind_enabled():
+        return _queue_pmo_cells(visit, {PMO_DOGS_COLUMN: visit.dogs or 0, PMO_CATS_COLUMN: visit.cats or 0})
 
     try:
         service = _get_sheets_service_rw()
@@ -2746,6 +2818,8 @@ def write_attended_by_to_sheet(visit: PmoVaccinationVisit) -> bool:
         return False
     if _pmo_is_master_sheet(visit.sheet_title):
         return False  # nunca escreve na aba mestre
+    if _pmo_sheet_write_behind_enabled():
+        return _queue_pmo_cells(visit, {PMO_ATTENDED_BY_COLUMN: _attended_by_sheet_value(visit)})
 
     try:
         service = _get_sheets_service_rw()
@@ -2944,6 +3018,15 @@ def sync_vacina_pmo_sheet(
         sheet_gid=sheet_gid,
         sheet_title=sheet_title,
     )
+    # Edições ainda na fila precisam chegar antes da leitura, senão a
+    # sincronização traria de volta os valores antigos da planilha. ``force``
+    # ignora o backoff; se a cota ainda recusar, é melhor não sincronizar.
+    pmo_sheet_writes.flush(spreadsheet_id, force=True)
+    if pmo_sheet_writes.pending(spreadsheet_id):
+        raise RuntimeError(
+            "Há edições da planilha PMO aguardando a cota do Google Sheets; "
+            "sincronize novamente em alguns minutos."
+        )
     if resolved_gid:
         values = _read_sheet_values_by_gid(
             service,
@@ -2987,6 +3070,16 @@ def _get_sheets_service_rw():
     return build("sheets", "v4", credentials=creds)
 
 
+# Fila das escritas pontuais (write_*_to_sheet) quando PMO_SHEETS_WRITE_BEHIND
+# está ligado; o cliente é montado uma vez e reutilizado pela thread.
+pmo_sheet_writes = SheetWriteBehind(
+    lambda: _get_sheets_service_rw(),
+    title_resolver=_resolve_sheet_title_by_gid,
+    config_prefix="PMO_SHEETS",
+    name="pmo-sheet-writes",
+)
+
+
 def _ensure_request_sheet(service, spreadsheet_id: str, title: str) -> None:
     metadata = (
         service.spreadsheets()
@@ -3216,12 +3309,22 @@ def distribute_pmo_houses(
     }
 
 
-def plan_pmo_day(houses: list[dict[str, Any]]) -> dict[str, Any]:
+def plan_pmo_day(
+    houses: list[dict[str, Any]],
+    *,
+    coords: dict[int, tuple[float, float]] | None = None,
+    origin: tuple[float, float] | None = None,
+) -> dict[str, Any]:
     """Monta o dia escolhendo (no máximo) um condomínio + casas avulsas.
 
     Pega o primeiro condomínio na ordem de proximidade, coloca todas as suas
     unidades juntas na manhã e completa o dia com casas fora de condomínio. Os
     demais condomínios ficam para outros dias. Sem condomínio, distribui normal.
+
+    Com ``coords`` (``sourceRow`` -> lat/lng) e ``origin``, reordena cada turno
+    pela rota mais curta saindo da origem, sem mudar quem entra em cada turno
+    (as metas de animais continuam valendo). Casas sem coordenada vão para o
+    fim do turno.
     """
     chosen_key = next((_pmo_condo_key(h) for h in houses if _pmo_is_condo(h)), "")
     condo_units = (
@@ -3231,9 +3334,27 @@ def plan_pmo_day(houses: list[dict[str, Any]]) -> dict[str, Any]:
     )
     avulsas = [h for h in houses if not _pmo_is_condo(h)]
     condo_label = _pmo_condo_label(condo_units[0]) if condo_units else ""
-    return distribute_pmo_houses(
+    plan = distribute_pmo_houses(
         avulsas, seed_morning=condo_units, condo_name=condo_label
     )
+    if coords and origin:
+        before = after = 0.0
+        for shift in ("Manha", "Tarde"):
+            located = [h for h in plan[shift] if h.get("sourceRow") in coords]
+            unlocated = [h for h in plan[shift] if h.get("sourceRow") not in coords]
+            if not located:
+                continue
+            route = _pmo_optimize_stops(
+                origin,
+                [coords[h["sourceRow"]] for h in located],
+                [_pmo_condo_key(h) if _pmo_is_condo(h) else "" for h in located],
+            )
+            plan[shift] = [located[index] for index in route.order] + unlocated
+            before += route.distance_before_km
+            after += route.distance_after_km
+        plan["distance_before_km"] = round(before, 2)
+        plan["distance_after_km"] = round(after, 2)
+    return plan
 
 
 def _pmo_empty_shift_slots(values: list[list[Any]], shift: str) -> list[int]:
@@ -3579,11 +3700,16 @@ def criar_dia_vacinacao(date_value: str) -> dict[str, Any]:
                 "tutor": row.get("tutor") or "",
                 "dogs": row.get("dogs") or 0,
                 "cats": row.get("cats") or 0,
+                "address": row.get("address") or "",
                 "cells": [_cell(raw, col) for col in range(PMO_SCHEDULE_SOURCE_COLUMNS)],
             }
         )
 
-    plan = plan_pmo_day(houses)
+    # Só coordenadas já em cache: criar o dia não espera por geocodificação.
+    keys_by_row = {h["sourceRow"]: _pmo_geocode_cache_key(h["address"]) for h in houses}
+    cached = geocode_cache.get_many(keys_by_row.values())
+    house_coords = {row: cached[key] for row, key in keys_by_row.items() if key in cached}
+    plan = plan_pmo_day(houses, coords=house_coords, origin=_pmo_route_origin_coords())
     manha, tarde = plan["Manha"], plan["Tarde"]
     if not manha and not tarde:
         raise ValueError("Nenhuma casa nova para agendar (todas já estão pintadas).")
@@ -3677,6 +3803,8 @@ def criar_dia_vacinacao(date_value: str) -> dict[str, Any]:
             [h for h in manha if _pmo_is_condo(h)]
         ),
         "leftover": (len(manha) - placed_manha) + (len(tarde) - placed_tarde),
+        "distanceBeforeKm": plan.get("distance_before_km"),
+        "distanceAfterKm": plan.get("distance_after_km"),
     }
 
 
@@ -0,0 +1,72 @@
+"""Tempo de startup do ``app.py`` por fase.
+
+O módulo do app é uma sequência longa de imports e registros; sem medir não
+dá para saber se um cold start lento (deploy, reciclagem por
+``--max-requests``) vem dos imports, das extensões, das guardas de schema ou
+do registro das blueprints. ``app.py`` marca o fim de cada fase com
+``startup_profile.checkpoint(nome)`` — o tempo desde a marca anterior vai para
+a fase (fases repetidas acumulam).
+
+As marcas custam um ``perf_counter`` e sempre são gravadas; com
+``STARTUP_PROFILE=1`` uma linha ``startup_profile total_ms=... <fase>=<ms>``
+sai no log ao final do import. O bench ``scripts/bench_startup.py`` lê
+``startup_profile.as_dict()``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def profiling_enabled() -> bool:
+    return (os.environ.get("STARTUP_PROFILE") or "").strip().lower() in {"1", "true", "yes", "on"}
+
+
+class StartupProfile:
+    def __init__(self, *, clock=time.perf_counter):
+        self._clock = clock
+        self.started_at = clock()
+        self._last = self.started_at
+        self.phases: dict[str, float] = {}
+        self.finished_at: float | None = None
+
+    def checkpoint(self, phase: str) -> float:
+        """Atribui a ``phase`` o tempo desde a última marca; devolve o trecho."""
+        now = self._clock()
+        elapsed = now - self._last
+        self._last = now
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed
+        return elapsed
+
+    @property
+    def total(self) -> float:
+        return (self.finished_at if self.finished_at is not None else self._last) - self.started_at
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": round(self.total * 1000, 1),
+            "phases": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+        }
+
+    def report(self) -> str:
+        lines = [f"{'fase':<16} {'ms':>9} {'%':>6}"]
+        total = self.total or 1e-9
+        for name, seconds in sorted(self.phases.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"{name:<16} {seconds * 1000:9.1f} {seconds / total * 100:5.1f}%")
+        lines.append(f"{'total':<16} {self.total * 1000:9.1f}")
+        return "\n".join(lines)
+
+    def finish(self, phase: str, log: logging.Logger | None = None) -> None:
+        """Fecha a última fase e, com ``STARTUP_PROFILE=1``, loga os tempos."""
+        self.checkpoint(phase)
+        self.finished_at = self._last
+        if profiling_enabled():
+            phases = " ".join(f"{name}={ms}" for name, ms in self.as_dict()["phases"].items())
+            (log or logger).info("startup_profile total_ms=%.1f %s", self.total * 1000, phases)
+
+
+startup_profile = StartupProfile()
@@ -32,6 +32,15 @@
         })
       : null;
   const supportsSocket = Boolean(socket);
+  // Renova a sessão no servidor (TTL curto) entre uma jogada e outra.
+  const HEARTBEAT_INTERVAL_MS = 30000;
+  if (supportsSocket) {
+    window.setInterval(() => {
+      if (socket.connected) {
+        socket.emit("heartbeat");
+      }
+    }, HEARTBEAT_INTERVAL_MS);
+  }
 
   const INITIAL_ROWS = [
     [true, true, true],
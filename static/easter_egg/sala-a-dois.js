@@ -32,7 +32,8 @@
   const chatInput = $("#chatInput");
   const reliableCallLink = $("#reliableCallLink");
   const toast = $("#toast");
-  const ROOM_ASSET_VERSION = "20260811d";
+  const ROOM_ASSET_VERSION = "20261018a";
+  const HEARTBEAT_INTERVAL_MS = 30000;
 
   const sanitizeRoom = (value) => (value || "")
     .toString()
@@ -345,6 +346,11 @@
       transports: ["websocket", "polling"],
     });
     state.socket = socket;
+    // Renova a sessão no servidor (TTL curto) enquanto a chamada está aberta.
+    const heartbeat = window.setInterval(() => {
+      if (state.socket !== socket) window.clearInterval(heartbeat);
+      else if (socket.connected) socket.emit("heartbeat");
+    }, HEARTBEAT_INTERVAL_MS);
 
     socket.on("room_state", (payload) => {
       state.seat = Number(payload.seat);
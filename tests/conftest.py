@@ -42,16 +42,46 @@ def _isolate_app_state():
 
 @pytest.fixture(autouse=True)
 def _clear_context_cache():
-    """Zera o cache de badges (TTL 30s) entre testes.
+    """Recria o cache de badges (memória, TTL 30s) entre testes.
 
     O cache é keyed por user_id; testes recriam usuários com os mesmos ids e
     herdariam contadores/flags do teste anterior (ex.: has_clinic_access).
+    O mesmo vale para os tokens OAuth verificados (mesmo bearer, outro banco)
+    e para as facetas da loja e o índice de protocolos clínicos (versão 0 em
+    todo banco novo).
     """
-    from context_processors import _context_cache
+    from services.badge_cache import badge_cache, reset_admin_ids
+    from services.catalog_facets import reset_catalog_facets
+    from services.clinical_suggestions import reset_protocol_index
+    from services.oauth_token_cache import token_cache
 
-    _context_cache.clear()
+    badge_cache.configure()
+    reset_admin_ids()
+    token_cache.clear()
+    reset_catalog_facets()
+    reset_protocol_index()
     yield
-    _context_cache.clear()
+    badge_cache.configure()
+    reset_admin_ids()
+    token_cache.clear()
+    reset_catalog_facets()
+    reset_protocol_index()
+
+
+@pytest.fixture(autouse=True)
+def _reset_bulario_caches():
+    """Descarta snapshot do bulário e índice de busca em memória entre testes.
+
+    Cada teste recria o banco com os mesmos ids; um snapshot anterior com a
+    mesma versão (0) seria reaproveitado.
+    """
+    from services.bulario_snapshot import resetar_snapshot
+    from services.medication_search import invalidar_indice_busca
+
+    resetar_snapshot()
+    invalidar_indice_busca()
+    yield
+    resetar_snapshot()
 
 
 @pytest.fixture()
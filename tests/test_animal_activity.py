@@ -0,0 +1,148 @@
+from datetime import datetime, timedelta
+
+from cli import backfill_animal_activity_command
+from extensions import db
+from models import Animal, AnimalActivity, Appointment, Clinica, Consulta, User, Veterinario
+from services.animal_search import search_animals
+
+
+def _setup():
+    clinic_a = Clinica(nome="Clínica A")
+    clinic_b = Clinica(nome="Clínica B")
+    tutor = User(name="Tutor", email="tutor@example.com", password_hash="x")
+    vet_user = User(name="Vet", email="vet@example.com", password_hash="x", worker="veterinario")
+    db.session.add_all([clinic_a, clinic_b, tutor, vet_user])
+    db.session.flush()
+    vet = Veterinario(user_id=vet_user.id, crmv="CRMV1", clinica_id=clinic_a.id)
+    db.session.add(vet)
+    db.session.flush()
+    return clinic_a, clinic_b, tutor, vet
+
+
+def _appointment(animal, tutor, vet, clinic, when):
+    return Appointment(
+        animal_id=animal.id,
+        tutor_id=tutor.id,
+        veterinario_id=vet.id,
+        scheduled_at=when,
+        clinica_id=clinic.id,
+    )
+
+
+def _naive(value):
+    return value.replace(tzinfo=None) if value else None
+
+
+def _activity(animal_id):
+    rows = AnimalActivity.query.filter_by(animal_id=animal_id).all()
+    return {
+        row.clinica_id: (_naive(row.last_appointment_at), _naive(row.last_consulta_at))
+        for row in rows
+    }
+
+
+def test_gravacoes_de_agenda_e_consulta_mantem_atividade_por_clinica(app):
+    clinic_a, clinic_b, tutor, vet = _setup()
+    animal = Animal(name="Rex", user_id=tutor.id, clinica_id=clinic_a.id)
+    db.session.add(animal)
+    db.session.flush()
+    base = datetime(2026, 10, 1, 10, 0)
+
+    first = _appointment(animal, tutor, vet, clinic_a, base)
+    second = _appointment(animal, tutor, vet, clinic_b, base + timedelta(days=3))
+    db.session.add_all([first, second])
+    db.session.add(Consulta(animal_id=animal.id, created_by=vet.user_id, clinica_id=clinic_a.id, created_at=base))
+    db.session.commit()
+
+    assert _activity(animal.id) == {
+        AnimalActivity.ALL_CLINICS: (base + timedelta(days=3), base),
+        clinic_a.id: (base, base),
+        clinic_b.id: (base + timedelta(days=3), None),
+    }
+
+    first.scheduled_at = base + timedelta(days=5)
+    db.session.delete(second)
+    db.session.commit()
+
+    assert _activity(animal.id) == {
+        AnimalActivity.ALL_CLINICS: (base + timedelta(days=5), base),
+        clinic_a.id: (base + timedelta(days=5), base),
+    }
+
+
+def test_busca_usa_chave_normalizada_e_atividade_da_clinica(app):
+    clinic_a, clinic_b, tutor, vet = _setup()
+    joao = Animal(name="João", microchip_number="985-112", user_id=tutor.id, clinica_id=clinic_a.id)
+    luna = Animal(name="Luna", user_id=tutor.id, clinica_id=clinic_a.id)
+    db.session.add_all([joao, luna])
+    db.session.flush()
+    now = datetime(2026, 10, 10, 9, 0)
+    db.session.add_all([
+        _appointment(joao, tutor, vet, clinic_a, now - timedelta(days=10)),
+        _appointment(luna, tutor, vet, clinic_a, now - timedelta(days=1)),
+        # mais recente, mas em outra clínica: não conta no escopo da clínica A
+        _appointment(joao, tutor, vet, clinic_b, now),
+    ])
+    db.session.commit()
+
+    def _search(term, **kwargs):
+        params = dict(clinic_scope=clinic_a.id, is_admin=False, visibility_clause=None)
+        params.update(kwargs)
+        return search_animals(term=term, **params)
+
+    assert joao.search_key == "joao 985-112"
+    assert [row["name"] for row in _search("JOAO")] == ["João"]
+    assert [row["name"] for row in _search("985-1")] == ["João"]
+    assert [row["name"] for row in _search("", sort="recent_attended")] == ["Luna", "João"]
+    assert [row["name"] for row in _search("", sort="recent_attended", clinic_scope=None, is_admin=True)] == [
+        "João",
+        "Luna",
+    ]
+
+
+def test_backfill_reconstroi_atividade_e_chave_de_busca(app):
+    clinic_a, _clinic_b, tutor, vet = _setup()
+    animal = Animal(name="Mel", microchip_number="42", user_id=tutor.id, clinica_id=clinic_a.id)
+    db.session.add(animal)
+    db.session.flush()
+    when = datetime(2026, 9, 1, 8, 0)
+    db.session.add(_appointment(animal, tutor, vet, clinic_a, when))
+    db.session.commit()
+    db.session.execute(AnimalActivity.__table__.delete())
+    db.session.execute(Animal.__table__.update().values(search_key=None))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(backfill_animal_activity_command, ["--batch-size", "1"])
+
+    assert result.exit_code == 0, result.output
+    assert "animals=1 activity_rows=2 batches=1" in result.output
+    db.session.expire_all()
+    assert Animal.query.get(animal.id).search_key == "mel 42"
+    assert _activity(animal.id) == {AnimalActivity.ALL_CLINICS: (when, None), clinic_a.id: (when, None)}
+
+
+def test_refresh_faz_upsert_sobre_linha_gravada_por_outra_sessao(app):
+    clinic_a, _clinic_b, tutor, vet = _setup()
+    animal = Animal(name="Rex", user_id=tutor.id, clinica_id=clinic_a.id)
+    db.session.add(animal)
+    db.session.commit()
+    base = datetime(2026, 10, 1, 10, 0)
+    table = AnimalActivity.__table__
+    # Linha já gravada por outra transação, com o id preservado pelo upsert.
+    db.session.execute(table.insert().values(
+        animal_id=animal.id, clinica_id=clinic_a.id, updated_at=base,
+        last_appointment_at=base - timedelta(days=30),
+    ))
+    db.session.execute(table.insert().values(animal_id=animal.id, clinica_id=999, updated_at=base))
+    row_id = db.session.execute(
+        db.select(table.c.id).where(table.c.animal_id == animal.id, table.c.clinica_id == clinic_a.id)
+    ).scalar_one()
+
+    db.session.add(_appointment(animal, tutor, vet, clinic_a, base))
+    db.session.commit()
+
+    assert _activity(animal.id) == {
+        AnimalActivity.ALL_CLINICS: (base, None),
+        clinic_a.id: (base, None),
+    }
+    assert db.session.get(AnimalActivity, row_id).clinica_id == clinic_a.id
@@ -0,0 +1,124 @@
+import os
+import sys
+
+os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///:memory:"
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import event
+
+from app import app as flask_app, db
+from helpers import BR_TZ, get_appointment_duration, get_available_times, has_conflict_for_slot
+from models import Animal, Appointment, Clinica, ExamAppointment, User, Veterinario, VetSchedule
+from services.availability import compute_availability, load_availability
+
+
+@pytest.fixture
+def app_ctx():
+    flask_app.config.update(
+        TESTING=True,
+        WTF_CSRF_ENABLED=False,
+        SQLALCHEMY_DATABASE_URI="sqlite:///:memory:",
+    )
+    with flask_app.app_context():
+        db.create_all()
+        yield
+        db.session.remove()
+        db.drop_all()
+
+
+def _seed(vet_count=2):
+    clinic = Clinica(id=1, nome="Clinica")
+    tutor = User(id=1, name="Tutor", email="tutor@test")
+    tutor.set_password("x")
+    animal = Animal(id=1, name="Rex", user_id=1, clinica_id=1)
+    db.session.add_all([clinic, tutor, animal])
+    for idx in range(1, vet_count + 1):
+        vet_user = User(id=100 + idx, name=f"Vet {idx}", email=f"vet{idx}@test", worker="veterinario")
+        vet_user.set_password("x")
+        db.session.add(vet_user)
+        db.session.add(Veterinario(id=idx, user_id=vet_user.id, crmv=f"{idx}", clinica_id=1))
+        for dia in ("Segunda", "Terça", "Quarta"):
+            db.session.add(
+                VetSchedule(
+                    veterinario_id=idx,
+                    dia_semana=dia,
+                    hora_inicio=time(8, 0),
+                    hora_fim=time(17, 0),
+                    intervalo_inicio=time(12, 0),
+                    intervalo_fim=time(13, 0),
+                )
+            )
+    db.session.commit()
+
+
+def _utc_naive(local_dt):
+    return local_dt.replace(tzinfo=BR_TZ).astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+
+
+def test_engine_matches_per_slot_conflict_check(app_ctx):
+    _seed(vet_count=1)
+    monday = date(2024, 5, 20)
+    # Stored as naive UTC, as naive local (legacy) and an exam in between.
+    db.session.add_all([
+        Appointment(animal_id=1, tutor_id=1, veterinario_id=1, clinica_id=1,
+                    scheduled_at=_utc_naive(datetime(2024, 5, 20, 9, 0)), status="scheduled"),
+        Appointment(animal_id=1, tutor_id=1, veterinario_id=1, clinica_id=1,
+                    scheduled_at=datetime(2024, 5, 20, 14, 15), status="scheduled"),
+        ExamAppointment(animal_id=1, specialist_id=1, requester_id=1,
+                        scheduled_at=_utc_naive(datetime(2024, 5, 20, 16, 0))),
+    ])
+    db.session.commit()
+
+    result = get_available_times(1, monday, include_booked=True)
+
+    duration = get_appointment_duration('consulta')
+    for label in result["available"] + result["booked"]:
+        slot = datetime.combine(monday, datetime.strptime(label, "%H:%M").time())
+        assert has_conflict_for_slot(1, slot, duration) == (label in result["booked"])
+    assert "09:00" in result["booked"]
+    assert "14:00" in result["booked"] and "14:30" in result["booked"]
+    assert "16:00" in result["booked"]
+    assert "12:00" not in result["available"] + result["booked"]
+    assert result["available"] == sorted(result["available"])
+    assert get_available_times("1", monday, include_booked=True) == result  # id vindo do form
+
+
+def test_engine_batches_many_vets_and_days_in_constant_queries(app_ctx):
+    _seed(vet_count=3)
+    statements = []
+
+    def _count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _count)
+    try:
+        start = date(2024, 5, 20)
+        result = compute_availability([1, 2, 3], start, start + timedelta(days=13))
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _count)
+
+    assert len(statements) == 3
+    assert set(result) == {1, 2, 3}
+    assert len(result[1]) == 14
+    assert result[2][start]["available"][0] == "08:00"
+    # Thursday has no schedule.
+    assert result[3][start + timedelta(days=3)] == {"available": [], "booked": []}
+
+
+def test_load_availability_ignores_empty_vet_list(app_ctx):
+    assert load_availability([], date(2024, 5, 20), date(2024, 5, 21)) == {}
+
+
+def test_available_times_endpoint_supports_multi_day_ranges(app_ctx):
+    _seed(vet_count=1)
+    with flask_app.test_client() as client:
+        resp = client.get("/api/specialist/1/available_times?date=2024-05-20&days=4")
+    assert resp.status_code == 200
+    payload = resp.get_json()
+    assert list(payload) == ["2024-05-20", "2024-05-21", "2024-05-22", "2024-05-23"]
+    assert payload["2024-05-20"] == get_available_times(1, date(2024, 5, 20))
+    assert payload["2024-05-23"] == []
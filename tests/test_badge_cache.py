@@ -0,0 +1,132 @@
+import fnmatch
+
+from flask_login import login_user
+
+from context_processors import inject_unread_count
+from extensions import db
+from models import Message, User
+from services.badge_cache import BadgeCache, MemoryBadgeBackend, RedisBadgeBackend, badge_cache
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class _LocalRedis:
+    """O suficiente do cliente redis-py para o backend de badges (sem servidor)."""
+
+    def __init__(self):
+        self.data = {}
+        self.calls = []
+
+    def mget(self, names):
+        self.calls.append("mget")
+        return [self.data.get(name) for name in names]
+
+    def set(self, name, value, ex=None):
+        self.data[name] = value.encode()
+
+    def delete(self, *names):
+        self.calls.append("delete")
+        for name in names:
+            self.data.pop(name, None)
+
+    def scan_iter(self, match="*"):
+        return [name for name in list(self.data) if fnmatch.fnmatch(name, match)]
+
+    def pipeline(self, transaction=True):
+        client = self
+
+        class _Pipeline:
+            def set(self, *args, **kwargs):
+                client.set(*args, **kwargs)
+
+            def execute(self):
+                client.calls.append("pipeline")
+
+        return _Pipeline()
+
+
+def _user(email, role="adotante"):
+    user = User(name=email.split("@")[0], email=email, password_hash="x", role=role)
+    db.session.add(user)
+    return user
+
+
+def test_memoria_e_lru_limitado_com_ttl():
+    clock = _FakeClock()
+    backend = MemoryBadgeBackend(max_entries=2, clock=clock)
+
+    backend.set_many({"1:a": 1, "2:a": 2}, ttl=30)
+    backend.get_many(["1:a"])  # 1:a vira o mais recente
+    backend.set_many({"3:a": 3}, ttl=30)
+
+    assert backend.get_many(["1:a", "2:a", "3:a"]) == {"1:a": 1, "3:a": 3}
+    assert backend.evictions == 1
+    clock.now = 31
+    assert backend.get_many(["1:a", "3:a"]) == {}
+
+
+def test_redis_compartilha_entre_workers_e_le_badges_numa_ida(app):
+    client = _LocalRedis()
+    worker_a = BadgeCache(RedisBadgeBackend(client), ttl=30)
+    worker_b = BadgeCache(RedisBadgeBackend(client), ttl=30)
+
+    with app.test_request_context("/"):
+        worker_a.set(7, "unread_messages", 3)
+        worker_a.set(7, "admin_action_notifications", {"admin_action_recent": [], "admin_action_count": 0})
+
+    client.calls.clear()
+    with app.test_request_context("/"):
+        values = [worker_b.get(7, key) for key in ("unread_messages", "admin_action_notifications", "pending_exam_count")]
+
+    assert values[0] == 3
+    assert values[1]["admin_action_count"] == 0
+    assert values[2] is None
+    assert client.calls == ["mget"]
+    stats = worker_b.stats()
+    assert (stats["hits"], stats["misses"], stats["round_trips"]) == (2, 1, 1)
+
+
+def test_commit_de_mensagem_invalida_badge_e_rollback_nao(app):
+    sender = _user("remetente@example.com")
+    receiver = _user("destino@example.com")
+    db.session.commit()
+    badge_cache.set(receiver.id, "unread_messages", 0)
+
+    db.session.add(Message(sender_id=sender.id, receiver_id=receiver.id, content="oi"))
+    db.session.flush()
+    db.session.rollback()
+    assert badge_cache.get(receiver.id, "unread_messages") == 0
+
+    db.session.add(Message(sender_id=sender.id, receiver_id=receiver.id, content="oi"))
+    db.session.commit()
+    assert badge_cache.get(receiver.id, "unread_messages") is None
+
+
+def test_admins_compartilham_contador_e_endpoint_expoe_metricas(app, client):
+    admin = _user("admin@example.com", role="admin")
+    outro_admin = _user("admin2@example.com", role="admin")
+    tutor = _user("tutor@example.com")
+    db.session.commit()
+    db.session.add(Message(sender_id=tutor.id, receiver_id=outro_admin.id, content="ajuda"))
+    db.session.commit()
+
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess["_user_id"] = str(admin.id)
+        sess["_fresh"] = True
+
+    with app.test_request_context("/"):
+        login_user(admin)
+        assert inject_unread_count() == {"unread_messages": 1}
+        assert inject_unread_count() == {"unread_messages": 1}
+
+    stats = client.get("/admin/api/badge_cache").get_json()
+    assert stats["backend"] == "memory"
+    assert stats["hits"] >= 1
+    assert stats["misses"] >= 1
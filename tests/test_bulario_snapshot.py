@@ -0,0 +1,183 @@
+from sqlalchemy import event
+
+from extensions import db
+from models import ApresentacaoMedicamento, CacheVersion, DoseMedicamento, Medicamento, User
+from services import bulario_snapshot
+from services.bulario import serializar_medicamento_autocomplete, serializar_medicamento_busca
+
+
+def _seed_catalogo():
+    user = User(name="Admin", email="admin-snapshot@example.com", role="admin")
+    user.set_password("x")
+    db.session.add(user)
+    db.session.flush()
+    med = Medicamento(
+        nome="Meloxicam",
+        principio_ativo="Meloxicam",
+        classificacao="Anti-inflamatório",
+        conteudo_estruturado={
+            "indicacoes": "Dor e inflamação.",
+            "raw_sections": {"Sobre": "AINE preferencial da COX-2."},
+        },
+        created_by=user.id,
+    )
+    db.session.add(med)
+    db.session.flush()
+    db.session.add_all([
+        ApresentacaoMedicamento(
+            medicamento_id=med.id, forma="comprimido", concentracao="2 mg",
+            nome_comercial="Maxicam",
+        ),
+        DoseMedicamento(
+            medicamento_id=med.id, especie="Cães", especie_code="CAO",
+            dose="0,1 mg/kg", dose_min=0.1, dose_max=0.1, dose_unidade="mg/kg",
+        ),
+    ])
+    db.session.commit()
+    return user.id, med.id
+
+
+def test_snapshot_serializa_igual_ao_orm_sem_raw_sections(app):
+    with app.app_context():
+        _, med_id = _seed_catalogo()
+        orm = db.session.get(Medicamento, med_id)
+        esperado_autocomplete = serializar_medicamento_autocomplete(orm)
+        esperado_busca = serializar_medicamento_busca(orm, nome_comercial_filtro="Maxicam")
+
+        registro = bulario_snapshot.obter_medicamento(med_id)
+
+        assert registro.doses[0].dose == "0,1 mg/kg"
+        assert registro.apresentacoes[0].medicamento is registro
+        assert "raw_sections" not in registro.conteudo_estruturado
+        assert bulario_snapshot.serializar_autocomplete(registro) == esperado_autocomplete
+        assert bulario_snapshot.serializar_busca(registro, nome_comercial_filtro="Maxicam") == esperado_busca
+        assert bulario_snapshot.secoes_vetsmart(med_id)[0]["nome"] == "Sobre"
+
+
+def test_snapshot_leituras_repetidas_nao_tocam_o_banco(app):
+    with app.app_context():
+        _, med_id = _seed_catalogo()
+        bulario_snapshot.obter_medicamento(med_id)
+        statements = []
+
+        def _count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", _count)
+        try:
+            for _ in range(5):
+                registro = bulario_snapshot.obter_medicamento(med_id)
+                bulario_snapshot.serializar_autocomplete(registro)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _count)
+
+        assert statements == []
+        stats = bulario_snapshot.estatisticas_snapshot()
+        assert stats["medicamentos"] == 1 and stats["doses"] == 1
+        assert stats["bytes_aproximados"] > 0
+        assert stats["hits"] >= 5 and stats["memo_hits"] >= 4
+
+
+def test_bump_de_outro_worker_recarrega_o_snapshot(app):
+    app.config["BULARIO_SNAPSHOT_CHECK_SECONDS"] = 0
+    with app.app_context():
+        _, med_id = _seed_catalogo()
+        versao_inicial = bulario_snapshot.obter_snapshot().versao
+
+        # Outro processo edita direto no banco e incrementa a versão; os
+        # listeners deste processo não veem o UPDATE.
+        db.session.execute(
+            Medicamento.__table__.update()
+            .where(Medicamento.id == med_id)
+            .values(nome="Meloxicam 0,2%")
+        )
+        db.session.commit()
+        assert bulario_snapshot.obter_medicamento(med_id).nome == "Meloxicam"
+
+        CacheVersion.bump(bulario_snapshot.CATALOGO_CACHE_KEY)
+
+        snapshot = bulario_snapshot.obter_snapshot()
+        assert snapshot.versao == versao_inicial + 1
+        assert snapshot.medicamentos[med_id].nome == "Meloxicam 0,2%"
+
+
+def test_edicao_pelo_bulario_incrementa_versao_e_expoe_metricas(client, app):
+    with app.app_context():
+        user_id, med_id = _seed_catalogo()
+
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+    assert client.get(f"/bulario/{med_id}").status_code == 200
+    resp = client.post(f"/bulario/{med_id}/editar", data={"nome": "Meloxicam Vet"})
+    assert resp.status_code == 302
+
+    with app.app_context():
+        assert CacheVersion.get(bulario_snapshot.CATALOGO_CACHE_KEY) == 1
+
+    detalhe = client.get(f"/medicamento/{med_id}/detalhe").get_json()
+    assert detalhe["nome"] == "Meloxicam Vet"
+
+    stats = client.get("/api/bulario/snapshot").get_json()
+    assert stats["versao"] == 1
+    assert stats["recargas"] >= 2
+
+
+def test_memo_por_registro_e_limitado_e_escrita_so_invalida_no_commit(app):
+    with app.app_context():
+        _, med_id = _seed_catalogo()
+        registro = bulario_snapshot.obter_medicamento(med_id)
+        for indice in range(bulario_snapshot.MEMO_MAX_ENTRIES + 10):
+            bulario_snapshot.serializar_busca(registro, nome_exibicao=f"busca livre {indice}")
+        assert len(registro._memo) == bulario_snapshot.MEMO_MAX_ENTRIES
+
+        db.session.get(Medicamento, med_id).nome = "Meloxicam rascunho"
+        db.session.flush()
+        db.session.rollback()
+        assert bulario_snapshot.obter_medicamento(med_id) is registro
+
+        db.session.get(Medicamento, med_id).nome = "Meloxicam 2"
+        db.session.commit()
+        assert bulario_snapshot.obter_medicamento(med_id).nome == "Meloxicam 2"
+
+
+def test_falha_no_bump_nao_derruba_a_escrita(app, monkeypatch):
+    def _falha(cls, key):
+        raise RuntimeError("banco fora")
+
+    monkeypatch.setattr(CacheVersion, "bump", classmethod(_falha))
+    with app.app_context():
+        assert bulario_snapshot.bump_versao_catalogo() is None
+
+
+def test_busca_por_nome_comercial_limita_e_ordena_no_banco(client, app):
+    with app.app_context():
+        user_id, _med_id = _seed_catalogo()
+        for indice in range(12):
+            med = Medicamento(nome=f"Genérico {indice:02d}", created_by=user_id)
+            db.session.add(med)
+            db.session.flush()
+            db.session.add(ApresentacaoMedicamento(
+                medicamento_id=med.id, forma="comprimido", concentracao="1 mg", nome_comercial=f"Marcavet {indice:02d}",
+            ))
+        db.session.commit()
+
+        statements = []
+
+        def capturar(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", capturar)
+        try:
+            with client.session_transaction() as sess:
+                sess["_user_id"] = str(user_id)
+                sess["_fresh"] = True
+            itens = client.get("/api/bulario/buscar?q=marcavet").get_json()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capturar)
+
+    assert [item["nome_exibicao_busca"] for item in itens] == [f"Marcavet {i:02d}" for i in range(10)]
+    comercial = next(sql for sql in statements if "nome_comercial" in sql and "GROUP BY" in sql)
+    assert "ORDER BY" in comercial and "LIMIT" in comercial
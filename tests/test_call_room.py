@@ -8,12 +8,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 from app import (
     CALL_NAMESPACE,
     app as flask_app,
-    call_room_members,
-    call_room_players,
-    call_session_players,
-    call_session_rooms,
     socketio,
 )
+from services.socket_rooms import MemoryRoomBackend, room_state
 
 
 @pytest.fixture
@@ -23,10 +20,15 @@ def app():
 
 
 def _reset_call_state():
-    call_room_members.clear()
-    call_room_players.clear()
-    call_session_players.clear()
-    call_session_rooms.clear()
+    with flask_app.app_context():
+        room_state.clear()
+
+
+class _Clock:
+    now = 1000.0
+
+    def __call__(self):
+        return self.now
 
 
 def _events(client, name):
@@ -67,8 +69,8 @@ def test_call_page_is_available_from_the_secret_arcade(app):
     assert "Ativamos um dispositivo; falta liberar o outro" in room_script
     assert "turns:staticauth.openrelay.metered.ca:443?transport=tcp" in room_script
     assert "createOffer({ iceRestart })" in room_script
-    assert 'src="/surpresa/sala-a-dois.js?v=20260811d"' in room_html
-    assert 'ROOM_ASSET_VERSION = "20260811d"' in room_script
+    assert 'src="/surpresa/sala-a-dois.js?v=20261018a"' in room_html
+    assert 'ROOM_ASSET_VERSION = "20261018a"' in room_script
     assert 'id="reliableCallLink"' in room_html
     assert "https://meet.jit.si/" in room_script
     assert "PetOrlandiaSalaADois-${roomCode}" in room_script
@@ -148,10 +150,33 @@ def test_call_room_accepts_only_two_people(app):
         assert first.is_connected(CALL_NAMESPACE)
         assert second.is_connected(CALL_NAMESPACE)
         assert not third.is_connected(CALL_NAMESPACE)
-        assert len(call_room_members["SO-DOIS"]) == 2
+        with app.app_context():
+            assert room_state.participants(CALL_NAMESPACE, "SO-DOIS") == 2
     finally:
         if first.is_connected(CALL_NAMESPACE):
             first.disconnect(namespace=CALL_NAMESPACE)
         if second.is_connected(CALL_NAMESPACE):
             second.disconnect(namespace=CALL_NAMESPACE)
         _reset_call_state()
+
+
+def test_call_room_heartbeat_keeps_the_seat_while_stale_sessions_expire(app):
+    clock = _Clock()
+    room_state.configure(MemoryRoomBackend(clock=clock), session_ttl=10)
+    first = socketio.test_client(app, namespace=CALL_NAMESPACE, query_string="sala=PING")
+    second = socketio.test_client(app, namespace=CALL_NAMESPACE, query_string="sala=PING")
+    third = None
+
+    try:
+        for _ in range(3):  # só o primeiro manda heartbeat; o segundo "caiu com o worker"
+            clock.now += 8
+            first.emit("heartbeat", namespace=CALL_NAMESPACE)
+
+        third = socketio.test_client(app, namespace=CALL_NAMESPACE, query_string="sala=PING")
+        assert third.is_connected(CALL_NAMESPACE)
+        assert _events(third, "room_state")[0]["args"][0]["seat"] == 2
+    finally:
+        for client in (first, second, third):
+            if client is not None and client.is_connected(CALL_NAMESPACE):
+                client.disconnect(namespace=CALL_NAMESPACE)
+        room_state.configure()
@@ -1091,3 +1091,85 @@ def test_seed_protocolos_notas_idempotente_e_recomendavel(client):
         assert all(item["nome"] != "Obstrução urinária felina" for item in feline)
         feline_ok = recommend_protocols({"suspeita_clinica": "obstrucao uretral", "especie": "gato"})
         assert feline_ok and feline_ok[0]["nome"] == "Obstrução urinária felina"
+
+
+def _brute_force_ranking(context, clinic_id, limit=5):
+    """Ranking antigo: pontua todos os protocolos ativos com _score_protocol."""
+    from sqlalchemy import or_
+
+    from services.clinical_suggestions import _score_protocol
+
+    query = ProtocoloClinico.query.filter_by(ativo=True).filter(
+        or_(ProtocoloClinico.clinica_id.is_(None), ProtocoloClinico.clinica_id == clinic_id)
+    )
+    ranked = []
+    for protocol in query.order_by(
+        ProtocoloClinico.prioridade.asc(), ProtocoloClinico.nome.asc(), ProtocoloClinico.id.asc()
+    ):
+        score, reasons = _score_protocol(protocol, context)
+        if score > 0:
+            ranked.append((score, protocol.id, reasons))
+    ranked.sort(key=lambda entry: entry[0], reverse=True)
+    return ranked[:limit]
+
+
+def test_protocol_index_ranks_like_full_scan(app):
+    import random
+
+    from services.clinical_suggestions import protocol_index
+
+    rng = random.Random(7)
+    termos = ['otite', 'dermatite', 'tosse', 'vomito', 'diarreia', 'fratura', 'prurido', 'febre', 'apatia']
+    db.session.add(Clinica(id=1, nome='Clinica Indice'))
+    for index in range(300):
+        db.session.add(ProtocoloClinico(
+            nome=f'Protocolo {index:03d} {rng.choice(termos)}',
+            suspeita_principal=' '.join(rng.sample(termos, rng.randint(1, 2))),
+            especie=rng.choice([None, 'cao', 'gato', 'Canino', 'equino']),
+            sinais_gatilho=' '.join(rng.sample(termos, 3)),
+            prioridade=rng.randint(0, 40),
+            ativo=index % 11 != 0,
+            clinica_id=rng.choice([None, 1, 2]),
+        ))
+    db.session.commit()
+
+    contexts = [
+        {'suspeita_clinica': 'otite', 'especie': 'cao'},
+        {'suspeita_clinica': 'Dermatite alérgica', 'queixa_principal': 'prurido e febre', 'especie': 'Felino'},
+        {'suspeita_clinica': 'ot', 'especie': None},
+        {'queixa_principal': 'tosse', 'historico_clinico': 'apatia', 'especie': 'cavalo'},
+        {'suspeita_clinica': 'fratura vomito diarreia', 'exame_fisico': 'febre'},
+        {},
+    ]
+    index = protocol_index(1)
+    for context in contexts:
+        expected = _brute_force_ranking(context, 1)
+        assert index.rank(context, 5) == expected, context
+        assert [item['id'] for item in recommend_protocols(context, clinic_id=1)] == [
+            protocol_id for _score, protocol_id, _reasons in expected
+        ]
+
+
+def test_protocol_index_is_cached_and_invalidated_on_save(app):
+    from services.clinical_suggestions import protocol_index_stats
+
+    db.session.add_all([Clinica(id=1, nome='A'), Clinica(id=2, nome='B')])
+    protocolo = ProtocoloClinico(nome='Otite', suspeita_principal='otite externa', clinica_id=1, prioridade=5)
+    db.session.add(protocolo)
+    db.session.commit()
+
+    context = {'suspeita_clinica': 'otite externa', 'especie': 'cao'}
+    assert [item['nome'] for item in recommend_protocols(context, clinic_id=1)] == ['Otite']
+    recommend_protocols(context, clinic_id=2)
+    assert protocol_index_stats()['misses'] == 2
+
+    recommend_protocols(context, clinic_id=1)
+    assert protocol_index_stats()['hits'] == 1
+
+    protocolo.suspeita_principal = 'dermatite'
+    db.session.commit()
+
+    assert recommend_protocols(context, clinic_id=1)[0]['motivos'][0] != 'Suspeita clínica coincide com o protocolo.'
+    recommend_protocols(context, clinic_id=2)
+    # Só o índice da clínica 1 foi remontado; o da clínica 2 seguiu em cache.
+    assert protocol_index_stats()['misses'] == 3
@@ -0,0 +1,191 @@
+import io
+import json
+import sys
+import zipfile
+from types import SimpleNamespace
+
+import flask_login.utils as login_utils
+import pytest
+
+from extensions import db
+from models import Animal, Clinica, DataExport, User, Vacina
+from services import clinic_data_export, data_export
+from services.data_export import cleanup_exports, iter_csv, iter_json_array, iter_ndjson, stream_zip
+from time_utils import utcnow
+
+
+def _login(client, user):
+    with client.session_transaction() as session:
+        session.clear()
+        session["_user_id"] = str(user.id)
+        session["_fresh"] = True
+
+
+@pytest.fixture
+def clinic(app, client, monkeypatch, tmp_path):
+    app.config["DATA_EXPORT_DIR"] = str(tmp_path)
+    app.config["DATA_EXPORT_BUCKET"] = None
+    owner = User(name="Dra. Stream", email="stream.export@example.com")
+    owner.set_password("segredo123")
+    tutor = User(name="Tutor Stream", email="tutor.stream@example.com")
+    tutor.set_password("segredo123")
+    db.session.add_all([owner, tutor])
+    db.session.flush()
+    clinic = Clinica(nome="Clínica Stream", owner_id=owner.id)
+    db.session.add(clinic)
+    db.session.flush()
+    for index in range(30):
+        animal = Animal(name=f"Pet {index}", user_id=tutor.id, clinica_id=clinic.id)
+        db.session.add(animal)
+        db.session.flush()
+        db.session.add(Vacina(animal_id=animal.id, nome="V10"))
+    db.session.commit()
+    _login(client, owner)
+    monkeypatch.setattr(login_utils, "_get_user", lambda: owner)
+    yield clinic
+    app.config.pop("DATA_EXPORT_DIR", None)
+
+
+def test_writers_reproduzem_o_texto_dos_serializadores_inteiros():
+    rows = [{"id": index, "nome": f"Pet {index}", "peso": None} for index in range(7)]
+
+    assert "".join(iter_json_array(iter(rows), flush_rows=3)) == json.dumps(rows, ensure_ascii=False, indent=2)
+    assert "".join(iter_json_array(iter([]))) == "[]"
+    assert [json.loads(line) for line in "".join(iter_ndjson(rows, flush_rows=2)).splitlines()] == rows
+    chunks = list(iter_csv(["id", "nome"], ([row["id"], row["nome"]] for row in rows), flush_rows=3))
+    assert len(chunks) == 3
+    assert "".join(chunks).splitlines()[:2] == ["id,nome", "0,Pet 0"]
+
+
+def test_stream_zip_comprime_entradas_geradas_em_pedacos():
+    def linhas():
+        for index in range(2000):
+            yield f'{{"id": {index}}}\n'
+
+    chunks = list(stream_zip([("LEIA-ME.txt", "texto"), ("dados.ndjson", linhas())]))
+
+    archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    assert archive.read("LEIA-ME.txt") == b"texto"
+    assert len(archive.read("dados.ndjson").splitlines()) == 2000
+
+
+def test_exportacao_da_clinica_sai_em_stream(client, clinic):
+    response = client.get(f"/clinica/{clinic.id}/exportar-dados", headers={"Accept": "text/html"})
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers["Content-Disposition"] == f"attachment; filename=petorlandia-clinica-{clinic.id}-dados.zip"
+    with zipfile.ZipFile(io.BytesIO(response.data)) as bundle:
+        assert len(json.loads(bundle.read("pacientes.json"))) == 30
+        assert len(json.loads(bundle.read("vacinas.json"))) == 30
+        assert [tutor["nome"] for tutor in json.loads(bundle.read("tutores.json"))] == ["Tutor Stream"]
+
+
+def test_exportacao_da_clinica_em_ndjson(client, clinic):
+    response = client.get(f"/clinica/{clinic.id}/exportar-dados?formato=ndjson")
+
+    with zipfile.ZipFile(io.BytesIO(response.data)) as bundle:
+        patients = [json.loads(line) for line in bundle.read("pacientes.ndjson").splitlines()]
+        assert [patient["name"] for patient in patients[:2]] == ["Pet 0", "Pet 1"]
+        assert len(patients) == 30
+    assert client.get(f"/clinica/{clinic.id}/exportar-dados?formato=xml").status_code == 400
+
+
+def test_exportacao_grande_vai_para_background_e_gera_link(app, client, clinic):
+    # Sem broker Celery nos testes: queue_clinic_export cai no fallback síncrono.
+    app.config["DATA_EXPORT_BACKGROUND_ROWS"] = 50
+
+    queued = client.get(f"/clinica/{clinic.id}/exportar-dados", headers={"Accept": "application/json"})
+    download = client.get(queued.get_json()["download_url"])
+
+    assert queued.status_code == 202
+    assert download.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(download.data)) as bundle:
+        assert len(json.loads(bundle.read("pacientes.json"))) == 30
+    assert client.get(f"/clinica/{clinic.id}/exportar-dados/token-que-nao-existe-123").status_code == 404
+
+
+def test_sem_bucket_a_exportacao_roda_numa_thread_e_o_request_nao_espera(app, client, clinic, monkeypatch):
+    submitted = []
+    monkeypatch.setattr(data_export, "_executor", lambda: SimpleNamespace(submit=lambda *job: submitted.append(job)))
+    monkeypatch.setattr(app, "testing", False)
+
+    token = clinic_data_export.queue_clinic_export(clinic.id)
+
+    assert clinic_data_export._store.status(clinic.id, token) == "pending"
+    [(job, *args)] = submitted
+    job(*args)  # o que a thread do executor faria
+    db.session.expire_all()
+    assert clinic_data_export._store.status(clinic.id, token) == "ready"
+
+
+def test_estado_da_exportacao_fica_no_banco_e_pendente_antigo_vira_falha(app, clinic, tmp_path):
+    store = clinic_data_export._store
+    token = store.reserve(clinic.id)
+    record = DataExport.query.filter_by(token=token).one()
+
+    assert (record.kind, record.owner_id, store.status(clinic.id, token)) == ("clinic_data", clinic.id, "pending")
+    assert not list(tmp_path.iterdir())  # nenhum marcador no disco local
+
+    record.created_at = utcnow() - store.pending_timeout()
+    db.session.commit()
+    assert store.status(clinic.id, token) == "failed"
+
+    def broken_chunks():
+        yield b"PK"
+        raise RuntimeError("disco cheio")
+
+    other = store.reserve(clinic.id)
+    with pytest.raises(RuntimeError):
+        store.write(clinic.id, other, broken_chunks())
+    assert DataExport.query.filter_by(token=other).one().error == "disco cheio"
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_limpeza_apaga_exportacoes_vencidas_e_arquivos(app, client, clinic, tmp_path):
+    app.config["DATA_EXPORT_BACKGROUND_ROWS"] = 1
+    queued = client.get(f"/clinica/{clinic.id}/exportar-dados", headers={"Accept": "application/json"})
+    record = DataExport.query.one()
+    assert (tmp_path / record.storage_key).exists()
+    (tmp_path / "9-orfao.zip.part").write_bytes(b"x")
+
+    assert cleanup_exports()["clinic_data"] == 0
+    record.expires_at = utcnow()
+    db.session.commit()
+    assert cleanup_exports()["clinic_data"] == 1
+
+    assert DataExport.query.count() == 0
+    assert not (tmp_path / record.storage_key).exists()
+    assert client.get(queued.get_json()["download_url"]).status_code == 404
+
+
+class _FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        self.objects[(bucket, key)] = fileobj.read()
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://{Params['Bucket']}.s3.example/{Params['Key']}?expira={ExpiresIn}"
+
+
+def test_bucket_configurado_grava_no_s3_e_entrega_link_assinado(app, client, clinic, monkeypatch):
+    fake = _FakeS3()
+    monkeypatch.setattr(data_export, "_s3", fake)
+    app.config["DATA_EXPORT_BUCKET"] = "exports-bucket"
+    dispatched = []
+    task = SimpleNamespace(delay=lambda *args: dispatched.append(args) or clinic_data_export.export_to_storage(*args))
+    monkeypatch.setitem(sys.modules, "app.jobs.tasks", SimpleNamespace(export_clinic_data=task))
+
+    queued = client.get(f"/clinica/{clinic.id}/exportar-dados?background=1", headers={"Accept": "application/json"})
+    download = client.get(queued.get_json()["download_url"])
+
+    key = f"exports/clinic_data/{DataExport.query.one().storage_key}"
+    assert dispatched and dispatched[0][0] == clinic.id
+    assert zipfile.ZipFile(io.BytesIO(fake.objects[("exports-bucket", key)])).namelist()
+    assert download.status_code == 302
+    assert download.headers["Location"].startswith(f"https://exports-bucket.s3.example/{key}")
@@ -1,6 +1,6 @@
 import os
 import sys
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
 
 import pytest
@@ -11,6 +11,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 from app import app as flask_app, db  # noqa: E402
 from models import (  # noqa: E402
     Animal,
+    ClassifiedMonthlyTotal,
     ClassifiedTransaction,
     ClinicFinancialSnapshot,
     ClinicNotification,
@@ -28,11 +29,15 @@ from models import (  # noqa: E402
 )
 from services.finance import (  # noqa: E402
     calculate_clinic_taxes,
+    classify_transactions_bulk,
+    build_accounting_dashboard,
     classify_transactions_for_month,
     generate_clinic_notifications,
     generate_financial_snapshot,
+    reconcile_classified_totals,
     update_financial_snapshots_daily,
 )
+from time_utils import utcnow  # noqa: E402
 
 
 @pytest.fixture
@@ -602,3 +607,186 @@ def test_cli_classify_transactions_history_reprocesses_previous_months(app):
         april_entry = next(entry for entry in entries if entry.month == date(2024, 4, 1))
         assert april_entry.description.startswith('Limpeza dental')
         assert april_entry.value == Decimal('300.00')
+
+
+def _classified_rows():
+    return sorted(
+        (row.clinic_id, row.raw_id, row.month, row.origin, row.description, row.value, row.category, row.subcategory)
+        for row in ClassifiedTransaction.query.all()
+    )
+
+
+def test_bulk_classification_matches_month_by_month(app):
+    months = [date(2024, 4, 1), date(2024, 5, 1), date(2024, 6, 1)]
+    with app.app_context():
+        clinic = _create_clinic_with_data()
+        _seed_budget_entries(clinic)
+        for month in months:
+            classify_transactions_for_month(clinic.id, month)
+        expected = _classified_rows()
+        ClassifiedTransaction.query.delete()
+        db.session.commit()
+
+        stats = classify_transactions_bulk([clinic.id], months)
+        db.session.commit()
+
+        assert expected
+        assert stats.written == len(expected)
+        assert _classified_rows() == expected
+
+
+def test_bulk_classification_skips_unchanged_rows_and_uses_watermark(app):
+    from sqlalchemy import event
+
+    months = [date(2024, 5, 1)]
+    with app.app_context():
+        clinic = _create_clinic_with_data()
+        payment = PJPayment.query.filter_by(clinic_id=clinic.id).one()
+        payment.updated_at = utcnow() - timedelta(days=1)
+        db.session.commit()
+        classify_transactions_bulk([clinic.id], months)
+        db.session.commit()
+
+        writes = []
+
+        def _capture(_conn, _cursor, statement, *_args):
+            if 'classified_transactions' in statement and not statement.lstrip().upper().startswith('SELECT'):
+                writes.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', _capture)
+        try:
+            stats = classify_transactions_bulk([clinic.id], months)
+            db.session.commit()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', _capture)
+        assert stats.written == 0
+        assert stats.unchanged == 2  # serviço e venda; o PJ ficou abaixo do watermark
+        assert writes == []
+
+        payment.valor = Decimal('9000.00')
+        db.session.commit()
+
+        stats = classify_transactions_bulk([clinic.id], months)
+        db.session.commit()
+
+        entry = ClassifiedTransaction.query.filter_by(origin='vet_payment').one()
+        assert stats.written == 1
+        assert entry.value == Decimal('9000.00')
+
+
+def test_classification_watermark_is_compared_in_utc():
+    from sqlalchemy import Column, DateTime
+
+    from services.finance import _watermark_datetime
+
+    position = int(datetime(2024, 5, 10, 12, 0, tzinfo=timezone.utc).timestamp())
+
+    assert _watermark_datetime(Column(DateTime()), position) == datetime(2024, 5, 10, 12, 0)
+    aware = _watermark_datetime(Column(DateTime(timezone=True)), position)
+    assert aware == datetime(2024, 5, 10, 12, 0, tzinfo=timezone.utc)
+    assert PJPayment.updated_at.property.columns[0].onupdate.arg.__name__ == 'utcnow'
+
+
+def _raw_totals():
+    from sqlalchemy import func
+
+    rows = (
+        db.session.query(
+            ClassifiedTransaction.clinic_id,
+            ClassifiedTransaction.month,
+            ClassifiedTransaction.category,
+            func.sum(ClassifiedTransaction.value),
+            func.count(ClassifiedTransaction.id),
+        )
+        .group_by(ClassifiedTransaction.clinic_id, ClassifiedTransaction.month, ClassifiedTransaction.category)
+        .all()
+    )
+    return {(c, m, cat): (Decimal(total).quantize(Decimal('0.01')), count) for c, m, cat, total, count in rows}
+
+
+def _stored_totals():
+    return {
+        (row.clinic_id, row.month, row.category): (Decimal(row.total).quantize(Decimal('0.01')), row.count)
+        for row in ClassifiedMonthlyTotal.query.all()
+        if row.count
+    }
+
+
+def test_monthly_totals_follow_orm_writes(app):
+    from app import _delete_pj_payment_classification, _sync_pj_payment_classification
+
+    with app.app_context():
+        clinic = _create_clinic_with_data()
+        classify_transactions_for_month(clinic.id, date(2024, 5, 1))
+        assert _stored_totals() == _raw_totals()
+
+        entry = ClassifiedTransaction.query.filter_by(origin='service').one()
+        db.session.expire(entry)
+        entry.value = Decimal('200.00')
+        entry.month = date(2024, 4, 1)
+        db.session.commit()
+        assert _stored_totals() == _raw_totals()
+
+        payment = PJPayment.query.filter_by(clinic_id=clinic.id).one()
+        _sync_pj_payment_classification(payment)
+        db.session.commit()
+        assert _stored_totals() == _raw_totals()
+
+        _delete_pj_payment_classification(payment.id)
+        ClassifiedTransaction.query.filter_by(origin='product_sale').one().category = 'custo_produto'
+        db.session.commit()
+        assert _stored_totals() == _raw_totals()
+
+        stats = classify_transactions_bulk([clinic.id], [date(2024, 4, 1), date(2024, 5, 1)])
+        db.session.commit()
+        assert stats.written == 2  # serviço volta para maio e venda volta para receita
+        assert _stored_totals() == _raw_totals()
+
+
+def test_reconcile_classified_totals_repairs_drift(app):
+    with app.app_context():
+        clinic = _create_clinic_with_data()
+        classify_transactions_for_month(clinic.id, date(2024, 5, 1))
+        assert build_accounting_dashboard(clinic.id, date(2024, 5, 1))['faturamento_mes'] == Decimal('220.50')
+
+        # Escrita fora do ORM: o listener não vê e os totais divergem.
+        ClassifiedTransaction.query.filter_by(origin='service').delete()
+        db.session.commit()
+
+        result = reconcile_classified_totals()
+
+        assert result.repaired == 1
+        assert _stored_totals() == _raw_totals()
+        assert reconcile_classified_totals([clinic.id]).repaired == 0
+
+
+def test_reconcile_applies_relative_correction_over_concurrent_delta(app, monkeypatch):
+    import services.finance as finance_module
+    from models.financeiro import apply_classified_total_deltas
+
+    with app.app_context():
+        clinic = _create_clinic_with_data()
+        classify_transactions_for_month(clinic.id, date(2024, 5, 1))
+        ClassifiedTransaction.query.filter_by(origin='service').delete()
+        db.session.commit()
+
+        def concurrent_write_then_correct(connection, deltas):
+            # Outro worker grava depois da leitura da conciliação: transação
+            # nova e o delta do listener, como num commit concorrente.
+            connection.execute(
+                ClassifiedTransaction.__table__.insert().values(
+                    clinic_id=clinic.id, date=datetime(2024, 5, 20), month=date(2024, 5, 1),
+                    origin='manual', description='Concorrente', value=Decimal('30.00'),
+                    category='receita_servico', raw_id='concorrente-1', created_at=datetime(2024, 5, 20),
+                )
+            )
+            apply_classified_total_deltas(
+                connection, {(clinic.id, date(2024, 5, 1), 'receita_servico'): (Decimal('30.00'), 1)}
+            )
+            return apply_classified_total_deltas(connection, deltas)
+
+        monkeypatch.setattr(finance_module, 'apply_classified_total_deltas', concurrent_write_then_correct)
+        assert reconcile_classified_totals([clinic.id]).repaired == 1
+
+        assert _stored_totals() == _raw_totals()
+
@@ -0,0 +1,174 @@
+import datetime as dt
+import ipaddress
+import json
+import ssl
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import pkcs12
+from cryptography.x509.oid import NameOID
+
+from extensions import db
+from models import Clinica, FiscalCertificate, FiscalEmitter
+from providers.fiscal.mtls import MtlsSessionPool, fiscal_session_pool, load_pkcs12
+from providers.nfse.nacional.client import NacionalNfseClient, NacionalNfseConfig
+
+
+def _issue(name, issuer_key=None, issuer_name=None, *, ca=False, san=None):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, name)])
+    now = dt.datetime.now(dt.timezone.utc)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(subject)
+        .issuer_name(issuer_name or subject)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - dt.timedelta(days=1))
+        .not_valid_after(now + dt.timedelta(days=1))
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+    )
+    if san:
+        builder = builder.add_extension(x509.SubjectAlternativeName(san), critical=False)
+    return key, builder.sign(issuer_key or key, hashes.SHA256())
+
+
+def _pem(path, *objects):
+    chunks = []
+    for obj in objects:
+        if isinstance(obj, x509.Certificate):
+            chunks.append(obj.public_bytes(serialization.Encoding.PEM))
+        else:
+            chunks.append(obj.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+            ))
+    path.write_bytes(b"".join(chunks))
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def pki(tmp_path_factory):
+    base = tmp_path_factory.mktemp("pki")
+    ca_key, ca_cert = _issue("Teste CA", ca=True)
+    server_key, server_cert = _issue(
+        "127.0.0.1", ca_key, ca_cert.subject, san=[x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]
+    )
+    client_key, client_cert = _issue("Emissor Teste", ca_key, ca_cert.subject)
+    pfx = pkcs12.serialize_key_and_certificates(
+        b"emissor", client_key, client_cert, None, serialization.BestAvailableEncryption(b"senha"),
+    )
+    return {
+        "ca": _pem(base / "ca.pem", ca_cert),
+        "server": (_pem(base / "server.pem", server_cert), _pem(base / "server.key", server_key)),
+        "pfx": pfx,
+    }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        peer = self.connection.getpeercert()
+        body = json.dumps({"chaveAcesso": "1" * 50, "cliente": dict(x[0] for x in peer["subject"])}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_args):
+        pass
+
+
+class _MtlsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, pki):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.handshakes = 0
+        context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH, cafile=pki["ca"])
+        context.verify_mode = ssl.CERT_REQUIRED
+        context.load_cert_chain(*pki["server"])
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+
+    def get_request(self):
+        request = super().get_request()
+        self.handshakes += 1
+        return request
+
+
+@pytest.fixture()
+def server(pki, monkeypatch):
+    monkeypatch.setenv("REQUESTS_CA_BUNDLE", pki["ca"])
+    httpd = _MtlsServer(pki)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _client(server, pki, pool=None):
+    config = NacionalNfseConfig(base_url=f"https://127.0.0.1:{server.server_address[1]}")
+    return NacionalNfseClient(config, pfx_bytes=pki["pfx"], pfx_password="senha", session_pool=pool, pool_key=7)
+
+
+def test_pool_reaproveita_conexao_mtls_entre_consultas(server, pki):
+    pool = MtlsSessionPool()
+
+    for _ in range(5):
+        response = _client(server, pki, pool).consultar_nfse("1" * 50)
+        assert response.success, response.error_message
+        assert response.response_json["cliente"]["commonName"] == "Emissor Teste"
+    pooled = server.handshakes
+
+    for _ in range(5):
+        assert _client(server, pki).consultar_nfse("1" * 50).success
+    pool.clear()
+
+    assert pooled == 1
+    assert server.handshakes - pooled == 5
+
+
+def test_pkcs12_parseado_uma_vez_por_conteudo(pki):
+    first = load_pkcs12(pki["pfx"], "senha")
+
+    assert load_pkcs12(pki["pfx"], "senha") is first
+    with pytest.raises(ValueError):
+        load_pkcs12(pki["pfx"], "errada")
+
+
+def test_troca_de_certificado_derruba_sessao_do_emissor(app, pki):
+    clinic = Clinica(nome="Clínica Fiscal")
+    db.session.add(clinic)
+    db.session.flush()
+    emitter = FiscalEmitter(clinic_id=clinic.id, cnpj="12345678000195", razao_social="Clínica Fiscal LTDA")
+    db.session.add(emitter)
+    db.session.commit()
+    session = fiscal_session_pool.session(emitter.id, pki["pfx"], "senha")
+
+    db.session.add(FiscalCertificate(
+        emitter_id=emitter.id, pfx_encrypted=b"x", pfx_password_encrypted="x", fingerprint_sha256="f" * 64,
+    ))
+    db.session.commit()
+
+    assert fiscal_session_pool.session(emitter.id, pki["pfx"], "senha") is not session
+    fiscal_session_pool.clear()
+
+
+def test_timeout_do_cliente_vai_por_request_sem_alterar_sessao_do_pool(pki):
+    from providers.nfse.betha.client import BethaNfseClient, BethaWsdlConfig
+
+    pool = MtlsSessionPool()
+    wsdl = BethaWsdlConfig("https://x/wsdl", "https://x/wsdl", "https://x/wsdl", "https://x/wsdl")
+    client = BethaNfseClient(wsdl, pki["pfx"], "senha", timeout=7, session_pool=pool, pool_key=1)
+
+    with client._transport() as (_history, transport):
+        assert transport.session is pool.session(1, pki["pfx"], "senha")
+        assert (transport.load_timeout, transport.operation_timeout) == (7, 7)
+    assert not hasattr(transport.session, "timeout")
+    pool.clear()
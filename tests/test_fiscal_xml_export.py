@@ -0,0 +1,108 @@
+import io
+import zipfile
+from types import SimpleNamespace
+
+import flask_login.utils as login_utils
+import pytest
+
+from extensions import db
+from models import Clinica, DataExport, FiscalDocument, FiscalDocumentStatus, FiscalDocumentType, FiscalEmitter
+from services.fiscal import xml_export
+from services.fiscal.xml_export import XmlExportFilters, iter_authorized_xmls, stream_zip
+
+
+@pytest.fixture
+def clinic(app, monkeypatch, tmp_path):
+    monkeypatch.setenv("FISCAL_MASTER_KEY", "test-master-key")
+    app.config["FISCAL_EXPORT_DIR"] = str(tmp_path)
+    app.config["DATA_EXPORT_BUCKET"] = None
+    clinic = Clinica(nome="Clínica Fiscal")
+    db.session.add(clinic)
+    db.session.flush()
+    emitter = FiscalEmitter(clinic_id=clinic.id, cnpj="12345678000195", razao_social="Clínica Fiscal LTDA")
+    db.session.add(emitter)
+    db.session.commit()
+    owner = SimpleNamespace(
+        id=11, is_authenticated=True, role=None, worker=None, clinica_id=clinic.id,
+        veterinario=None, clinicas=[clinic], clinic_roles=[],
+    )
+    monkeypatch.setattr(login_utils, "_get_user", lambda: owner)
+    yield clinic
+    app.config.pop("FISCAL_EXPORT_DIR", None)
+
+
+def _documents(clinic, count, doc_type=FiscalDocumentType.NFSE):
+    emitter = FiscalEmitter.query.filter_by(clinic_id=clinic.id).one()
+    for index in range(count):
+        document = FiscalDocument(
+            emitter_id=emitter.id,
+            clinic_id=clinic.id,
+            doc_type=doc_type,
+            status=FiscalDocumentStatus.AUTHORIZED,
+            nfse_number=str(index + 1),
+        )
+        document.xml_authorized = f"<nfse numero='{index + 1}'/>"
+        db.session.add(document)
+    db.session.commit()
+
+
+def test_exportacao_transmite_zip_com_todos_os_xmls(client, clinic):
+    _documents(clinic, 3)
+
+    response = client.get("/fiscal/exports/xmls?start_date=2000-01-01")
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.headers["Content-Disposition"].startswith("attachment; filename=xmls-fiscais-20000101-")
+    archive = zipfile.ZipFile(io.BytesIO(response.data))
+    assert sorted(archive.namelist()) == ["nfse-1.xml", "nfse-2.xml", "nfse-3.xml"]
+    assert archive.read("nfse-2.xml") == b"<nfse numero='2'/>"
+
+
+def test_exportacao_sem_documentos_retorna_404(client, clinic):
+    _documents(clinic, 2, doc_type=FiscalDocumentType.NFE)
+
+    assert client.get("/fiscal/exports/xmls?doc_type=nfse").status_code == 404
+    assert client.get("/fiscal/exports/xmls?doc_type=xpto").status_code == 400
+
+
+def test_exportacao_em_background_gera_link_de_download(client, clinic):
+    # Sem bucket compartilhado a exportação roda no próprio processo.
+    _documents(clinic, 2)
+
+    queued = client.get("/fiscal/exports/xmls?background=1")
+    download = client.get(queued.get_json()["download_url"])
+
+    assert queued.status_code == 202
+    assert download.status_code == 200
+    assert download.headers["Content-Disposition"].startswith("attachment; filename=xmls-fiscais-inicio-hoje.zip")
+    assert len(zipfile.ZipFile(io.BytesIO(download.data)).namelist()) == 2
+    assert client.get("/fiscal/exports/xmls/token-que-nao-existe-123").status_code == 404
+
+
+def test_exportacao_em_background_registra_estado_e_falha_vira_410(client, clinic, monkeypatch):
+    _documents(clinic, 1)
+
+    def broken(filters, batch_size=200):
+        yield "nfse-1.xml", "<nfse/>"
+        raise RuntimeError("XML corrompido")
+
+    monkeypatch.setattr(xml_export, "iter_authorized_xmls", broken)
+    queued = client.get("/fiscal/exports/xmls?background=1")
+    record = DataExport.query.one()
+
+    assert (record.kind, record.owner_id, record.status) == ("fiscal_xml", clinic.id, DataExport.FAILED)
+    assert record.error == "XML corrompido"
+    assert client.get(queued.get_json()["download_url"]).status_code == 410
+
+
+def test_stream_zip_nao_acumula_o_arquivo_inteiro(clinic):
+    _documents(clinic, 40)
+    entries = iter_authorized_xmls(XmlExportFilters(clinic_id=clinic.id), batch_size=5)
+
+    chunks = list(stream_zip(entries))
+
+    assert len(chunks) > 40
+    # Um pedaço por XML; só o último (diretório central) cresce com o total.
+    assert max(len(chunk) for chunk in chunks[:-1]) < 1024
+    assert len(zipfile.ZipFile(io.BytesIO(b"".join(chunks))).namelist()) == 40
@@ -0,0 +1,175 @@
+import pytest
+from sqlalchemy import text
+
+from extensions import db
+from models import Endereco, GeocodeCacheEntry, JobCheckpoint
+from services import vacina_pmo_service
+from services.geocode_queue import CHECKPOINT_KEY, AddressGeocodeQueue
+from services.geocoding import GeocodeCache, TokenBucket, geocode_cache, geocode_cache_key
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class _FakeGeocoder:
+    """Resolve endereços por rua; consome uma ficha por "requisição"."""
+
+    def __init__(self, coords_by_street, on_call=None):
+        self.coords_by_street = coords_by_street
+        self.calls = []
+        self.on_call = on_call
+
+    def __call__(self, *, rua=None, session=None, rate_limiter=None, max_requests=None, **fields):
+        rate_limiter.acquire()
+        self.calls.append(rua)
+        if self.on_call:
+            self.on_call(len(self.calls))
+        return self.coords_by_street.get(rua)
+
+
+@pytest.fixture(autouse=True)
+def _clear_geocode_memory():
+    geocode_cache.clear_memory()
+    yield
+    geocode_cache.clear_memory()
+
+
+def _endereco(rua, numero="10", **extra):
+    return Endereco(rua=rua, numero=numero, bairro="Centro", cidade="Orlândia", estado="SP", **extra)
+
+
+def test_token_bucket_espaca_requisicoes_sem_sleep_fixo():
+    clock = _FakeClock()
+    bucket = TokenBucket(2.0, capacity=2, clock=clock, sleep=clock.sleep)
+
+    waits = [bucket.acquire() for _ in range(4)]
+
+    assert waits[:2] == [0.0, 0.0]  # rajada inicial
+    assert waits[2:] == [0.5, 0.5]
+    assert bucket.waited_seconds == pytest.approx(1.0)
+
+
+def test_fila_deduplica_usa_cache_e_grava_por_lote(app):
+    db.session.add_all([
+        _endereco("Rua A"),
+        _endereco("rua a "),  # mesmo endereço normalizado
+        _endereco("Rua B"),
+        _endereco("Rua Sem Resultado"),
+        _endereco("Rua Ja Geocodificada", latitude=1.0, longitude=1.0),
+        _endereco("Rua Cacheada"),
+    ])
+    db.session.commit()
+    cached_key = geocode_cache_key("Rua Cacheada", "10", "Centro", "Orlândia", "SP", None)
+    geocode_cache.put_many({cached_key: (-20.7, -47.9)}, source="pmo")
+    db.session.commit()
+    geocode_cache.clear_memory()
+
+    clock = _FakeClock()
+    geocoder = _FakeGeocoder({"Rua A": (-20.71, -47.88), "Rua B": (-20.72, -47.87)})
+    queue = AddressGeocodeQueue(
+        app,
+        geocoder=geocoder,
+        rate_limiter=TokenBucket(1.0, clock=clock, sleep=clock.sleep),
+        chunk_size=3,
+    )
+
+    status = queue.run_pending()
+
+    assert geocoder.calls == ["Rua A", "Rua B", "Rua Sem Resultado"]
+    assert clock.sleeps == [1.0, 1.0]
+    assert status["processed"] == 5
+    assert status["updated"] == 4
+    assert status["skipped"] == 1
+    assert status["deduplicated"] == 1
+    assert status["cache_hits"] == 1
+    assert status["chunks"] == 2
+    coords = {e.rua: (e.latitude, e.longitude) for e in Endereco.query.all()}
+    assert coords["rua a "] == (-20.71, -47.88)
+    assert coords["Rua Cacheada"] == (-20.7, -47.9)
+    assert coords["Rua Sem Resultado"] == (None, None)
+    assert GeocodeCacheEntry.query.count() == 3
+    # Passada completa zera o cursor para a próxima tentar de novo.
+    assert JobCheckpoint.get(CHECKPOINT_KEY) == 0
+
+
+def test_fila_retoma_do_cursor_apos_interrupcao(app):
+    db.session.add_all([_endereco(f"Rua {idx}") for idx in range(5)])
+    db.session.commit()
+    coords = {f"Rua {idx}": (-20.0 - idx, -47.0) for idx in range(5)}
+    clock = _FakeClock()
+
+    primeira = AddressGeocodeQueue(
+        app,
+        rate_limiter=TokenBucket(100.0, clock=clock, sleep=clock.sleep),
+        chunk_size=2,
+    )
+    # Simula o dyno caindo durante o segundo lote.
+    primeira._geocoder = _FakeGeocoder(coords, on_call=lambda n: n == 3 and primeira.stop())
+    primeira.run_pending()
+    cursor = JobCheckpoint.get(CHECKPOINT_KEY)
+    assert cursor == 3
+    assert Endereco.query.filter(Endereco.latitude.isnot(None)).count() == 3
+
+    segunda_geocoder = _FakeGeocoder(coords)
+    segunda = AddressGeocodeQueue(
+        app,
+        geocoder=segunda_geocoder,
+        rate_limiter=TokenBucket(100.0, clock=clock, sleep=clock.sleep),
+        chunk_size=2,
+    )
+    status = segunda.run_pending()
+
+    assert status["resumed_from"] == 3
+    assert segunda_geocoder.calls == ["Rua 3", "Rua 4"]
+    assert Endereco.query.filter(Endereco.latitude.is_(None)).count() == 0
+
+
+def test_pmo_reaproveita_cache_persistido(app, monkeypatch):
+    address = "Rua das Flores, 100, Centro"
+    key = vacina_pmo_service._pmo_geocode_cache_key(address)
+    geocode_cache.put_many({key: (-20.72, -47.88)}, source="endereco")
+    db.session.commit()
+    geocode_cache.clear_memory()
+
+    def _no_network(*_args, **_kwargs):
+        raise AssertionError("não deveria consultar o Google")
+
+    monkeypatch.setattr(vacina_pmo_service, "_pmo_geocode_google", _no_network)
+
+    assert vacina_pmo_service._pmo_geocode_address(address) == (-20.72, -47.88)
+    assert key in vacina_pmo_service._PMO_ROUTE_COORDS_CACHE
+
+
+def test_chave_unica_memoria_limitada_e_leitura_nao_desfaz_a_sessao(app, monkeypatch):
+    endereco = "Rua das Flores, 100, Centro"
+    assert vacina_pmo_service._pmo_geocode_cache_key(endereco) == geocode_cache_key(
+        "Rua das Flores", "100", "Centro"
+    )
+
+    cache = GeocodeCache(max_entries=2)
+    for index in range(3):
+        cache.memory[f"k{index}"] = (float(index), 0.0)
+    assert list(cache.memory) == ["k1", "k2"]
+
+    pendente = _endereco("Rua Pendente")
+    db.session.add(pendente)
+    db.session.flush()
+
+    def _tabela_ausente(*_args, **_kwargs):
+        return db.session.execute(text("SELECT * FROM geocode_cache_inexistente"))
+
+    monkeypatch.setattr(db.session, "query", _tabela_ausente)
+    assert cache.get_many(["sem-entrada"]) == {}
+    monkeypatch.undo()
+    db.session.commit()
+    assert Endereco.query.filter_by(rua="Rua Pendente").count() == 1
@@ -0,0 +1,167 @@
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from flask import render_template_string
+from PIL import Image
+from sqlalchemy import event, text
+from werkzeug.datastructures import FileStorage
+
+import app as app_module
+from extensions import db
+from models import ImageAsset, User
+from services import image_pipeline
+from services.image_pipeline import derivative_worker, image_srcset, image_variant, variants_cache
+
+
+@pytest.fixture
+def local_uploads(app, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, "BUCKET", None)
+    monkeypatch.setattr(app_module, "PROJECT_ROOT", tmp_path)
+    app.config["IMAGE_CACHE_DIR"] = str(tmp_path / "cache")
+    derivative_worker.discard()
+    variants_cache.clear()
+    yield tmp_path / "static" / "uploads"
+    derivative_worker.discard()
+    variants_cache.clear()
+    app.config.pop("IMAGE_CACHE_DIR", None)
+
+
+def _photo(size=(2000, 1000), color=(200, 40, 40), fmt="PNG"):
+    buffer = BytesIO()
+    Image.new("RGB", size, color).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+
+def _upload(data, filename, folder="products"):
+    storage = FileStorage(stream=BytesIO(data), filename=filename, content_type="image/png")
+    return app_module.upload_to_s3(storage, filename, folder=folder)
+
+
+def test_derivados_saem_do_request_e_alimentam_o_srcset(local_uploads):
+    url = _upload(_photo(), "racao.png")
+
+    assert url == "/static/uploads/products/racao.jpg"
+    assert image_srcset(url) == ""
+    assert derivative_worker.flush() == 1
+
+    asset = ImageAsset.query.filter_by(url=url).one()
+    assert [item["w"] for item in asset.variants] == [160, 480, 1280]
+    assert (local_uploads / asset.original_key).read_bytes() == _photo()
+    srcset = image_srcset(url, "webp")
+    assert srcset.count(".webp") == 3 and srcset.endswith(" 1280w")
+    assert image_variant(url, 300).endswith("/480.jpg")
+    with Image.open(local_uploads / image_variant(url, 100).removeprefix("/static/uploads/")) as thumb:
+        assert thumb.size == (160, 80)
+
+
+def test_mesmo_conteudo_reaproveita_original_e_derivados(local_uploads, monkeypatch):
+    data = _photo(size=(600, 600))
+    first = _upload(data, "a.png")
+    derivative_worker.flush()
+
+    renders = []
+    original_render = image_pipeline.render_derivatives
+    monkeypatch.setattr(
+        image_pipeline, "render_derivatives", lambda image: renders.append(image) or original_render(image)
+    )
+    second = _upload(data, "b.png")
+    derivative_worker.flush()
+
+    assert first != second
+    assert renders == []
+    assert image_srcset(second) == image_srcset(first)
+    assert [item["w"] for item in ImageAsset.query.filter_by(url=second).one().variants] == [160, 480]
+    assert len(list((local_uploads / "images" / "originals").iterdir())) == 1
+
+
+def test_rotacao_usa_original_em_cache(local_uploads, monkeypatch):
+    url = _upload(_photo(size=(400, 200)), "pet.png", folder="animals")
+    (local_uploads / "animals" / "pet.jpg").unlink()
+
+    def sem_rede(*_args, **_kwargs):
+        raise AssertionError("não deveria baixar a imagem")
+
+    monkeypatch.setattr(app_module.requests, "get", sem_rede)
+    rotated = app_module.bake_image_rotation(url, 90, folder="animals")
+
+    assert rotated != url
+    with Image.open(local_uploads / rotated.removeprefix("/static/uploads/")) as image:
+        assert image.size == (200, 400)
+
+
+def test_card_do_produto_usa_picture_com_webp(local_uploads):
+    url = _upload(_photo(), "sache.png")
+    template = (
+        "{% from 'components/product_media.html' import media_image %}"
+        "{{ media_image(url, 'Sachê') }}"
+    )
+
+    before = render_template_string(template, url=url)
+    derivative_worker.flush()
+    after = render_template_string(template, url=url)
+
+    assert "srcset" not in before
+    assert 'type="image/webp"' in after
+    assert 'sizes="(max-width: 576px) 50vw, 280px"' in after
+
+
+def test_sem_async_fora_dos_testes_o_job_roda_na_hora(app, local_uploads, monkeypatch):
+    monkeypatch.setitem(app.config, "TESTING", False)
+    monkeypatch.setitem(app.config, "IMAGE_DERIVATIVES_ASYNC", False)
+    url = "/static/uploads/products/na-hora.jpg"
+    image_pipeline.register_upload(_photo(size=(600, 300)), url, image_pipeline.LocalImageStorage(local_uploads))
+
+    assert derivative_worker.flush() == 0
+    assert image_variant(url, 100).endswith("/160.jpg")
+
+
+def test_grade_busca_os_derivados_da_pagina_numa_consulta(app, local_uploads):
+    first = _upload(_photo(), "um.png")
+    second = _upload(_photo(color=(10, 10, 200)), "dois.png")
+    derivative_worker.flush()
+    variants_cache.clear()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        image_pipeline.prefetch_image_variants([first, second, "/static/legado.jpg", None])
+        srcsets = [image_srcset(url) for url in (first, second, "/static/legado.jpg")]
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert len([sql for sql in statements if "image_asset" in sql]) == 1
+    assert srcsets[0] and srcsets[1] and srcsets[2] == ""
+
+
+def test_falha_na_leitura_nao_desfaz_a_transacao_do_request(app, local_uploads, monkeypatch):
+    user = User(name="Tutor", email="tutor-imagem@example.com")
+    user.set_password("x")
+    db.session.add(user)
+    db.session.flush()
+
+    def _tabela_ausente(*_args, **_kwargs):
+        return db.session.execute(text("SELECT * FROM image_asset_inexistente"))
+
+    with monkeypatch.context() as patch:
+        patch.setattr(db.session, "query", _tabela_ausente)
+        assert image_srcset("/static/uploads/sem-tabela.jpg") == ""
+    db.session.commit()
+    assert User.query.filter_by(email="tutor-imagem@example.com").count() == 1
+
+
+def test_grade_de_animais_sem_derivados_nao_emite_srcset_vazio(app, local_uploads):
+    template = "{% include 'animais/_animals_grid.html' %}"
+    animal = SimpleNamespace(
+        id=1, name="Rex", image="/static/uploads/animals/rex.jpg", modo="doacao",
+        owner=SimpleNamespace(id=2, name="Tutor", email="tutor@example.com", phone=None),
+        photo_offset_x=0, photo_offset_y=0, photo_rotation=0, photo_zoom=1, description="",
+        date_added=None,
+    )
+
+    with app.test_request_context():
+        html = render_template_string(template, animals=[animal], modo="doacao", current_user=SimpleNamespace(worker=None))
+
+    assert 'src="/static/uploads/animals/rex.jpg"' in html
+    assert "srcset" not in html
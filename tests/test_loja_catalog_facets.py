@@ -0,0 +1,127 @@
+"""Facetas da loja em memória e paginação por cursor da rolagem infinita."""
+
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from extensions import db
+from models import CacheVersion, Clinica, Product
+from services.catalog_facets import CATALOG_CACHE_KEY, catalog_facets, facets_stats
+
+
+def _abrir_loja() -> None:
+    from models.base import SiteFlag
+
+    SiteFlag.set('loja_em_breve', False)
+    db.session.commit()
+
+
+def _seed(total=30, clinica=None):
+    products = [
+        Product(
+            name=f'Produto {index:02d}',
+            description='Descrição',
+            price=float(10 + index % 7),
+            stock=10,
+            status='active',
+            category='racao' if index % 2 else 'higiene',
+            clinica_id=clinica.id if clinica else None,
+        )
+        for index in range(total)
+    ]
+    db.session.add_all(products)
+    db.session.commit()
+    return products
+
+
+@contextmanager
+def _statements():
+    captured = []
+
+    def _before(_conn, _cursor, statement, *_args):
+        captured.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', _before)
+    try:
+        yield captured
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _before)
+
+
+def test_facetas_contam_por_vendedor_e_categoria(app):
+    clinica = Clinica(nome='Clínica Centro')
+    db.session.add(clinica)
+    db.session.commit()
+    _seed(10, clinica=clinica)
+    _seed(4)
+
+    facets = catalog_facets()
+
+    assert facets.total == 14
+    assert facets.count(f'c_{clinica.id}') == 10
+    assert facets.count(f'c_{clinica.id}', 'racao') == 5
+    assert facets.count('c_abc', 'higiene') == 7
+    assert [v['nome'] for v in facets.vendedores] == ['Clínica Centro']
+
+
+def test_loja_reaproveita_facetas_e_dispensa_count(client):
+    _abrir_loja()
+    _seed(15)
+
+    assert client.get('/loja').status_code == 200
+    with _statements() as statements:
+        response = client.get('/loja?page=2')
+
+    assert response.status_code == 200
+    assert 'Produto 14' in response.get_data(as_text=True)
+    assert facets_stats()['hits'] >= 1
+    assert not [s for s in statements if 'count(' in s.lower()]
+
+
+def test_commit_de_produto_invalida_facetas(app):
+    _seed(3)
+    assert catalog_facets().total == 3
+
+    versao = CacheVersion.get(CATALOG_CACHE_KEY)
+
+    db.session.add(Product(name='Novo', price=5.0, stock=1, status='active'))
+    db.session.commit()
+
+    assert catalog_facets().total == 4
+    assert CacheVersion.get(CATALOG_CACHE_KEY) == versao + 1
+
+
+def test_cursor_percorre_catalogo_sem_repetir(client):
+    _abrir_loja()
+    _seed(30)
+
+    for filtro, key in (('all', 'name'), ('priceLow', 'price'), ('new', 'id')):
+        seen, cursor = [], None
+        with _statements() as statements:
+            while True:
+                url = f'/loja/data?format=json&filter={filtro}&cursor={cursor or ""}'
+                payload = client.get(url).get_json()
+                seen.extend(payload['products'])
+                cursor = payload['next_cursor']
+                assert payload['has_next'] is (cursor is not None)
+                if not cursor:
+                    break
+
+        ids = [item['id'] for item in seen]
+        assert len(ids) == len(set(ids)) == 30
+        values = [item[key] for item in seen]
+        assert values == sorted(values, reverse=filtro == 'new')
+        assert not [s for s in statements if 'count(' in s.lower()]
+
+
+def test_sem_cursor_mantem_resposta_numerada(client):
+    _abrir_loja()
+    _seed(14)
+
+    payload = client.get('/loja/data?format=json&page=2').get_json()
+    first = client.get('/loja/data?format=json').get_json()
+
+    assert (first['page'], first['total_pages'], 'next_cursor' in first) == (1, 2, False)
+    assert payload['page'] == 2
+    assert payload['total_pages'] == 2
+    assert len(payload['products']) == 2
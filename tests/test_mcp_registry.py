@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+import pytest
+
+from extensions import db
+from models import Animal, OAuthAccessToken, User
+from services.mcp_registry import McpToolRegistry
+from services.oauth_token_cache import token_cache
+from time_utils import utcnow
+
+SCOPES = "profile pets:read pets:write"
+
+
+def _user(email, role="adotante"):
+    user = User(name=email.split("@")[0], email=email, role=role)
+    user.set_password("secret123")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _token(user, value, scope=SCOPES):
+    db.session.add(OAuthAccessToken(
+        client_id="registry-client",
+        user_id=user.id,
+        access_token=value,
+        token_type="Bearer",
+        resource="https://www.petorlandia.com.br/mcp",
+        scope=scope,
+        expires_at=utcnow() + timedelta(minutes=30),
+    ))
+    db.session.commit()
+    return {"Authorization": f"Bearer {value}"}
+
+
+def _rpc(method, req_id=1, **params):
+    message = {"jsonrpc": "2.0", "method": method, "params": params}
+    if req_id is not None:
+        message["id"] = req_id
+    return message
+
+
+def test_registro_recusa_nome_duplicado():
+    registry = McpToolRegistry()
+    registry.tool("a")(lambda call: None)
+
+    with pytest.raises(ValueError):
+        registry.tool("b", "a")(lambda call: None)
+
+
+def test_catalogo_cacheado_com_etag_e_sem_tools_de_admin(app, client):
+    from services.mcp_registry import mcp_tools
+
+    tutor = _user("tutor@example.com")
+    admin = _user("admin@example.com", role="admin")
+    tutor_headers = _token(tutor, "tok-tutor")
+    admin_headers = _token(admin, "tok-admin")
+
+    first = client.post("/mcp", json=_rpc("tools/list"), headers=tutor_headers)
+    etag = first.headers["ETag"].strip('"')
+    names = {tool["name"] for tool in first.get_json()["result"]["tools"]}
+    again = client.post(
+        "/mcp", json=_rpc("tools/list", req_id=2), headers={**tutor_headers, "If-None-Match": f'"{etag}"'}
+    )
+    admin_list = client.post("/mcp", json=_rpc("tools/list"), headers=admin_headers)
+
+    assert first.status_code == 200
+    assert "listar_meus_pets" in names
+    assert "listar_alertas_admin" not in names
+    assert again.status_code == 304
+    assert admin_list.headers["ETag"].strip('"') != etag
+    assert "listar_alertas_admin" in {tool["name"] for tool in admin_list.get_json()["result"]["tools"]}
+    assert mcp_tools.catalogue(is_admin=False) is mcp_tools.catalogue(is_admin=False)
+
+
+def test_token_verificado_fica_em_cache_e_revogacao_invalida(app, client):
+    tutor = _user("tutor@example.com")
+    headers = _token(tutor, "tok-revogar")
+
+    assert client.post("/mcp", json=_rpc("initialize"), headers=headers).status_code == 200
+    assert token_cache.get("tok-revogar").user_id == tutor.id
+
+    OAuthAccessToken.query.filter_by(access_token="tok-revogar").one().revoke()
+    db.session.commit()
+
+    assert token_cache.get("tok-revogar") is None
+    assert client.post("/mcp", json=_rpc("initialize"), headers=headers).status_code == 401
+
+
+def test_batch_responde_tudo_numa_request_e_compartilha_lookup_do_pet(app, client, monkeypatch):
+    import blueprints.mcp as mcp_module
+
+    tutor = _user("tutor@example.com")
+    animal = Animal(name="Rex", user_id=tutor.id)
+    db.session.add(animal)
+    db.session.commit()
+    headers = _token(tutor, "tok-batch", scope="profile pets:read clinical_summary:read")
+
+    lookups = []
+    original = mcp_module._integration_find_accessible_animal
+
+    def counting(*args, **kwargs):
+        lookups.append(kwargs.get("animal_id"))
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(mcp_module, "_integration_find_accessible_animal", counting)
+
+    response = client.post("/mcp", headers=headers, json=[
+        _rpc("tools/call", 1, name="obter_resumo_clinico_animal", arguments={"animal_id": animal.id}),
+        _rpc("tools/call", 2, name="obter_resumo_clinico_animal", arguments={"animal_id": animal.id}),
+        _rpc("tools/call", 3, name="registrar_vacina_pet", arguments={"animal_id": animal.id}),
+        _rpc("tools/call", 4, name="nao_existe"),
+        _rpc("notifications/initialized", req_id=None),
+        "lixo",
+    ])
+
+    replies = response.get_json()
+    assert response.status_code == 200
+    assert [reply["id"] for reply in replies] == [1, 2, 3, 4, None]
+    assert "error" not in replies[0] and "error" not in replies[1]
+    assert replies[2]["result"]["structuredContent"]["missing_scopes"] == ["pets:write"]
+    assert response.headers.getlist("WWW-Authenticate") == replies[2]["result"]["_meta"]["mcp/www_authenticate"]
+    assert replies[3]["error"]["code"] == -32601
+    assert replies[4]["error"]["code"] == -32600
+    assert lookups == [animal.id]
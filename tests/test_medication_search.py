@@ -83,3 +83,83 @@ def test_buscar_medicamentos_autocomplete_leve_e_detalhe_sob_demanda(client, app
     assert detail["id"] == med_id
     assert detail["apresentacoes"]
     assert "monografia_estruturada" in detail
+
+
+def test_search_document_normalizado_e_atualizado_na_escrita(client, app):
+    with app.app_context():
+        user = User(name="Vet", email="vet-doc@example.com", worker="veterinario")
+        user.set_password("x")
+        db.session.add(user)
+        db.session.flush()
+        med = Medicamento(
+            nome="Cefalexina",
+            principio_ativo="Cefalexina monoidratada",
+            conteudo_estruturado={"indicacoes": "Piodermite e infecções urinárias."},
+            created_by=user.id,
+        )
+        db.session.add(med)
+        db.session.commit()
+        med_id = med.id
+        user_id = user.id
+        assert "infeccoes urinarias" in med.search_document
+
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess["_user_id"] = str(user_id)
+        sess["_fresh"] = True
+
+    # Acento no termo e no conteúdo não impede o match.
+    data = client.get("/buscar_medicamentos?q=infecções").get_json()
+    assert [item["id"] for item in data] == [med_id]
+    assert client.get("/api/bulario/buscar?q=URINARIAS").get_json()[0]["id"] == med_id
+
+    with app.app_context():
+        med = db.session.get(Medicamento, med_id)
+        med.conteudo_estruturado = {"indicacoes": "Otite externa."}
+        db.session.commit()
+
+    assert client.get("/buscar_medicamentos?q=urinarias").get_json() == []
+    assert client.get("/buscar_medicamentos?q=otite").get_json()[0]["id"] == med_id
+
+
+def test_busca_ranqueia_quem_casa_todos_os_tokens_primeiro(app):
+    from services.medication_search import buscar_ids_medicamentos
+
+    with app.app_context():
+        user = User(name="Vet", email="vet-rank@example.com", worker="veterinario")
+        user.set_password("x")
+        db.session.add(user)
+        db.session.flush()
+        parcial = Medicamento(nome="Amoxicilina", created_by=user.id)
+        completo = Medicamento(nome="Amoxicilina + Clavulanato de Potássio", created_by=user.id)
+        outro = Medicamento(nome="Dipirona", created_by=user.id)
+        db.session.add_all([parcial, completo, outro])
+        db.session.commit()
+
+        ids = buscar_ids_medicamentos("amoxicilina clavulanato")
+
+        assert ids[0] == completo.id
+        assert parcial.id in ids
+        assert outro.id not in ids
+
+
+def test_indice_em_memoria_so_invalida_no_commit(app):
+    from services import medication_search
+
+    indice = medication_search._indice_memoria
+    with app.app_context():
+        user = User(name="Vet", email="vet-commit@example.com", worker="veterinario")
+        user.set_password("x")
+        db.session.add(user)
+        db.session.commit()
+
+        versao = indice._versao
+        db.session.add(Medicamento(nome="Enrofloxacina", created_by=user.id))
+        db.session.flush()
+        assert indice._versao == versao  # flush ainda não é visível a outras threads
+        db.session.rollback()
+        assert indice._versao == versao
+
+        db.session.add(Medicamento(nome="Enrofloxacina", created_by=user.id))
+        db.session.commit()
+        assert indice._versao == versao + 1
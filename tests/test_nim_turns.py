@@ -8,13 +8,10 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 from app import (
     app as flask_app,
     _nim_default_rows,
-    nim_room_members,
-    nim_room_players,
-    nim_rooms,
-    nim_session_players,
-    nim_session_rooms,
+    _nim_room_state,
     socketio,
 )
+from services.socket_rooms import room_state
 
 
 @pytest.fixture
@@ -24,11 +21,13 @@ def app():
 
 
 def _reset_nim_state():
-    nim_rooms.clear()
-    nim_session_rooms.clear()
-    nim_session_players.clear()
-    nim_room_members.clear()
-    nim_room_players.clear()
+    with flask_app.app_context():
+        room_state.clear()
+
+
+def _nim_state(room_code):
+    with flask_app.app_context():
+        return _nim_room_state(room_code)
 
 
 def test_nim_rejects_out_of_turn_move(app):
@@ -59,7 +58,7 @@ def test_nim_rejects_out_of_turn_move(app):
         }
         player_two.emit("move", invalid_move)
 
-        current_state = nim_rooms[room_code]
+        current_state = _nim_state(room_code)
         assert current_state["turn"] == 1
         assert current_state["rows"][0] == [True, True, True]
 
@@ -70,7 +69,7 @@ def test_nim_rejects_out_of_turn_move(app):
         }
         player_one.emit("move", valid_move)
 
-        current_state = nim_rooms[room_code]
+        current_state = _nim_state(room_code)
         assert current_state["rows"][0] == [False, True, True]
     finally:
         player_one.disconnect()
@@ -89,7 +88,7 @@ def test_nim_reset_alternates_starting_player(app):
     assert player_two.is_connected()
 
     try:
-        initial_state = nim_rooms[room_code]
+        initial_state = _nim_state(room_code)
         assert initial_state["turn"] == 1
         assert initial_state["starting_player"] == 1
 
@@ -103,7 +102,7 @@ def test_nim_reset_alternates_starting_player(app):
         }
         player_one.emit("move", reset_payload_first)
 
-        after_first_reset = nim_rooms[room_code]
+        after_first_reset = _nim_state(room_code)
         assert after_first_reset["turn"] == 2
         assert after_first_reset["starting_player"] == 2
 
@@ -117,7 +116,7 @@ def test_nim_reset_alternates_starting_player(app):
         }
         player_two.emit("move", reset_payload_second)
 
-        after_second_reset = nim_rooms[room_code]
+        after_second_reset = _nim_state(room_code)
         assert after_second_reset["turn"] == 1
         assert after_second_reset["starting_player"] == 1
     finally:
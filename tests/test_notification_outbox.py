@@ -0,0 +1,128 @@
+from datetime import timedelta
+
+import pytest
+
+import app as app_module
+from extensions import db, mail
+from models import Animal, Appointment, Notification, NotificationOutbox, User, Veterinario
+from services import notification_outbox
+from services.notification_outbox import drain, enqueue
+from time_utils import utcnow
+
+
+def _tutor(email="tutor@example.com", phone="11988887777"):
+    tutor = User(name="Tutor", email=email, phone=phone, password_hash="x")
+    db.session.add(tutor)
+    db.session.flush()
+    return tutor
+
+
+def _email(tutor, target, **kwargs):
+    return enqueue(
+        kind="appointment",
+        target=target,
+        channel="email",
+        user_id=tutor.id,
+        recipient=tutor.email,
+        subject="Lembrete",
+        body=f"texto {target}",
+        **kwargs,
+    )
+
+
+def test_job_so_enfileira_e_nao_repete_no_mesmo_dia(app, monkeypatch):
+    sent = []
+    monkeypatch.setattr(mail, "send", lambda message: sent.append(message))
+    tutor = _tutor()
+    vet_user = User(name="Vet", email="vet@example.com", password_hash="x", worker="veterinario")
+    db.session.add(vet_user)
+    db.session.flush()
+    vet = Veterinario(user_id=vet_user.id, crmv="CRMV9")
+    animal = Animal(name="Thor", user_id=tutor.id)
+    db.session.add_all([vet, animal])
+    db.session.flush()
+    appointment = Appointment(
+        animal_id=animal.id,
+        tutor_id=tutor.id,
+        veterinario_id=vet.id,
+        scheduled_at=utcnow() + timedelta(hours=5),
+    )
+    db.session.add(appointment)
+    db.session.commit()
+
+    app_module.verificar_datas_proximas()
+    app_module.verificar_datas_proximas()
+
+    rows = NotificationOutbox.query.order_by(NotificationOutbox.channel).all()
+    assert [(row.channel, row.status) for row in rows] == [
+        ("email", "pending"),
+        ("push", "pending"),
+        ("whatsapp", "pending"),
+    ]
+    assert {row.target for row in rows} == {f"appointment:{appointment.id}"}
+    assert rows[2].recipient == "whatsapp:+5511988887777"
+    assert sent == []  # nada saiu inline
+    assert Notification.query.filter_by(user_id=tutor.id, kind="appointment").count() == 2
+
+
+def test_drenador_de_email_usa_uma_conexao_smtp_por_lote(app, monkeypatch):
+    app.config["MAIL_DEFAULT_SENDER"] = ("PetOrlândia", "nao-responda@example.com")
+    monkeypatch.setattr(app.extensions["mail"], "suppress", True)
+    tutor = _tutor()
+    for index in range(3):
+        _email(tutor, f"appointment:{index}")
+    db.session.commit()
+
+    connections = []
+    original_connect = mail.connect
+
+    def _connect():
+        connection = original_connect()
+        connections.append(connection)
+        return connection
+
+    with mail.record_messages() as outbox:
+        mail.connect = _connect
+        try:
+            stats = drain("email", batch_size=2)
+        finally:
+            mail.connect = original_connect
+
+    assert stats == {"batches": 2, "sent": 3, "retry": 0, "dead": 0}
+    assert len(connections) == 2
+    assert sorted(message.body for message in outbox) == [f"texto appointment:{i}" for i in range(3)]
+    assert NotificationOutbox.query.filter_by(status="sent").count() == 3
+    assert drain("email") == {"batches": 0, "sent": 0, "retry": 0, "dead": 0}
+
+
+def test_falha_guarda_estado_de_retry_e_desiste_no_limite(app, monkeypatch):
+    app.config.update(
+        MAIL_DEFAULT_SENDER=("PetOrlândia", "nao-responda@example.com"),
+        NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2,
+    )
+    tutor = _tutor()
+    row = _email(tutor, "appointment:1")
+    db.session.commit()
+
+    def _down():
+        raise ConnectionRefusedError("smtp fora do ar")
+
+    monkeypatch.setattr(mail, "connect", _down)
+    assert drain("email")["retry"] == 1
+    db.session.refresh(row)
+    assert (row.status, row.attempts) == ("pending", 1)
+    assert "smtp fora do ar" in row.last_error
+    assert drain("email")["batches"] == 0  # ainda no backoff
+
+    row.next_attempt_at = utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert drain("email")["dead"] == 1
+    db.session.refresh(row)
+    assert (row.status, row.attempts) == ("dead", 2)
+
+
+def test_canal_desconhecido_e_recusado(app):
+    with pytest.raises(ValueError):
+        enqueue(kind="x", target="y", channel="sms", body="z")
+    with pytest.raises(ValueError):
+        notification_outbox.drain("sms")
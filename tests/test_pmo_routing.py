@@ -0,0 +1,83 @@
+import random
+
+from services import vacina_pmo_service as pmo
+from services.pmo_routing import distance_matrix, haversine_km, optimize_route
+
+ORIGIN = (-20.7122, -47.8838)
+
+
+def test_matriz_bate_com_haversine():
+    points = [ORIGIN, (-20.70, -47.87), (-20.73, -47.90)]
+    matrix = distance_matrix(points)
+    assert matrix[1][2] == matrix[2][1]
+    assert abs(matrix[0][2] - haversine_km(points[0], points[2])) < 1e-9
+
+
+def test_otimizador_desfaz_cruzamento_e_nao_piora():
+    # Casas numa linha reta para o norte, entregues fora de ordem.
+    points = [(-20.70 + 0.004 * step, -47.8838) for step in (3, 1, 4, 2, 5)]
+
+    result = optimize_route(ORIGIN, points)
+
+    assert [points[i] for i in result.order] == sorted(points)
+    assert result.distance_after_km < result.distance_before_km
+
+
+def test_unidades_de_condominio_ficam_juntas():
+    rng = random.Random(3)
+    points = [(-20.70 + rng.uniform(-0.02, 0.02), -47.88 + rng.uniform(-0.02, 0.02)) for _ in range(12)]
+    groups = [None] * 12
+    for index in (2, 7, 10):
+        groups[index] = "torino"
+
+    result = optimize_route(ORIGIN, points, groups=groups)
+
+    positions = sorted(result.order.index(index) for index in (2, 7, 10))
+    assert positions == list(range(positions[0], positions[0] + 3))
+    assert sorted(result.order) == list(range(12))
+    assert result.distance_after_km <= result.distance_before_km
+
+
+def test_orcamento_zero_devolve_rota_valida():
+    rng = random.Random(5)
+    points = [(-20.70 + rng.uniform(-0.03, 0.03), -47.88 + rng.uniform(-0.03, 0.03)) for _ in range(60)]
+
+    result = optimize_route(ORIGIN, points, time_budget=0)
+
+    assert result.timed_out
+    assert sorted(result.order) == list(range(60))
+    assert result.distance_after_km <= result.distance_before_km
+
+
+def _house(row, dogs, complement=""):
+    cells = ["Tutor", "Rua Um, 10" if complement else f"Rua {row}", "", complement]
+    return {"sourceRow": row, "tutor": f"T{row}", "dogs": dogs, "cats": 0, "cells": cells}
+
+
+def test_plan_pmo_day_reordena_turnos_sem_mudar_metas():
+    houses = [_house(2, 3, "Condominio Torino"), _house(3, 2, "Condominio Torino")]
+    houses += [_house(row, 2) for row in range(4, 14)]
+    coords = {h["sourceRow"]: (-20.70 - 0.003 * ((h["sourceRow"] * 7) % 11), -47.88) for h in houses}
+    coords[3] = coords[2]
+
+    sem_rota = pmo.plan_pmo_day(houses)
+    com_rota = pmo.plan_pmo_day(houses, coords=coords, origin=ORIGIN)
+
+    for shift in ("Manha", "Tarde"):
+        assert sorted(h["sourceRow"] for h in com_rota[shift]) == sorted(h["sourceRow"] for h in sem_rota[shift])
+    assert com_rota["manha_animals"] <= pmo.PMO_MORNING_TARGET_ANIMALS
+    assert com_rota["manha_animals"] + com_rota["tarde_animals"] <= pmo.PMO_DAY_MAX_ANIMALS
+    manha_rows = [h["sourceRow"] for h in com_rota["Manha"]]
+    assert abs(manha_rows.index(2) - manha_rows.index(3)) == 1
+    assert com_rota["distance_after_km"] <= com_rota["distance_before_km"]
+    assert "distance_before_km" not in sem_rota
+
+
+def test_chave_do_condominio_usa_o_nome_completo():
+    chave = pmo._pmo_address_condo_key
+
+    assert chave("Rua X, 10, Condomínio Residencial A, bloco 2, Centro") == "residencial a"
+    assert chave("Rua X, 12, Condominio Residencial A - Casa 9, Centro") == "residencial a"
+    assert chave("Rua Y, 40, Condomínio Residencial B Apto 3, Centro") == "residencial b"
+    assert chave("Rua 20, 955A, A - Condominio Quebec Casa 182, Centro") == "quebec"
+    assert chave("Rua 1, 2, Centro") == ""
@@ -0,0 +1,76 @@
+from extensions import db
+from models import ProductEvent, User
+from services import product_analytics
+from services.product_event_buffer import ProductEventBuffer
+from time_utils import utcnow
+
+
+def _row(index=0):
+    return {
+        "event_name": f"evento_{index}",
+        "anonymous_id": "anon",
+        "session_id": "sess",
+        "user_id": None,
+        "source_path": "/",
+        "referrer_host": None,
+        "utm_source": None,
+        "utm_medium": None,
+        "utm_campaign": None,
+        "properties": {"stage": index},
+        "created_at": utcnow(),
+    }
+
+
+def test_buffer_grava_lote_com_um_insert(app):
+    app.config.update(PRODUCT_EVENTS_BATCH_SIZE=100, PRODUCT_EVENTS_FLUSH_MS=60000)
+    buffer = ProductEventBuffer(app)
+
+    for index in range(5):
+        assert buffer.submit(app, _row(index))
+    buffer.shutdown()
+
+    stats = buffer.stats()
+    assert stats["written"] == 5
+    assert stats["batches"] == 1
+    assert stats["running"] is False
+    assert ProductEvent.query.count() == 5
+    assert ProductEvent.query.filter_by(event_name="evento_3").one().properties == {"stage": 3}
+
+
+def test_buffer_cheio_descarta_e_conta(app):
+    app.config.update(
+        PRODUCT_EVENTS_BATCH_SIZE=1,
+        PRODUCT_EVENTS_FLUSH_MS=60000,
+        PRODUCT_EVENTS_QUEUE_SIZE=2,
+        PRODUCT_EVENTS_ENQUEUE_TIMEOUT_MS=0,
+    )
+    buffer = ProductEventBuffer(app)
+
+    # Banco "travado": a thread pega no máximo um evento e fica esperando.
+    with buffer._flush_lock:
+        accepted = [buffer.submit(app, _row(index)) for index in range(6)]
+    buffer.shutdown()
+
+    stats = buffer.stats()
+    assert stats["dropped"] == accepted.count(False) >= 1
+    assert stats["written"] == accepted.count(True) == ProductEvent.query.count()
+
+
+def test_track_event_assincrono_nao_commita_sessao_do_chamador(app, monkeypatch):
+    app.config.update(TESTING=False, PRODUCT_EVENTS_ASYNC=True, PRODUCT_EVENTS_FLUSH_MS=60000)
+    buffer = ProductEventBuffer(app)
+    monkeypatch.setattr(product_analytics, "event_buffer", buffer)
+
+    with app.test_request_context("/planos?utm_source=instagram"):
+        db.session.add(User(name="Pendente", email="pendente@example.com", password_hash="x"))
+        product_analytics.track_event("pricing_viewed", plan="basico")
+        db.session.rollback()
+    buffer.shutdown()
+    app.config["TESTING"] = True
+
+    assert User.query.filter_by(email="pendente@example.com").count() == 0
+    evento = ProductEvent.query.one()
+    assert evento.event_name == "pricing_viewed"
+    assert evento.utm_source == "instagram"
+    assert evento.source_path == "/planos"
+    assert evento.properties == {"plan": "basico"}
@@ -0,0 +1,139 @@
+import base64
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from extensions import db
+from models import PushSubscription, User
+from services.push import PushMessage, dispatch_push, push_to_users
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+class _StubPushService(BaseHTTPRequestHandler):
+    """Serviço de push local: o status devolvido vem do path do endpoint."""
+
+    hits = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        _StubPushService.hits.append((self.path, self.headers.get("Authorization", "")))
+        status = int(self.path.strip("/").split("/")[0])
+        self.send_response(status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def push_service(app):
+    _StubPushService.hits = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubPushService)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    vapid_key = ec.generate_private_key(ec.SECP256R1())
+    app.config.update(
+        VAPID_PUBLIC_KEY="test-public",
+        VAPID_PRIVATE_KEY=_b64(vapid_key.private_numbers().private_value.to_bytes(32, "big")),
+        VAPID_CLAIM_EMAIL="push@example.com",
+    )
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+    app.config.update(VAPID_PUBLIC_KEY=None, VAPID_PRIVATE_KEY=None, VAPID_CLAIM_EMAIL=None)
+
+
+def _subscription(user, endpoint, fail_count=0):
+    browser_key = ec.generate_private_key(ec.SECP256R1()).public_key()
+    sub = PushSubscription(
+        user_id=user.id,
+        endpoint=endpoint,
+        endpoint_hash=endpoint[-64:].rjust(64, "0"),
+        p256dh=_b64(browser_key.public_bytes(
+            serialization.Encoding.X962, serialization.PublicFormat.UncompressedPoint
+        )),
+        auth=_b64(os.urandom(16)),
+        fail_count=fail_count,
+    )
+    db.session.add(sub)
+    return sub
+
+
+def _users(count):
+    users = [User(name=f"Tutor {i}", email=f"tutor{i}@example.com", password_hash="x") for i in range(count)]
+    db.session.add_all(users)
+    db.session.flush()
+    return users
+
+
+def test_envio_em_massa_poda_inscricoes_mortas_e_reporta_lotes(app, push_service):
+    users = _users(3)
+    _subscription(users[0], f"{push_service}/201/a")
+    _subscription(users[0], f"{push_service}/410/b")
+    _subscription(users[1], f"{push_service}/201/c")
+    _subscription(users[1], f"{push_service}/404/d")
+    _subscription(users[2], f"{push_service}/500/e")
+    db.session.commit()
+
+    stats = dispatch_push(
+        [PushMessage(user.id, "Lembrete", f"oi {user.name}") for user in users],
+        max_workers=4,
+        batch_size=2,
+    )
+
+    assert (stats.users, stats.subscriptions) == (3, 5)
+    assert (stats.sent, stats.failed, stats.pruned) == (2, 1, 2)
+    assert [batch.subscriptions for batch in stats.batches] == [2, 2, 1]
+    assert all(auth.startswith("vapid ") for _path, auth in _StubPushService.hits)
+    remaining = {sub.endpoint.rsplit("/", 1)[-1]: sub for sub in PushSubscription.query.all()}
+    assert sorted(remaining) == ["a", "c", "e"]
+    assert remaining["a"].last_success_at is not None
+    assert remaining["e"].fail_count == 1
+
+
+def test_falhas_repetidas_removem_inscricao_e_mensagens_seguintes_pulam_morta(app, push_service):
+    [user] = _users(1)
+    _subscription(user, f"{push_service}/503/flaky", fail_count=4)
+    _subscription(user, f"{push_service}/410/gone")
+    db.session.commit()
+
+    stats = dispatch_push(
+        [PushMessage(user.id, "Lembrete", texto) for texto in ("um", "dois")],
+        batch_size=2,
+    )
+
+    assert PushSubscription.query.count() == 0
+    assert stats.pruned == 2
+    # o lote 1 já apagou as duas; a segunda mensagem não é enviada a ninguém
+    assert len(_StubPushService.hits) == 2
+    assert len(stats.batches) == 1
+
+
+def test_push_to_users_consulta_inscricoes_uma_vez(app, push_service):
+    users = _users(4)
+    for index, user in enumerate(users):
+        _subscription(user, f"{push_service}/201/{index}")
+    db.session.commit()
+
+    statements = []
+
+    def _count(conn, cursor, statement, *args):
+        if "FROM push_subscription" in statement and statement.lstrip().upper().startswith("SELECT"):
+            statements.append(statement)
+
+    engine = db.engine
+    db.event.listen(engine, "before_cursor_execute", _count)
+    try:
+        sent = push_to_users([user.id for user in users] + [None], "Aviso", "texto")
+    finally:
+        db.event.remove(engine, "before_cursor_execute", _count)
+
+    assert sent == 4
+    assert len(statements) == 1
@@ -0,0 +1,143 @@
+"""Fase 2 do scraper VetSmart: parse em pool, checkpoint por hash e escrita em lote."""
+import sys
+import pathlib
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "scripts" / "scraping"))
+
+import run_2_process as fase2  # noqa: E402
+
+
+class _Cursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_exc):
+        return False
+
+    def execute(self, sql, *_args):
+        self.conn.sql.append(sql.strip())
+
+
+class _Conn:
+    def __init__(self):
+        self.sql, self.commits, self.rollbacks = [], 0, 0
+
+    def cursor(self):
+        return _Cursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        pass
+
+
+def _prod(pid, nome=None):
+    return SimpleNamespace(
+        vetsmart_id=pid, nome=nome or f"Med {pid}", principio_ativo="x", apresentacoes=[], doses=[]
+    )
+
+
+def test_lote_isola_produto_com_erro_e_comita_uma_vez(monkeypatch):
+    def importar(_cur, prod):
+        if prod.vetsmart_id == 2:
+            raise RuntimeError("violação")
+        return {"apres": 1, "doses": 2, "med_novo": 1, "med_atualizado": 0}
+
+    monkeypatch.setattr(fase2, "_importar_produto", importar)
+    conn = _Conn()
+
+    stats, gravados = fase2.importar_lote(conn, [_prod(1), _prod(2), _prod(3)], dry_run=False)
+
+    assert gravados == [1, 3]
+    assert stats["doses"] == 4 and stats["erros_db"] == 1
+    assert conn.commits == 1 and conn.rollbacks == 0
+    assert conn.sql.count("ROLLBACK TO SAVEPOINT produto") == 1
+
+
+@pytest.fixture
+def ambiente(tmp_path, monkeypatch):
+    html_dir = tmp_path / "html"
+    html_dir.mkdir()
+    for pid in (10, 11, 12):
+        (html_dir / f"{pid}.html").write_text(f"<html>{pid}</html>", encoding="utf-8")
+
+    parseados = []
+
+    def processar(pid, html, usar_llm):
+        parseados.append(pid)
+        return None if pid == 12 else _prod(pid)
+
+    monkeypatch.setattr(fase2, "LOG_FILE", tmp_path / "process.log")
+    monkeypatch.setattr(fase2, "CKPT_FILE", tmp_path / "ckpt.sqlite")
+    monkeypatch.setattr(fase2, "conectar_banco", _Conn)
+    monkeypatch.setattr(fase2, "processar_html", processar)
+    monkeypatch.setattr(
+        fase2, "_importar_produto",
+        lambda _cur, _prod: {"apres": 0, "doses": 0, "med_novo": 1, "med_atualizado": 0},
+    )
+
+    def rodar(*extra):
+        parseados.clear()
+        monkeypatch.setattr(
+            sys, "argv", ["run_2_process.py", "--html-dir", str(html_dir), "--workers", "1", *extra]
+        )
+        fase2.main()
+        return sorted(parseados)
+
+    return SimpleNamespace(html_dir=html_dir, rodar=rodar)
+
+
+def test_segunda_execucao_pula_paginas_inalteradas(ambiente, capsys):
+    assert ambiente.rodar() == [10, 11, 12]
+    assert ambiente.rodar() == []
+    assert "Inalterados (pulados): 3" in capsys.readouterr().out
+
+    (ambiente.html_dir / "11.html").write_text("<html>11 corrigido</html>", encoding="utf-8")
+    assert ambiente.rodar() == [11]
+    assert ambiente.rodar("--forcar") == [10, 11, 12]
+
+
+def test_nova_versao_do_parser_reprocessa_tudo(ambiente, monkeypatch):
+    ambiente.rodar()
+    monkeypatch.setattr(fase2, "PARSER_REV", fase2.PARSER_REV + 1)
+
+    assert ambiente.rodar() == [10, 11, 12]
+
+
+def test_ligar_o_llm_reprocessa_tudo(ambiente, monkeypatch):
+    ambiente.rodar()
+
+    assert ambiente.rodar("--usar-llm") == [10, 11, 12]
+    assert ambiente.rodar("--usar-llm") == []
+    monkeypatch.setattr(fase2, "LLM_MODEL", "outro-modelo")
+    assert ambiente.rodar("--usar-llm") == [10, 11, 12]
+
+
+def test_dry_run_nao_grava_checkpoint(ambiente):
+    assert ambiente.rodar("--dry-run") == [10, 11, 12]
+    assert ambiente.rodar() == [10, 11, 12]
+
+
+def test_pool_de_processos_parseia_html_real(tmp_path):
+    paths = []
+    for pid in (1, 2):
+        path = tmp_path / f"{pid}.html"
+        path.write_text("<html><body><h1>Nada</h1></body></html>", encoding="utf-8")
+        paths.append((pid, str(path), False))
+
+    resultados = list(fase2.parsear(paths, workers=2))
+
+    assert [pid for pid, _prod, _t in resultados] == [1, 2]
+    assert all(prod is None and segundos >= 0 for _pid, prod, segundos in resultados)
@@ -17,6 +17,9 @@ class _FakeExportQuery:
     def all(self):
         return self._pacientes
 
+    def yield_per(self, _count):
+        return iter(self._pacientes)
+
 
 @pytest.fixture()
 def analysis_app():
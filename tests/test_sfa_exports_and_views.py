@@ -4,11 +4,22 @@ import json
 from datetime import datetime
 from types import SimpleNamespace
 
+from sqlalchemy import event
+
+from extensions import db
+from models.sfa import SfaPaciente
+from services import sfa_service
 from services.sfa_service import (
+    carregar_form_schema,
+    carregar_respostas_em_blocos,
+    carregar_respostas_em_lote,
     carregar_t10_form_schema,
     gerar_csv_exportacao_analitica,
     gerar_csv_exportacao_cadastro,
     gerar_csv_assinaturas_tcle,
+    gerar_lote_pacientes_teste_sfa,
+    iterar_csv_exportacao_analitica,
+    limpar_cache_formularios_sfa,
     montar_analise_respostas,
     montar_visao_resposta_formulario,
     montar_registro_assinatura_tcle,
@@ -235,3 +246,76 @@ def test_gerar_csv_assinaturas_tcle_exporta_registros():
     assert rows[0]["id_estudo"] == "SFA-123"
     assert rows[0]["nome_assinatura"] == "Lucilene Alves da Silva"
     assert rows[0]["ip"] == "203.0.113.9"
+
+
+def test_payload_da_resposta_e_decodificado_uma_vez_e_revalidado_pelo_texto():
+    limpar_cache_formularios_sfa()
+    resposta = SimpleNamespace(id=7, timestamp=datetime(2026, 3, 23), dados_json=json.dumps({"nome": "Ana"}))
+
+    primeiro = sfa_service._carregar_payload_resposta(resposta)
+    primeiro["nome"] = "alterado pelo chamador"
+    assert sfa_service._carregar_payload_resposta(resposta) == {"nome": "Ana"}
+    assert len(sfa_service._payload_memo) == 1
+
+    resposta.dados_json = json.dumps({"nome": "Ana Maria"})
+    assert sfa_service._carregar_payload_resposta(resposta) == {"nome": "Ana Maria"}
+    assert len(sfa_service._payload_memo) == 1
+
+
+def test_schema_do_formulario_fica_em_cache_ate_o_arquivo_mudar(tmp_path, monkeypatch):
+    limpar_cache_formularios_sfa()
+    arquivo = tmp_path / "t10.json"
+    arquivo.write_text(json.dumps({"title": "T10", "sections": []}), encoding="utf-8")
+    monkeypatch.setattr(sfa_service, "T10_FORM_SCHEMA_FILE", str(arquivo))
+
+    primeiro = carregar_form_schema("t10")
+    primeiro["title"] = "editado em memoria"
+    assert carregar_form_schema("t10")["title"] == "T10"
+    assert sfa_service._form_schema_compartilhado("t10") is sfa_service._form_schema_compartilhado("t10")
+
+    arquivo.write_text(json.dumps({"title": "T10 revisado", "sections": []}), encoding="utf-8")
+    assert carregar_form_schema("t10")["title"] == "T10 revisado"
+    assert carregar_form_schema("t10")["_path"] == str(arquivo)
+
+
+def test_exportacao_analitica_com_respostas_em_lote_usa_uma_query_por_etapa(app):
+    with app.app_context():
+        gerar_lote_pacientes_teste_sfa(6)
+        db.session.expunge_all()
+        esperado = gerar_csv_exportacao_analitica(SfaPaciente.query.order_by(SfaPaciente.id).all())
+        db.session.expunge_all()
+
+        pacientes = SfaPaciente.query.order_by(SfaPaciente.id).all()
+        statements = []
+        listener = lambda *_args: statements.append(1)  # noqa: E731
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            carregar_respostas_em_lote(pacientes)
+            csv_text = gerar_csv_exportacao_analitica(pacientes)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert len(statements) == 3
+    assert csv_text == esperado
+    assert len(list(csv.DictReader(io.StringIO(csv_text)))) == 6
+
+
+def test_exportacao_analitica_em_stream_le_a_query_em_blocos(app):
+    with app.app_context():
+        gerar_lote_pacientes_teste_sfa(5)
+        db.session.expunge_all()
+        esperado = gerar_csv_exportacao_analitica(SfaPaciente.query.order_by(SfaPaciente.id).all())
+        db.session.expunge_all()
+
+        statements = []
+        listener = lambda *_args: statements.append(1)  # noqa: E731
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            pacientes = SfaPaciente.query.order_by(SfaPaciente.id).yield_per(2)
+            chunks = list(iterar_csv_exportacao_analitica(carregar_respostas_em_blocos(pacientes, chunk_size=2)))
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert "".join(chunks) == esperado
+    # 1 SELECT de pacientes + 3 etapas × 3 blocos (2 + 2 + 1 pacientes).
+    assert len(statements) == 10
@@ -449,6 +449,9 @@ class _FakeExportQuery:
     def all(self):
         return self._pacientes
 
+    def yield_per(self, _count):
+        return iter(self._pacientes)
+
 
 class _FakePagination:
     def __init__(self, items):
@@ -480,8 +483,8 @@ def test_export_routes_retornam_csv(native_t0_app, monkeypatch, url, csv_text, e
     client = app.test_client()
 
     monkeypatch.setattr("blueprints.sfa._consulta_pacientes_filtrada", lambda filtros=None: _FakeExportQuery([paciente]))
-    monkeypatch.setattr(sfa_service, "gerar_csv_exportacao_cadastro", lambda pacientes: csv_text)
-    monkeypatch.setattr(sfa_service, "gerar_csv_exportacao_analitica", lambda pacientes: csv_text)
+    monkeypatch.setattr(sfa_service, "iterar_csv_exportacao_cadastro", lambda pacientes: iter([csv_text]))
+    monkeypatch.setattr(sfa_service, "iterar_csv_exportacao_analitica", lambda pacientes: iter([csv_text]))
 
     response = client.get(url)
 
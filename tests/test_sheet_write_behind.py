@@ -0,0 +1,208 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from services import vacina_pmo_service
+from services.sheet_write_behind import SheetWriteBehind
+from services.vacina_pmo_service import persist_vacina_pmo_rows, update_vacina_pmo_animal_status
+
+
+class _QuotaError(Exception):
+    resp = SimpleNamespace(status=429)
+
+
+class _FakeRequest:
+    def __init__(self, service, kind, payload):
+        self.service = service
+        self.kind = kind
+        self.payload = payload
+
+    def execute(self):
+        if self.service.errors:
+            raise self.service.errors.pop(0)
+        if self.kind == "get":
+            return {"sheets": [{"properties": {"sheetId": 123, "title": "Aba Sabado"}}]}
+        if self.kind == "values_get":
+            return {"values": []}
+        getattr(self.service, self.kind).append(self.payload)
+        return {}
+
+
+class _FakeSheets:
+    """Cliente Sheets v4 em memória: registra os lotes e levanta erros enfileirados."""
+
+    def __init__(self):
+        self.value_batches = []
+        self.format_batches = []
+        self.metadata_reads = 0
+        self.errors = []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return _FakeValues(self)
+
+    def get(self, *, spreadsheetId, fields):
+        self.metadata_reads += 1
+        return _FakeRequest(self, "get", None)
+
+    def batchUpdate(self, *, spreadsheetId, body):
+        return _FakeRequest(self, "format_batches", {"spreadsheetId": spreadsheetId, **body})
+
+
+class _FakeValues:
+    def __init__(self, service):
+        self.service = service
+
+    def batchUpdate(self, *, spreadsheetId, body):
+        return _FakeRequest(self.service, "value_batches", {"spreadsheetId": spreadsheetId, **body})
+
+    def get(self, *, spreadsheetId, range):
+        return _FakeRequest(self.service, "values_get", None)
+
+
+def _engine(fake, built):
+    def factory():
+        built.append(1)
+        return fake
+
+    return SheetWriteBehind(
+        factory, title_resolver=vacina_pmo_service._resolve_sheet_title_by_gid, config_prefix="PMO_SHEETS"
+    )
+
+
+def test_edits_coalesce_into_one_batch_per_spreadsheet(app):
+    fake, built = _FakeSheets(), []
+    engine = _engine(fake, built)
+
+    with engine._flush_lock:  # segura a thread para o teste controlar o flush
+        engine.set_cells(app, "plan-a", 7, {"M": 1, "N": 0}, sheet_gid="123")
+        engine.set_cells(app, "plan-a", 7, {"K": "09:15 - Lua: vacinado."}, sheet_gid="123")
+        engine.set_cells(app, "plan-a", 7, {"M": 2}, sheet_gid="123")
+        engine.set_cells(app, "plan-a", 8, {"O": "Tutor"}, sheet_gid="123")
+        engine.set_cells(app, "plan-b", 3, {"J": "Rex"}, sheet_title="Outra")
+        engine.set_background(app, "plan-a", 123, 7, 0, {"red": 1})
+        engine.set_background(app, "plan-a", 123, 7, 0, {"green": 1})
+    engine.shutdown()
+
+    assert [batch["spreadsheetId"] for batch in fake.value_batches] == ["plan-a", "plan-b"]
+    assert fake.value_batches[0]["valueInputOption"] == "USER_ENTERED"
+    assert fake.value_batches[0]["data"] == [
+        {"range": "'Aba Sabado'!K7", "values": [["09:15 - Lua: vacinado."]]},
+        {"range": "'Aba Sabado'!M7:N7", "values": [[2, 0]]},
+        {"range": "'Aba Sabado'!O8", "values": [["Tutor"]]},
+    ]
+    assert fake.value_batches[1]["data"] == [{"range": "'Outra'!J3", "values": [["Rex"]]}]
+    assert len(fake.format_batches) == 1
+    (request,) = fake.format_batches[0]["requests"]
+    assert request["repeatCell"]["cell"]["userEnteredFormat"]["backgroundColor"] == {"green": 1}
+    assert request["repeatCell"]["range"]["startRowIndex"] == 6
+
+    engine.set_cells(app, "plan-a", 9, {"K": "nova"}, sheet_gid="123")
+    engine.shutdown()
+
+    assert len(fake.value_batches) == 3
+    assert fake.metadata_reads == 1  # título por gid fica em cache
+    assert built == [1]  # cliente autorizado montado uma vez só
+    stats = engine.stats()
+    assert stats["coalesced"] == 2 and stats["pending"] == 0
+
+
+def test_quota_error_requeues_and_backs_off(app):
+    fake, built = _FakeSheets(), []
+    engine = _engine(fake, built)
+    fake.errors.append(_QuotaError("Quota exceeded"))
+
+    with engine._flush_lock:
+        engine.set_cells(app, "plan-a", 7, {"M": 1, "N": 0}, sheet_title="Aba")
+    engine._stop.set()
+    engine._thread.join(5)
+
+    assert engine.flush() == 0
+    assert fake.value_batches == []
+    assert engine.stats()["backoff_seconds"] > 0
+    assert engine.pending() == 2
+
+    engine.set_cells(app, "plan-a", 7, {"M": 2}, sheet_title="Aba")
+    assert engine.flush() == 0  # ainda em backoff: nada sai
+
+    assert engine.flush(force=True) == 1
+    assert fake.value_batches[0]["data"] == [{"range": "'Aba'!M7:N7", "values": [[2, 0]]}]
+    stats = engine.stats()
+    assert stats["retries"] == 1 and stats["backoff_seconds"] == 0 and stats["pending"] == 0
+
+
+def test_status_updates_are_written_behind(app, monkeypatch):
+    fake, built = _FakeSheets(), []
+    engine = _engine(fake, built)
+    monkeypatch.setattr(vacina_pmo_service, "pmo_sheet_writes", engine)
+    monkeypatch.setattr(vacina_pmo_service, "_pmo_event_time_label", lambda: "09:15")
+    direct = []
+    monkeypatch.setattr(vacina_pmo_service, "_get_sheets_service_rw", lambda: direct.append(1))
+    app.config.update(PMO_SHEETS_WRITE_BEHIND=True, PMO_SHEETS_FLUSH_SECONDS=60)
+
+    with app.app_context():
+        saved = persist_vacina_pmo_rows(
+            [{
+                "id": "sheet-1", "status": "pendente", "tutor": "Tutor PMO", "address": "Rua 1, 10",
+                "phone1": "5516999999999", "phone2": "", "dogs": 2, "cats": 1,
+                "animals": [
+                    {"name": "Lua", "species": "cao", "status": "pendente"},
+                    {"name": "Babi", "species": "cao", "status": "pendente"},
+                    {"name": "Mia", "species": "gato", "status": "pendente"},
+                ],
+                "note": "", "date": "2026-05-28", "shift": "Manha", "password": "PMOA9999",
+                "certificateUrl": "", "sourceRow": 7,
+            }],
+            spreadsheet_id="planilha-pmo",
+            sheet_gid="123",
+            sheet_title="Vacinacao Antirrabica_7",
+        )
+        app.config["TESTING"] = False
+        try:
+            for animal in saved[0]["animals"]:
+                update_vacina_pmo_animal_status(animal["id"], "vacinado")
+        finally:
+            app.config["TESTING"] = True
+
+    assert direct == [] and fake.value_batches == []
+    engine.shutdown()
+
+    (values,) = fake.value_batches
+    by_range = {entry["range"]: entry["values"] for entry in values["data"]}
+    assert by_range["'Vacinacao Antirrabica_7'!K7"] == [[
+        "09:15 - Lua: vacinado. | 09:15 - Babi: vacinado. | 09:15 - Mia: vacinado."
+    ]]
+    assert by_range["'Vacinacao Antirrabica_7'!M7:O7"] == [[2, 1, "Tutor PMO"]]
+    (formats,) = fake.format_batches
+    assert len(formats["requests"]) == 1
+    assert built == [1]
+
+
+def test_sync_forca_o_envio_e_nao_le_com_edicoes_na_fila(app, monkeypatch):
+    fake, built = _FakeSheets(), []
+    engine = _engine(fake, built)
+    monkeypatch.setattr(vacina_pmo_service, "pmo_sheet_writes", engine)
+    monkeypatch.setattr(vacina_pmo_service, "_get_sheets_service_rw", lambda: fake)
+    monkeypatch.setattr(
+        vacina_pmo_service, "_resolve_sheet_target", lambda *_args, **_kwargs: ("plan-a", "'Aba'!A:T", "", "Aba")
+    )
+    with engine._flush_lock:
+        engine.set_cells(app, "plan-a", 7, {"M": 1}, sheet_title="Aba")
+    engine._stop.set()
+    engine._thread.join(5)
+    engine._retry_at = time.monotonic() + 60  # em backoff: só o force envia
+    fake.errors.append(_QuotaError("Quota exceeded"))
+
+    with app.app_context():
+        with pytest.raises(RuntimeError, match="aguardando a cota"):
+            vacina_pmo_service.sync_vacina_pmo_sheet()
+        assert engine.pending("plan-a") == 1
+
+        engine._retry_at = time.monotonic() + 60
+        result = vacina_pmo_service.sync_vacina_pmo_sheet()
+
+    assert result.rows == [] and engine.pending() == 0
+    assert fake.value_batches[0]["data"] == [{"range": "'Aba'!M7", "values": [[1]]}]
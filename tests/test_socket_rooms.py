@@ -0,0 +1,212 @@
+import os
+import pathlib
+import socket
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+import socketio as socketio_client
+
+from services.socket_rooms import MemoryRoomBackend, RedisRoomBackend, RoomState
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _memory_state():
+    clock = _Clock()
+    return RoomState(MemoryRoomBackend(clock=clock), ttl=60, session_ttl=10), clock
+
+
+def test_seats_are_assigned_once_and_released_on_leave():
+    rooms, _clock = _memory_state()
+
+    assert rooms.join("/chamada", "SALA", "a") == (1, 1)
+    assert rooms.join("/chamada", "SALA", "b") == (2, 2)
+    assert rooms.join("/chamada", "SALA", "c") is None
+    assert rooms.join("/", "SALA", "c") == (1, 1)  # namespaces não se misturam
+
+    assert rooms.leave("/chamada", "a") == ("SALA", 1, 1)
+    assert rooms.session("/chamada", "a") is None
+    assert rooms.join("/chamada", "SALA", "c") == (1, 2)
+    assert rooms.session("/chamada", "c") == ("SALA", 1)
+    assert rooms.leave("/chamada", "desconhecido") is None
+
+
+def test_expired_sessions_free_their_seats():
+    rooms, clock = _memory_state()
+    rooms.join("/", "PALITOS", "a")
+    rooms.join("/", "PALITOS", "b")
+    rooms.update_state("/", "PALITOS", lambda current: {"turn": 2})
+
+    clock.now += 61  # worker caiu sem disconnect: tudo expira
+
+    assert rooms.participants("/", "PALITOS") == 0
+    assert rooms.get_state("/", "PALITOS") is None
+    assert rooms.join("/", "PALITOS", "c") == (1, 1)
+
+
+def test_sessions_expire_quickly_unless_events_renew_them():
+    rooms, clock = _memory_state()
+    rooms.join("/chamada", "SALA", "a")
+    rooms.join("/chamada", "SALA", "b")
+
+    for _ in range(10):  # chamada longa: só o heartbeat de "a" chega
+        clock.now += 8
+        assert rooms.session("/chamada", "a") == ("SALA", 1)
+
+    # "b" caiu com o worker: o assento volta a ficar livre em um TTL de sessão,
+    # e o de "a" segue ocupado além do TTL da sala.
+    assert rooms.join("/chamada", "SALA", "c") == (2, 2)
+
+
+def test_redis_backend_shares_rooms_between_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    worker_a = RoomState(RedisRoomBackend(fakeredis.FakeRedis(server=server)), ttl=60, session_ttl=10)
+    worker_b = RoomState(RedisRoomBackend(fakeredis.FakeRedis(server=server)), ttl=60, session_ttl=10)
+
+    assert worker_a.join("/chamada", "SALA", "a") == (1, 1)
+    assert worker_b.join("/chamada", "SALA", "b") == (2, 2)
+    assert worker_a.join("/chamada", "SALA", "c") is None
+    assert worker_a.session("/chamada", "b") == ("SALA", 2)
+
+    worker_a.update_state("/", "SALA", lambda current: {"turn": 2, "players": {1: "Ana"}})
+    assert worker_b.update_state("/", "SALA", lambda current: None) is None
+    assert worker_b.get_state("/", "SALA") == {"turn": 2, "players": {"1": "Ana"}}
+
+    # Sessão expirada (worker reiniciado) libera o assento na próxima entrada.
+    worker_b.backend.client.delete(worker_b.backend._session_key("/chamada", "a"))
+    assert worker_b.join("/chamada", "SALA", "c") == (1, 2)
+    assert worker_a.leave("/chamada", "b") == ("SALA", 2, 1)
+    assert 0 < worker_a.backend.client.ttl(worker_a.backend._seats_key("/chamada", "SALA")) <= 60
+
+    session_key = worker_a.backend._session_key("/chamada", "c")
+    assert 0 < worker_a.backend.client.ttl(session_key) <= 10
+    worker_a.backend.client.expire(session_key, 2)
+    assert worker_b.session("/chamada", "c") == ("SALA", 1)  # evento renova
+    assert worker_a.backend.client.ttl(session_key) > 2
+
+
+_WORKER = textwrap.dedent(
+    """
+    import sys
+
+    sys.path.insert(0, sys.argv[1])
+    from app import app, socketio
+
+    socketio.run(app, host="127.0.0.1", port=int(sys.argv[2]), allow_unsafe_werkzeug=True, log_output=False)
+    """
+)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class _Worker:
+    """Um processo do app com ``socketio.run``, como um worker do gunicorn."""
+
+    def __init__(self, script, redis_url):
+        self.port = _free_port()
+        env = dict(
+            os.environ,
+            SQLALCHEMY_DATABASE_URI="sqlite:///:memory:",
+            SOCKETIO_MESSAGE_QUEUE=redis_url,
+            SOCKETIO_ASYNC_MODE="threading",
+        )
+        env.pop("REDIS_URL", None)
+        self.process = subprocess.Popen(
+            [sys.executable, str(script), str(PROJECT_ROOT), str(self.port)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, env=env, cwd=str(PROJECT_ROOT),
+        )
+
+    def wait_ready(self, timeout=90):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            assert self.process.poll() is None, "worker encerrou antes de subir"
+            try:
+                socket.create_connection(("127.0.0.1", self.port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.2)
+        raise AssertionError("worker não subiu a tempo")
+
+    def close(self):
+        self.process.terminate()
+        try:
+            self.process.wait(10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class _Participant:
+    def __init__(self, worker):
+        self.events = []
+        self.client = socketio_client.Client(reconnection=False)
+        self.client.on("*", lambda name, data: self.events.append((name, data)), namespace="/chamada")
+        self.client.connect(f"http://127.0.0.1:{worker.port}?sala=MULTI", namespaces=["/chamada"], wait_timeout=10)
+
+    def wait_for(self, name, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            found = [data for event, data in self.events if event == name]
+            if found:
+                return found
+            time.sleep(0.05)
+        return []
+
+
+def test_two_workers_share_call_room_through_message_queue(tmp_path):
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    redis_url = "redis://%s:%s/0" % server.server_address
+    script = tmp_path / "socket_worker.py"
+    script.write_text(_WORKER, encoding="utf-8")
+    workers = [_Worker(script, redis_url), _Worker(script, redis_url)]
+    participants = []
+    try:
+        for worker in workers:
+            worker.wait_ready()
+        first = _Participant(workers[0])
+        participants.append(first)
+        assert first.wait_for("room_state")[0]["seat"] == 1
+
+        second = _Participant(workers[1])
+        participants.append(second)
+        assert second.wait_for("room_state")[0] == {
+            "room": "MULTI", "participants": 2, "seat": 2, "initiator": False,
+        }
+        # Presença e sinalização atravessam os processos pela fila.
+        assert first.wait_for("peer_joined") == [{"participants": 2}]
+        second.client.emit("webrtc_signal", {"description": {"type": "offer", "sdp": "v=0"}}, namespace="/chamada")
+        assert first.wait_for("webrtc_signal") == [{"description": {"type": "offer", "sdp": "v=0"}}]
+        assert second.wait_for("webrtc_signal", timeout=0.5) == []
+
+        third = _Participant(workers[0])
+        participants.append(third)
+        assert third.wait_for("room_full")  # o assento é global, não por worker
+
+        second.client.disconnect()
+        assert first.wait_for("peer_left") == [{"participants": 1}]
+    finally:
+        for participant in participants:
+            participant.client.disconnect()
+        for worker in workers:
+            worker.close()
+        server.shutdown()
+        server.server_close()
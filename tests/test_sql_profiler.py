@@ -0,0 +1,97 @@
+import logging
+
+import pytest
+from flask import request
+from sqlalchemy import text
+
+from extensions import db
+from models import User
+from services.sql_profiler import RequestProfile, fingerprint, sql_profiler
+
+
+@pytest.fixture(autouse=True)
+def _reset_profiler():
+    sql_profiler.reset()
+    yield
+    sql_profiler.reset()
+
+
+def test_fingerprint_agrupa_mesma_consulta_com_parametros_diferentes():
+    a = fingerprint("SELECT * FROM animal WHERE id = 12 AND name = 'Rex'")
+    b = fingerprint("SELECT *  FROM animal WHERE id = 7 AND name = 'O''Malley'")
+    c = fingerprint("SELECT * FROM animal WHERE id IN (1, 2, 3)")
+
+    assert a == b == "SELECT * FROM animal WHERE id = ? AND name = ?"
+    assert c == "SELECT * FROM animal WHERE id IN (...)"
+
+
+def test_desligado_nao_mede_nada(app, client):
+    app.config["SQL_PROFILER_ENABLED"] = False
+
+    response = client.get("/ready")
+
+    assert "Server-Timing" not in response.headers
+    assert sql_profiler.slowest_endpoints() == []
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_request_perfilada_loga_resumo_e_sinaliza_n_mais_um(app):
+    app.config.update(SQL_PROFILER_ENABLED=True, SQL_PROFILER_N_PLUS_ONE_THRESHOLD=5)
+    for index in range(6):
+        db.session.add(User(name=f"u{index}", email=f"u{index}@example.com", password_hash="x"))
+    db.session.commit()
+    ids = [user.id for user in User.query.all()]
+
+    handler = _ListHandler()
+    app.logger.addHandler(handler)
+    with app.test_request_context("/pacientes"):
+        profile = RequestProfile()
+        request.environ["petorlandia.sql_profile"] = profile
+        sql_profiler._listen()
+        for user_id in ids:  # lazy load em loop
+            db.session.execute(text("SELECT name FROM user WHERE id = :id"), {"id": user_id})
+        db.session.execute(text("SELECT 1"))
+        summary = sql_profiler.summarize(profile, endpoint="pacientes")
+    app.logger.removeHandler(handler)
+
+    assert summary["query_count"] == 7
+    assert summary["db_time_ms"] >= 0
+    assert summary["n_plus_one"] == [{"statement": "SELECT name FROM user WHERE id = ?", "count": 6}]
+    assert any(message.startswith("sql_profile endpoint=pacientes queries=7") for message in handler.messages)
+    assert any("sql_n_plus_one endpoint=pacientes count=6" in message for message in handler.messages)
+    [row] = sql_profiler.slowest_endpoints()
+    assert row["endpoint"] == "pacientes"
+    assert row["n_plus_one_requests"] == 1
+
+
+def test_endpoint_admin_lista_endpoints_perfilados(app, client):
+    admin = User(name="Admin", email="admin@example.com", password_hash="x", role="admin")
+    db.session.add(admin)
+    db.session.commit()
+    app.config["SQL_PROFILER_ENABLED"] = True
+    with client.session_transaction() as sess:
+        sess.clear()
+        sess["_user_id"] = str(admin.id)
+        sess["_fresh"] = True
+
+    ready = client.get("/ready")
+    for probe in ("/wp-login.php", "/.env", "/nao-existe/123"):
+        assert client.get(probe).status_code == 404
+    payload = client.get("/admin/api/sql_profile?sort=queries").get_json()
+    app.config["SQL_PROFILER_ENABLED"] = False
+
+    assert ready.headers["Server-Timing"].startswith("db;dur=")
+    assert payload["enabled"] is True
+    endpoints = {row["endpoint"]: row for row in payload["endpoints"]}
+    assert endpoints["health_ready"]["requests"] == 1
+    assert endpoints["health_ready"]["queries"] >= 1
+    assert endpoints["<unmatched>"]["requests"] == 3
+    assert not any(row.startswith("/") for row in endpoints)
@@ -0,0 +1,121 @@
+import os
+import pathlib
+import subprocess
+import sys
+
+from flask import Blueprint, Flask
+from sqlalchemy import create_engine
+
+from blueprint_utils import _register_with_alias
+from schema_guards import run_schema_guards
+from startup_profile import StartupProfile
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+
+
+def _rules(app, endpoint):
+    return sorted(rule.rule for rule in app.url_map.iter_rules(endpoint))
+
+
+def test_checkpoints_acumulam_por_fase():
+    ticks = iter([0.0, 1.0, 1.5, 4.0, 4.25])
+    profile = StartupProfile(clock=lambda: next(ticks))
+
+    profile.checkpoint("imports")
+    profile.checkpoint("routes")
+    profile.checkpoint("blueprints")
+    profile.finish("routes")
+
+    assert profile.as_dict() == {
+        "total_ms": 4250.0,
+        "phases": {"imports": 1000.0, "routes": 750.0, "blueprints": 2500.0},
+    }
+
+
+def test_alias_cobre_todas_as_rules_sem_sobrescrever_outra_view():
+    app = Flask(__name__)
+
+    def editar(animal_id):
+        return "editar"
+
+    app.add_url_rule("/editar_animal/<int:animal_id>", "editar_animal", editar)
+    app.add_url_rule("/home", "index", lambda: "app")
+    blueprint = Blueprint("pacientes", __name__)
+    blueprint.add_url_rule("/editar_animal/<int:animal_id>", "editar_animal", editar)
+    blueprint.add_url_rule("/animal/<int:animal_id>/editar", "editar_animal", editar)
+    blueprint.add_url_rule("/pacientes", "index", lambda: "blueprint")
+    blueprint.add_url_rule("/pacientes/novo", "novo", lambda: "novo", methods=["GET", "POST"])
+
+    _register_with_alias(app, blueprint)
+
+    assert _rules(app, "editar_animal") == ["/animal/<int:animal_id>/editar", "/editar_animal/<int:animal_id>"]
+    assert _rules(app, "index") == ["/home"]  # alias de outra view fica intacto
+    assert _rules(app, "novo") == ["/pacientes/novo"]
+    assert {"GET", "POST"} <= next(app.url_map.iter_rules("novo")).methods
+
+
+def _guarded_app(tmp_path):
+    app = Flask(__name__, instance_path=str(tmp_path / "instance"))
+    engine = create_engine(f"sqlite:///{tmp_path / 'startup.db'}")
+    return app, engine
+
+
+def test_guardas_rodam_uma_vez_por_fingerprint(tmp_path, monkeypatch):
+    app, engine = _guarded_app(tmp_path)
+    calls = []
+
+    def guard():
+        calls.append("guard")
+
+    monkeypatch.setenv("HEROKU_SLUG_COMMIT", "abc123")
+    assert run_schema_guards(app, engine, [guard]) is True
+    assert run_schema_guards(app, engine, [guard]) is False
+    assert (tmp_path / "instance" / "schema_guards.json").exists()
+
+    monkeypatch.setenv("HEROKU_SLUG_COMMIT", "def456")  # novo deploy
+    assert run_schema_guards(app, engine, [guard]) is True
+    assert calls == ["guard", "guard"]
+
+    app.config["SCHEMA_GUARDS_CACHE"] = False
+    assert run_schema_guards(app, engine, [guard]) is True
+
+
+def test_guarda_com_falha_roda_de_novo_no_proximo_startup(tmp_path):
+    app, engine = _guarded_app(tmp_path)
+    outcomes = iter([False, True])
+    calls = []
+
+    def guard():
+        calls.append("guard")
+        return next(outcomes)
+
+    assert run_schema_guards(app, engine, [guard]) is True
+    assert run_schema_guards(app, engine, [guard]) is True
+    assert run_schema_guards(app, engine, [guard]) is False
+    assert len(calls) == 2
+
+
+def test_banco_em_memoria_sempre_roda_as_guardas(tmp_path):
+    app = Flask(__name__, instance_path=str(tmp_path))
+    engine = create_engine("sqlite:///:memory:")
+    calls = []
+
+    for _ in range(2):
+        assert run_schema_guards(app, engine, [lambda: calls.append("guard")]) is True
+    assert len(calls) == 2
+    assert not (tmp_path / "schema_guards.json").exists()
+
+
+def test_import_do_app_nao_carrega_sdks_pesados():
+    code = (
+        "import sys\n"
+        "import app\n"
+        "print('sdks=' + ','.join(sorted(m for m in ('boto3', 'googleapiclient', 'zeep', 'reportlab') if m in sys.modules)))\n"
+    )
+    env = dict(os.environ, SQLALCHEMY_DATABASE_URI="sqlite:///:memory:")
+    completed = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=str(PROJECT_ROOT), env=env, capture_output=True, text=True, timeout=180, check=True,
+    )
+
+    assert completed.stdout.strip().splitlines()[-1] == "sdks="